@@ -0,0 +1,2 @@
+# Benchmarks de performance do backend NeuroVendas
+# Executar a partir de backend/: python -m benchmarks.<modulo>
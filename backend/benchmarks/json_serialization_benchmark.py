@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark de serialização JSON - caminho padrão do FastAPI vs. utils.fast_json
+
+Compara uma resposta de listagem com 1.000 leads (formato de /api/leads):
+- DEFAULT: dict devolvido pelo endpoint → jsonable_encoder + json.dumps (JSONResponse)
+- FAST: FastJSONResponse (orjson, sem jsonable_encoder)
+
+Mede só a serialização e também requests/s de ponta a ponta numa app FastAPI
+mínima (ASGI em memória, sem rede).
+
+Uso (a partir de backend/):
+    python -m benchmarks.json_serialization_benchmark [--leads 1000] [--runs 50]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from utils import fast_json
+from utils.fast_json import FastJSONResponse
+
+TEMPERATURAS = ("quente", "morno", "frio")
+STATUS = ("novo", "em_contato", "agendado", "convertido", "perdido")
+
+
+def build_leads_page(count: int) -> dict:
+    now = datetime.now(timezone.utc)
+    leads = []
+    for n in range(count):
+        created = now - timedelta(minutes=n * 7)
+        leads.append({
+            "id": str(uuid4()),
+            "nome": f"Cliente Benchmark {n} — Conceição",
+            "email": f"cliente{n}@exemplo.com.br",
+            "telefone": f"+55 11 9{n:04d}-{n:04d}",
+            "procedimento": "Harmonização facial",
+            "origem": "instagram",
+            "temperatura": TEMPERATURAS[n % 3],
+            "status": STATUS[n % 5],
+            "valor_estimado": 1500 + n,
+            "observacoes": "Pediu orçamento pelo direct; prefere horários à tarde. " * 2,
+            "created_at": created.isoformat(),
+            "updated_at": created,
+        })
+    return {"success": True, "leads": leads, "next_cursor": "eyJ2IjogMX0", "has_more": True, "total": count * 3}
+
+
+def _time_runs(render, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list):
+    print(f"  {label:<8} média {statistics.mean(timings):8.2f} ms | "
+          f"mediana {statistics.median(timings):8.2f} ms | min {min(timings):8.2f} ms")
+
+
+async def _throughput(app: FastAPI, path: str, requests: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get(path)
+        start = time.perf_counter()
+        for _ in range(requests):
+            response = await client.get(path)
+            response.raise_for_status()
+        return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leads", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=50)
+    args = parser.parse_args()
+
+    page = build_leads_page(args.leads)
+    backend = "orjson" if fast_json.orjson is not None else "json (stdlib, orjson ausente)"
+    print(f"JSON benchmark - {args.leads} leads, {args.runs} execuções, FAST com {backend}\n")
+
+    default_body = JSONResponse(jsonable_encoder(page)).body
+    fast_body = FastJSONResponse(page).body
+    print(f"[tamanho] default {len(default_body) / 1024:.0f} KB | fast {len(fast_body) / 1024:.0f} KB\n")
+
+    print("[serialização]")
+    default = _time_runs(lambda: JSONResponse(jsonable_encoder(page)), args.runs)
+    fast = _time_runs(lambda: FastJSONResponse(page), args.runs)
+    _report("default", default)
+    _report("fast", fast)
+    print(f"  speedup {statistics.mean(default) / statistics.mean(fast):.2f}x\n")
+
+    app = FastAPI()
+
+    @app.get("/default")
+    async def default_endpoint():
+        return page
+
+    @app.get("/fast")
+    async def fast_endpoint():
+        return FastJSONResponse(page)
+
+    print("[ponta a ponta, ASGI em memória]")
+    default_rps = asyncio.run(_throughput(app, "/default", args.runs))
+    fast_rps = asyncio.run(_throughput(app, "/fast", args.runs))
+    print(f"  default  {default_rps:8.1f} req/s")
+    print(f"  fast     {fast_rps:8.1f} req/s")
+    print(f"  speedup {fast_rps / default_rps:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
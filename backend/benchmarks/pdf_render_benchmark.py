@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Benchmark de renderização de PDF - fontes frias vs. em cache
+
+Compara o tempo de renderizar um e-book de 20 capítulos:
+- COLD: comportamento antigo, add_font() parseando os TTF a cada documento
+- WARM: services.pdf_renderer com fontes parseadas uma vez por worker
+- CACHED: services.render_pipeline devolvendo o artefato do cache de renderização
+
+Uso (a partir de backend/):
+    python -m benchmarks.pdf_render_benchmark [--runs 10] [--chapters 20]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fpdf import FPDF
+
+from services import pdf_renderer
+from services.ebook_layout import build_layout, new_ebook_to_structured
+from services.pdf_renderer import FONT_DIR, FONT_FILES, render_layout_pdf
+from services.render_pipeline import render_ebook
+
+PARAGRAPH = (
+    "A neurociência aplicada à estética mostra que a decisão de agendar um procedimento "
+    "acontece antes da justificativa racional. Entender esse mecanismo muda a forma de "
+    "comunicar resultados, objeções e preço — ção, ã, é, ü e outros acentos inclusos."
+)
+
+
+def build_structured_ebook(chapters: int) -> dict:
+    sections = [{"type": "hero", "title": "Guia de Benchmark", "subtitle": "20 capítulos"}]
+    for n in range(1, chapters + 1):
+        sections.append({
+            "type": "section",
+            "title": f"CAPÍTULO {n} — Título do capítulo",
+            "blocks": [
+                {"type": "paragraph", "text": PARAGRAPH * 3},
+                {"type": "callout", "style": "highlight", "text": PARAGRAPH},
+                {"type": "paragraph", "text": PARAGRAPH * 2},
+                {"type": "bullet_list", "items": [PARAGRAPH[:80]] * 4},
+                {"type": "paragraph", "text": PARAGRAPH * 2},
+            ]
+        })
+    return {
+        "meta": {
+            "title": "Guia de Benchmark",
+            "subtitle": "Renderização de PDF",
+            "author": "Elevare",
+            "tone": "educational",
+            "audience": "Profissionais de estética",
+            "goal": "Medir performance"
+        },
+        "sections": sections
+    }
+
+
+def build_new_ebook(chapters: int) -> dict:
+    return {
+        "title": "Guia de Benchmark",
+        "subtitle": "Renderização de PDF",
+        "professional_name": "Dra. Teste",
+        "visual_style": "acolhedor-feminino",
+        "introduction": PARAGRAPH * 3,
+        "conclusion": PARAGRAPH * 2,
+        "next_step": PARAGRAPH,
+        "chapters": [
+            {"chapter_number": n, "title": f"Capítulo {n}", "content": PARAGRAPH * 8, "source": "Kahneman (2011)"}
+            for n in range(1, chapters + 1)
+        ]
+    }
+
+
+class _ColdFontPDF(FPDF):
+    """Reproduz o caminho antigo: add_font() de disco em cada documento"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for style, filename in FONT_FILES.items():
+            path = os.path.join(FONT_DIR, filename)
+            if os.path.exists(path):
+                self.add_font(pdf_renderer.FONT_FAMILY, style, path)
+        self.font_name = pdf_renderer.FONT_FAMILY
+        self.italic_style = "I" if "dejavuI" in self.fonts else ""
+
+
+def _time_runs(render, runs: int) -> list:
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        render()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def _report(label: str, timings: list):
+    print(f"  {label:<6} média {statistics.mean(timings):8.1f} ms | "
+          f"mediana {statistics.median(timings):8.1f} ms | min {min(timings):8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--chapters", type=int, default=20)
+    args = parser.parse_args()
+
+    if not pdf_renderer.warm_font_cache():
+        print(f"Fontes DejaVu não encontradas em {FONT_DIR}; benchmark não representativo.")
+        return 1
+
+    workloads = {
+        "structured": (build_structured_ebook(args.chapters), "marketing"),
+        "ebook-new": (new_ebook_to_structured(build_new_ebook(args.chapters)), "acolhedor-feminino"),
+    }
+
+    print(f"PDF render benchmark - {args.chapters} capítulos, {args.runs} execuções\n")
+
+    # Custo isolado de preparar um documento com as fontes registradas
+    print("[setup de fontes por documento]")
+    _report("cold", _time_runs(_ColdFontPDF, args.runs))
+    _report("warm", _time_runs(pdf_renderer.ElevarePDF, args.runs))
+    print()
+
+    for name, (structured, template) in workloads.items():
+        layout = build_layout(structured)
+
+        def render():
+            return render_layout_pdf(layout, template)
+
+        render()  # aquece imports/caches do fpdf2
+
+        # COLD: troca temporariamente a base da classe pelo caminho antigo
+        bases = pdf_renderer.LayoutPDF.__bases__
+        pdf_renderer.LayoutPDF.__bases__ = (_ColdFontPDF,)
+        try:
+            cold = _time_runs(render, args.runs)
+        finally:
+            pdf_renderer.LayoutPDF.__bases__ = bases
+
+        warm = _time_runs(render, args.runs)
+
+        render_ebook(structured, template, "pdf")
+        cached = _time_runs(lambda: render_ebook(structured, template, "pdf"), args.runs)
+
+        print(f"[{name}]")
+        _report("cold", cold)
+        _report("warm", warm)
+        _report("cached", cached)
+        print(f"  speedup {statistics.mean(cold) / statistics.mean(warm):.2f}x\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Pegada de tokens dos prompts registrados (services.prompt_registry)
+
+Para cada template: version_id, variáveis, tokens do texto fixo, tokens do
+prefixo fixo (antes da primeira variável) e custo de entrada estimado por
+1.000 chamadas só com o texto fixo. As variáveis, o system prompt e as
+imagens somam a isso em cada request.
+
+Uso (a partir de backend/):
+    python -m benchmarks.prompt_footprint [--all] [--model openai/gpt-4o] [--json]
+"""
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.neurovendas_prompts  # noqa: F401 - registra os templates
+import services.prompt_templates  # noqa: F401 - registra os templates
+from services.llm_usage import MODEL_PRICES
+from services.prompt_registry import prompt_registry, tokenizer_name
+
+
+def footprint(template, price_in: float) -> dict:
+    return {
+        "version_id": template.version_id,
+        "syntax": template.syntax,
+        "variables": sorted(template.variables),
+        "static_chars": len(template.static_text),
+        "static_tokens": template.static_tokens,
+        "prefix_tokens": template.prefix_tokens,
+        "usd_per_1k_calls": round(template.static_tokens * price_in / 1000, 4),
+        "description": template.description,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--all", action="store_true", help="todas as versões, não só as ativas")
+    parser.add_argument("--model", default="openai/gpt-4o", choices=sorted(MODEL_PRICES))
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    price_in = MODEL_PRICES[args.model][0]
+    templates = prompt_registry.templates() if args.all else prompt_registry.active()
+    rows = sorted((footprint(t, price_in) for t in templates), key=lambda row: -row["static_tokens"])
+
+    if args.json:
+        print(json.dumps({"tokenizer": tokenizer_name(), "model": args.model, "templates": rows}, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"Prompts registrados - {len(rows)} template(s), tokenizer {tokenizer_name()}, preço {args.model}\n")
+    print(f"  {'version_id':<58} {'fixo':>6} {'prefixo':>8} {'vars':>5} {'US$/1k':>8}")
+    for row in rows:
+        print(
+            f"  {row['version_id']:<58} {row['static_tokens']:>6} {row['prefix_tokens']:>8} "
+            f"{len(row['variables']):>5} {row['usd_per_1k_calls']:>8.4f}"
+        )
+    total = sum(row["static_tokens"] for row in rows)
+    print(f"\n  total de tokens fixos: {total}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,22 +1,122 @@
 """
 Routers initialization
-Importa e configura todos os routers modulares
+Monta os routers modulares sob demanda: cada módulo só é importado no primeiro
+request que cair no seu prefixo (ROUTE_MODULES), fora do cold start.
+
+Só as rotas listadas em MOUNTED_ROUTES são montadas: rotas revisadas que o
+server.py não atende. O restante dos módulos (auth, dashboard, checkout,
+status e histórico de pagamentos, gamma/create-ebook, ...) repete rotas do
+server.py; gamification e onboarding ficam de fora (onboarding/complete soma
+XP a cada chamada). As rotas do server.py são avaliadas antes. Rotas
+carregadas assim não aparecem no OpenAPI.
 """
 
-from fastapi import APIRouter
-from routers import auth, ai, gamification, onboarding, diagnosis, dashboard, payments, ebooks
+import importlib
+import logging
+import threading
+import time
+from typing import Dict, FrozenSet, List
+
+from starlette.routing import BaseRoute, Match, NoMatchFound
+
+from utils.lazy_imports import startup_timer
+
+logger = logging.getLogger("elevare.routers")
+
+# Prefixo do path → módulo com `router`
+ROUTE_MODULES: Dict[str, str] = {
+    "/api/ai": "routers.ai",
+    "/api/diagnosis": "routers.diagnosis",
+    "/api/payments": "routers.payments",
+    "/api/ebooks": "routers.ebooks",
+}
+
+# Rotas montadas de cada módulo ("MÉTODO path"); o resto do módulo fica de fora
+MOUNTED_ROUTES: Dict[str, FrozenSet[str]] = {
+    "routers.ai": frozenset({
+        "GET /api/ai/history",
+        "GET /api/ai/usage",
+    }),
+    "routers.diagnosis": frozenset({
+        "GET /api/diagnosis/history",
+    }),
+    "routers.payments": frozenset({
+        "GET /api/payments/plans",
+        "GET /api/payments/subscription",
+    }),
+    "routers.ebooks": frozenset({
+        "GET /api/ebooks/list",
+        "GET /api/ebooks/{ebook_id}",
+        "DELETE /api/ebooks/{ebook_id}",
+    }),
+}
+
+_ROUTE_KEY = "elevare.lazy_route"
+_load_lock = threading.Lock()
+
+
+class LazyRoutes(BaseRoute):
+    """Rotas de `module_name`, importado no primeiro request sob `prefix`"""
+
+    def __init__(self, prefix: str, module_name: str):
+        self.prefix = prefix.rstrip("/")
+        self.module_name = module_name
+        self._routes: List[BaseRoute] = None
+
+    def _load(self) -> List[BaseRoute]:
+        if self._routes is None:
+            with _load_lock:
+                if self._routes is None:
+                    start = time.perf_counter()
+                    module = importlib.import_module(self.module_name)
+                    startup_timer.record_lazy("router", self.module_name, time.perf_counter() - start)
+                    self._routes = mounted_routes(self.module_name, module.router.routes)
+        return self._routes
+
+    def matches(self, scope):
+        if scope["type"] != "http":
+            return Match.NONE, {}
+        path = scope["path"]
+        if path != self.prefix and not path.startswith(self.prefix + "/"):
+            return Match.NONE, {}
+        partial = None
+        for route in self._load():
+            match, child_scope = route.matches(scope)
+            if match == Match.FULL:
+                return Match.FULL, {**child_scope, _ROUTE_KEY: route}
+            if match == Match.PARTIAL and partial is None:
+                partial = {**child_scope, _ROUTE_KEY: route}
+        if partial is not None:
+            return Match.PARTIAL, partial
+        return Match.NONE, {}
+
+    async def handle(self, scope, receive, send):
+        route = scope.pop(_ROUTE_KEY)
+        await route.handle(scope, receive, send)
+
+    def url_path_for(self, name: str, **path_params):
+        raise NoMatchFound(name, path_params)
+
+
+def _route_keys(route: BaseRoute) -> FrozenSet[str]:
+    return frozenset(f"{method} {route.path}" for method in getattr(route, "methods", None) or ())
+
+
+def mounted_routes(module_name: str, routes: List[BaseRoute]) -> List[BaseRoute]:
+    """Rotas do módulo liberadas em MOUNTED_ROUTES"""
+    allowed = MOUNTED_ROUTES.get(module_name, frozenset())
+    selected = [route for route in routes if _route_keys(route) & allowed]
+    found = frozenset().union(*(_route_keys(route) for route in selected))
+    missing = allowed - found
+    if missing:
+        logger.warning(f"{module_name}: rotas liberadas que não existem no módulo: {sorted(missing)}")
+    return selected
+
 
-# Router principal que agrega todos
-api_router = APIRouter()
+def mount_routers(app):
+    """Registra os routers modulares depois das rotas do server.py"""
+    for prefix, module_name in ROUTE_MODULES.items():
+        app.router.routes.append(LazyRoutes(prefix, module_name))
 
-# Incluir todos os routers
-api_router.include_router(auth.router)
-api_router.include_router(ai.router)
-api_router.include_router(gamification.router)
-api_router.include_router(onboarding.router)
-api_router.include_router(diagnosis.router)
-api_router.include_router(dashboard.router)
-api_router.include_router(payments.router)
-api_router.include_router(ebooks.router)
 
-__all__ = ["api_router"]
+__all__ = ["ROUTE_MODULES", "MOUNTED_ROUTES", "LazyRoutes", "mounted_routes", "mount_routers"]
@@ -84,7 +84,8 @@ async def get_current_user(
     )
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
+        # Tokens do server.py (login/registro) trazem "user_id"; os antigos, "sub"
+        user_id: str = payload.get("user_id") or payload.get("sub")
         if user_id is None:
             raise credentials_exception
     except JWTError:
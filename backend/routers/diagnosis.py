@@ -15,9 +15,7 @@ async def get_db():
     from server import db
     return db
 
-async def get_current_user():
-    from routers.auth import get_current_user as _get_current_user
-    return await _get_current_user()
+from routers.auth import get_current_user
 
 # Pydantic Models
 class DiagnosisComplete(BaseModel):
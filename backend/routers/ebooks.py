@@ -22,6 +22,7 @@ async def get_db():
 from routers.auth import get_current_user
 from services.gamma_service import GammaService, GammaConfig
 from utils.plan_limits import check_and_raise_limit, LimitExceededError
+from utils.pagination import increment_count
 
 # Pydantic Models
 class CreateEbookRequest(BaseModel):
@@ -150,6 +151,7 @@ Use exemplos reais do mercado de estética e bem-estar.
         }
         
         await db.ebooks.insert_one(ebook_doc)
+        await increment_count(db, current_user["id"], "ebooks")
         logger.info(f"[E-book] Salvo no MongoDB: {ebook_id}")
         
         # Incrementar contador de uso
@@ -266,6 +268,7 @@ async def delete_ebook(
             status_code=404,
             detail={"error": "not_found", "message": "E-book não encontrado"}
         )
+    await increment_count(db, current_user["id"], "ebooks", -1)
     
     return {
         "success": True,
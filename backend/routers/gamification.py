@@ -6,7 +6,6 @@ Gerencia: XP, níveis, badges, conquistas
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from typing import List, Dict
-from datetime import datetime, timezone
 
 router = APIRouter(prefix="/api/gamification", tags=["gamification"])
 
@@ -36,42 +35,6 @@ def calculate_level(xp: int) -> int:
     return 1
 
 # Routes
-@router.post("/add-xp")
-async def add_xp(
-    xp_amount: int,
-    reason: str,
-    current_user: dict = Depends(get_current_user),
-    db = Depends(get_db)
-):
-    """Adicionar XP ao usuário"""
-    current_xp = current_user.get("xp", 0)
-    current_level = current_user.get("level", 1)
-    new_xp = current_xp + xp_amount
-    new_level = calculate_level(new_xp)
-    
-    level_up = new_level > current_level
-    
-    await db.users.update_one(
-        {"id": current_user["id"]},
-        {
-            "$set": {"xp": new_xp, "level": new_level},
-            "$push": {
-                "xp_history": {
-                    "amount": xp_amount,
-                    "reason": reason,
-                    "timestamp": datetime.now(timezone.utc)
-                }
-            }
-        }
-    )
-    
-    return {
-        "xp": new_xp,
-        "level": new_level,
-        "level_up": level_up,
-        "xp_added": xp_amount
-    }
-
 @router.get("/stats")
 async def get_gamification_stats(
     current_user: dict = Depends(get_current_user),
@@ -1,6 +1,7 @@
 """
 Rotas de Pagamentos - Integração Stripe
-Gerencia: checkout, status, webhooks, assinaturas
+Gerencia: checkout, status, assinaturas
+(o webhook do Stripe fica em /api/webhook/stripe, no server.py)
 """
 
 from fastapi import APIRouter, HTTPException, Depends, Request
@@ -364,93 +365,6 @@ async def get_payment_status(
         logger.error(f"Erro ao verificar status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Erro ao verificar status: {str(e)}")
 
-@router.post("/webhook")
-async def stripe_webhook(request: Request, db = Depends(get_db)):
-    """Webhook para eventos do Stripe"""
-    from emergentintegrations.payments.stripe.checkout import StripeCheckout
-    
-    stripe_api_key = os.environ.get("STRIPE_API_KEY")
-    stripe_webhook_secret = os.environ.get("STRIPE_WEBHOOK_SECRET")
-    
-    if not stripe_webhook_secret:
-        logger.warning("STRIPE_WEBHOOK_SECRET não configurado")
-        return {"received": True}
-    
-    try:
-        body = await request.body()
-        signature = request.headers.get("Stripe-Signature", "")
-        
-        stripe_checkout = StripeCheckout(
-            api_key=stripe_api_key, 
-            webhook_url="",
-            webhook_secret=stripe_webhook_secret
-        )
-        webhook_response = await stripe_checkout.handle_webhook(body, signature)
-        
-        # Processar evento de pagamento confirmado
-        if webhook_response.payment_status == "paid":
-            session_id = webhook_response.session_id
-            
-            transaction = await db.payment_transactions.find_one(
-                {"session_id": session_id},
-                {"_id": 0}
-            )
-            
-            if transaction and transaction.get("payment_status") != "paid":
-                plan = SUBSCRIPTION_PLANS.get(transaction["plan_id"])
-                
-                if plan:
-                    # Atualizar usuário
-                    await db.users.update_one(
-                        {"id": transaction["user_id"]},
-                        {
-                            "$set": {
-                                "subscription_plan": transaction["plan_id"],
-                                "plan_name": plan["name"],
-                                "subscription_active": True,
-                                "subscription_limits": plan["limits"],
-                                "subscription_updated_at": datetime.now(timezone.utc).isoformat()
-                            },
-                            "$inc": {"credits_remaining": plan["credits"]}
-                        }
-                    )
-                    
-                    # Atualizar transação
-                    await db.payment_transactions.update_one(
-                        {"session_id": session_id},
-                        {
-                            "$set": {
-                                "status": "completed",
-                                "payment_status": "paid",
-                                "credits_added": plan["credits"],
-                                "processed_at": datetime.now(timezone.utc).isoformat()
-                            }
-                        }
-                    )
-                    
-                    # Enviar email de confirmação
-                    try:
-                        from services.email_service import get_email_service
-                        user = await db.users.find_one({"id": transaction["user_id"]})
-                        if user:
-                            email_service = get_email_service()
-                            await email_service.send_payment_confirmation(
-                                user_email=user["email"],
-                                user_name=user["name"],
-                                plan_name=plan["name"],
-                                amount=plan["price"] / 100
-                            )
-                    except Exception as email_error:
-                        logger.warning(f"Falha ao enviar email de confirmação: {str(email_error)}")
-                    
-                    logger.info(f"Webhook: Pagamento processado - user={transaction['user_email']}, plan={transaction['plan_id']}")
-        
-        return {"received": True, "status": "processed"}
-        
-    except Exception as e:
-        logger.error(f"Erro no webhook Stripe: {str(e)}")
-        return {"received": True, "error": str(e)}
-
 @router.get("/subscription")
 async def get_user_subscription(
     current_user: dict = Depends(get_current_user),
@@ -1,21 +1,63 @@
-from fastapi import FastAPI, HTTPException, Depends, status, Request, File, UploadFile, Form
+from fastapi import FastAPI, HTTPException, Depends, status, Request, File, UploadFile, Form, Response, BackgroundTasks
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument
 from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timezone, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
+import copy
 import json
 import base64
+import logging
+import tempfile
+from contextlib import asynccontextmanager
 from uuid import uuid4
 from dotenv import load_dotenv
-import resend
+
+# Relógio do cold start: antes dos demais imports do projeto
+from utils.lazy_imports import startup_timer
 
 load_dotenv()
 
+logger = logging.getLogger("elevare.server")
+
+# Observabilidade (métricas Prometheus, trace ID nos logs, tempo por dependência)
+from utils.observability import (
+    ObservabilityMiddleware, MongoCommandListener, configure_logging, instrument_ai_clients, metrics_payload,
+    set_request_user
+)
+from utils.loop_monitor import loop_monitor, ENABLED as LOOP_MONITOR_ENABLED
+from utils.profiler import ProfilingMiddleware, list_profiles, profile_path
+from services.llm_usage import usage_ledger, usage_report, ensure_usage_indexes
+from utils.ai_retry import resilience_status
+# Prazo por request propagado para LLM, retries e MongoDB
+from utils.deadline import DeadlineMiddleware, enforce_on_ai_clients, is_deadline_error, record_partial
+# Gerações longas canceladas (ou mantidas em segundo plano) se o cliente desconectar
+from utils.disconnect import (
+    ClientDisconnected, run_disconnect_aware, list_background_results, get_background_result,
+    ensure_background_result_indexes, mark_background_result_interrupted
+)
+# Serialização rápida (orjson) para listagens, documentos grandes e catálogos
+from utils.fast_json import FastJSONResponse, StaticJSON, dumps as json_dumps
+# Compressão gzip/brotli negociada e artefatos pré-comprimidos
+from utils.compression import CompressionMiddleware, precompressed_response
+# Pool, compressão e read preference do MongoDB
+from utils.db_config import create_client, workload_database, pool_listener, config_report
+# Idempotency-Key e single-flight nos endpoints de geração/checkout
+from utils.idempotency import idempotent
+# Estado compartilhado entre workers/réplicas (invalidação, rate limit, jobs com lease)
+from utils.shared_state import shared_state, ensure_shared_state_indexes, RateLimitExceeded
+configure_logging()
+instrument_ai_clients()
+enforce_on_ai_clients()
+startup_timer.mark("imports_infra")
+
 # Import LucresIA
 from services.lucresia import LucresIA, PROMPTS_BIBLIOTECA, TEMPLATES_CONTEUDO
 from services.biblioteca_prompts import (
@@ -27,6 +69,20 @@ from services.biblioteca_prompts import (
     TIPOS_CONTEUDO
 )
 from services.image_generator import get_image_generator, ImageGenerator
+# Prints reduzidos ao orçamento de tiles do modelo de visão + hash perceptual
+from services.vision_preprocess import prepare_screenshot, same_screenshots
+# Imagens em binário com derivados WebP/AVIF (thumb/medium) servidos por /api/images
+from services.image_derivatives import (
+    store_image, store_image_refs, load_image, delete_images, image_urls, image_id_from_url,
+    decode_base64_image, ensure_image_indexes, CACHE_MAX_AGE as IMAGE_CACHE_MAX_AGE
+)
+# Memória do chat da LucresIA: janela por orçamento de tokens + resumo em background
+from services.chat_memory import chat_memory, ensure_chat_history_indexes
+# Prompts versionados e pré-compilados (o import de prompt_templates registra os templates)
+from services.prompt_registry import prompt_registry, PromptVariableError
+from services.prompt_templates import biblioteca_prompt_name, CAMPANHA_IDENTIDADE_MARCA, PRESENCA_VISUAL_SYSTEM
+# Roteamento de modelos por tarefa com fallback (níveis configurados em um só lugar)
+from services.model_router import routed_chat, routing_status
 from services.content_verifier import get_content_verifier, ContentVerifier
 from services.carousel_generator import get_carousel_generator, CarouselGenerator
 from services.multi_platform_generator import get_multi_platform_generator, MultiPlatformGenerator
@@ -34,9 +90,32 @@ from services.seo_blog_generator import get_seo_blog_generator, SEOBlogGenerator
 
 # E-book Structured Generator (New System)
 from services.ebook_generator import generate_structured_ebook, structured_ebook_to_readable_text
-from services.ebook_renderer import render_structured_ebook, get_available_templates
+from services.ebook_patch import PatchError, apply_patch, readable_fields, version_filter
+from services.ebook_revisions import (
+    RevisionNotFoundError, record_revision, materialize, list_revisions, diff_versions,
+    delete_revisions, new_ebook_content, ensure_revision_indexes, NEW_EBOOK_FIELDS
+)
+from services.ebook_renderer import get_available_templates
 from schemas.ebook_schema import is_valid_structured_ebook
 
+# Renderização de e-books (layout único → HTML/PDF/EPUB, com cache)
+from services.pdf_renderer import warm_font_cache
+from services.render_pipeline import render_ebook, render_key
+from services.ebook_layout import new_ebook_to_structured, v2_data_to_structured
+
+# Listagens paginadas por cursor
+from utils.pagination import (
+    DEFAULT_PAGE_SIZE, InvalidCursorError, page_response, increment_count, ensure_pagination_indexes
+)
+
+# Consulta de leads (filtros, busca, funil)
+from services.lead_query import (
+    query_leads, search_fields, search_fields_update, ensure_lead_indexes, backfill_search_fields
+)
+
+# Importação/exportação de leads em massa
+from services.lead_import import create_import_job, run_import_job, mark_import_interrupted, export_leads_csv
+
 # E-book Generator V2 (Interno - SEM GAMMA)
 from services.ebook_generator_v2 import get_ebook_generator, EbookGeneratorV2
 
@@ -48,12 +127,27 @@ from services.gamma_service import (
     build_blog_config
 )
 
-# Stripe Integration
-from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionResponse, CheckoutStatusResponse, CheckoutSessionRequest
+startup_timer.mark("imports_services")
 
 # App initialization
 app = FastAPI(title="NeuroVendas by Elevare", version="2.0.0")
 
+# Prazo do request: camada mais interna, para o 504 passar pelo CORS
+app.add_middleware(DeadlineMiddleware)
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Ninguém lê esta resposta; 499 separa desconexões de erros nas métricas
+    return Response(status_code=499)
+
+@app.exception_handler(RateLimitExceeded)
+async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Muitas tentativas. Aguarde alguns minutos e tente novamente."},
+        headers={"Retry-After": str(int(exc.retry_after) + 1)},
+    )
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -63,6 +157,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compressão por fora do CORS e do prazo: vale para qualquer resposta da aplicação
+app.add_middleware(CompressionMiddleware)
+
+# Profiler sob demanda fica dentro da observabilidade (perfil já com trace ID)
+app.add_middleware(ProfilingMiddleware)
+# Registrado por último = camada mais externa (mede também o CORS)
+app.add_middleware(ObservabilityMiddleware)
+
 # Database
 MONGO_URL = os.environ.get("MONGO_URL", "mongodb://localhost:27017")
 DB_NAME = os.environ.get("DB_NAME", "elevare_db")
@@ -73,11 +175,19 @@ ACCESS_TOKEN_EXPIRE_DAYS = 7
 # Resend Email Config
 RESEND_API_KEY = os.environ.get("RESEND_API_KEY", "")
 RESEND_FROM_EMAIL = os.environ.get("RESEND_FROM_EMAIL", "noreply@elevare.neurovendas")
-if RESEND_API_KEY:
-    resend.api_key = RESEND_API_KEY
+
+def get_resend():
+    """SDK do Resend, importado no primeiro e-mail enviado"""
+    import resend
+    if RESEND_API_KEY:
+        resend.api_key = RESEND_API_KEY
+    return resend
+
 
 client: AsyncIOMotorClient = None
 db = None
+# Leituras agregadas (estatísticas, rankings, relatórios): secundários quando houver
+db_analytics = None
 
 # Password hashing
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -210,6 +320,11 @@ class StructuredEbookPDFRequest(BaseModel):
 class StructuredEbookUpdateRequest(BaseModel):
     ebook_id: str
     structured_content: dict
+    version: Optional[int] = None  # se enviado, 409 quando o e-book mudou desde a leitura
+
+class StructuredEbookPatchRequest(BaseModel):
+    version: int
+    operations: List[Dict[str, Any]]
 
 class ChatMessageRequest(BaseModel):
     message: str
@@ -627,10 +742,18 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
         user = await db.users.find_one({"id": user_id}, {"_id": 0})
         if user is None:
             raise HTTPException(status_code=401, detail="Usuário não encontrado")
+        # Atribui as chamadas de LLM do request ao usuário (ledger de uso)
+        set_request_user(user_id)
         return user
     except JWTError:
         raise HTTPException(status_code=401, detail="Token inválido")
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    """Usuário autenticado com role admin (rotas de diagnóstico)"""
+    if current_user.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Acesso restrito a administradores")
+    return current_user
+
 async def check_credits(user_id: str, required_amount: int) -> tuple[bool, int]:
     """
     Verifica se o usuário tem créditos suficientes.
@@ -806,19 +929,174 @@ GAMIFICATION_REWARDS = {
 # EVENTS
 # =============================================================================
 
-@app.on_event("startup")
+# Recursos por worker: com N workers (ou réplicas) cada processo abre o próprio
+# pool do MongoDB e as próprias tasks, sempre depois do fork. Estado que precisa
+# ser igual entre processos fica em utils.shared_state.
+
 async def startup_db_client():
-    global client, db
-    client = AsyncIOMotorClient(MONGO_URL)
+    global client, db, db_analytics
+    client = create_client(MONGO_URL, event_listeners=[MongoCommandListener()])
     db = client[DB_NAME]
+    db_analytics = workload_database(db, "analytics")
     print(f"✅ NeuroVendas conectado ao MongoDB: {DB_NAME}")
+    # Parsear fontes do PDF uma vez por worker (evita add_font a cada request)
+    warm_font_cache()
+    startup_timer.mark("font_cache")
+    shared_state.start(db)
+    try:
+        await ensure_pagination_indexes(db)
+        await ensure_lead_indexes(db)
+        # Uma vez por deploy, não uma vez por worker
+        if await shared_state.backend.add("startup", "backfill_search_fields", {"worker": shared_state.worker_id}, 600):
+            await backfill_search_fields(db)
+        await ensure_revision_indexes(db)
+        await ensure_usage_indexes(db)
+        await ensure_background_result_indexes(db)
+        await ensure_shared_state_indexes(db)
+        await ensure_image_indexes(db)
+        await ensure_chat_history_indexes(db)
+    except Exception as e:
+        logger.warning(f"Não foi possível criar índices de paginação/leads/revisões/uso: {e}")
+    startup_timer.mark("indexes")
+    shared_state.on_job_expired("lead_import", lambda job: mark_import_interrupted(db, job))
+    shared_state.on_job_expired("background_result", lambda job: mark_background_result_interrupted(db, job))
+    usage_ledger.start(db)
+    chat_memory.start(db)
+    if LOOP_MONITOR_ENABLED:
+        loop_monitor.start()
+    startup_timer.ready()
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics(request: Request):
+    """Exposição Prometheus (protegida por METRICS_TOKEN quando definido)"""
+    token = os.environ.get("METRICS_TOKEN")
+    if token and request.headers.get("authorization") != f"Bearer {token}":
+        raise HTTPException(status_code=401, detail="Não autorizado")
+    body, content_type = metrics_payload()
+    return Response(content=body, media_type=content_type)
 
-@app.on_event("shutdown")
 async def shutdown_db_client():
     global client
+    await loop_monitor.stop()
+    await chat_memory.stop()
+    await shared_state.stop()
+    # Grava o que ainda está na fila do ledger antes de fechar a conexão
+    await usage_ledger.stop()
     if client:
         client.close()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await startup_db_client()
+    try:
+        yield
+    finally:
+        await shutdown_db_client()
+
+app.router.lifespan_context = lifespan
+
+# =============================================================================
+# ADMIN - DIAGNÓSTICO DE PERFORMANCE
+# =============================================================================
+
+@app.get("/api/admin/loop-stalls")
+async def get_loop_stalls(limit: int = 50, admin: dict = Depends(get_admin_user)):
+    """Travamentos do event loop agregados por local no código (maior tempo total primeiro)"""
+    return {"success": True, **loop_monitor.report(limit)}
+
+@app.delete("/api/admin/loop-stalls")
+async def reset_loop_stalls(admin: dict = Depends(get_admin_user)):
+    """Zera o agregado (útil antes de um teste de carga em staging)"""
+    loop_monitor.reset()
+    return {"success": True}
+
+@app.get("/api/admin/profiles")
+async def get_profiles(admin: dict = Depends(get_admin_user)):
+    """Perfis de requests capturados (X-Profile ou amostragem), mais recentes primeiro"""
+    return {"success": True, "profiles": await run_in_threadpool(list_profiles)}
+
+@app.get("/api/admin/profiles/{name}")
+async def download_profile(name: str, admin: dict = Depends(get_admin_user)):
+    """Arquivo folded do perfil (flamegraph.pl / speedscope)"""
+    path = profile_path(name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Perfil não encontrado")
+    with open(path, "rb") as f:
+        content = f.read()
+    return Response(
+        content=content,
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{name}"'}
+    )
+
+@app.get("/api/admin/llm-usage")
+async def get_llm_usage_report(
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    group_by: str = "endpoint",
+    user_id: Optional[str] = None,
+    limit: int = 100,
+    admin: dict = Depends(get_admin_user)
+):
+    """
+    Uso de LLM agregado (chamadas, erros, tentativas extras, tokens, custo estimado, p50/p95).
+    group_by: combinação de day, user_id, endpoint, task, model (separados por vírgula).
+    """
+    try:
+        report = await usage_report(
+            db_analytics,
+            date_from=date_from,
+            date_to=date_to,
+            group_by=[field.strip() for field in group_by.split(",") if field.strip()],
+            user_id=user_id,
+            limit=min(max(limit, 1), 1000)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, **report}
+
+@app.get("/api/admin/ai-resilience")
+async def get_ai_resilience(admin: dict = Depends(get_admin_user)):
+    """Estado dos circuit breakers das chamadas de IA"""
+    return {"success": True, **resilience_status()}
+
+@app.get("/api/admin/model-routing")
+async def get_model_routing(admin: dict = Depends(get_admin_user)):
+    """
+    Política de roteamento de modelos: nível de cada tarefa, modelos e espera
+    antes do fallback por nível e estado do circuit breaker de cada modelo.
+    Latência e custo por tarefa: /api/admin/llm-usage?group_by=task,model
+    """
+    return {"success": True, **routing_status()}
+
+@app.get("/api/admin/db-pool")
+async def get_db_pool(admin: dict = Depends(get_admin_user)):
+    """Configuração do client MongoDB e utilização do pool por servidor (deste worker)"""
+    return {"success": True, "config": config_report(), "pools": pool_listener.report()}
+
+@app.get("/api/admin/startup-timing")
+async def get_startup_timing(admin: dict = Depends(get_admin_user)):
+    """Fases do cold start deste worker e imports tardios (SDKs, routers) desde então"""
+    return {"success": True, **startup_timer.report()}
+
+# =============================================================================
+# GERAÇÕES CONCLUÍDAS EM SEGUNDO PLANO (cliente desconectou)
+# =============================================================================
+
+@app.get("/api/background-results")
+async def get_background_results(limit: int = 20, current_user: dict = Depends(get_current_user)):
+    """Gerações que continuaram após o fechamento da aba (sem o conteúdo)"""
+    results = await list_background_results(db, current_user["id"], min(max(limit, 1), 100))
+    return {"success": True, "results": results}
+
+@app.get("/api/background-results/{result_id}")
+async def get_background_result_endpoint(result_id: str, current_user: dict = Depends(get_current_user)):
+    """Status e resposta completa de uma geração em segundo plano"""
+    result = await get_background_result(db, current_user["id"], result_id)
+    if not result:
+        raise HTTPException(status_code=404, detail="Resultado não encontrado")
+    return {"success": True, "result": result}
+
 # =============================================================================
 # HEALTH CHECK
 # =============================================================================
@@ -844,6 +1122,7 @@ async def health_check():
         "service": "NeuroVendas by Elevare",
         "version": "2.0.0",
         "ai": "LucresIA",
+        "worker": shared_state.worker_id,
         "integrations": integrations
     }
 
@@ -924,7 +1203,7 @@ async def test_email_integration(current_user: dict = Depends(get_current_user))
         }
     
     try:
-        result = resend.Emails.send({
+        result = get_resend().Emails.send({
             "from": f"Elevare NeuroVendas <{RESEND_FROM_EMAIL}>",
             "to": [current_user["email"]],
             "subject": "✅ Teste de Email - NeuroVendas",
@@ -1188,7 +1467,7 @@ async def cadastro_gratuito(data: CadastroGratuitoInput):
         # Enviar email de boas-vindas (não-bloqueante)
         try:
             if RESEND_API_KEY:
-                resend.Emails.send({
+                get_resend().Emails.send({
                     "from": f"Elevare NeuroVendas <{RESEND_FROM_EMAIL}>",
                     "to": [data.email],
                     "subject": "🎉 Bem-vinda ao Elevare NeuroVendas!",
@@ -1287,8 +1566,13 @@ async def register(user_data: UserCreate):
         }
     }
 
+# Tentativas de login por e-mail, somando todos os workers/réplicas (0 desliga)
+LOGIN_RATE_LIMIT = int(os.environ.get("LOGIN_RATE_LIMIT", "10"))
+LOGIN_RATE_WINDOW_SECONDS = 300
+
 @app.post("/api/auth/login", response_model=TokenResponse)
 async def login(credentials: UserLogin):
+    await shared_state.rate_limit("login", credentials.email.lower(), LOGIN_RATE_LIMIT, LOGIN_RATE_WINDOW_SECONDS)
     user = await db.users.find_one({"email": credentials.email}, {"_id": 0})
     
     if not user or not verify_password(credentials.password, user["password_hash"]):
@@ -1376,7 +1660,7 @@ async def forgot_password(data: PasswordResetRequest):
     try:
         if RESEND_API_KEY:
             reset_link = f"https://aivendas-1.preview.emergentagent.com/reset-password?token={reset_token}"
-            resend.Emails.send({
+            get_resend().Emails.send({
                 "from": f"Elevare NeuroVendas <{RESEND_FROM_EMAIL}>",
                 "to": [user["email"]],
                 "subject": "Recupere sua senha - NeuroVendas by Elevare",
@@ -1473,7 +1757,7 @@ async def join_waitlist(data: WaitlistRequest):
     # Enviar email de confirmação
     try:
         if RESEND_API_KEY:
-            resend.Emails.send({
+            get_resend().Emails.send({
                 "from": f"Elevare NeuroVendas <{RESEND_FROM_EMAIL}>",
                 "to": [data.email],
                 "subject": "Você está na lista VIP! - NeuroVendas by Elevare",
@@ -1775,21 +2059,23 @@ async def chat_with_lucresia(data: ChatMessageRequest, current_user: dict = Depe
         {"_id": 0}
     )
     
-    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity)
+    # Resumo + últimos turnos da sessão (o prompt não cresce com a conversa)
+    window = await chat_memory.load_window(current_user["id"], session_id)
+    lucresia = LucresIA(
+        session_id=session_id,
+        user_context=user_context,
+        brand_identity=brand_identity,
+        conversation_context=window.as_context(),
+    )
     
     try:
         response = await lucresia.send_message(data.message)
         
-        # Save chat history
-        await db.chat_history.insert_one({
-            "id": str(uuid4()),
-            "user_id": current_user["id"],
-            "session_id": session_id,
-            "message": data.message,
-            "response": response,
-            "brand_context_used": brand_identity is not None,
-            "created_at": datetime.now(timezone.utc).isoformat()
-        })
+        # Save chat history (agenda o resumo se a janela transbordou)
+        await chat_memory.record_turn(
+            current_user["id"], session_id, data.message, response, window,
+            brand_context_used=brand_identity is not None,
+        )
         
         # Consume 1 credit per message
         await consume_credits(current_user["id"], 1, "Chat com LucresIA")
@@ -1935,7 +2221,7 @@ IMPORTANTE:
 
         # Chamar IA usando LucresIA (padrão do sistema)
         session_id = f"presenca_{current_user['id']}_{uuid4()}"
-        lucresia = LucresIA(session_id=session_id)
+        lucresia = LucresIA(session_id=session_id, task="presence_diagnosis")
         response = await lucresia.send_message(prompt)
         
         # Parsear resposta JSON
@@ -2042,7 +2328,7 @@ Responda APENAS com o JSON, sem explicações adicionais."""
 
         # Chamar IA usando LucresIA
         session_id = f"presenca_simples_{current_user['id']}_{uuid4()}"
-        lucresia = LucresIA(session_id=session_id)
+        lucresia = LucresIA(session_id=session_id, task="presence_diagnosis")
         response = await lucresia.send_message(prompt)
         
         # Parsear resposta JSON
@@ -2076,6 +2362,9 @@ Responda APENAS com o JSON, sem explicações adicionais."""
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro na análise: {str(e)}")
 
+# Janela em que os mesmos prints reaproveitam a análise visual anterior
+PRESENCA_CACHE_DAYS = int(os.environ.get("PRESENCA_CACHE_DAYS", "30"))
+
 @app.post("/api/ai/diagnostico-presenca-visual")
 async def diagnostico_presenca_visual(
     instagramHandle: str = Form(...),
@@ -2086,7 +2375,8 @@ async def diagnostico_presenca_visual(
 ):
     """
     Diagnóstico de Presença Digital com ANÁLISE VISUAL COMPLETA
-    Recebe prints do Instagram e da página para análise estratégica com GPT-4o Vision
+    Recebe prints do Instagram e da página para análise estratégica com GPT-4o Vision.
+    Os mesmos prints (hash perceptual) para o mesmo perfil reaproveitam a última análise.
     """
     # VERIFICAR CRÉDITOS
     credits_required = 5
@@ -2097,197 +2387,48 @@ async def diagnostico_presenca_visual(
             detail=f"Créditos insuficientes. Necessário: {credits_required}, Disponível: {current_balance}"
         )
     
+    # Validar, reduzir ao orçamento de tiles e recodificar (sem metadados)
     try:
-        # Ler e converter imagens para base64
-        instagram_bytes = await instagramImage.read()
-        pagina_bytes = await paginaImage.read()
-        
-        instagram_base64 = base64.b64encode(instagram_bytes).decode('utf-8')
-        pagina_base64 = base64.b64encode(pagina_bytes).decode('utf-8')
-        
-        # Detectar tipo de imagem
-        instagram_type = instagramImage.content_type or "image/jpeg"
-        pagina_type = paginaImage.content_type or "image/jpeg"
+        instagram_prepared = await prepare_screenshot(instagramImage)
+        pagina_prepared = await prepare_screenshot(paginaImage)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    screenshot_hashes = [instagram_prepared.phash, pagina_prepared.phash]
+    
+    # Mesmos prints do mesmo perfil e mesma versão do prompt: reaproveitar a análise (sem custo de IA nem créditos)
+    previous_analyses = await db.presenca_analyses.find(
+        {
+            "user_id": current_user["id"],
+            "instagram_handle": instagramHandle,
+            "link_bio": linkBio,
+            "prompt_version": prompt_registry.get("presenca_visual").version_id,
+            "screenshot_hashes": {"$exists": True},
+            "created_at": {"$gte": (datetime.now(timezone.utc) - timedelta(days=PRESENCA_CACHE_DAYS)).isoformat()}
+        },
+        {"_id": 0, "result": 1, "screenshot_hashes": 1}
+    ).sort("created_at", -1).limit(20).to_list(20)
+    for previous in previous_analyses:
+        if same_screenshots(screenshot_hashes, previous["screenshot_hashes"]):
+            return {"success": True, "result": previous["result"], "cached": True}
+    
+    try:
+        instagram_base64 = instagram_prepared.base64()
+        pagina_base64 = pagina_prepared.base64()
         
         # PROMPT MASTER - ANÁLISE VISUAL ESTRATÉGICA COMPLETA
-        prompt_master = f"""Você é um especialista premium em análise de presença digital, marketing para estética avançada e conversão de alto valor.
-
-═══════════════════════════════════════════════════════════════════════════════════
-DADOS DE ENTRADA
-═══════════════════════════════════════════════════════════════════════════════════
-
-PERFIL INSTAGRAM:
-- Handle: @{instagramHandle}
-- IMAGEM 1: Print do perfil Instagram (ANALISE VISUALMENTE TODOS OS ELEMENTOS)
-
-PÁGINA DE DESTINO:
-- Link: {linkBio}
-- IMAGEM 2: Print da página de destino (ANALISE VISUALMENTE TODOS OS ELEMENTOS)
-
-═══════════════════════════════════════════════════════════════════════════════════
-INSTRUÇÕES DE ANÁLISE VISUAL DETALHADA
-═══════════════════════════════════════════════════════════════════════════════════
-
-📱 ANÁLISE DO INSTAGRAM (baseado no print):
-1. Bio: Leia o texto da bio, identifique nome, especialidade, proposta de valor
-2. Foto de perfil: Avalie profissionalismo e coerência
-3. Destaques: Identifique os destaques fixados e seus títulos/ícones
-4. Feed: Analise estilo visual, cores dominantes, qualidade das fotos
-5. Números: Identifique seguidores, posts (se visíveis)
-6. Prova social: Busque menções a números, certificações, transformações
-7. CTA: Avalie se há chamada clara para ação
-
-🌐 ANÁLISE DA PÁGINA (baseado no print):
-1. Título principal: Leia e transcreva o título exato
-2. Subtítulo: Leia e transcreva se houver
-3. CTA principal: Identifique o botão/link de ação principal
-4. Layout: Avalie organização visual e hierarquia
-5. Prova social: Busque depoimentos, avaliações, números de clientes
-6. Cores: Identifique paleta de cores dominante
-7. Serviços/Preços: Identifique se estão visíveis
-
-🎨 ANÁLISE DE COERÊNCIA VISUAL:
-- Compare cores entre Instagram e página
-- Compare tom de comunicação
-- Compare qualidade visual e profissionalismo
-- Identifique quebras de expectativa entre canais
-
-🏆 ANÁLISE DE AUTORIDADE:
-- Especialização clara ou genérica?
-- Prova social visível e quantificável?
-- Elementos de credibilidade (certificações, anos de experiência)?
-- Percepção de preço (popular, médio ou premium)?
-
-═══════════════════════════════════════════════════════════════════════════════════
-FORMATO DE RESPOSTA (JSON OBRIGATÓRIO)
-═══════════════════════════════════════════════════════════════════════════════════
-
-Retorne EXATAMENTE este JSON (sem texto antes ou depois):
-
-{{
-  "resumoExecutivo": {{
-    "notaGeral": 70,
-    "pontuacoes": {{
-      "autoridadePercebida": 75,
-      "coerenciaVisual": 70,
-      "provaSocial": 65,
-      "conversaoCTAs": 60,
-      "presencaDigitalGlobal": 72
-    }},
-    "status": "BOM"
-  }},
-  "instagramAnalise": {{
-    "bioIdentificada": "Texto exato da bio lido na imagem",
-    "seguidores": "Número identificado ou 'Não visível'",
-    "posts": "Número identificado ou 'Não visível'",
-    "destaqueIdentificados": ["Destaque 1", "Destaque 2"],
-    "paletaCores": ["#cor1", "#cor2"],
-    "pontosFortes": [
-      {{"item": "Ponto forte específico", "impacto": "ALTO"}},
-      {{"item": "Outro ponto forte", "impacto": "MÉDIO"}}
-    ],
-    "pontosFracos": [
-      {{"item": "Ponto fraco específico", "impacto": "ALTO", "solucao": "Solução prática"}},
-      {{"item": "Outro ponto fraco", "impacto": "MÉDIO", "solucao": "Solução prática"}}
-    ],
-    "sugestoesCopy": {{
-      "bioSugerida": "Sugestão de bio otimizada com CTA",
-      "ctaSugerido": "Exemplo de CTA para link"
-    }}
-  }},
-  "paginaAnalise": {{
-    "tituloIdentificado": "Título exato lido na imagem",
-    "subtituloIdentificado": "Subtítulo ou 'Não identificado'",
-    "ctaIdentificado": "Texto do botão/CTA principal",
-    "servicosVisiveis": ["Serviço 1", "Serviço 2"],
-    "precosVisiveis": ["R$ X", "R$ Y"],
-    "provasSociaisVisiveis": ["Depoimento", "Avaliação", "Número"],
-    "pontosFortes": [
-      {{"item": "Ponto forte específico", "impacto": "ALTO"}},
-      {{"item": "Outro ponto forte", "impacto": "MÉDIO"}}
-    ],
-    "pontosFracos": [
-      {{"item": "Ponto fraco específico", "impacto": "ALTO", "solucao": "Solução prática"}},
-      {{"item": "Outro ponto fraco", "impacto": "MÉDIO", "solucao": "Solução prática"}}
-    ],
-    "sugestoesCopy": {{
-      "tituloSugerido": "Sugestão de título mais impactante",
-      "ctaSugerido": "Sugestão de CTA mais efetivo"
-    }}
-  }},
-  "coerencia": {{
-    "status": "alinhado",
-    "analise": "Análise detalhada da coerência entre canais baseada nos elementos visuais identificados",
-    "elementosAlinhados": ["Elemento 1", "Elemento 2"],
-    "quebraExpectativa": ["Quebra 1 se houver"]
-  }},
-  "autoridade": {{
-    "percepcao": "especialista",
-    "nivel": "premium",
-    "justificativa": "Justificativa baseada nos elementos visuais identificados",
-    "elementosAutoridade": ["Elemento 1", "Elemento 2"],
-    "elementosFaltando": ["Elemento que aumentaria autoridade"]
-  }},
-  "melhorias": [
-    {{
-      "acao": "Ação específica e prática",
-      "impacto": "ALTO",
-      "prazo": "7 dias",
-      "resultadoEsperado": "Resultado quantificável esperado"
-    }},
-    {{
-      "acao": "Segunda ação prioritária",
-      "impacto": "ALTO",
-      "prazo": "7 dias",
-      "resultadoEsperado": "Resultado esperado"
-    }},
-    {{
-      "acao": "Terceira ação",
-      "impacto": "MÉDIO",
-      "prazo": "30 dias",
-      "resultadoEsperado": "Resultado esperado"
-    }}
-  ],
-  "templateVisual": {{
-    "paletaSugerida": {{
-      "primaria": "#cor",
-      "secundaria": "#cor",
-      "contraste": "#cor"
-    }},
-    "tipografiaSugerida": {{
-      "titulos": "Nome da fonte",
-      "corpo": "Nome da fonte"
-    }}
-  }},
-  "insightPrincipal": "Um parágrafo estratégico com o insight mais importante para aumentar conversão"
-}}
-
-═══════════════════════════════════════════════════════════════════════════════════
-REGRAS CRÍTICAS
-═══════════════════════════════════════════════════════════════════════════════════
-
-1. ANALISE VISUALMENTE as imagens - NÃO invente informações
-2. Leia os textos que aparecem nas imagens (bio, títulos, CTAs)
-3. Identifique cores, elementos visuais, números visíveis
-4. Se algo não estiver visível, indique "Não identificado" ou "Não visível"
-5. Seja ESPECÍFICO - cite elementos que você viu nas imagens
-6. Priorize melhorias que aumentem CONVERSÃO real
-7. Responda APENAS com o JSON, sem texto adicional"""
+        prompt_master = prompt_registry.render(
+            "presenca_visual", instagram_handle=instagramHandle, link_bio=linkBio
+        )
 
-        # Usar LlmChat com ImageContent para análise visual com GPT-4o
-        from emergentintegrations.llm.chat import LlmChat, ImageContent, UserMessage
+        # Análise visual com ImageContent (rota "presence_visual": modelos com visão)
+        from emergentintegrations.llm.chat import ImageContent, UserMessage
         
         api_key = os.environ.get('EMERGENT_LLM_KEY') or os.environ.get('OPENAI_API_KEY')
         if not api_key:
             raise HTTPException(status_code=500, detail="API key não configurada")
         
-        # Criar instância do chat com GPT-4o (suporta visão)
         session_id = f"visual_diagnosis_{current_user['id']}_{uuid4()}"
-        llm = LlmChat(
-            api_key=api_key,
-            session_id=session_id,
-            system_message="Você é um especialista premium em análise de presença digital e marketing para estética."
-        ).with_model("openai", "gpt-4o")
+        llm = routed_chat("presence_visual", session_id, PRESENCA_VISUAL_SYSTEM.render().text, api_key=api_key)
         
         # Criar conteúdo com imagens (usando base64)
         instagram_image = ImageContent(image_base64=instagram_base64)
@@ -2295,7 +2436,7 @@ REGRAS CRÍTICAS
         
         # Enviar mensagem com texto e imagens
         user_message = UserMessage(
-            text=prompt_master,
+            text=prompt_master.text,
             file_contents=[instagram_image, pagina_image]
         )
         response = await llm.send_message(user_message)
@@ -2317,13 +2458,16 @@ REGRAS CRÍTICAS
             "result": result,
             "visual_analysis": True,
             "analysis_type": "premium_visual",
+            "screenshot_hashes": screenshot_hashes,
+            "vision_tokens_estimate": instagram_prepared.tokens + pagina_prepared.tokens,
+            "prompt_version": prompt_master.version_id,
             "created_at": datetime.now(timezone.utc).isoformat()
         })
         
         # Consumir créditos
         await consume_credits(current_user["id"], credits_required, f"Diagnóstico visual: @{instagramHandle}", check_balance=False)
         
-        return {"success": True, "result": result}
+        return {"success": True, "result": result, "cached": False}
         
     except json.JSONDecodeError as e:
         raise HTTPException(status_code=500, detail=f"Erro ao processar resposta da IA: {str(e)}")
@@ -2407,7 +2551,7 @@ REGRA: O diagnóstico deve parecer que você CONHECE o perfil dela, não um temp
 
 Responda APENAS com o JSON válido."""
 
-    lucresia = LucresIA(session_id=session_id)
+    lucresia = LucresIA(session_id=session_id, task="bio_diagnosis")
     
     try:
         from emergentintegrations.llm.chat import UserMessage
@@ -2485,6 +2629,7 @@ async def generate_content(data: ContentGenerateRequest, current_user: dict = De
             "brand_identity_used": brand_identity is not None,
             "created_at": datetime.now(timezone.utc).isoformat()
         })
+        await increment_count(db, current_user["id"], "generated_content")
         
         # Consume credits (já verificado acima)
         await consume_credits(current_user["id"], credits_required, f"Geração de {data.tipo}: {data.tema}", check_balance=False)
@@ -2559,18 +2704,18 @@ async def generate_carousel_neurovendas(data: CarouselGenerateRequest, current_u
         raise HTTPException(status_code=500, detail=f"Erro ao gerar carrossel: {str(e)}")
 
 @app.post("/api/ai/generate-carousel-sequence")
-async def generate_carousel_sequence(data: CarouselSequenceRequest, current_user: dict = Depends(get_current_user)):
+async def generate_carousel_sequence(request: Request, data: CarouselSequenceRequest, current_user: dict = Depends(get_current_user)):
     """Gera sequência estratégica de carrosséis para campanha completa"""
     brand_identity = await get_user_brand_identity(current_user["id"])
     
     generator = get_carousel_generator(brand_identity=brand_identity)
     
     try:
-        result = await generator.generate_carousel_sequence(
+        result = await run_disconnect_aware(request, generator.generate_carousel_sequence(
             niche=data.niche,
             campaign_theme=data.campaign_theme,
             number_of_carousels=data.number_of_carousels
-        )
+        ), stage="carousel_sequence")
         
         # Consumir 5 créditos por sequência
         await consume_credits(current_user["id"], 5, f"Sequência de carrosséis: {data.campaign_theme}")
@@ -2580,6 +2725,8 @@ async def generate_carousel_sequence(data: CarouselSequenceRequest, current_user
             "sequence": result,
             "brand_identity_applied": brand_identity is not None
         }
+    except ClientDisconnected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar sequência: {str(e)}")
 
@@ -2817,18 +2964,19 @@ async def create_template(data: TemplateCreate, current_user: dict = Depends(get
         "created_at": datetime.now(timezone.utc).isoformat(),
         "updated_at": datetime.now(timezone.utc).isoformat()
     })
+    await increment_count(db, current_user["id"], "content_templates")
     
     return {"success": True, "template_id": template_id, "message": "Template criado com sucesso"}
 
 @app.get("/api/templates")
-async def list_templates(current_user: dict = Depends(get_current_user)):
-    """Lista todos os templates do usuário"""
-    templates = await db.content_templates.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    return {"success": True, "templates": templates}
+async def list_templates(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lista os templates do usuário (paginado; fields=full inclui o conteúdo)"""
+    return await list_page("content_templates", "templates", current_user["id"], cursor, limit, fields)
 
 @app.get("/api/templates/{template_id}")
 async def get_template(template_id: str, current_user: dict = Depends(get_current_user)):
@@ -2876,6 +3024,7 @@ async def delete_template(template_id: str, current_user: dict = Depends(get_cur
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Template não encontrado")
+    await increment_count(db, current_user["id"], "content_templates", -1)
     
     return {"success": True, "message": "Template deletado"}
 
@@ -2972,6 +3121,7 @@ async def generate_ebook(data: EbookGenerateRequest, current_user: dict = Depend
             "ebook": result,
             "created_at": datetime.now(timezone.utc).isoformat()
         })
+        await increment_count(db, current_user["id"], "ebooks")
         
         # Consume 10 credits for ebook generation
         await consume_credits(current_user["id"], 10, f"E-book: {data.topic}")
@@ -2985,17 +3135,24 @@ async def generate_ebook(data: EbookGenerateRequest, current_user: dict = Depend
 # =============================================================================
 
 @app.post("/api/ebook/generate-structured")
-async def generate_structured_ebook_endpoint(data: StructuredEbookGenerateRequest, current_user: dict = Depends(get_current_user)):
+async def generate_structured_ebook_endpoint(request: Request, data: StructuredEbookGenerateRequest, current_user: dict = Depends(get_current_user)):
     """Gera e-book estruturado usando o Sistema Editorial Elevare com QA automático"""
     try:
         # Gerar conteúdo estruturado via LLM com validação automática
-        result = await generate_structured_ebook(
+        # (cliente desconectado: cancela a chamada em andamento e as reescritas)
+        result = await run_disconnect_aware(request, generate_structured_ebook(
             topic=data.topic,
             audience=data.audience,
             goal=data.goal,
             tone=data.tone,
             author=data.author
-        )
+        ), stage="ebook_structured")
+        
+        # Tentativas de reescrita entram no histórico antes da versão final
+        final_content = result["structured_ebook"]
+        history = list(result.get("drafts") or [])
+        if not history or history[-1] != final_content:
+            history.append(final_content)
         
         # Salvar no banco
         ebook_id = str(uuid4())
@@ -3008,7 +3165,8 @@ async def generate_structured_ebook_endpoint(data: StructuredEbookGenerateReques
             "tone": data.tone,
             "author": data.author,
             "structured_content": result["structured_ebook"],
-            "readable_content": structured_ebook_to_readable_text(result["structured_ebook"]),
+            **readable_fields(result["structured_ebook"]),
+            "version": len(history),
             "qa_report": result.get("qa_report", {}),
             "generation_attempts": result.get("attempts", 1),
             "status": "approved" if result.get("qa_report", {}).get("aprovado", False) else "review",
@@ -3016,6 +3174,13 @@ async def generate_structured_ebook_endpoint(data: StructuredEbookGenerateReques
             "updated_at": datetime.now(timezone.utc).isoformat()
         })
         
+        for index, content in enumerate(history):
+            await record_revision(
+                db, "ebooks_structured", ebook_id, current_user["id"], index + 1, content,
+                previous=history[index - 1] if index else None,
+                source="generated" if index == len(history) - 1 else "attempt"
+            )
+        
         # Consumir 15 créditos para geração de e-book estruturado
         await consume_credits(current_user["id"], 15, f"E-book Estruturado: {data.topic}")
         
@@ -3025,75 +3190,199 @@ async def generate_structured_ebook_endpoint(data: StructuredEbookGenerateReques
             "structured_ebook": result["structured_ebook"],
             "readable_content": structured_ebook_to_readable_text(result["structured_ebook"]),
             "qa_report": result.get("qa_report", {}),
-            "attempts": result.get("attempts", 1)
+            "attempts": result.get("attempts", 1),
+            "version": len(history)
         }
         
         # Adicionar aviso se houver
         if result.get("warning"):
             response_data["warning"] = result["warning"]
+        if result.get("deadline_reached"):
+            response_data["partial"] = True
         
         return response_data
+    except ClientDisconnected:
+        raise
     except Exception as e:
+        if is_deadline_error(e):
+            raise
         raise HTTPException(status_code=500, detail=f"Erro ao gerar e-book estruturado: {str(e)}")
 
 
 @app.post("/api/ebook/update-structured")
 async def update_structured_ebook_endpoint(data: StructuredEbookUpdateRequest, current_user: dict = Depends(get_current_user)):
-    """Atualiza conteúdo de e-book estruturado após edição"""
+    """Atualiza conteúdo de e-book estruturado após edição (documento inteiro; para autosave use o PATCH)"""
     try:
         # Validar schema
         if not is_valid_structured_ebook(data.structured_content):
             raise HTTPException(status_code=400, detail="Conteúdo estruturado inválido")
         
-        # Atualizar no banco
-        result = await db.ebooks_structured.update_one(
-            {"id": data.ebook_id, "user_id": current_user["id"]},
+        query = {"id": data.ebook_id, "user_id": current_user["id"]}
+        if data.version is not None:
+            query.update(version_filter(data.version))
+        
+        # Atualizar no banco (documento anterior volta para o delta da revisão)
+        before = await db.ebooks_structured.find_one_and_update(
+            query,
             {
                 "$set": {
                     "structured_content": data.structured_content,
-                    "readable_content": structured_ebook_to_readable_text(data.structured_content),
+                    **readable_fields(data.structured_content),
                     "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
+                },
+                "$inc": {"version": 1}
+            },
+            projection={"_id": 0, "structured_content": 1, "version": 1},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.modified_count == 0:
-            raise HTTPException(status_code=404, detail="E-book não encontrado")
+        if before is None:
+            await _raise_ebook_conflict_or_404(data.ebook_id, current_user["id"])
         
-        return {"success": True, "message": "E-book atualizado com sucesso"}
+        new_version = before.get("version", 0) + 1
+        await record_revision(
+            db, "ebooks_structured", data.ebook_id, current_user["id"], new_version,
+            data.structured_content, previous=before.get("structured_content")
+        )
+        
+        return {"success": True, "message": "E-book atualizado com sucesso", "version": new_version}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao atualizar e-book: {str(e)}")
 
 
+async def _raise_ebook_conflict_or_404(ebook_id: str, user_id: str):
+    """Distingue e-book inexistente (404) de versão desatualizada (409)"""
+    current = await db.ebooks_structured.find_one(
+        {"id": ebook_id, "user_id": user_id},
+        {"_id": 0, "version": 1}
+    )
+    if not current:
+        raise HTTPException(status_code=404, detail="E-book não encontrado")
+    raise HTTPException(
+        status_code=409,
+        detail={
+            "error": "version_conflict",
+            "message": "O e-book foi alterado em outra sessão. Recarregue antes de salvar.",
+            "current_version": current.get("version", 0)
+        }
+    )
+
+
+@app.patch("/api/ebook/{ebook_id}")
+async def patch_structured_ebook(ebook_id: str, data: StructuredEbookPatchRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Atualização parcial (JSON Patch em meta/seções/blocos) com concorrência otimista.
+    Grava só as seções alteradas e o texto legível delas; retorna a nova versão.
+    """
+    ebook = await db.ebooks_structured.find_one(
+        {"id": ebook_id, "user_id": current_user["id"]},
+        {"_id": 0, "structured_content": 1, "readable_header": 1, "readable_sections": 1, "version": 1}
+    )
+    if not ebook:
+        raise HTTPException(status_code=404, detail="E-book não encontrado")
+    if ebook.get("version", 0) != data.version:
+        await _raise_ebook_conflict_or_404(ebook_id, current_user["id"])
+    
+    try:
+        patch = apply_patch(ebook, data.operations)
+    except PatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    if not patch.set_fields:
+        return {"success": True, "version": data.version, "changed_sections": []}
+    
+    result = await db.ebooks_structured.update_one(
+        {"id": ebook_id, "user_id": current_user["id"], **version_filter(data.version)},
+        {
+            "$set": {**patch.set_fields, "updated_at": datetime.now(timezone.utc).isoformat()},
+            "$inc": {"version": 1}
+        }
+    )
+    if result.matched_count == 0:
+        # Outra gravação entrou entre a leitura e o update
+        await _raise_ebook_conflict_or_404(ebook_id, current_user["id"])
+    
+    await record_revision(
+        db, "ebooks_structured", ebook_id, current_user["id"], data.version + 1,
+        patch.structured_content, previous=ebook.get("structured_content"), operations=data.operations
+    )
+    
+    return {"success": True, "version": data.version + 1, "changed_sections": patch.changed_sections}
+
+
 @app.post("/api/ebook/generate-html")
-async def generate_ebook_html_endpoint(data: StructuredEbookPDFRequest, current_user: dict = Depends(get_current_user)):
+async def generate_ebook_html_endpoint(request: Request, data: StructuredEbookPDFRequest, current_user: dict = Depends(get_current_user)):
     """Gera HTML renderizado do e-book com template selecionado"""
     try:
         # Buscar e-book
         ebook = await db.ebooks_structured.find_one(
             {"id": data.ebook_id, "user_id": current_user["id"]},
-            {"_id": 0}
+            {"_id": 0, "structured_content": 1}
         )
         
         if not ebook:
             raise HTTPException(status_code=404, detail="E-book não encontrado")
+        structured = ebook["structured_content"]
         
-        # Renderizar HTML
-        html_content = render_structured_ebook(ebook["structured_content"], data.template)
+        def build() -> bytes:
+            # Renderizar HTML (pipeline com cache por conteúdo/template)
+            rendered = render_ebook(structured, data.template, "html")
+            return json_dumps({
+                "success": True,
+                "html": rendered.content.decode("utf-8"),
+                "template": data.template
+            })
         
-        return {
-            "success": True,
-            "html": html_content,
-            "template": data.template
-        }
+        # JSON final guardado já comprimido: repetição não renderiza nem comprime
+        key = ("generate-html", render_key(structured, data.template, "html"), data.template)
+        return await precompressed_response(request, key, build, "application/json")
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar HTML: {str(e)}")
 
 
+@app.get("/api/ebook/{ebook_id}/export")
+async def export_ebook(
+    request: Request,
+    ebook_id: str,
+    format: str = "pdf",
+    template: str = "educational",
+    current_user: dict = Depends(get_current_user)
+):
+    """Exporta o e-book estruturado em PDF, HTML ou EPUB (mesmo layout, cache por conteúdo/template)"""
+    ebook = await db.ebooks_structured.find_one(
+        {"id": ebook_id, "user_id": current_user["id"]},
+        {"_id": 0, "structured_content": 1}
+    )
+    
+    if not ebook:
+        raise HTTPException(status_code=404, detail="E-book não encontrado")
+    
+    structured = ebook.get("structured_content")
+    if not structured:
+        raise HTTPException(status_code=400, detail="Conteúdo não gerado ainda")
+    
+    try:
+        rendered = await run_in_threadpool(render_ebook, structured, template, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    # HTML sai pré-comprimido; PDF/EPUB já são formatos comprimidos e vão como estão
+    return await precompressed_response(
+        request,
+        ("export", rendered.content_hash, rendered.template, format),
+        lambda: rendered.content,
+        rendered.media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="ebook-{ebook_id}.{rendered.extension}"',
+            "X-Render-Cache": "hit" if rendered.cached else "miss",
+        }
+    )
+
+
 @app.get("/api/ebook/templates")
 async def get_ebook_templates(current_user: dict = Depends(get_current_user)):
     """Lista templates disponíveis para e-books"""
@@ -3125,7 +3414,7 @@ async def get_structured_ebook(ebook_id: str, current_user: dict = Depends(get_c
     if not ebook:
         raise HTTPException(status_code=404, detail="E-book não encontrado")
     
-    return {"success": True, "ebook": ebook}
+    return FastJSONResponse({"success": True, "ebook": ebook})
 
 
 @app.get("/api/ebook")
@@ -3136,7 +3425,7 @@ async def list_structured_ebooks(current_user: dict = Depends(get_current_user))
         {"_id": 0}
     ).sort("created_at", -1).to_list(100)
     
-    return {"success": True, "ebooks": ebooks}
+    return FastJSONResponse({"success": True, "ebooks": ebooks})
 
 
 @app.delete("/api/ebook/{ebook_id}")
@@ -3149,9 +3438,107 @@ async def delete_structured_ebook(ebook_id: str, current_user: dict = Depends(ge
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="E-book não encontrado")
     
+    await delete_revisions(db, ebook_id)
+    
     return {"success": True, "message": "E-book removido com sucesso"}
 
 
+# =============================================================================
+# HISTÓRICO DE REVISÕES (ebooks_structured e ebooks_new)
+# =============================================================================
+
+async def _owned_ebook_version(collection: str, ebook_id: str, user_id: str) -> int:
+    """Versão atual do e-book do usuário (404 se não existir)"""
+    ebook = await db[collection].find_one({"id": ebook_id, "user_id": user_id}, {"_id": 0, "version": 1})
+    if not ebook:
+        raise HTTPException(status_code=404, detail="E-book não encontrado")
+    return ebook.get("version", 0)
+
+
+async def _revision_content(ebook_id: str, version: int) -> dict:
+    try:
+        return await materialize(db, ebook_id, version)
+    except RevisionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+async def _revisions_response(collection: str, ebook_id: str, user_id: str) -> dict:
+    current_version = await _owned_ebook_version(collection, ebook_id, user_id)
+    return {
+        "success": True,
+        "current_version": current_version,
+        "revisions": await list_revisions(db, ebook_id)
+    }
+
+
+async def _revision_diff_response(collection: str, ebook_id: str, user_id: str, from_version: int, to_version: int) -> dict:
+    await _owned_ebook_version(collection, ebook_id, user_id)
+    try:
+        operations = await diff_versions(db, ebook_id, from_version, to_version)
+    except RevisionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    return {"success": True, "from": from_version, "to": to_version, "operations": operations}
+
+
+async def _restore_revision(collection: str, ebook_id: str, user_id: str, version: int) -> dict:
+    """Grava o conteúdo de uma versão antiga como uma nova versão"""
+    await _owned_ebook_version(collection, ebook_id, user_id)
+    content = await _revision_content(ebook_id, version)
+    
+    if collection == "ebooks_structured":
+        changes = {"structured_content": content, **readable_fields(content)}
+        projection = {"_id": 0, "structured_content": 1, "version": 1}
+    else:
+        changes = {field: content.get(field) for field in NEW_EBOOK_FIELDS}
+        projection = {"_id": 0, "version": 1, **{field: 1 for field in NEW_EBOOK_FIELDS}}
+    
+    before = await db[collection].find_one_and_update(
+        {"id": ebook_id, "user_id": user_id},
+        {"$set": {**changes, "updated_at": datetime.now(timezone.utc).isoformat()}, "$inc": {"version": 1}},
+        projection=projection,
+        return_document=ReturnDocument.BEFORE
+    )
+    if before is None:
+        raise HTTPException(status_code=404, detail="E-book não encontrado")
+    
+    previous = before.get("structured_content") if collection == "ebooks_structured" else new_ebook_content(before)
+    new_version = before.get("version", 0) + 1
+    await record_revision(
+        db, collection, ebook_id, user_id, new_version, content, previous=previous, source=f"restore:{version}"
+    )
+    return {"success": True, "version": new_version, "restored_from": version}
+
+
+@app.get("/api/ebook/{ebook_id}/revisions")
+async def list_structured_ebook_revisions(ebook_id: str, current_user: dict = Depends(get_current_user)):
+    """Histórico de versões do e-book estruturado (mais recentes primeiro)"""
+    return await _revisions_response("ebooks_structured", ebook_id, current_user["id"])
+
+
+@app.get("/api/ebook/{ebook_id}/revisions/diff")
+async def diff_structured_ebook_revisions(
+    ebook_id: str,
+    from_version: int,
+    to_version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Diferença entre duas versões (operações JSON Patch)"""
+    return await _revision_diff_response("ebooks_structured", ebook_id, current_user["id"], from_version, to_version)
+
+
+@app.get("/api/ebook/{ebook_id}/revisions/{version}")
+async def get_structured_ebook_revision(ebook_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """Conteúdo estruturado de uma versão"""
+    await _owned_ebook_version("ebooks_structured", ebook_id, current_user["id"])
+    return {"success": True, "version": version, "structured_content": await _revision_content(ebook_id, version)}
+
+
+@app.post("/api/ebook/{ebook_id}/revisions/{version}/restore")
+async def restore_structured_ebook_revision(ebook_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """Restaura uma versão (vira a versão mais nova; o histórico é preservado)"""
+    return await _restore_revision("ebooks_structured", ebook_id, current_user["id"], version)
+
+
 # =============================================================================
 # EBOOK COVER & PDF GENERATION (NOVO)
 # =============================================================================
@@ -3321,124 +3708,10 @@ async def generate_ebook_pdf(data: PDFGenerateRequest, current_user: dict = Depe
         if not structured:
             raise HTTPException(status_code=400, detail="Conteúdo não gerado ainda")
         
-        # Gerar PDF usando fpdf2
-        from fpdf import FPDF
-        
-        class EbookPDF(FPDF):
-            def __init__(self, template: str):
-                super().__init__()
-                self.template = template
-                self.set_auto_page_break(auto=True, margin=15)
-                
-                # Template colors - Elevare palette
-                self.colors = {
-                    "educational": {"primary": (139, 92, 246), "secondary": (167, 139, 250), "text": (30, 41, 59)},
-                    "marketing": {"primary": (217, 70, 239), "secondary": (236, 72, 153), "text": (30, 41, 59)},
-                    "storytelling": {"primary": (124, 58, 237), "secondary": (139, 92, 246), "text": (30, 41, 59)}
-                }.get(template, {"primary": (139, 92, 246), "secondary": (167, 139, 250), "text": (30, 41, 59)})
-            
-            def header(self):
-                if self.page_no() > 1:
-                    self.set_font('Helvetica', 'I', 8)
-                    self.set_text_color(*self.colors["secondary"])
-                    self.cell(0, 10, self.title if hasattr(self, 'title') else '', align='C')
-                    self.ln(10)
-            
-            def footer(self):
-                self.set_y(-15)
-                self.set_font('Helvetica', 'I', 8)
-                self.set_text_color(128, 128, 128)
-                self.cell(0, 10, f'Página {self.page_no()}', align='C')
-        
-        pdf = EbookPDF(data.template)
-        meta = structured.get("meta", {})
-        pdf.title = meta.get("title", "E-book Elevare")
-        
-        # Tentar adicionar fontes DejaVu se disponíveis
-        try:
-            pdf.add_font('DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', uni=True)
-            pdf.add_font('DejaVu', 'B', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', uni=True)
-            pdf.add_font('DejaVu', 'I', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Oblique.ttf', uni=True)
-            font_name = 'DejaVu'
-        except:
-            font_name = 'Helvetica'
-        
-        # Página de capa
-        pdf.add_page()
-        pdf.set_fill_color(*pdf.colors["primary"])
-        pdf.rect(0, 0, 210, 297, 'F')
-        
-        pdf.set_y(80)
-        pdf.set_font(font_name, 'B', 28)
-        pdf.set_text_color(255, 255, 255)
-        pdf.multi_cell(0, 12, meta.get('title', 'E-book'), align='C')
-        
-        if meta.get('subtitle'):
-            pdf.ln(10)
-            pdf.set_font(font_name, 'I' if font_name == 'DejaVu' else '', 14)
-            pdf.multi_cell(0, 8, meta.get('subtitle', ''), align='C')
-        
-        pdf.set_y(240)
-        pdf.set_font(font_name, '', 12)
-        pdf.cell(0, 10, f"Por: {meta.get('author', 'Elevare NeuroVendas')}", align='C')
-        pdf.ln(8)
-        pdf.set_font(font_name, 'I' if font_name == 'DejaVu' else '', 10)
-        pdf.cell(0, 10, f"Para: {meta.get('audience', '')}", align='C')
-        
-        # Páginas de conteúdo
-        sections = structured.get("sections", [])
-        for i, section in enumerate(sections):
-            if section.get("type") == "hero":
-                continue  # Já foi na capa
-            
-            pdf.add_page()
-            
-            # Título da seção
-            if section.get("title"):
-                pdf.set_font(font_name, 'B', 20)
-                pdf.set_text_color(*pdf.colors["primary"])
-                pdf.multi_cell(0, 10, section.get("title", ""), align='L')
-                pdf.ln(8)
-            
-            # Subtítulo
-            if section.get("subtitle"):
-                pdf.set_font(font_name, 'I' if font_name == 'DejaVu' else '', 12)
-                pdf.set_text_color(*pdf.colors["secondary"])
-                pdf.multi_cell(0, 7, section.get("subtitle", ""))
-                pdf.ln(5)
-            
-            # Blocos de conteúdo
-            pdf.set_text_color(*pdf.colors["text"])
-            for block in section.get("blocks", []):
-                if block.get("type") == "paragraph":
-                    pdf.set_font(font_name, '', 11)
-                    text = block.get("text", "")
-                    # Remover tags HTML básicas
-                    import re
-                    text = re.sub(r'<[^>]+>', '', text)
-                    pdf.multi_cell(0, 6, text)
-                    pdf.ln(4)
-                    
-                elif block.get("type") == "bullet_list":
-                    pdf.set_font(font_name, '', 11)
-                    for item in block.get("items", []):
-                        item_text = re.sub(r'<[^>]+>', '', item)
-                        pdf.cell(8, 6, chr(149))  # Bullet point
-                        pdf.multi_cell(0, 6, item_text)
-                    pdf.ln(3)
-                    
-                elif block.get("type") == "callout":
-                    pdf.set_fill_color(243, 232, 255)  # Light purple
-                    pdf.set_font(font_name, 'I' if font_name == 'DejaVu' else '', 10)
-                    text = re.sub(r'<[^>]+>', '', block.get("text", ""))
-                    pdf.multi_cell(0, 6, text, fill=True)
-                    pdf.ln(5)
-        
-        # Gerar bytes do PDF
-        pdf_bytes = bytes(pdf.output())
+        # Gerar PDF no threadpool (fpdf2 é síncrono; pipeline com cache por conteúdo/template)
+        pdf_bytes = (await run_in_threadpool(render_ebook, structured, data.template, "pdf")).content
         
         # Converter para base64
-        import base64
         pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
         pdf_url = f"data:application/pdf;base64,{pdf_base64}"
         
@@ -3503,7 +3776,9 @@ class EbookV2Request(BaseModel):
     author: str = "Elevare NeuroVendas"
 
 @app.post("/api/ebook/generate-v2")
+@idempotent("ebook_v2")
 async def create_ebook_v2(
+    request: Request,
     data: EbookV2Request,
     current_user: dict = Depends(get_current_user)
 ):
@@ -3558,6 +3833,7 @@ async def create_ebook_v2(
             "created_at": datetime.now(timezone.utc).isoformat(),
         }
         await db.ebooks.insert_one(ebook_record)
+        await increment_count(db, current_user["id"], "ebooks")
         
         # Consumir créditos
         await consume_credits(current_user["id"], CREDIT_COSTS["ebook"], f"E-book V2: {data.title}")
@@ -3616,13 +3892,25 @@ async def download_ebook_pdf(
         raise HTTPException(status_code=404, detail="E-book não encontrado")
     
     pdf_path = ebook.get("pdf_path")
-    if not pdf_path or not os.path.exists(pdf_path):
+    if pdf_path and os.path.exists(pdf_path):
+        return FileResponse(
+            path=pdf_path,
+            filename=ebook.get("pdf_filename", "ebook.pdf"),
+            media_type="application/pdf"
+        )
+    
+    # Arquivo temporário perdido (restart/outro worker): renderiza de novo a partir do conteúdo salvo
+    ebook_data = ebook.get("ebook_data")
+    if not ebook_data:
         raise HTTPException(status_code=404, detail="PDF não disponível")
     
-    return FileResponse(
-        path=pdf_path,
-        filename=ebook.get("pdf_filename", "ebook.pdf"),
-        media_type="application/pdf"
+    structured = v2_data_to_structured(ebook_data)
+    rendered = await run_in_threadpool(render_ebook, structured, "elevare-v2", "pdf")
+    filename = ebook.get("pdf_filename", "ebook.pdf")
+    return Response(
+        content=rendered.content,
+        media_type=rendered.media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
     )
 
 
@@ -3851,23 +4139,29 @@ async def generate_script(data: ScriptDirectRequest, current_user: dict = Depend
 # PROMPTS LIBRARY ROUTES (EXPANDIDO)
 # =============================================================================
 
+# Catálogos estáticos: serializados uma vez por worker
+_PROMPTS_BIBLIOTECA_JSON = StaticJSON(lambda: {"success": True, "prompts": PROMPTS_BIBLIOTECA})
+_PROMPTS_ESTRATEGICOS_JSON = StaticJSON(lambda: {
+    "success": True,
+    "prompts": PROMPTS_ESTRATEGICOS,
+    "categorias": ["autoridade", "vendas", "educativo", "prova_social", "conexao",
+                   "estrategia", "relacionamento", "design", "copy", "video", "engajamento", "conteudo", "instagram"]
+})
+_TEMPLATES_CONTEUDO_JSON = StaticJSON(lambda: {"success": True, "templates": TEMPLATES_CONTEUDO})
+_TEMPLATES_CALENDARIO_JSON = StaticJSON(lambda: {"success": True, "templates": TEMPLATES_CALENDARIO})
+_TONS_COMUNICACAO_JSON = StaticJSON(lambda: {"success": True, "tons": TONS_COMUNICACAO})
+_OBJETIVOS_ESTRATEGICOS_JSON = StaticJSON(lambda: {"success": True, "objetivos": OBJETIVOS_ESTRATEGICOS})
+_TIPOS_CONTEUDO_JSON = StaticJSON(lambda: {"success": True, "tipos": TIPOS_CONTEUDO})
+
 @app.get("/api/biblioteca/prompts")
-async def get_prompts_library(current_user: dict = Depends(get_current_user)):
+async def get_prompts_library(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all strategic prompts - versão básica"""
-    return {
-        "success": True,
-        "prompts": PROMPTS_BIBLIOTECA
-    }
+    return await _PROMPTS_BIBLIOTECA_JSON.response(request)
 
 @app.get("/api/biblioteca/prompts-estrategicos")
-async def get_prompts_estrategicos(current_user: dict = Depends(get_current_user)):
+async def get_prompts_estrategicos(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all strategic prompts - versão completa com 15+ prompts"""
-    return {
-        "success": True,
-        "prompts": PROMPTS_ESTRATEGICOS,
-        "categorias": ["autoridade", "vendas", "educativo", "prova_social", "conexao", 
-                      "estrategia", "relacionamento", "design", "copy", "video", "engajamento", "conteudo", "instagram"]
-    }
+    return await _PROMPTS_ESTRATEGICOS_JSON.response(request)
 
 @app.get("/api/biblioteca/prompts-estrategicos/{prompt_id}")
 async def get_prompt_by_id(prompt_id: str, current_user: dict = Depends(get_current_user)):
@@ -3880,44 +4174,29 @@ async def get_prompt_by_id(prompt_id: str, current_user: dict = Depends(get_curr
     }
 
 @app.get("/api/biblioteca/templates")
-async def get_templates_library(current_user: dict = Depends(get_current_user)):
+async def get_templates_library(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all content templates - versão básica"""
-    return {
-        "success": True,
-        "templates": TEMPLATES_CONTEUDO
-    }
+    return await _TEMPLATES_CONTEUDO_JSON.response(request)
 
 @app.get("/api/biblioteca/templates-calendario")
-async def get_templates_calendario(current_user: dict = Depends(get_current_user)):
+async def get_templates_calendario(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all calendar templates"""
-    return {
-        "success": True,
-        "templates": TEMPLATES_CALENDARIO
-    }
+    return await _TEMPLATES_CALENDARIO_JSON.response(request)
 
 @app.get("/api/biblioteca/tons")
-async def get_tons_comunicacao(current_user: dict = Depends(get_current_user)):
+async def get_tons_comunicacao(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all communication tones"""
-    return {
-        "success": True,
-        "tons": TONS_COMUNICACAO
-    }
+    return await _TONS_COMUNICACAO_JSON.response(request)
 
 @app.get("/api/biblioteca/objetivos")
-async def get_objetivos_estrategicos(current_user: dict = Depends(get_current_user)):
+async def get_objetivos_estrategicos(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all strategic objectives"""
-    return {
-        "success": True,
-        "objetivos": OBJETIVOS_ESTRATEGICOS
-    }
+    return await _OBJETIVOS_ESTRATEGICOS_JSON.response(request)
 
 @app.get("/api/biblioteca/tipos-conteudo")
-async def get_tipos_conteudo(current_user: dict = Depends(get_current_user)):
+async def get_tipos_conteudo(request: Request, current_user: dict = Depends(get_current_user)):
     """Get all content types"""
-    return {
-        "success": True,
-        "tipos": TIPOS_CONTEUDO
-    }
+    return await _TIPOS_CONTEUDO_JSON.response(request)
 
 @app.post("/api/biblioteca/gerar-from-prompt")
 async def gerar_conteudo_from_prompt(
@@ -3930,24 +4209,25 @@ async def gerar_conteudo_from_prompt(
     
     prompt_base = PROMPTS_ESTRATEGICOS[data.prompt_id]
     
-    # Replace variables in prompt
-    prompt_text = prompt_base["prompt"]
-    for var, value in data.variaveis.items():
-        prompt_text = prompt_text.replace(f"[{var.upper()}]", value)
-        prompt_text = prompt_text.replace(f"[{var}]", value)
-    
-    # Add tone instruction
-    tom_info = TONS_COMUNICACAO.get(data.tom, TONS_COMUNICACAO["profissional"])
-    prompt_text += f"\n\nTom de comunicação: {tom_info['nome']} - {tom_info['descricao']}"
+    # Template pré-compilado: variáveis substituídas em uma passada + instrução de tom
+    # "profissional" (padrão do request) não existe no catálogo: cai para o tom técnico
+    tom_info = TONS_COMUNICACAO.get(data.tom) or TONS_COMUNICACAO["tecnico"]
+    try:
+        prompt = prompt_registry.render(
+            biblioteca_prompt_name(data.prompt_id),
+            **{**data.variaveis, "tom_nome": tom_info["nome"], "tom_descricao": tom_info["descricao"]},
+        )
+    except PromptVariableError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     
     session_id = f"prompt_{current_user['id']}_{uuid4()}"
     user_context = current_user.get("onboarding_data", {})
     brand_identity = await get_user_brand_identity(current_user["id"])
     
-    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity)
+    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity, task="prompt_library")
     
     try:
-        response = await lucresia.send_message(prompt_text)
+        response = await lucresia.send_message(prompt.text)
         
         # Save generated content
         await db.generated_content.insert_one({
@@ -3955,11 +4235,13 @@ async def gerar_conteudo_from_prompt(
             "user_id": current_user["id"],
             "prompt_id": data.prompt_id,
             "prompt_titulo": prompt_base["titulo"],
+            "prompt_version": prompt.version_id,
             "variaveis": data.variaveis,
             "tom": data.tom,
             "content": response,
             "created_at": datetime.now(timezone.utc).isoformat()
         })
+        await increment_count(db, current_user["id"], "generated_content")
         
         # Consume credits
         await consume_credits(current_user["id"], 2, f"Conteúdo: {prompt_base['titulo']}")
@@ -4008,39 +4290,26 @@ async def gerar_sugestoes_calendario(
     tom_info = TONS_COMUNICACAO.get(data.tom_preferido, TONS_COMUNICACAO["acolhedor"])
     
     # Build prompt for calendar generation
-    prompt = f"""Gere um calendário de conteúdo para o mês de {tema_mes['mes']} com o tema "{tema_mes['tema_principal']}".
-
-Subtemas disponíveis: {', '.join(tema_mes['subtemas'])}
-
-Configurações:
-- Posts por semana: {data.posts_por_semana}
-- Tipos de conteúdo: {', '.join(data.tipos_conteudo)}
-- Tom de comunicação: {tom_info['nome']} ({tom_info['descricao']})
-
-Gere em formato JSON uma lista com {data.posts_por_semana * 4} posts (4 semanas), cada um com:
-{{
-    "semana": 1-4,
-    "dia_semana": "segunda/terça/etc",
-    "tipo": "feed/reels/stories/etc",
-    "titulo": "título do post",
-    "subtema": "subtema relacionado",
-    "objetivo": "engajar/educar/vender/inspirar",
-    "legenda_sugerida": "legenda completa",
-    "hashtags": ["lista", "de", "hashtags"],
-    "horario_sugerido": "melhor horário"
-}}
-
-Distribua os tipos de conteúdo e objetivos de forma equilibrada.
-Responda APENAS com o JSON válido, sem texto adicional."""
+    prompt = prompt_registry.render(
+        "calendario_sugestoes",
+        mes=tema_mes["mes"],
+        tema_principal=tema_mes["tema_principal"],
+        subtemas=tema_mes["subtemas"],
+        posts_por_semana=data.posts_por_semana,
+        tipos_conteudo=data.tipos_conteudo,
+        tom_nome=tom_info["nome"],
+        tom_descricao=tom_info["descricao"],
+        total_posts=data.posts_por_semana * 4,
+    )
 
     session_id = f"calendario_{current_user['id']}_{uuid4()}"
     user_context = current_user.get("onboarding_data", {})
     brand_identity = await get_user_brand_identity(current_user["id"])
     
-    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity)
+    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity, task="calendar_suggestions")
     
     try:
-        response = await lucresia.send_message(prompt)
+        response = await lucresia.send_message(prompt.text)
         
         # Try to parse JSON
         import json
@@ -4056,6 +4325,7 @@ Responda APENAS com o JSON válido, sem texto adicional."""
             "mes": data.mes,
             "tema": tema_mes['tema_principal'],
             "sugestoes": sugestoes,
+            "prompt_version": prompt.version_id,
             "created_at": datetime.now(timezone.utc).isoformat()
         })
         
@@ -4072,13 +4342,17 @@ Responda APENAS com o JSON válido, sem texto adicional."""
         raise HTTPException(status_code=500, detail=f"Erro ao gerar calendário: {str(e)}")
 
 @app.get("/api/calendario/posts")
-async def get_calendar_posts(current_user: dict = Depends(get_current_user)):
-    """Get all calendar posts for user"""
-    posts = await db.calendar_posts.find(
-        {"user_id": current_user["id"]}, 
-        {"_id": 0}
-    ).sort("data_agendada", 1).to_list(1000)
-    return {"success": True, "posts": posts}
+async def get_calendario_posts(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get calendar posts for user (ordem da agenda: cursor em (data_agendada, id))"""
+    return await list_page(
+        "calendar_posts", "posts", current_user["id"], cursor, limit, fields,
+        sort_field="data_agendada", direction=1,
+    )
 
 @app.get("/api/calendario/posts/semana")
 async def get_calendar_posts_week(current_user: dict = Depends(get_current_user)):
@@ -4133,6 +4407,7 @@ async def create_calendar_post(
     }
     
     await db.calendar_posts.insert_one(post)
+    await increment_count(db, current_user["id"], "calendar_posts")
     return {"success": True, "post": {k: v for k, v in post.items() if k != "_id"}}
 
 @app.put("/api/calendario/posts/{post_id}")
@@ -4196,6 +4471,7 @@ async def delete_calendar_post(
     )
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Post não encontrado")
+    await increment_count(db, current_user["id"], "calendar_posts", -1)
     return {"success": True, "message": "Post removido"}
 
 @app.get("/api/calendario/stats")
@@ -4203,16 +4479,16 @@ async def get_calendar_stats(current_user: dict = Depends(get_current_user)):
     """Get calendar statistics"""
     user_id = current_user["id"]
     
-    total = await db.calendar_posts.count_documents({"user_id": user_id})
-    planejados = await db.calendar_posts.count_documents({"user_id": user_id, "status": "planejado"})
-    em_criacao = await db.calendar_posts.count_documents({"user_id": user_id, "status": "em_criacao"})
-    aprovados = await db.calendar_posts.count_documents({"user_id": user_id, "status": "aprovado"})
-    postados = await db.calendar_posts.count_documents({"user_id": user_id, "status": "postado"})
+    total = await db_analytics.calendar_posts.count_documents({"user_id": user_id})
+    planejados = await db_analytics.calendar_posts.count_documents({"user_id": user_id, "status": "planejado"})
+    em_criacao = await db_analytics.calendar_posts.count_documents({"user_id": user_id, "status": "em_criacao"})
+    aprovados = await db_analytics.calendar_posts.count_documents({"user_id": user_id, "status": "aprovado"})
+    postados = await db_analytics.calendar_posts.count_documents({"user_id": user_id, "status": "postado"})
     
     # Count by type
     tipos_count = {}
     for tipo in ["feed", "reels", "stories", "bastidores", "cta", "carrossel"]:
-        count = await db.calendar_posts.count_documents({"user_id": user_id, "tipo": tipo})
+        count = await db_analytics.calendar_posts.count_documents({"user_id": user_id, "tipo": tipo})
         tipos_count[tipo] = count
     
     # Calculate execution rate
@@ -4267,7 +4543,7 @@ Responda APENAS com o JSON válido."""
     user_context = current_user.get("onboarding_data", {})
     brand_identity = await get_user_brand_identity(current_user["id"])
     
-    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity)
+    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity, task="post_captions")
     
     try:
         response = await lucresia.send_message(prompt)
@@ -4364,13 +4640,13 @@ async def get_campanhas_stats(current_user: dict = Depends(get_current_user)):
     """Estatísticas gerais das campanhas"""
     user_id = current_user["id"]
     
-    total = await db.campanhas.count_documents({"user_id": user_id})
-    em_rascunho = await db.campanhas.count_documents({"user_id": user_id, "status": "rascunho"})
-    em_execucao = await db.campanhas.count_documents({"user_id": user_id, "status": "em_execucao"})
-    concluidas = await db.campanhas.count_documents({"user_id": user_id, "status": "concluida"})
+    total = await db_analytics.campanhas.count_documents({"user_id": user_id})
+    em_rascunho = await db_analytics.campanhas.count_documents({"user_id": user_id, "status": "rascunho"})
+    em_execucao = await db_analytics.campanhas.count_documents({"user_id": user_id, "status": "em_execucao"})
+    concluidas = await db_analytics.campanhas.count_documents({"user_id": user_id, "status": "concluida"})
     
-    total_posts = await db.posts_campanha.count_documents({"user_id": user_id})
-    posts_postados = await db.posts_campanha.count_documents({"user_id": user_id, "status": "postado"})
+    total_posts = await db_analytics.posts_campanha.count_documents({"user_id": user_id})
+    posts_postados = await db_analytics.posts_campanha.count_documents({"user_id": user_id, "status": "postado"})
     
     taxa_execucao = round((posts_postados / total_posts * 100), 1) if total_posts > 0 else 0
     
@@ -4406,10 +4682,11 @@ async def get_campanha(campanha_id: str, current_user: dict = Depends(get_curren
     if not campanha:
         raise HTTPException(status_code=404, detail="Campanha não encontrada")
     
-    # Buscar posts da campanha
+    # Buscar posts da campanha (imagens como URLs, não base64)
+    await migrate_post_images(current_user["id"], {"campanha_id": campanha_id})
     posts = await db.posts_campanha.find(
         {"campanha_id": campanha_id},
-        {"_id": 0}
+        {"_id": 0, "imagem_base64": 0}
     ).sort("dia_do_ciclo", 1).to_list(10)
     
     return {
@@ -4472,6 +4749,12 @@ async def update_campanha(
 @app.delete("/api/campanhas/{campanha_id}")
 async def delete_campanha(campanha_id: str, current_user: dict = Depends(get_current_user)):
     """Remove uma campanha e seus posts"""
+    posts = await db.posts_campanha.find(
+        {"campanha_id": campanha_id, "user_id": current_user["id"], "imagem_id": {"$ne": None}},
+        {"_id": 0, "imagem_id": 1}
+    ).to_list(None)
+    await delete_images(db, current_user["id"], [post["imagem_id"] for post in posts])
+    
     # Deletar posts da campanha
     await db.posts_campanha.delete_many({"campanha_id": campanha_id})
     
@@ -4486,7 +4769,9 @@ async def delete_campanha(campanha_id: str, current_user: dict = Depends(get_cur
     return {"success": True, "message": "Campanha removida"}
 
 @app.post("/api/campanhas/{campanha_id}/gerar-sequencia")
+@idempotent("campanha_sequencia")
 async def gerar_sequencia_campanha(
+    request: Request,
     campanha_id: str,
     current_user: dict = Depends(get_current_user)
 ):
@@ -4531,53 +4816,33 @@ async def gerar_sequencia_campanha(
     
     brand_context = ""
     if brand_identity:
-        brand_context = f"""
-IDENTIDADE DA MARCA:
-- Marca: {brand_identity.get('brand_name', 'Não definido')}
-- Segmento: {brand_identity.get('segment', 'estética')}
-- Especialidade: {brand_identity.get('main_specialty', '')}
-- Posicionamento: {brand_identity.get('positioning', '')}
-- Estilo Visual: {brand_identity.get('visual_style', '')}
-- Frases-chave: {', '.join(brand_identity.get('key_phrases', []))}
-"""
-
-    prompt = f"""Você é a LucresIA, especialista em neurovendas para estética. 
-Gere uma sequência de 6 posts seguindo o CICLO NEUROVENDEDOR para a campanha:
-
-CAMPANHA: {campanha['nome']}
-TEMA BASE: {campanha['tema_base']}
-OBJETIVO: {campanha['objetivo_estrategico']}
-TOM: {tom_info['nome']} - {tom_info['descricao']}
-EMOÇÃO PRINCIPAL: {campanha['emocao_principal']}
-{brand_context}
-CICLO A SEGUIR:
-1. IMPACTO (Reptiliano) - Reels/Frase instintiva - Captar atenção
-2. IDENTIFICAÇÃO (Límbico) - Storytelling/Bastidor - Criar conexão
-3. AUTORIDADE (Neocórtex) - Dica Técnica/Carrossel - Demonstrar expertise
-4. EDUCAÇÃO (Neocórtex) - Carrossel/Mini Aula - Entregar valor
-5. PROVA+OFERTA (Límbico/Reptiliano) - Depoimento+CTA - Converter
-6. ENCANTAMENTO (Límbico) - Bastidor/Agradecimento - Fidelizar
-
-Para CADA post, gere em JSON:
-{{
-    "dia": 1-6,
-    "titulo": "título curto",
-    "tipo_conteudo": "tipo sugerido",
-    "legenda": "legenda completa com gancho, corpo e CTA",
-    "cta": "call-to-action específico",
-    "gatilhos": ["lista", "de", "gatilhos"],
-    "dica_visual": "sugestão de visual/design"
-}}
-
-Responda APENAS com um array JSON válido dos 6 posts."""
+        brand_context = prompt_registry.render(
+            "campanha_identidade_marca",
+            **{
+                field: brand_identity[field]
+                for field in CAMPANHA_IDENTIDADE_MARCA.variables
+                if brand_identity.get(field) is not None
+            },
+        ).text
+
+    prompt = prompt_registry.render(
+        "campanha_sequencia",
+        nome=campanha["nome"],
+        tema_base=campanha["tema_base"],
+        objetivo=campanha["objetivo_estrategico"],
+        tom_nome=tom_info["nome"],
+        tom_descricao=tom_info["descricao"],
+        emocao_principal=campanha["emocao_principal"],
+        brand_context=brand_context,
+    )
 
     session_id = f"campanha_{current_user['id']}_{uuid4()}"
     user_context = current_user.get("onboarding_data", {})
     
-    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity)
+    lucresia = LucresIA(session_id=session_id, user_context=user_context, brand_identity=brand_identity, task="campaign_sequence")
     
     try:
-        response = await lucresia.send_message(prompt)
+        response = await lucresia.send_message(prompt.text)
         
         import json
         try:
@@ -4616,11 +4881,26 @@ Responda APENAS com um array JSON válido dos 6 posts."""
                 "dica_visual": post_data.get("dica_visual", ""),
                 "data_programada": data_programada.strftime("%Y-%m-%d"),
                 "status": "planejado",
+                "prompt_version": prompt.version_id,
                 "created_at": datetime.now(timezone.utc).isoformat()
             }
-            
-            await db.posts_campanha.insert_one(post)
-            posts_criados.append({k: v for k, v in post.items() if k != "_id"})
+            posts_criados.append(post)
+        
+        # Um único round trip; se o prazo acabar aqui, devolve os posts gerados sem salvar
+        try:
+            if posts_criados:
+                await db.posts_campanha.insert_many([dict(post) for post in posts_criados])
+        except Exception as e:
+            if not is_deadline_error(e):
+                raise
+            record_partial("campanha_posts")
+            return {
+                "success": True,
+                "partial": True,
+                "saved": False,
+                "message": "Tempo limite atingido ao salvar: os posts foram gerados mas não foram salvos",
+                "posts": posts_criados
+            }
         
         # Atualizar campanha
         await db.campanhas.update_one(
@@ -4644,14 +4924,17 @@ Responda APENAS com um array JSON válido dos 6 posts."""
         }
         
     except Exception as e:
+        if is_deadline_error(e):
+            raise
         raise HTTPException(status_code=500, detail=f"Erro ao gerar sequência: {str(e)}")
 
 @app.get("/api/campanhas/{campanha_id}/posts")
 async def get_posts_campanha(campanha_id: str, current_user: dict = Depends(get_current_user)):
-    """Lista posts de uma campanha"""
+    """Lista posts de uma campanha (imagens como URLs de miniatura/média/original)"""
+    await migrate_post_images(current_user["id"], {"campanha_id": campanha_id})
     posts = await db.posts_campanha.find(
         {"campanha_id": campanha_id, "user_id": current_user["id"]},
-        {"_id": 0}
+        {"_id": 0, "imagem_base64": 0}
     ).sort("dia_do_ciclo", 1).to_list(10)
     
     return {"success": True, "posts": posts}
@@ -4725,7 +5008,7 @@ Responda em JSON:
 
     session_id = f"copy_{current_user['id']}_{uuid4()}"
     brand_identity = await get_user_brand_identity(current_user["id"])
-    lucresia = LucresIA(session_id=session_id, user_context=current_user.get("onboarding_data", {}), brand_identity=brand_identity)
+    lucresia = LucresIA(session_id=session_id, user_context=current_user.get("onboarding_data", {}), brand_identity=brand_identity, task="post_copy")
     
     try:
         response = await lucresia.send_message(prompt)
@@ -4767,8 +5050,52 @@ Responda em JSON:
 # IMAGE GENERATION ROUTES
 # =============================================================================
 
+async def migrate_post_images(user_id: str, query: dict):
+    """Posts antigos com a imagem em base64 no documento: grava em `images` (uma vez)"""
+    legacy = await db.posts_campanha.find(
+        {**query, "user_id": user_id, "imagem_base64": {"$nin": [None, ""]}},
+        {"_id": 0, "id": 1, "imagem_base64": 1}
+    ).to_list(None)
+    for post in legacy:
+        try:
+            stored = await store_image(db, user_id, decode_base64_image(post["imagem_base64"]), "post")
+        except ValueError as e:
+            logger.warning(f"Imagem do post {post['id']} não migrada: {e}")
+            continue
+        await db.posts_campanha.update_one(
+            {"id": post["id"]},
+            {"$set": {"imagem_id": stored["id"], "imagem_urls": stored["urls"]}, "$unset": {"imagem_base64": ""}}
+        )
+
+@app.get("/api/images/{image_id}/{variant}")
+async def get_image(image_id: str, variant: str, request: Request):
+    """
+    Imagem binária (variant: thumb, medium ou original) no melhor formato do
+    Accept (AVIF/WebP). Sem login: o id aleatório é a credencial (uso em <img>).
+    """
+    try:
+        image = await load_image(
+            db, image_id, variant,
+            accept=request.headers.get("accept"),
+            if_none_match=request.headers.get("if-none-match")
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if image is None:
+        raise HTTPException(status_code=404, detail="Imagem não encontrada")
+    
+    headers = {
+        "ETag": image.etag,
+        "Cache-Control": f"private, max-age={IMAGE_CACHE_MAX_AGE}, immutable",
+        "Vary": "Accept",
+    }
+    if image.content is None:
+        return Response(status_code=304, headers=headers)
+    return Response(content=image.content, media_type=image.media_type, headers=headers)
+
 @app.post("/api/images/generate")
-async def generate_image(data: GenerateImageRequest, current_user: dict = Depends(get_current_user)):
+@idempotent("image")
+async def generate_image(request: Request, data: GenerateImageRequest, current_user: dict = Depends(get_current_user)):
     """Gera uma imagem a partir de um prompt"""
     try:
         image_gen = get_image_generator()
@@ -4778,8 +5105,15 @@ async def generate_image(data: GenerateImageRequest, current_user: dict = Depend
         )
         
         if result["success"]:
+            stored = await store_image(db, current_user["id"], result["image_bytes"], "generated")
             await consume_credits(current_user["id"], 5, f"Gerar imagem: {data.prompt[:30]}...")
-            return result
+            return {
+                "success": True,
+                "image_id": stored["id"],
+                "image_urls": stored["urls"],
+                "prompt_used": result.get("prompt_used", ""),
+                "model": result.get("model")
+            }
         else:
             raise HTTPException(status_code=500, detail=result.get("error", "Erro ao gerar imagem"))
             
@@ -4787,7 +5121,9 @@ async def generate_image(data: GenerateImageRequest, current_user: dict = Depend
         raise HTTPException(status_code=500, detail=f"Erro ao gerar imagem: {str(e)}")
 
 @app.post("/api/campanhas/posts/{post_id}/gerar-imagem")
+@idempotent("post_image")
 async def generate_post_image(
+    request: Request,
     post_id: str,
     data: Optional[GeneratePostImageRequest] = None,
     current_user: dict = Depends(get_current_user)
@@ -4827,23 +5163,29 @@ async def generate_post_image(
             )
         
         if result["success"]:
-            # Salvar referência da imagem no post
+            # Original + derivados em `images`; o post guarda só a referência
+            stored = await store_image(db, current_user["id"], result["image_bytes"], "post")
             await db.posts_campanha.update_one(
                 {"id": post_id},
                 {
                     "$set": {
-                        "imagem_base64": result["image_base64"],
+                        "imagem_id": stored["id"],
+                        "imagem_urls": stored["urls"],
                         "imagem_prompt": result.get("prompt_used", ""),
                         "updated_at": datetime.now(timezone.utc).isoformat()
-                    }
+                    },
+                    "$unset": {"imagem_base64": ""}
                 }
             )
+            # Imagem anterior do post não é mais referenciada
+            await delete_images(db, current_user["id"], [post.get("imagem_id")])
             
             await consume_credits(current_user["id"], 5, f"Gerar imagem post: {post.get('titulo', '')[:20]}")
             
             return {
                 "success": True,
-                "image_base64": result["image_base64"],
+                "image_id": stored["id"],
+                "image_urls": stored["urls"],
                 "prompt_used": result.get("prompt_used", ""),
                 "post_id": post_id
             }
@@ -4855,21 +5197,23 @@ async def generate_post_image(
 
 @app.get("/api/campanhas/posts/{post_id}/imagem")
 async def get_post_image(post_id: str, current_user: dict = Depends(get_current_user)):
-    """Retorna a imagem de um post"""
+    """Retorna as URLs (miniatura, média, original) da imagem de um post"""
+    await migrate_post_images(current_user["id"], {"id": post_id})
     post = await db.posts_campanha.find_one(
         {"id": post_id, "user_id": current_user["id"]},
-        {"_id": 0, "imagem_base64": 1, "imagem_prompt": 1}
+        {"_id": 0, "imagem_id": 1, "imagem_prompt": 1}
     )
     
     if not post:
         raise HTTPException(status_code=404, detail="Post não encontrado")
     
-    if not post.get("imagem_base64"):
+    if not post.get("imagem_id"):
         return {"success": False, "message": "Este post não tem imagem gerada"}
     
     return {
         "success": True,
-        "image_base64": post.get("imagem_base64"),
+        "image_id": post["imagem_id"],
+        "image_urls": image_urls(post["imagem_id"]),
         "prompt_used": post.get("imagem_prompt", "")
     }
 
@@ -4908,7 +5252,7 @@ async def verify_campaign(campanha_id: str, current_user: dict = Depends(get_cur
     # Buscar posts
     posts = await db.posts_campanha.find(
         {"campanha_id": campanha_id},
-        {"_id": 0}
+        {"_id": 0, "imagem_base64": 0}
     ).to_list(10)
     
     if not posts:
@@ -4996,14 +5340,142 @@ async def suggest_content_improvements(data: SuggestImprovementsRequest, current
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao sugerir melhorias: {str(e)}")
 
+# =============================================================================
+# LISTAGENS PAGINADAS
+# =============================================================================
+
+async def list_page(collection_name: str, key: str, user_id: str, cursor: Optional[str], limit: int,
+                    fields: Optional[str], sort_field: str = "created_at", direction: int = -1) -> dict:
+    """Página de uma listagem do usuário (cursor em (sort_field, id), projeção de resumo, total em cache)"""
+    try:
+        page = await page_response(
+            db, collection_name, user_id, key,
+            cursor=cursor, limit=limit, fields=fields,
+            sort_field=sort_field, direction=direction,
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(page)
+
 # =============================================================================
 # LEADS ROUTES
 # =============================================================================
 
 @app.get("/api/leads")
-async def get_leads(current_user: dict = Depends(get_current_user)):
-    leads = await db.leads.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return {"success": True, "leads": leads}
+async def get_leads(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    return await list_page("leads", "leads", current_user["id"], cursor, limit, fields)
+
+@app.get("/api/leads/query")
+async def query_leads_endpoint(
+    q: Optional[str] = None,
+    text: Optional[str] = None,
+    status: Optional[str] = None,
+    temperatura: Optional[str] = None,
+    procedimento: Optional[str] = None,
+    origem: Optional[str] = None,
+    valor_min: Optional[int] = None,
+    valor_max: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Consulta de leads no servidor: filtros combináveis (status, temperatura,
+    procedimento e origem aceitam valores separados por vírgula), busca por
+    prefixo em nome/email/telefone (q) ou textual (text), ordenação por
+    created_at/valor_estimado e contagens do funil na mesma resposta.
+    """
+    try:
+        result = await query_leads(
+            db, current_user["id"],
+            q=q, text=text, status=status, temperatura=temperatura,
+            procedimento=procedimento, origem=origem,
+            valor_min=valor_min, valor_max=valor_max,
+            created_from=created_from, created_to=created_to,
+            sort=sort, order=order, cursor=cursor, limit=limit, fields=fields,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return FastJSONResponse(result)
+
+LEAD_IMPORT_MAX_BYTES = int(os.environ.get("LEAD_IMPORT_MAX_MB", "20")) * 1024 * 1024
+LEAD_IMPORT_EXTENSIONS = (".csv", ".txt", ".xlsx", ".xlsm")
+
+def _save_upload(upload: UploadFile, suffix: str) -> str:
+    """Copia o upload para um arquivo temporário em blocos (limite LEAD_IMPORT_MAX_MB)"""
+    size = 0
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, prefix="leads_import_") as tmp:
+        while chunk := upload.file.read(1024 * 1024):
+            size += len(chunk)
+            if size > LEAD_IMPORT_MAX_BYTES:
+                tmp.close()
+                os.remove(tmp.name)
+                raise ValueError(f"Arquivo maior que {LEAD_IMPORT_MAX_BYTES // (1024 * 1024)} MB")
+            tmp.write(chunk)
+    return tmp.name
+
+@app.post("/api/leads/import")
+async def import_leads_endpoint(
+    background_tasks: BackgroundTasks,
+    file: UploadFile = File(...),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Importa leads de CSV/XLSX em segundo plano.
+    Retorna o job; o progresso fica em GET /api/leads/import/{job_id}.
+    """
+    filename = file.filename or "leads.csv"
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in LEAD_IMPORT_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use CSV ou XLSX")
+    
+    try:
+        path = await run_in_threadpool(_save_upload, file, extension)
+    except ValueError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    
+    job = await create_import_job(db, current_user["id"], filename)
+    background_tasks.add_task(run_import_job, db, current_user["id"], job["id"], path, filename, LeadCreate)
+    return {"success": True, "job": job}
+
+@app.get("/api/leads/import/{job_id}")
+async def get_lead_import(job_id: str, current_user: dict = Depends(get_current_user)):
+    """Progresso de uma importação de leads"""
+    job = await db.lead_imports.find_one({"id": job_id, "user_id": current_user["id"]}, {"_id": 0})
+    if not job:
+        raise HTTPException(status_code=404, detail="Importação não encontrada")
+    return {"success": True, "job": job}
+
+@app.get("/api/leads/export")
+async def export_leads_endpoint(
+    q: Optional[str] = None,
+    status: Optional[str] = None,
+    temperatura: Optional[str] = None,
+    procedimento: Optional[str] = None,
+    origem: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Exporta os leads (com os filtros de /api/leads/query) em CSV, gerado por páginas"""
+    stream = export_leads_csv(
+        db, current_user["id"],
+        q=q, status=status, temperatura=temperatura, procedimento=procedimento, origem=origem,
+    )
+    filename = f"leads-{datetime.now(timezone.utc).strftime('%Y%m%d')}.csv"
+    return StreamingResponse(
+        stream,
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
 
 @app.post("/api/leads")
 async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_current_user)):
@@ -5024,9 +5496,11 @@ async def create_lead(lead_data: LeadCreate, current_user: dict = Depends(get_cu
         "observacoes": lead_data.observacoes,
         "created_at": now,
         "updated_at": now,
+        **search_fields(lead_data.nome, lead_data.email, lead_data.telefone),
     }
     
     await db.leads.insert_one(lead)
+    await increment_count(db, current_user["id"], "leads")
     return {"success": True, "lead": {k: v for k, v in lead.items() if k != "_id"}}
 
 @app.put("/api/leads/{lead_id}")
@@ -5034,6 +5508,15 @@ async def update_lead(lead_id: str, lead_data: LeadUpdate, current_user: dict =
     update_data = {k: v for k, v in lead_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
+    # Mantém os campos de busca normalizados em dia
+    if any(key in update_data for key in ("nome", "email", "telefone")):
+        current = await db.leads.find_one(
+            {"id": lead_id, "user_id": current_user["id"]},
+            {"_id": 0, "nome": 1, "email": 1, "telefone": 1}
+        )
+        if current:
+            update_data.update(search_fields_update(current, update_data))
+    
     result = await db.leads.update_one(
         {"id": lead_id, "user_id": current_user["id"]},
         {"$set": update_data}
@@ -5050,6 +5533,7 @@ async def delete_lead(lead_id: str, current_user: dict = Depends(get_current_use
     result = await db.leads.delete_one({"id": lead_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Lead não encontrado")
+    await increment_count(db, current_user["id"], "leads", -1)
     return {"success": True, "message": "Lead removido"}
 
 # =============================================================================
@@ -5057,9 +5541,13 @@ async def delete_lead(lead_id: str, current_user: dict = Depends(get_current_use
 # =============================================================================
 
 @app.get("/api/calendar/posts")
-async def get_calendar_posts(current_user: dict = Depends(get_current_user)):
-    posts = await db.calendar_posts.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return {"success": True, "posts": posts}
+async def get_calendar_posts(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    return await list_page("calendar_posts", "posts", current_user["id"], cursor, limit, fields)
 
 @app.post("/api/calendar/posts")
 async def create_calendar_post(data: CalendarPostCreate, current_user: dict = Depends(get_current_user)):
@@ -5080,6 +5568,7 @@ async def create_calendar_post(data: CalendarPostCreate, current_user: dict = De
     }
     
     await db.calendar_posts.insert_one(post)
+    await increment_count(db, current_user["id"], "calendar_posts")
     return {"success": True, "post": {k: v for k, v in post.items() if k != "_id"}}
 
 @app.put("/api/calendar/posts/{post_id}/publish")
@@ -5097,6 +5586,7 @@ async def delete_calendar_post(post_id: str, current_user: dict = Depends(get_cu
     result = await db.calendar_posts.delete_one({"id": post_id, "user_id": current_user["id"]})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Post não encontrado")
+    await increment_count(db, current_user["id"], "calendar_posts", -1)
     return {"success": True, "message": "Post removido"}
 
 # =============================================================================
@@ -5104,9 +5594,13 @@ async def delete_calendar_post(post_id: str, current_user: dict = Depends(get_cu
 # =============================================================================
 
 @app.get("/api/agendamentos")
-async def get_agendamentos(current_user: dict = Depends(get_current_user)):
-    agendamentos = await db.agendamentos.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return {"success": True, "agendamentos": agendamentos}
+async def get_agendamentos(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    return await list_page("agendamentos", "agendamentos", current_user["id"], cursor, limit, fields)
 
 @app.post("/api/agendamentos")
 async def create_agendamento(data: AgendamentoCreate, current_user: dict = Depends(get_current_user)):
@@ -5127,6 +5621,7 @@ async def create_agendamento(data: AgendamentoCreate, current_user: dict = Depen
     }
     
     await db.agendamentos.insert_one(agendamento)
+    await increment_count(db, current_user["id"], "agendamentos")
     return {"success": True, "agendamento": {k: v for k, v in agendamento.items() if k != "_id"}}
 
 # =============================================================================
@@ -5134,14 +5629,22 @@ async def create_agendamento(data: AgendamentoCreate, current_user: dict = Depen
 # =============================================================================
 
 @app.get("/api/content")
-async def get_content(current_user: dict = Depends(get_current_user)):
-    content = await db.generated_content.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(100)
-    return {"success": True, "content": content}
+async def get_content(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    return await list_page("generated_content", "content", current_user["id"], cursor, limit, fields)
 
 @app.get("/api/ebooks")
-async def get_ebooks(current_user: dict = Depends(get_current_user)):
-    ebooks = await db.ebooks.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(50)
-    return {"success": True, "ebooks": ebooks}
+async def get_ebooks(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    return await list_page("ebooks", "ebooks", current_user["id"], cursor, limit, fields)
 
 @app.get("/api/personas")
 async def get_personas(current_user: dict = Depends(get_current_user)):
@@ -5162,25 +5665,25 @@ async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
     user_id = current_user["id"]
     
     # Count leads by temperature
-    leads_count = await db.leads.count_documents({"user_id": user_id})
-    leads_quentes = await db.leads.count_documents({"user_id": user_id, "temperatura": "quente"})
-    leads_mornos = await db.leads.count_documents({"user_id": user_id, "temperatura": "morno"})
+    leads_count = await db_analytics.leads.count_documents({"user_id": user_id})
+    leads_quentes = await db_analytics.leads.count_documents({"user_id": user_id, "temperatura": "quente"})
+    leads_mornos = await db_analytics.leads.count_documents({"user_id": user_id, "temperatura": "morno"})
     
     # Count agendamentos
-    agendamentos_count = await db.agendamentos.count_documents({"user_id": user_id})
+    agendamentos_count = await db_analytics.agendamentos.count_documents({"user_id": user_id})
     
     # Sum faturamento
     pipeline = [
         {"$match": {"user_id": user_id, "status": "realizado"}},
         {"$group": {"_id": None, "total": {"$sum": "$valor"}}}
     ]
-    faturamento_result = await db.agendamentos.aggregate(pipeline).to_list(1)
+    faturamento_result = await db_analytics.agendamentos.aggregate(pipeline).to_list(1)
     faturamento = faturamento_result[0]["total"] if faturamento_result else 0
     
     # Content counts
-    content_count = await db.generated_content.count_documents({"user_id": user_id})
-    ebooks_count = await db.ebooks.count_documents({"user_id": user_id})
-    personas_count = await db.personas.count_documents({"user_id": user_id})
+    content_count = await db_analytics.generated_content.count_documents({"user_id": user_id})
+    ebooks_count = await db_analytics.ebooks.count_documents({"user_id": user_id})
+    personas_count = await db_analytics.personas.count_documents({"user_id": user_id})
     
     return {
         "success": True,
@@ -5367,9 +5870,45 @@ async def get_brand_identity_options(current_user: dict = Depends(get_current_us
         }
     }
 
+BRAND_PHOTO_FIELDS = ("professional_photos", "clinic_photos")
+
+async def brand_photo_refs(user_id: str, photos: List[str]) -> List[str]:
+    """Fotos enviadas em base64/data URL viram referências /api/images/{id}/original"""
+    try:
+        return await store_image_refs(db, user_id, photos, "brand")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def delete_replaced_brand_photos(user_id: str, previous: Optional[dict], update: dict):
+    """Remove as imagens que saíram das listas de fotos da marca"""
+    if not previous:
+        return
+    kept = {photo for field in BRAND_PHOTO_FIELDS for photo in update.get(field, previous.get(field) or [])}
+    removed = [
+        image_id_from_url(photo) for field in BRAND_PHOTO_FIELDS if field in update
+        for photo in previous.get(field) or [] if photo not in kept
+    ]
+    await delete_images(db, user_id, removed)
+
+async def migrate_brand_photos(identity: dict) -> dict:
+    """Identidades antigas com fotos em base64 no documento: grava em `images` (uma vez)"""
+    legacy = {
+        field: identity[field] for field in BRAND_PHOTO_FIELDS
+        if any(not image_id_from_url(photo) for photo in identity.get(field) or [])
+    }
+    if not legacy:
+        return identity
+    try:
+        update = {field: await store_image_refs(db, identity["user_id"], photos, "brand") for field, photos in legacy.items()}
+    except ValueError as e:
+        logger.warning(f"Fotos da marca de {identity['user_id']} não migradas: {e}")
+        return identity
+    await db.brand_identity.update_one({"user_id": identity["user_id"]}, {"$set": update})
+    return {**identity, **update}
+
 @app.get("/api/brand-identity")
 async def get_brand_identity(current_user: dict = Depends(get_current_user)):
-    """Retorna a identidade de marca do usuário"""
+    """Retorna a identidade de marca do usuário (fotos como /api/images/{id}/original)"""
     identity = await db.brand_identity.find_one(
         {"user_id": current_user["id"]},
         {"_id": 0}
@@ -5407,6 +5946,7 @@ async def get_brand_identity(current_user: dict = Depends(get_current_user)):
             "is_new": True
         }
     
+    identity = await migrate_brand_photos(identity)
     return {"success": True, "identity": identity, "is_new": False}
 
 @app.post("/api/brand-identity")
@@ -5433,8 +5973,8 @@ async def create_or_update_brand_identity(
         "font_style": data.font_style or "moderna",
         "visual_style": data.visual_style or "clean",
         "logo_base64": data.logo_base64,
-        "professional_photos": data.professional_photos or [],
-        "clinic_photos": data.clinic_photos or [],
+        "professional_photos": await brand_photo_refs(current_user["id"], data.professional_photos or []),
+        "clinic_photos": await brand_photo_refs(current_user["id"], data.clinic_photos or []),
         "appearance_mode": data.appearance_mode or "sometimes",
         "key_phrases": data.key_phrases or [],
         "instagram_handle": data.instagram_handle,
@@ -5448,6 +5988,7 @@ async def create_or_update_brand_identity(
             {"user_id": current_user["id"]},
             {"$set": identity_data}
         )
+        await delete_replaced_brand_photos(current_user["id"], existing, identity_data)
     else:
         identity_data["id"] = str(uuid4())
         identity_data["created_at"] = now
@@ -5484,12 +6025,22 @@ async def update_brand_identity(
     if not update_data:
         raise HTTPException(status_code=400, detail="Nenhum campo para atualizar")
     
+    previous = None
+    if any(field in update_data for field in BRAND_PHOTO_FIELDS):
+        previous = await db.brand_identity.find_one(
+            {"user_id": current_user["id"]}, {"_id": 0, **{field: 1 for field in BRAND_PHOTO_FIELDS}}
+        )
+        for field in BRAND_PHOTO_FIELDS:
+            if field in update_data:
+                update_data[field] = await brand_photo_refs(current_user["id"], update_data[field])
+    
     update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
     
     result = await db.brand_identity.update_one(
         {"user_id": current_user["id"]},
         {"$set": update_data}
     )
+    await delete_replaced_brand_photos(current_user["id"], previous, update_data)
     
     if result.matched_count == 0:
         # Create new if doesn't exist
@@ -5549,7 +6100,8 @@ async def delete_professional_photo(index: int, current_user: dict = Depends(get
     if index < 0 or index >= len(photos):
         raise HTTPException(status_code=400, detail="Índice inválido")
     
-    photos.pop(index)
+    removed = photos.pop(index)
+    await delete_images(db, current_user["id"], [image_id_from_url(removed)])
     await db.brand_identity.update_one(
         {"user_id": current_user["id"]},
         {"$set": {"professional_photos": photos, "updated_at": datetime.now(timezone.utc).isoformat()}}
@@ -5569,7 +6121,8 @@ async def delete_clinic_photo(index: int, current_user: dict = Depends(get_curre
     if index < 0 or index >= len(photos):
         raise HTTPException(status_code=400, detail="Índice inválido")
     
-    photos.pop(index)
+    removed = photos.pop(index)
+    await delete_images(db, current_user["id"], [image_id_from_url(removed)])
     await db.brand_identity.update_one(
         {"user_id": current_user["id"]},
         {"$set": {"clinic_photos": photos, "updated_at": datetime.now(timezone.utc).isoformat()}}
@@ -5641,10 +6194,12 @@ A imagem deve:
         )
         
         if result["success"]:
+            stored = await store_image(db, current_user["id"], result["image_bytes"], "campaign")
             await consume_credits(current_user["id"], 5, f"Imagem de campanha: {data.campaign_type}")
             return {
                 "success": True,
-                "image_base64": result["image_base64"],
+                "image_id": stored["id"],
+                "image_urls": stored["urls"],
                 "prompt_used": prompt,
                 "campaign_type": data.campaign_type
             }
@@ -5687,7 +6242,7 @@ Sugira em JSON:
 
     session_id = f"brand_ai_{current_user['id']}_{uuid4()}"
     existing_brand = await get_user_brand_identity(current_user["id"])
-    lucresia = LucresIA(session_id=session_id, user_context=current_user.get("onboarding_data", {}), brand_identity=existing_brand)
+    lucresia = LucresIA(session_id=session_id, user_context=current_user.get("onboarding_data", {}), brand_identity=existing_brand, task="brand_suggestions")
     
     try:
         response = await lucresia.send_message(prompt)
@@ -5738,7 +6293,8 @@ async def get_seo_awareness_levels(current_user: dict = Depends(get_current_user
     }
 
 @app.post("/api/seo/generate-article")
-async def generate_seo_article(data: SEOArticleGenerateRequest, current_user: dict = Depends(get_current_user)):
+@idempotent("seo_article")
+async def generate_seo_article(request: Request, data: SEOArticleGenerateRequest, current_user: dict = Depends(get_current_user)):
     """Gera artigo SEO completo otimizado para Google"""
     brand_identity = await get_user_brand_identity(current_user["id"])
     
@@ -5762,7 +6318,7 @@ async def generate_seo_article(data: SEOArticleGenerateRequest, current_user: di
     
     generator = get_seo_blog_generator(brand_identity=brand_identity)
     
-    try:
+    async def generate_and_save() -> dict:
         article = await generator.generate_article(
             keyword=data.keyword,
             topic=topic,
@@ -5791,6 +6347,7 @@ async def generate_seo_article(data: SEOArticleGenerateRequest, current_user: di
             "created_at": datetime.now(timezone.utc).isoformat(),
             "updated_at": datetime.now(timezone.utc).isoformat()
         })
+        await increment_count(db, current_user["id"], "seo_articles")
         
         # Consumir créditos (5 para artigo SEO completo)
         await consume_credits(current_user["id"], 5, f"Artigo SEO: {data.keyword}")
@@ -5802,6 +6359,15 @@ async def generate_seo_article(data: SEOArticleGenerateRequest, current_user: di
             "content": article,  # Alias para compatibilidade
             "brand_identity_applied": brand_identity is not None
         }
+    
+    try:
+        # Se a aba for fechada, o artigo termina e é salvo em segundo plano
+        return await run_disconnect_aware(
+            request, generate_and_save(), stage="seo_article",
+            keep_running=True, db=db, user_id=current_user["id"]
+        )
+    except ClientDisconnected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Erro ao gerar artigo: {str(e)}")
 
@@ -5852,14 +6418,14 @@ async def improve_seo_article(data: SEOArticleImproveRequest, current_user: dict
         raise HTTPException(status_code=500, detail=f"Erro ao melhorar artigo: {str(e)}")
 
 @app.get("/api/seo/articles")
-async def list_seo_articles(current_user: dict = Depends(get_current_user)):
-    """Lista artigos SEO do usuário"""
-    articles = await db.seo_articles.find(
-        {"user_id": current_user["id"]},
-        {"_id": 0}
-    ).sort("created_at", -1).to_list(100)
-    
-    return {"success": True, "articles": articles}
+async def list_seo_articles(
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Lista artigos SEO do usuário (paginado; fields=full inclui o artigo)"""
+    return await list_page("seo_articles", "articles", current_user["id"], cursor, limit, fields)
 
 @app.get("/api/seo/articles/{article_id}")
 async def get_seo_article(article_id: str, current_user: dict = Depends(get_current_user)):
@@ -5872,7 +6438,7 @@ async def get_seo_article(article_id: str, current_user: dict = Depends(get_curr
     if not article:
         raise HTTPException(status_code=404, detail="Artigo não encontrado")
     
-    return {"success": True, "article": article}
+    return FastJSONResponse({"success": True, "article": article})
 
 @app.put("/api/seo/articles/{article_id}")
 async def update_seo_article(article_id: str, data: SEOArticleUpdateRequest, current_user: dict = Depends(get_current_user)):
@@ -5909,6 +6475,7 @@ async def delete_seo_article(article_id: str, current_user: dict = Depends(get_c
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Artigo não encontrado")
+    await increment_count(db, current_user["id"], "seo_articles", -1)
     
     return {"success": True, "message": "Artigo deletado"}
 
@@ -5917,12 +6484,12 @@ async def get_seo_stats(current_user: dict = Depends(get_current_user)):
     """Retorna estatísticas de SEO do usuário"""
     user_id = current_user["id"]
     
-    total = await db.seo_articles.count_documents({"user_id": user_id})
-    rascunhos = await db.seo_articles.count_documents({"user_id": user_id, "status": "rascunho"})
-    publicados = await db.seo_articles.count_documents({"user_id": user_id, "status": "publicado"})
+    total = await db_analytics.seo_articles.count_documents({"user_id": user_id})
+    rascunhos = await db_analytics.seo_articles.count_documents({"user_id": user_id, "status": "rascunho"})
+    publicados = await db_analytics.seo_articles.count_documents({"user_id": user_id, "status": "publicado"})
     
     # Calcular score médio de SEO
-    articles = await db.seo_articles.find(
+    articles = await db_analytics.seo_articles.find(
         {"user_id": user_id},
         {"article.seo_score.score": 1}
     ).to_list(100)
@@ -6185,11 +6752,11 @@ async def get_leaderboard(current_user: dict = Depends(get_current_user)):
         {"$limit": 10}
     ]
     
-    top_users = await db.credit_logs.aggregate(pipeline).to_list(10)
+    top_users = await db_analytics.credit_logs.aggregate(pipeline).to_list(10)
     
     leaderboard = []
     for i, item in enumerate(top_users):
-        user = await db.users.find_one({"id": item["_id"]}, {"_id": 0, "name": 1, "email": 1})
+        user = await db_analytics.users.find_one({"id": item["_id"]}, {"_id": 0, "name": 1, "email": 1})
         if user:
             name = user.get("name", user.get("email", "").split("@")[0])
             # Mascarar parte do nome
@@ -6221,6 +6788,7 @@ async def get_social_links():
 # =============================================================================
 
 @app.post("/api/payments/create-checkout")
+@idempotent("checkout")
 async def create_checkout_session(data: SubscriptionCheckoutRequest, request: Request, current_user: dict = Depends(get_current_user)):
     """Cria sessão de checkout do Stripe para assinatura"""
     
@@ -6238,6 +6806,7 @@ async def create_checkout_session(data: SubscriptionCheckoutRequest, request: Re
     host_url = str(request.base_url).rstrip("/")
     webhook_url = f"{host_url}/api/webhook/stripe"
     
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout, CheckoutSessionRequest
     stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url=webhook_url)
     
     # Construir URLs de sucesso/cancelamento
@@ -6316,6 +6885,7 @@ async def get_payment_status(session_id: str, current_user: dict = Depends(get_c
         }
     
     # Verificar status no Stripe
+    from emergentintegrations.payments.stripe.checkout import StripeCheckout
     stripe_api_key = os.environ.get("STRIPE_API_KEY")
     stripe_checkout = StripeCheckout(api_key=stripe_api_key, webhook_url="")
     
@@ -6376,6 +6946,7 @@ async def stripe_webhook(request: Request):
         body = await request.body()
         signature = request.headers.get("Stripe-Signature", "")
         
+        from emergentintegrations.payments.stripe.checkout import StripeCheckout
         stripe_checkout = StripeCheckout(
             api_key=stripe_api_key, 
             webhook_url="",
@@ -6723,13 +7294,6 @@ EBOOK_STRUCTURES = {
     }
 }
 
-# Esquemas de cores
-COLOR_SCHEMES = {
-    "clean-profissional": {"primary": "#4F46E5", "secondary": "#7C3AED", "accent": "#D4A853"},
-    "acolhedor-feminino": {"primary": "#EC4899", "secondary": "#A855F7", "accent": "#D4A853"},
-    "moderno-impactante": {"primary": "#06B6D4", "secondary": "#F59E0B", "accent": "#EC4899"}
-}
-
 @app.post("/api/ebook-new/generate")
 async def generate_new_ebook(data: NewEbookGenerateRequest, current_user: dict = Depends(get_current_user)):
     """Gera um novo e-book usando LucresIA"""
@@ -6837,11 +7401,15 @@ IMPORTANTE: Retorne APENAS o JSON válido, sem texto antes ou depois."""
             "views": 0,
             "downloads": 0,
             "pdf_url": None,
+            "version": 1,
             "created_at": datetime.now(timezone.utc).isoformat(),
             "updated_at": datetime.now(timezone.utc).isoformat()
         }
         
         await db.ebooks_new.insert_one(ebook_record)
+        await record_revision(
+            db, "ebooks_new", ebook_id, current_user["id"], 1, new_ebook_content(ebook_record), source="generated"
+        )
         
         # Deduzir créditos
         await db.users.update_one(
@@ -6921,15 +7489,25 @@ async def update_new_ebook(ebook_id: str, data: NewEbookUpdateRequest, current_u
         if data.next_step is not None:
             update_data["next_step"] = data.next_step
         
-        result = await db.ebooks_new.update_one(
+        before = await db.ebooks_new.find_one_and_update(
             {"id": ebook_id, "user_id": current_user["id"]},
-            {"$set": update_data}
+            {"$set": update_data, "$inc": {"version": 1}},
+            projection={"_id": 0, "version": 1, **{field: 1 for field in NEW_EBOOK_FIELDS}},
+            return_document=ReturnDocument.BEFORE
         )
         
-        if result.matched_count == 0:
+        if before is None:
             raise HTTPException(status_code=404, detail="E-book não encontrado")
         
-        return {"success": True, "message": "E-book atualizado"}
+        previous = new_ebook_content(before)
+        new_version = before.get("version", 0) + 1
+        await record_revision(
+            db, "ebooks_new", ebook_id, current_user["id"], new_version,
+            {**previous, **{k: v for k, v in update_data.items() if k in NEW_EBOOK_FIELDS}},
+            previous=previous
+        )
+        
+        return {"success": True, "message": "E-book atualizado", "version": new_version}
     except HTTPException:
         raise
     except Exception as e:
@@ -6947,6 +7525,8 @@ async def delete_new_ebook(ebook_id: str, current_user: dict = Depends(get_curre
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="E-book não encontrado")
         
+        await delete_revisions(db, ebook_id)
+        
         return {"success": True, "message": "E-book deletado"}
     except HTTPException:
         raise
@@ -6970,9 +7550,6 @@ async def record_ebook_download(ebook_id: str, current_user: dict = Depends(get_
 async def generate_new_ebook_pdf(data: NewEbookPDFRequest, current_user: dict = Depends(get_current_user)):
     """Gera PDF do e-book"""
     try:
-        from fpdf import FPDF
-        import base64
-        
         # Buscar e-book
         ebook = await db.ebooks_new.find_one(
             {"id": data.ebook_id, "user_id": current_user["id"]},
@@ -6982,182 +7559,11 @@ async def generate_new_ebook_pdf(data: NewEbookPDFRequest, current_user: dict =
         if not ebook:
             raise HTTPException(status_code=404, detail="E-book não encontrado")
         
-        # Configurações de cores
-        colors = COLOR_SCHEMES.get(ebook.get("visual_style", "clean-profissional"), COLOR_SCHEMES["clean-profissional"])
-        
-        # Converter hex para RGB
-        def hex_to_rgb(hex_color):
-            hex_color = hex_color.lstrip('#')
-            return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-        
-        primary_rgb = hex_to_rgb(colors["primary"])
-        secondary_rgb = hex_to_rgb(colors["secondary"])
-        accent_rgb = hex_to_rgb(colors["accent"])
-        
-        # Criar PDF
-        pdf = FPDF()
-        pdf.set_auto_page_break(auto=True, margin=20)
-        
-        # Registrar fonte
-        try:
-            pdf.add_font('DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', uni=True)
-            pdf.add_font('DejaVu', 'B', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', uni=True)
-            font_name = 'DejaVu'
-        except:
-            font_name = 'Helvetica'
-        
-        # ===== CAPA =====
-        pdf.add_page()
-        pdf.set_fill_color(*primary_rgb)
-        pdf.rect(0, 0, 210, 297, 'F')
-        
-        # Decoração
-        pdf.set_fill_color(255, 255, 255)
-        pdf.set_draw_color(*accent_rgb)
-        pdf.set_line_width(1)
-        pdf.line(30, 120, 180, 120)
-        
-        # Título
-        pdf.set_text_color(255, 255, 255)
-        pdf.set_font(font_name, 'B', 28)
-        pdf.set_y(130)
-        pdf.multi_cell(0, 12, ebook.get("title", "E-book"), align='C')
-        
-        # Subtítulo
-        pdf.set_font(font_name, '', 14)
-        pdf.set_y(170)
-        pdf.multi_cell(0, 8, ebook.get("subtitle", ""), align='C')
-        
-        # Linha decorativa
-        pdf.line(30, 195, 180, 195)
-        
-        # Autor
-        pdf.set_font(font_name, '', 12)
-        pdf.set_y(240)
-        pdf.cell(0, 10, f"Por {ebook.get('professional_name', '')}", align='C')
-        
-        # Rodapé
-        pdf.set_font(font_name, '', 9)
-        pdf.set_y(270)
-        pdf.cell(0, 10, "Gerado pela Plataforma Elevare", align='C')
-        
-        # ===== SUMÁRIO =====
-        pdf.add_page()
-        pdf.set_text_color(*primary_rgb)
-        pdf.set_font(font_name, 'B', 24)
-        pdf.cell(0, 15, "Sumário", ln=True)
-        
-        pdf.set_draw_color(*accent_rgb)
-        pdf.set_line_width(1)
-        pdf.line(10, 35, 60, 35)
-        
-        pdf.set_y(50)
-        pdf.set_text_color(30, 30, 30)
-        pdf.set_font(font_name, '', 12)
-        
-        pdf.cell(0, 10, "Introdução", ln=True)
-        for cap in ebook.get("chapters", []):
-            pdf.cell(0, 10, f"Capítulo {cap.get('chapter_number', '')}: {cap.get('title', '')}", ln=True)
-        pdf.cell(0, 10, "Conclusão", ln=True)
-        pdf.cell(0, 10, "Próximos Passos", ln=True)
-        
-        # ===== INTRODUÇÃO =====
-        pdf.add_page()
-        pdf.set_text_color(*primary_rgb)
-        pdf.set_font(font_name, 'B', 22)
-        pdf.cell(0, 15, "Introdução", ln=True)
-        
-        pdf.set_draw_color(*accent_rgb)
-        pdf.line(10, pdf.get_y(), 60, pdf.get_y())
-        pdf.set_y(pdf.get_y() + 15)
-        
-        pdf.set_text_color(30, 30, 30)
-        pdf.set_font(font_name, '', 11)
-        pdf.multi_cell(0, 7, ebook.get("introduction", ""))
-        
-        # ===== CAPÍTULOS =====
-        for cap in ebook.get("chapters", []):
-            pdf.add_page()
-            
-            # Badge do capítulo
-            pdf.set_text_color(*accent_rgb)
-            pdf.set_font(font_name, 'B', 10)
-            pdf.cell(0, 10, f"CAPÍTULO {cap.get('chapter_number', '')}", ln=True)
-            
-            # Título do capítulo
-            pdf.set_text_color(*primary_rgb)
-            pdf.set_font(font_name, 'B', 18)
-            pdf.multi_cell(0, 10, cap.get("title", ""))
-            
-            # Linha
-            pdf.set_draw_color(*secondary_rgb)
-            pdf.line(10, pdf.get_y() + 5, 200, pdf.get_y() + 5)
-            pdf.set_y(pdf.get_y() + 15)
-            
-            # Conteúdo
-            pdf.set_text_color(30, 30, 30)
-            pdf.set_font(font_name, '', 11)
-            pdf.multi_cell(0, 7, cap.get("content", ""))
-            
-            # Fonte
-            if cap.get("source"):
-                pdf.set_y(pdf.get_y() + 10)
-                pdf.set_text_color(100, 100, 100)
-                pdf.set_font(font_name, '', 9)
-                pdf.cell(0, 7, f"Referência: {cap.get('source')}", ln=True)
-        
-        # ===== CONCLUSÃO =====
-        pdf.add_page()
-        pdf.set_text_color(*primary_rgb)
-        pdf.set_font(font_name, 'B', 22)
-        pdf.cell(0, 15, "Conclusão", ln=True)
-        
-        pdf.set_draw_color(*accent_rgb)
-        pdf.line(10, pdf.get_y(), 60, pdf.get_y())
-        pdf.set_y(pdf.get_y() + 15)
-        
-        pdf.set_text_color(30, 30, 30)
-        pdf.set_font(font_name, '', 11)
-        pdf.multi_cell(0, 7, ebook.get("conclusion", ""))
-        
-        # ===== PRÓXIMOS PASSOS =====
-        pdf.add_page()
-        pdf.set_text_color(*primary_rgb)
-        pdf.set_font(font_name, 'B', 22)
-        pdf.cell(0, 15, "Próximos Passos", ln=True)
-        
-        pdf.set_draw_color(*accent_rgb)
-        pdf.line(10, pdf.get_y(), 80, pdf.get_y())
-        pdf.set_y(pdf.get_y() + 15)
-        
-        pdf.set_text_color(30, 30, 30)
-        pdf.set_font(font_name, '', 11)
-        pdf.multi_cell(0, 7, ebook.get("next_step", ""))
-        
-        # Agradecimento
-        pdf.set_y(pdf.get_y() + 30)
-        pdf.set_text_color(*primary_rgb)
-        pdf.set_font(font_name, 'B', 14)
-        pdf.cell(0, 10, "Obrigado pela leitura!", align='C', ln=True)
-        
-        pdf.set_text_color(30, 30, 30)
-        pdf.set_font(font_name, '', 11)
-        pdf.cell(0, 8, f"Este material foi preparado por {ebook.get('professional_name', '')}", align='C', ln=True)
-        
-        # Rodapé
-        pdf.set_y(260)
-        pdf.set_text_color(150, 150, 150)
-        pdf.set_font(font_name, '', 9)
-        pdf.cell(0, 8, "━" * 50, align='C', ln=True)
-        pdf.set_text_color(*secondary_rgb)
-        pdf.set_font(font_name, 'B', 10)
-        pdf.cell(0, 8, "Gerado pela Plataforma Elevare", align='C', ln=True)
-        pdf.set_text_color(150, 150, 150)
-        pdf.set_font(font_name, '', 9)
-        pdf.cell(0, 8, "Inteligência Editorial para Profissionais de Estética", align='C', ln=True)
-        
-        # Gerar PDF como base64
-        pdf_bytes = pdf.output(dest='S').encode('latin-1')
+        # Gerar PDF (convertido para o formato estruturado; template = estilo visual)
+        structured = new_ebook_to_structured(ebook)
+        pdf_bytes = (await run_in_threadpool(
+            render_ebook, structured, ebook.get("visual_style") or "clean-profissional", "pdf"
+        )).content
         pdf_base64 = base64.b64encode(pdf_bytes).decode('utf-8')
         pdf_url = f"data:application/pdf;base64,{pdf_base64}"
         
@@ -7230,19 +7636,29 @@ Retorne APENAS o novo conteúdo do capítulo (sem o título), mantendo a qualida
 
         refined_content = await lucresia.generate(prompt)
         
-        # Atualizar capítulo
-        ebook["chapters"][chapter_idx]["content"] = refined_content.strip()
-        
-        await db.ebooks_new.update_one(
-            {"id": data.ebook_id},
+        # Atualizar só o conteúdo do capítulo (posição estável pelo índice encontrado)
+        before = await db.ebooks_new.find_one_and_update(
+            {"id": data.ebook_id, f"chapters.{chapter_idx}.id": data.chapter_id},
             {
                 "$set": {
-                    "chapters": ebook["chapters"],
+                    f"chapters.{chapter_idx}.content": refined_content.strip(),
                     "updated_at": datetime.now(timezone.utc).isoformat()
-                }
-            }
+                },
+                "$inc": {"version": 1}
+            },
+            projection={"_id": 0, "version": 1, **{field: 1 for field in NEW_EBOOK_FIELDS}},
+            return_document=ReturnDocument.BEFORE
         )
         
+        if before is not None:
+            previous = new_ebook_content(before)
+            content = copy.deepcopy(previous)
+            content["chapters"][chapter_idx]["content"] = refined_content.strip()
+            await record_revision(
+                db, "ebooks_new", data.ebook_id, current_user["id"], before.get("version", 0) + 1,
+                content, previous=previous, source="refine"
+            )
+        
         return {"success": True, "message": "Capítulo aperfeiçoado"}
         
     except HTTPException:
@@ -7251,6 +7667,37 @@ Retorne APENAS o novo conteúdo do capítulo (sem o título), mantendo a qualida
         print(f"Erro ao aperfeiçoar capítulo: {e}")
         raise HTTPException(status_code=500, detail="Erro ao aperfeiçoar capítulo")
 
+@app.get("/api/ebook-new/{ebook_id}/revisions")
+async def list_new_ebook_revisions(ebook_id: str, current_user: dict = Depends(get_current_user)):
+    """Histórico de versões do e-book (mais recentes primeiro)"""
+    return await _revisions_response("ebooks_new", ebook_id, current_user["id"])
+
+@app.get("/api/ebook-new/{ebook_id}/revisions/diff")
+async def diff_new_ebook_revisions(
+    ebook_id: str,
+    from_version: int,
+    to_version: int,
+    current_user: dict = Depends(get_current_user)
+):
+    """Diferença entre duas versões (operações JSON Patch)"""
+    return await _revision_diff_response("ebooks_new", ebook_id, current_user["id"], from_version, to_version)
+
+@app.get("/api/ebook-new/{ebook_id}/revisions/{version}")
+async def get_new_ebook_revision(ebook_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """Conteúdo de uma versão"""
+    await _owned_ebook_version("ebooks_new", ebook_id, current_user["id"])
+    return {"success": True, "version": version, "content": await _revision_content(ebook_id, version)}
+
+@app.post("/api/ebook-new/{ebook_id}/revisions/{version}/restore")
+async def restore_new_ebook_revision(ebook_id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """Restaura uma versão (vira a versão mais nova; o histórico é preservado)"""
+    return await _restore_revision("ebooks_new", ebook_id, current_user["id"], version)
+
+# Rotas revisadas dos routers modulares (routers.MOUNTED_ROUTES), importadas no primeiro request do prefixo
+from routers import mount_routers
+mount_routers(app)
+startup_timer.mark("routes")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -4,10 +4,9 @@ Gera carrosséis de alta conversão seguindo a lógica de NeuroVendas Elevare.
 """
 
 import os
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from dotenv import load_dotenv
 
-load_dotenv()
+from services.model_router import routed_chat
+
 
 CAROUSEL_SYSTEM_PROMPT = """
 Você é o Gerador de Carrosséis NeuroVendas Elevare.
@@ -90,11 +89,7 @@ class CarouselGenerator:
         import uuid
         session_id = f"carousel_{uuid.uuid4().hex[:8]}"
         
-        self.chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-4o")
+        self.chat = routed_chat("carousel", session_id, system_message, api_key=self.api_key)
     
     async def generate_carousel(
         self,
@@ -118,6 +113,7 @@ class CarouselGenerator:
             audience_awareness: Consciência do público (frio, morno, quente)
             number_of_slides: Quantidade de slides (7-9)
         """
+        from emergentintegrations.llm.chat import UserMessage
         
         objective_map = {
             "atracao": "Atrair novos seguidores e gerar awareness",
@@ -236,6 +232,8 @@ Responda APENAS com o JSON válido."""
         """
         Gera sequência de carrosséis para campanha completa.
         """
+        from emergentintegrations.llm.chat import UserMessage
+        
         prompt = f"""Crie uma sequência estratégica de {number_of_carousels} carrosséis para uma campanha.
 
 CONTEXTO:
@@ -272,7 +270,7 @@ Responda em JSON:
 Responda APENAS com o JSON válido."""
 
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="carousel_sequence")
         
         import json
         import re
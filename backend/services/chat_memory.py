@@ -0,0 +1,266 @@
+"""
+Memória de Conversa da LucresIA (janela com orçamento de tokens + resumo)
+
+Cada mensagem do chat cria um LucresIA/LlmChat novo, sem histórico. A memória
+da sessão vem do banco:
+- `chat_history`: um documento por turno (mensagem + resposta), indexado por
+  usuário, sessão e data
+- `chat_sessions`: resumo acumulado da sessão e até onde ele cobre
+  (`summarized_until`)
+
+O contexto enviado ao modelo é o resumo + os últimos CHAT_WINDOW_TURNS turnos
+ainda não resumidos que cabem em CHAT_WINDOW_TOKENS. Quando a janela
+transborda, os turnos mais antigos (deixando meia janela) são incorporados ao
+resumo em background (tarefa "chat_summary" de services.model_router): o
+prompt não cresce com a conversa, a resposta não espera pelo resumo e o
+modelo de resumo roda cerca de uma vez a cada meia janela de mensagens.
+
+Sessões são sempre filtradas pelo usuário: um session_id de outra pessoa não
+traz histórico nenhum.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Set
+from uuid import uuid4
+
+from pymongo import ASCENDING, DESCENDING
+
+from services.model_router import routed_chat
+from utils.observability import estimate_tokens
+from utils.shared_state import shared_state
+
+logger = logging.getLogger("elevare.chat_memory")
+
+WINDOW_TURNS = int(os.environ.get("CHAT_WINDOW_TURNS", "10"))
+WINDOW_TOKENS = int(os.environ.get("CHAT_WINDOW_TOKENS", "3000"))
+SUMMARY_MAX_TOKENS = int(os.environ.get("CHAT_SUMMARY_MAX_TOKENS", "600"))
+# Turnos resumidos por chamada (o restante entra no próximo resumo)
+SUMMARY_BATCH_TURNS = int(os.environ.get("CHAT_SUMMARY_BATCH_TURNS", "40"))
+SUMMARY_LOCK_SECONDS = 120
+
+SUMMARY_PROMPT = """Você resume conversas entre uma profissional da estética e a LucresIA,
+assistente de neurovendas. Atualize o resumo com os novos turnos.
+
+Mantenha: objetivos e pedidos da usuária, dados do negócio citados (serviços,
+preços, público, agenda), decisões tomadas, conteúdos já entregues e pendências.
+Descarte saudações e repetições. Escreva em português, em tópicos curtos, com
+no máximo {max_words} palavras. Responda só com o resumo."""
+
+
+class ChatTurn(NamedTuple):
+    message: str
+    response: str
+    created_at: str
+
+
+class ConversationWindow(NamedTuple):
+    summary: Optional[str]
+    turns: List[ChatTurn]
+    tokens: int
+    overflow: bool  # há turnos fora da janela ainda não resumidos
+
+    def as_context(self) -> Optional[str]:
+        """Bloco para o system prompt (None = conversa nova)"""
+        if not self.summary and not self.turns:
+            return None
+        parts = []
+        if self.summary:
+            parts.append(f"Resumo do que já foi conversado:\n{self.summary}")
+        if self.turns:
+            lines = []
+            for turn in self.turns:
+                lines.append(f"Usuária: {turn.message}")
+                lines.append(f"LucresIA: {turn.response}")
+            parts.append("Mensagens mais recentes:\n" + "\n".join(lines))
+        return "\n\n".join(parts)
+
+
+def _turn_tokens(turn: ChatTurn) -> int:
+    return estimate_tokens(turn.message) + estimate_tokens(turn.response) + 8
+
+
+def _clip(text: str, max_tokens: int) -> str:
+    max_chars = max_tokens * 4
+    return text if len(text) <= max_chars else text[:max_chars] + "…"
+
+
+def select_window(turns: List[ChatTurn], max_turns: int = WINDOW_TURNS, max_tokens: int = WINDOW_TOKENS) -> List[ChatTurn]:
+    """
+    Últimos turnos (ordem cronológica) dentro de max_turns e max_tokens. O
+    turno mais recente sempre entra, cortado se sozinho passar do orçamento.
+    """
+    window: List[ChatTurn] = []
+    used = 0
+    for turn in reversed(turns[-max_turns:] if max_turns > 0 else []):
+        tokens = _turn_tokens(turn)
+        if used + tokens > max_tokens:
+            if not window:
+                half = max_tokens // 2
+                window.append(ChatTurn(_clip(turn.message, half), _clip(turn.response, half), turn.created_at))
+            break
+        window.append(turn)
+        used += tokens
+    window.reverse()
+    return window
+
+
+async def ensure_chat_history_indexes(db):
+    await db.chat_history.create_index(
+        [("user_id", ASCENDING), ("session_id", ASCENDING), ("created_at", DESCENDING)], name="user_session_created"
+    )
+    await db.chat_sessions.create_index(
+        [("user_id", ASCENDING), ("session_id", ASCENDING)], unique=True, name="user_session"
+    )
+
+
+# ============================================================================
+# MEMÓRIA
+# ============================================================================
+
+class ChatMemory:
+    def __init__(self):
+        self._db = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    def start(self, db):
+        self._db = db
+
+    async def stop(self):
+        """Aguarda os resumos em andamento (evita trabalho de LLM jogado fora)"""
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def load_window(self, user_id: str, session_id: str) -> ConversationWindow:
+        session = await self._db.chat_sessions.find_one(
+            {"user_id": user_id, "session_id": session_id}, {"_id": 0, "summary": 1, "summarized_until": 1}
+        ) or {}
+        query = {"user_id": user_id, "session_id": session_id}
+        if session.get("summarized_until"):
+            query["created_at"] = {"$gt": session["summarized_until"]}
+        # Um turno a mais que a janela: basta para saber se algo ficou de fora
+        recent = await self._db.chat_history.find(
+            query, {"_id": 0, "message": 1, "response": 1, "created_at": 1}
+        ).sort("created_at", DESCENDING).limit(WINDOW_TURNS + 1).to_list(None)
+        pending = [ChatTurn(doc["message"], doc["response"], doc["created_at"]) for doc in reversed(recent)]
+
+        turns = select_window(pending)
+        summary = session.get("summary")
+        tokens = estimate_tokens(summary) + sum(_turn_tokens(turn) for turn in turns)
+        return ConversationWindow(summary, turns, tokens, overflow=len(turns) < len(pending))
+
+    async def record_turn(
+        self,
+        user_id: str,
+        session_id: str,
+        message: str,
+        response: str,
+        window: ConversationWindow,
+        **extra,
+    ):
+        """Grava o turno e agenda o resumo se a janela transbordou"""
+        await self._db.chat_history.insert_one({
+            "id": str(uuid4()),
+            "user_id": user_id,
+            "session_id": session_id,
+            "message": message,
+            "response": response,
+            "context_tokens": window.tokens,
+            **extra,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+        # Com o turno novo, a janela transborda se já estava cheia
+        turn_tokens = sum(_turn_tokens(turn) for turn in window.turns) + _turn_tokens(ChatTurn(message, response, ""))
+        if window.overflow or len(window.turns) + 1 > WINDOW_TURNS or turn_tokens > WINDOW_TOKENS:
+            self.schedule_summary(user_id, session_id)
+
+    def schedule_summary(self, user_id: str, session_id: str):
+        # Contexto limpo: sem o prazo do request (utils.deadline) nem o timeout CSOT do
+        # pymongo, que a task herdaria de /api/ai/chat e deixariam o resumo sem tempo
+        task = asyncio.get_running_loop().create_task(
+            self._summarize_safely(user_id, session_id), context=contextvars.Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _summarize_safely(self, user_id: str, session_id: str):
+        # Um resumo por sessão de cada vez, entre todos os workers
+        lock_key = f"{user_id}:{session_id}"
+        if not await shared_state.backend.add("chat_summary", lock_key, {"worker": shared_state.worker_id}, SUMMARY_LOCK_SECONDS):
+            return
+        try:
+            await self.summarize(user_id, session_id)
+        except Exception as e:
+            logger.warning(f"Falha ao resumir a sessão de chat {session_id}: {e}")
+        finally:
+            await shared_state.backend.delete("chat_summary", lock_key)
+
+    async def summarize(self, user_id: str, session_id: str) -> bool:
+        """
+        Incorpora ao resumo os turnos pendentes mais antigos, deixando fora
+        dele só metade da janela (o próximo resumo fica para daqui a ~metade da
+        janela de mensagens). Retorna False se não havia o que resumir.
+        """
+        session = await self._db.chat_sessions.find_one(
+            {"user_id": user_id, "session_id": session_id}, {"_id": 0, "summary": 1, "summarized_until": 1}
+        ) or {}
+        previous_until = session.get("summarized_until")
+        pending_query = {"user_id": user_id, "session_id": session_id}
+        if previous_until:
+            pending_query["created_at"] = {"$gt": previous_until}
+
+        recent = await self._db.chat_history.find(
+            pending_query, {"_id": 0, "message": 1, "response": 1, "created_at": 1}
+        ).sort("created_at", DESCENDING).limit(WINDOW_TURNS).to_list(None)
+        recent = [ChatTurn(doc["message"], doc["response"], doc["created_at"]) for doc in reversed(recent)]
+        keep = select_window(recent, WINDOW_TURNS // 2, WINDOW_TOKENS // 2)
+        if not keep:
+            return False
+
+        fold_query = {**pending_query, "created_at": {**pending_query.get("created_at", {}), "$lt": keep[0].created_at}}
+        docs = await self._db.chat_history.find(
+            fold_query, {"_id": 0, "message": 1, "response": 1, "created_at": 1}
+        ).sort("created_at", ASCENDING).limit(SUMMARY_BATCH_TURNS).to_list(None)
+        if not docs:
+            return False
+        turns = [ChatTurn(doc["message"], doc["response"], doc["created_at"]) for doc in docs]
+
+        summary = await self._generate_summary(session.get("summary"), turns)
+        result = await self._db.chat_sessions.update_one(
+            # Só avança se ninguém resumiu a sessão enquanto o modelo respondia
+            {"user_id": user_id, "session_id": session_id, "summarized_until": previous_until},
+            {
+                "$set": {
+                    "summary": summary,
+                    "summary_tokens": estimate_tokens(summary),
+                    "summarized_until": turns[-1].created_at,
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                },
+                "$inc": {"summarized_turns": len(turns)},
+            },
+            upsert=previous_until is None,
+        )
+        logger.info(f"Sessão de chat {session_id}: {len(turns)} turno(s) incorporados ao resumo")
+        return bool(result.matched_count or result.upserted_id)
+
+    async def _generate_summary(self, previous: Optional[str], turns: List[ChatTurn]) -> str:
+        from emergentintegrations.llm.chat import UserMessage
+
+        chat = routed_chat(
+            "chat_summary",
+            f"chat_summary_{uuid4()}",
+            SUMMARY_PROMPT.format(max_words=SUMMARY_MAX_TOKENS * 3 // 4),
+        )
+
+        lines = [f"Resumo atual:\n{previous}" if previous else "Resumo atual: (vazio)", "", "Novos turnos:"]
+        for turn in turns:
+            lines.append(f"Usuária: {turn.message}")
+            lines.append(f"LucresIA: {turn.response}")
+        summary = await chat.send_message(UserMessage(text="\n".join(lines)))
+        return _clip(str(summary).strip(), SUMMARY_MAX_TOKENS)
+
+
+chat_memory = ChatMemory()
@@ -3,9 +3,8 @@ Serviço de Verificação de Conteúdo (Fact-Checking) para NeuroVendas
 """
 import os
 from typing import Dict, Any, List
-from dotenv import load_dotenv
 
-load_dotenv()
+from services.model_router import routed_chat
 
 class ContentVerifier:
     def __init__(self):
@@ -15,7 +14,7 @@ class ContentVerifier:
     
     async def verify_content(self, content: str, content_type: str = "post") -> Dict[str, Any]:
         """Verifica a qualidade e precisão de um conteúdo"""
-        from emergentintegrations.llm.openai import LlmChat, UserMessage
+        from emergentintegrations.llm.chat import UserMessage
         
         prompt = f"""Verifique este {content_type} de estética:
 
@@ -25,10 +24,11 @@ Retorne em JSON:
 {{"score_qualidade": 0, "aprovado": true, "claims_verificados": [], "alertas": [], "sugestoes_melhoria": [], "pontos_positivos": [], "resumo": ""}}"""
 
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"verify_{hash(content)}",
-                system_message="Você é um verificador de conteúdo de estética. Responda em JSON válido."
+            chat = routed_chat(
+                "content_verify",
+                f"verify_{hash(content)}",
+                "Você é um verificador de conteúdo de estética. Responda em JSON válido.",
+                api_key=self.api_key
             )
             response = await chat.send_message(UserMessage(text=prompt))
             
@@ -105,7 +105,7 @@ Retorne em JSON:
     
     async def suggest_improvements(self, content: str) -> Dict[str, Any]:
         """Sugere melhorias para um conteúdo"""
-        from emergentintegrations.llm.openai import LlmChat, UserMessage
+        from emergentintegrations.llm.chat import UserMessage
         
         prompt = f"""Melhore este conteúdo de estética:
 
@@ -115,10 +115,11 @@ Retorne em JSON:
 {{"versao_melhorada": "", "mudancas_aplicadas": [], "gatilhos_adicionados": [], "tom_ajustado": "", "impacto_esperado": ""}}"""
 
         try:
-            chat = LlmChat(
-                api_key=self.api_key,
-                session_id=f"improve_{hash(content)}",
-                system_message="Você é um copywriter de estética. Responda em JSON válido."
+            chat = routed_chat(
+                "content_improve",
+                f"improve_{hash(content)}",
+                "Você é um copywriter de estética. Responda em JSON válido.",
+                api_key=self.api_key
             )
             response = await chat.send_message(UserMessage(text=prompt))
             
@@ -10,10 +10,12 @@ Sistema com:
 
 import json
 import os
+import time
 import uuid
 from typing import Optional, Tuple
-from emergentintegrations.llm.chat import LlmChat, UserMessage
 from schemas.ebook_schema import is_valid_structured_ebook
+from utils.deadline import DeadlineExceeded, has_time_for, record_partial
+from services.model_router import routed_chat
 from services.editorial_system import (
     get_prompt_mestre,
     get_prompt_editor_fantasma,
@@ -228,29 +230,34 @@ async def generate_structured_ebook(
     2. Valida com Editor Fantasma
     3. Se reprovado, reescreve até MAX_REWRITE_ATTEMPTS
     4. Retorna resultado aprovado ou melhor tentativa
+
+    Reescritas só começam se couberem no prazo do request (estimativa: duração
+    da última chamada); sem tempo, retorna a melhor tentativa com aviso.
+    `drafts` traz todas as versões interpretadas, na ordem em que foram geradas
+    (o endpoint as registra no histórico de revisões).
     """
+    from emergentintegrations.llm.chat import UserMessage
     
     session_id = f"ebook_{uuid.uuid4()}"
     
     system_prompt = get_structured_ebook_system_prompt()
     user_prompt = get_structured_ebook_user_prompt(topic, audience, goal, tone, author)
     
-    # Configurar chat
-    chat = LlmChat(
-        api_key=EMERGENT_LLM_KEY,
-        session_id=session_id,
-        system_message=system_prompt
-    ).with_model("openai", "gpt-4o")
+    # Configurar chat (modelo pela rota da tarefa, ver services.model_router)
+    chat = routed_chat("ebook_structured", session_id, system_prompt, api_key=EMERGENT_LLM_KEY)
     
     # Primeira geração
     user_message = UserMessage(text=user_prompt)
+    started = time.monotonic()
     response = await chat.send_message(user_message)
+    last_call_seconds = time.monotonic() - started
     
     if not response:
         raise ValueError("LLM retornou resposta vazia")
     
     # Processar resposta
     parsed_ebook = _parse_llm_response(response)
+    drafts = [parsed_ebook]
     
     # Validar com Editor Fantasma
     relatorio_qa = gerar_relatorio_qa(parsed_ebook)
@@ -261,24 +268,39 @@ async def generate_structured_ebook(
             "structured_ebook": parsed_ebook,
             "qa_report": relatorio_qa,
             "attempts": 1,
-            "raw_content": response
+            "raw_content": response,
+            "drafts": drafts
         }
     
     # Se reprovado, tenta reescrever
     melhor_ebook = parsed_ebook
     melhor_relatorio = relatorio_qa
+    attempts = 1
+    deadline_reached = False
     
     for attempt in range(MAX_REWRITE_ATTEMPTS):
+        if not has_time_for(last_call_seconds):
+            deadline_reached = True
+            break
+        
         rewrite_prompt = get_rewrite_prompt(relatorio_qa["problemas"], parsed_ebook)
         rewrite_message = UserMessage(text=rewrite_prompt)
         
-        response = await chat.send_message(rewrite_message)
+        started = time.monotonic()
+        try:
+            response = await chat.send_message(rewrite_message)
+        except DeadlineExceeded:
+            deadline_reached = True
+            break
+        last_call_seconds = time.monotonic() - started
+        attempts += 1
         
         if not response:
             continue
         
         try:
             parsed_ebook = _parse_llm_response(response)
+            drafts.append(parsed_ebook)
             relatorio_qa = gerar_relatorio_qa(parsed_ebook)
             
             # Atualiza melhor versão
@@ -291,19 +313,26 @@ async def generate_structured_ebook(
                     "structured_ebook": parsed_ebook,
                     "qa_report": relatorio_qa,
                     "attempts": attempt + 2,
-                    "raw_content": response
+                    "raw_content": response,
+                    "drafts": drafts
                 }
         except Exception:
             continue
     
     # Retorna melhor tentativa mesmo se não aprovado completamente
-    return {
+    result = {
         "structured_ebook": melhor_ebook,
         "qa_report": melhor_relatorio,
-        "attempts": MAX_REWRITE_ATTEMPTS + 1,
+        "attempts": attempts,
         "raw_content": response,
+        "drafts": drafts,
         "warning": "E-book gerado com avisos de qualidade. Revise manualmente."
     }
+    if deadline_reached:
+        record_partial("ebook_rewrite")
+        result["deadline_reached"] = True
+        result["warning"] = "Tempo limite atingido antes de concluir as revisões de qualidade. Revise manualmente."
+    return result
 
 
 def _parse_llm_response(response: str) -> dict:
@@ -329,12 +358,9 @@ def _parse_llm_response(response: str) -> dict:
     return parsed_data
 
 
-def structured_ebook_to_readable_text(ebook: dict) -> str:
-    """Converte StructuredEbook para texto legível (Markdown)"""
+def readable_header(meta: dict) -> str:
+    """Cabeçalho (meta) do texto legível"""
     lines = []
-    
-    # Meta
-    meta = ebook.get("meta", {})
     lines.append(f"# {meta.get('title', '')}")
     if meta.get("subtitle"):
         lines.append(f"## {meta['subtitle']}")
@@ -345,39 +371,54 @@ def structured_ebook_to_readable_text(ebook: dict) -> str:
     lines.append("")
     lines.append("---")
     lines.append("")
-    
-    # Sections
-    for section in ebook.get("sections", []):
-        if section.get("type") == "hero":
-            lines.append(f"# {section.get('title', '')}")
-            if section.get("subtitle"):
-                lines.append(f"### {section['subtitle']}")
-            lines.append("")
-        elif section.get("type") == "section":
-            lines.append(f"## {section.get('title', '')}")
-            lines.append("")
-            
-            for block in section.get("blocks", []):
-                if block.get("type") == "paragraph":
-                    lines.append(block.get("text", ""))
-                    lines.append("")
-                elif block.get("type") == "bullet_list":
-                    for item in block.get("items", []):
-                        lines.append(f"• {item}")
-                    lines.append("")
-                elif block.get("type") == "callout":
-                    style_emoji = {
-                        "highlight": "💡",
-                        "tip": "✅",
-                        "warning": "⚠️"
-                    }.get(block.get("style", "highlight"), "💡")
-                    lines.append(f"> {style_emoji} **{block.get('text', '')}**")
-                    lines.append("")
-            
-            lines.append("---")
-            lines.append("")
-        elif section.get("type") == "image":
-            lines.append(f"*[Imagem: {section.get('prompt', '')}]*")
-            lines.append("")
-    
     return "\n".join(lines)
+
+
+def readable_section(section: dict) -> str:
+    """Texto legível de uma seção (permite atualizar só as seções alteradas)"""
+    lines = []
+    if section.get("type") == "hero":
+        lines.append(f"# {section.get('title', '')}")
+        if section.get("subtitle"):
+            lines.append(f"### {section['subtitle']}")
+        lines.append("")
+    elif section.get("type") == "section":
+        lines.append(f"## {section.get('title', '')}")
+        lines.append("")
+        
+        for block in section.get("blocks", []):
+            if block.get("type") == "paragraph":
+                lines.append(block.get("text", ""))
+                lines.append("")
+            elif block.get("type") == "bullet_list":
+                for item in block.get("items", []):
+                    lines.append(f"• {item}")
+                lines.append("")
+            elif block.get("type") == "callout":
+                style_emoji = {
+                    "highlight": "💡",
+                    "tip": "✅",
+                    "warning": "⚠️"
+                }.get(block.get("style", "highlight"), "💡")
+                lines.append(f"> {style_emoji} **{block.get('text', '')}**")
+                lines.append("")
+        
+        lines.append("---")
+        lines.append("")
+    elif section.get("type") == "image":
+        lines.append(f"*[Imagem: {section.get('prompt', '')}]*")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def join_readable(header: str, sections: list) -> str:
+    """Monta o texto legível completo a partir das partes já renderizadas"""
+    return "\n".join(part for part in [header, *sections] if part)
+
+
+def structured_ebook_to_readable_text(ebook: dict) -> str:
+    """Converte StructuredEbook para texto legível (Markdown)"""
+    return join_readable(
+        readable_header(ebook.get("meta", {})),
+        [readable_section(section) for section in ebook.get("sections", [])],
+    )
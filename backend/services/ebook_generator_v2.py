@@ -6,115 +6,12 @@ Sem dependência de APIs externas (Gamma)
 
 import os
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any
 from datetime import datetime
-from fpdf import FPDF
 import json
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-
-class ElevareEbookPDF(FPDF):
-    """Classe customizada para criar PDFs premium Elevare"""
-    
-    def __init__(self, title: str, author: str = "Elevare NeuroVendas"):
-        super().__init__()
-        self.title_text = title
-        self.author_text = author
-        self.chapter_title = ""
-        # Adicionar fonte Unicode para suportar caracteres especiais
-        self.add_font('DejaVu', '', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf')
-        self.add_font('DejaVu', 'B', '/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf')
-        
-    def header(self):
-        """Header personalizado"""
-        if self.page_no() > 1:  # Não mostrar header na capa
-            self.set_font('DejaVu', '', 8)
-            self.set_text_color(128, 122, 168)  # Lavanda Elevare
-            self.cell(0, 10, self.title_text, 0, 0, 'L')
-            self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'R')
-            self.ln(15)
-    
-    def footer(self):
-        """Footer personalizado"""
-        if self.page_no() > 1:  # Não mostrar footer na capa
-            self.set_y(-15)
-            self.set_font('DejaVu', '', 8)
-            self.set_text_color(128, 122, 168)
-            self.cell(0, 10, 'Elevare NeuroVendas - www.elevare.com.br', 0, 0, 'C')
-    
-    def chapter_cover(self, title: str, subtitle: str = ""):
-        """Capa do e-book"""
-        self.add_page()
-        
-        # Fundo colorido (simulado com retângulo)
-        self.set_fill_color(138, 124, 168)  # Lavanda Elevare
-        self.rect(0, 0, 210, 297, 'F')
-        
-        # Título principal
-        self.set_y(100)
-        self.set_font('DejaVu', 'B', 32)
-        self.set_text_color(255, 255, 255)
-        self.multi_cell(0, 15, title, 0, 'C')
-        
-        # Subtítulo
-        if subtitle:
-            self.ln(10)
-            self.set_font('DejaVu', '', 16)
-            self.multi_cell(0, 10, subtitle, 0, 'C')
-        
-        # Logo/Autor
-        self.set_y(250)
-        self.set_font('DejaVu', 'B', 14)
-        self.cell(0, 10, 'Elevare NeuroVendas', 0, 0, 'C')
-        
-        self.set_y(265)
-        self.set_font('DejaVu', '', 10)
-        self.cell(0, 10, 'Inteligencia Artificial para Profissionais de Estetica', 0, 0, 'C')
-    
-    def add_chapter_title(self, num: int, title: str):
-        """Adiciona título de capítulo"""
-        self.add_page()
-        self.set_font('DejaVu', 'B', 20)
-        self.set_text_color(138, 124, 168)  # Lavanda Elevare
-        chapter_text = f'Capitulo {num}'
-        self.cell(0, 10, chapter_text, 0, 1, 'L')
-        
-        self.set_font('DejaVu', 'B', 16)
-        self.set_text_color(52, 73, 94)  # Petróleo Elevare
-        self.multi_cell(0, 10, title)
-        self.ln(5)
-    
-    def add_body_text(self, text: str):
-        """Adiciona texto do corpo"""
-        self.set_font('DejaVu', '', 11)
-        self.set_text_color(52, 73, 94)  # Petróleo Elevare
-        
-        # Processar parágrafos
-        paragraphs = text.split('\n\n')
-        for para in paragraphs:
-            if para.strip():
-                self.multi_cell(0, 6, para.strip())
-                self.ln(3)
-    
-    def add_bullet_list(self, items: List[str]):
-        """Adiciona lista com bullets"""
-        self.set_font('DejaVu', '', 11)
-        self.set_text_color(52, 73, 94)
-        
-        for item in items:
-            self.cell(10, 6, '-', 0, 0)  # Usar traço ao invés de bullet unicode
-            self.multi_cell(0, 6, item.strip())
-            self.ln(1)
-    
-    def add_call_to_action(self, cta_text: str):
-        """Adiciona CTA destacado"""
-        self.ln(10)
-        self.set_fill_color(212, 175, 55)  # Dourado Elevare
-        self.set_font('DejaVu', 'B', 12)
-        self.set_text_color(255, 255, 255)
-        
-        self.cell(0, 12, cta_text, 0, 1, 'C', True)
-        self.ln(5)
-
+from services.ebook_layout import v2_data_to_structured
+from services.model_router import routed_chat
+from services.render_pipeline import render_ebook
 
 class EbookGeneratorV2:
     """Gerador de E-books usando GPT-4o diretamente"""
@@ -153,6 +50,7 @@ class EbookGeneratorV2:
                 "final_cta": str
             }
         """
+        from emergentintegrations.llm.chat import UserMessage
         
         prompt = f"""Você é um especialista em criar e-books estratégicos para profissionais de estética.
 
@@ -200,13 +98,14 @@ REQUISITOS DE CONTEÚDO:
 
 IMPORTANTE: Retorne APENAS o JSON, sem texto adicional antes ou depois."""
 
-        # Usar LlmChat com GPT-4o
+        # Modelo pela rota da tarefa (services.model_router)
         session_id = f"ebook_gen_{datetime.now().timestamp()}"
-        llm = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message="Você é um especialista em criar e-books estratégicos premium."
-        ).with_model("openai", "gpt-4o")
+        llm = routed_chat(
+            "ebook",
+            session_id,
+            "Você é um especialista em criar e-books estratégicos premium.",
+            api_key=self.api_key
+        )
         
         # Gerar conteúdo
         response = await llm.send_message(UserMessage(text=prompt))
@@ -228,84 +127,12 @@ IMPORTANTE: Retorne APENAS o JSON, sem texto adicional antes ou depois."""
         Returns:
             Caminho do arquivo PDF gerado
         """
-        pdf = ElevareEbookPDF(
-            title=ebook_data["title"],
-            author="Elevare NeuroVendas"
-        )
-        
-        # Capa
-        pdf.chapter_cover(
-            title=ebook_data["title"],
-            subtitle=ebook_data.get("subtitle", "")
-        )
-        
-        # Página de introdução
-        pdf.add_page()
-        pdf.set_font('DejaVu', 'B', 16)
-        pdf.set_text_color(138, 124, 168)
-        pdf.cell(0, 10, 'Introducao', 0, 1, 'L')
-        pdf.ln(5)
-        pdf.add_body_text(ebook_data["introduction"])
-        
-        # Capítulos
-        for chapter in ebook_data["chapters"]:
-            pdf.add_chapter_title(chapter["number"], chapter["title"])
-            pdf.add_body_text(chapter["content"])
-            
-            # Pontos-chave
-            if chapter.get("key_points"):
-                pdf.ln(5)
-                pdf.set_font('DejaVu', 'B', 12)
-                pdf.set_text_color(138, 124, 168)
-                pdf.cell(0, 10, 'Pontos-Chave:', 0, 1, 'L')
-                pdf.add_bullet_list(chapter["key_points"])
-            
-            # CTA do capítulo
-            if chapter.get("cta"):
-                pdf.add_call_to_action(chapter["cta"])
-        
-        # Conclusão
-        pdf.add_page()
-        pdf.set_font('DejaVu', 'B', 16)
-        pdf.set_text_color(138, 124, 168)
-        pdf.cell(0, 10, 'Conclusao', 0, 1, 'L')
-        pdf.ln(5)
-        pdf.add_body_text(ebook_data["conclusion"])
-        
-        # CTA Final
-        pdf.ln(10)
-        pdf.add_call_to_action(ebook_data["final_cta"])
-        
-        # Página de encerramento
-        pdf.add_page()
-        pdf.set_y(100)
-        pdf.set_font('DejaVu', 'B', 20)
-        pdf.set_text_color(138, 124, 168)
-        pdf.cell(0, 10, 'Parabens por Concluir Este E-book!', 0, 1, 'C')
-        
-        pdf.ln(10)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.set_text_color(52, 73, 94)
-        pdf.multi_cell(0, 8, 'Este material foi criado especialmente para voce pela Elevare NeuroVendas, a plataforma de IA para profissionais de estetica que querem atrair mais clientes e vender mais.')
-        
-        pdf.ln(10)
-        pdf.set_font('DejaVu', 'B', 14)
-        pdf.set_text_color(138, 124, 168)
-        pdf.cell(0, 10, 'Proximos Passos:', 0, 1, 'C')
-        
-        pdf.ln(5)
-        pdf.set_font('DejaVu', '', 11)
-        pdf.set_text_color(52, 73, 94)
-        next_steps = [
-            "Aplique os aprendizados deste e-book no seu negocio",
-            "Acesse mais recursos e ferramentas na plataforma Elevare",
-            "Crie conteudo estrategico com nossa IA especializada",
-            "Junte-se a comunidade de profissionais de sucesso"
-        ]
-        pdf.add_bullet_list(next_steps)
+        # Mesmo pipeline dos demais e-books (layout → PDF), com o template da marca
+        structured = v2_data_to_structured(ebook_data)
+        rendered = render_ebook(structured, "elevare-v2", "pdf")
         
-        # Salvar PDF
-        pdf.output(output_path)
+        with open(output_path, "wb") as f:
+            f.write(rendered.content)
         
         return output_path
     
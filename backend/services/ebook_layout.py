@@ -0,0 +1,229 @@
+"""
+Representação de Layout para E-books
+
+Camada intermediária entre o documento estruturado (schemas/ebook_schema)
+e os backends de renderização (HTML, PDF, EPUB).
+
+Fluxo: StructuredEbook → EbookLayout (montado uma vez) → backend
+
+Os outros formatos de e-book do sistema (V2 e Elevare E-books) são
+convertidos para StructuredEbook antes de entrar no pipeline.
+"""
+
+import hashlib
+import json
+import re
+from typing import List, NamedTuple, Optional, Tuple
+
+from schemas.ebook_schema import StructuredEbook
+
+# ============================================================================
+# LAYOUT
+# ============================================================================
+
+class LayoutBlock(NamedTuple):
+    kind: str                      # paragraph | bullet_list | callout
+    text: str = ""
+    items: Tuple[str, ...] = ()
+    style: str = ""                # estilo do callout
+
+
+class LayoutSection(NamedTuple):
+    kind: str                      # chapter | image
+    title: str = ""
+    subtitle: str = ""
+    number: Optional[int] = None
+    blocks: Tuple[LayoutBlock, ...] = ()
+    note: str = ""                 # referência/fonte do capítulo
+    image_prompt: str = ""
+    image_style: str = ""
+    image_url: str = ""
+
+
+class EbookLayout(NamedTuple):
+    content_hash: str
+    title: str
+    subtitle: str
+    author: str
+    audience: str
+    tone: str
+    sections: Tuple[LayoutSection, ...]
+
+    @property
+    def chapters(self) -> Tuple[LayoutSection, ...]:
+        return tuple(s for s in self.sections if s.kind == "chapter")
+
+
+_HTML_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def _clean(text) -> str:
+    """Remove tags HTML e espaços extras (feito uma vez, vale para todos os backends)"""
+    if not text:
+        return ""
+    return _HTML_TAG_RE.sub('', str(text)).strip()
+
+
+def content_hash(structured: dict) -> str:
+    """Hash estável do conteúdo estruturado (chave do cache de renderização)"""
+    canonical = json.dumps(structured, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _build_block(block: dict) -> Optional[LayoutBlock]:
+    block_type = block.get("type")
+    if block_type == "paragraph":
+        return LayoutBlock("paragraph", text=_clean(block.get("text")))
+    if block_type == "bullet_list":
+        return LayoutBlock("bullet_list", items=tuple(_clean(item) for item in block.get("items", [])))
+    if block_type == "callout":
+        return LayoutBlock("callout", text=_clean(block.get("text")), style=block.get("style") or "highlight")
+    return None
+
+
+def build_layout(structured: dict, digest: Optional[str] = None) -> EbookLayout:
+    """Monta o layout a partir de um documento StructuredEbook"""
+    ebook = StructuredEbook(**structured)
+    meta = ebook.meta
+
+    title = _clean(meta.title)
+    subtitle = _clean(meta.subtitle)
+    sections: List[LayoutSection] = []
+
+    for section in ebook.sections:
+        section_type = section.get("type")
+        if section_type == "hero":
+            # Hero vira capa; mantém o título/subtítulo do hero se a meta não tiver
+            title = title or _clean(section.get("title"))
+            subtitle = subtitle or _clean(section.get("subtitle"))
+        elif section_type == "section":
+            blocks = tuple(b for b in (_build_block(block) for block in section.get("blocks", [])) if b)
+            sections.append(LayoutSection(
+                "chapter",
+                title=_clean(section.get("title")),
+                subtitle=_clean(section.get("subtitle")),
+                number=section.get("number"),
+                blocks=blocks,
+                note=_clean(section.get("source")),
+            ))
+        elif section_type == "image":
+            sections.append(LayoutSection(
+                "image",
+                image_prompt=_clean(section.get("prompt")),
+                image_style=section.get("style") or "inline",
+                image_url=section.get("url") or "",
+            ))
+
+    return EbookLayout(
+        content_hash=digest or content_hash(structured),
+        title=title or "E-book",
+        subtitle=subtitle,
+        author=_clean(meta.author),
+        audience=_clean(meta.audience),
+        tone=meta.tone.value,
+        sections=tuple(sections),
+    )
+
+
+# ============================================================================
+# CONVERSORES (outros formatos → StructuredEbook)
+# ============================================================================
+
+def _paragraph_blocks(text: str) -> List[dict]:
+    return [
+        {"type": "paragraph", "text": para.strip()}
+        for para in (text or "").split("\n\n")
+        if para.strip()
+    ]
+
+
+V2_CLOSING_TEXT = (
+    "Este material foi criado especialmente para você pela Elevare NeuroVendas, a plataforma de IA "
+    "para profissionais de estética que querem atrair mais clientes e vender mais."
+)
+V2_NEXT_STEPS = [
+    "Aplique os aprendizados deste e-book no seu negócio",
+    "Acesse mais recursos e ferramentas na plataforma Elevare",
+    "Crie conteúdo estratégico com nossa IA especializada",
+    "Junte-se à comunidade de profissionais de sucesso",
+]
+
+
+def v2_data_to_structured(ebook_data: dict, author: str = "Elevare NeuroVendas", audience: str = "") -> dict:
+    """Converte ebook_data do EbookGeneratorV2 (introduction/chapters/conclusion)"""
+    sections = [{"type": "hero", "title": ebook_data.get("title", ""), "subtitle": ebook_data.get("subtitle", "")}]
+
+    if ebook_data.get("introduction"):
+        sections.append({"type": "section", "title": "Introdução", "blocks": _paragraph_blocks(ebook_data["introduction"])})
+
+    for chapter in ebook_data.get("chapters", []):
+        blocks = _paragraph_blocks(chapter.get("content", ""))
+        if chapter.get("key_points"):
+            blocks.append({"type": "paragraph", "text": "Pontos-Chave:"})
+            blocks.append({"type": "bullet_list", "items": chapter["key_points"]})
+        if chapter.get("cta"):
+            blocks.append({"type": "callout", "style": "highlight", "text": chapter["cta"]})
+        sections.append({
+            "type": "section",
+            "number": chapter.get("number"),
+            "title": chapter.get("title", ""),
+            "blocks": blocks,
+        })
+
+    closing = _paragraph_blocks(ebook_data.get("conclusion", ""))
+    if ebook_data.get("final_cta"):
+        closing.append({"type": "callout", "style": "highlight", "text": ebook_data["final_cta"]})
+    if closing:
+        sections.append({"type": "section", "title": "Conclusão", "blocks": closing})
+
+    sections.append({"type": "section", "title": "Parabéns por Concluir Este E-book!", "blocks": [
+        {"type": "paragraph", "text": V2_CLOSING_TEXT},
+        {"type": "paragraph", "text": "Próximos Passos:"},
+        {"type": "bullet_list", "items": V2_NEXT_STEPS},
+    ]})
+
+    return {
+        "meta": {
+            "title": ebook_data.get("title", "E-book"),
+            "subtitle": ebook_data.get("subtitle"),
+            "author": author,
+            "tone": "educational",
+            "audience": audience or "Profissionais de estética",
+            "goal": ebook_data.get("title", ""),
+        },
+        "sections": sections,
+    }
+
+
+def new_ebook_to_structured(ebook: dict) -> dict:
+    """Converte um documento de ebooks_new (Elevare E-books)"""
+    sections = [{"type": "hero", "title": ebook.get("title", ""), "subtitle": ebook.get("subtitle", "")}]
+
+    if ebook.get("introduction"):
+        sections.append({"type": "section", "title": "Introdução", "blocks": _paragraph_blocks(ebook["introduction"])})
+
+    for chapter in ebook.get("chapters", []):
+        sections.append({
+            "type": "section",
+            "number": chapter.get("chapter_number"),
+            "title": chapter.get("title", ""),
+            "source": chapter.get("source", ""),
+            "blocks": _paragraph_blocks(chapter.get("content", "")),
+        })
+
+    if ebook.get("conclusion"):
+        sections.append({"type": "section", "title": "Conclusão", "blocks": _paragraph_blocks(ebook["conclusion"])})
+    if ebook.get("next_step"):
+        sections.append({"type": "section", "title": "Próximos Passos", "blocks": _paragraph_blocks(ebook["next_step"])})
+
+    return {
+        "meta": {
+            "title": ebook.get("title") or "E-book",
+            "subtitle": ebook.get("subtitle"),
+            "author": ebook.get("professional_name") or "Plataforma Elevare",
+            "tone": "educational",
+            "audience": ebook.get("specialty") or "",
+            "goal": ebook.get("objective") or "",
+        },
+        "sections": sections,
+    }
@@ -0,0 +1,133 @@
+"""
+Atualização Parcial de E-books Estruturados (JSON Patch)
+
+Operações no estilo RFC 6902 limitadas a meta, seções e blocos:
+
+    {"op": "replace", "path": "/sections/3/blocks/2/text", "value": "..."}
+    {"op": "add",     "path": "/sections/3/blocks/-",      "value": {...}}
+    {"op": "remove",  "path": "/sections/5"}
+    {"op": "replace", "path": "/meta/title",               "value": "..."}
+
+A escrita é um $set apenas nas seções alteradas (structured_content.sections.N)
+e no texto legível dessas seções (readable_sections.N). Inserir/remover seções
+reescreve o array de seções, mas o texto legível das seções inalteradas é
+reaproveitado. Concorrência otimista pelo campo `version`.
+"""
+
+import copy
+import json
+from typing import Any, Dict, List, NamedTuple
+
+from schemas.ebook_schema import is_valid_structured_ebook
+from services.ebook_generator import join_readable, readable_header, readable_section
+from utils.json_patch import JsonPatchError, apply_operation, parse_path
+
+MAX_OPERATIONS = 200
+
+
+class PatchError(JsonPatchError):
+    """Operação inválida (caminho inexistente, op desconhecida, resultado fora do schema)"""
+
+
+class PatchResult(NamedTuple):
+    set_fields: Dict[str, Any]      # campos para o $set (já com prefixos do documento)
+    structured_content: dict
+    changed_sections: List[int]
+
+
+def _check_scope(operation: dict):
+    """Patches de e-book só mexem em meta (replace) e em seções/blocos"""
+    tokens = parse_path(operation.get("path", ""))
+    if tokens[0] not in ("meta", "sections") or (tokens[0] == "meta" and operation.get("op") != "replace"):
+        raise PatchError(f"Caminho não permitido: {operation.get('path')}")
+
+
+def _section_key(section: dict) -> str:
+    return json.dumps(section, sort_keys=True, ensure_ascii=False)
+
+
+def apply_patch(ebook: dict, operations: List[dict]) -> PatchResult:
+    """
+    Aplica as operações ao documento carregado (structured_content + readable_*)
+    e calcula o $set mínimo.
+
+    Raises:
+        PatchError: operação inválida ou resultado fora do schema
+    """
+    if not operations:
+        raise PatchError("Nenhuma operação enviada")
+    if len(operations) > MAX_OPERATIONS:
+        raise PatchError(f"Máximo de {MAX_OPERATIONS} operações por patch")
+
+    original = ebook.get("structured_content") or {}
+    patched = copy.deepcopy(original)
+    try:
+        for operation in operations:
+            _check_scope(operation)
+            apply_operation(patched, operation)
+    except JsonPatchError as e:
+        raise PatchError(str(e)) from e
+
+    if not is_valid_structured_ebook(patched):
+        raise PatchError("Conteúdo estruturado inválido após o patch")
+
+    old_sections = original.get("sections", [])
+    new_sections = patched.get("sections", [])
+    old_readable = ebook.get("readable_sections")
+    if not isinstance(old_readable, list) or len(old_readable) != len(old_sections):
+        old_readable = None  # documento anterior ao texto por seção: recalcula tudo
+
+    set_fields: Dict[str, Any] = {}
+    header = ebook.get("readable_header")
+    if patched.get("meta") != original.get("meta") or header is None:
+        header = readable_header(patched.get("meta", {}))
+        set_fields["structured_content.meta"] = patched.get("meta")
+        set_fields["readable_header"] = header
+
+    changed: List[int] = []
+    if old_readable is not None and len(new_sections) == len(old_sections):
+        # Mesma estrutura: $set só nas posições alteradas
+        readable = list(old_readable)
+        for i, (old, new) in enumerate(zip(old_sections, new_sections)):
+            if old != new:
+                readable[i] = readable_section(new)
+                set_fields[f"structured_content.sections.{i}"] = new
+                set_fields[f"readable_sections.{i}"] = readable[i]
+                changed.append(i)
+    else:
+        # Seções inseridas/removidas: reescreve o array, reaproveitando o texto das inalteradas
+        previous = {}
+        if old_readable is not None:
+            previous = {_section_key(s): text for s, text in zip(old_sections, old_readable)}
+        readable = []
+        for i, section in enumerate(new_sections):
+            text = previous.get(_section_key(section))
+            if text is None:
+                text = readable_section(section)
+                changed.append(i)
+            readable.append(text)
+        set_fields["structured_content.sections"] = new_sections
+        set_fields["readable_sections"] = readable
+
+    if set_fields:
+        set_fields["readable_content"] = join_readable(header, readable)
+
+    return PatchResult(set_fields, patched, changed)
+
+
+def readable_fields(structured: dict) -> dict:
+    """Campos de texto legível para gravar junto com um structured_content completo"""
+    header = readable_header(structured.get("meta", {}))
+    sections = [readable_section(section) for section in structured.get("sections", [])]
+    return {
+        "readable_header": header,
+        "readable_sections": sections,
+        "readable_content": join_readable(header, sections),
+    }
+
+
+def version_filter(version: int) -> dict:
+    """Filtro de concorrência otimista (documentos antigos sem `version` contam como 0)"""
+    if version == 0:
+        return {"$or": [{"version": 0}, {"version": {"$exists": False}}]}
+    return {"version": version}
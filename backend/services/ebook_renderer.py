@@ -1,13 +1,15 @@
 """
 Motor de Layout para E-books
 
-Converte documento estruturado (JSON) em HTML estilizado
+Converte o layout do e-book (services.ebook_layout) em HTML estilizado
 Suporta 3 templates: Educational, Marketing, Storytelling
 """
 
 from typing import Literal
 import html
 
+from services.ebook_layout import EbookLayout, LayoutBlock, LayoutSection, build_layout
+
 TemplateType = Literal["educational", "marketing", "storytelling"]
 
 # ============================================================================
@@ -404,58 +406,59 @@ def escape_html(text: str) -> str:
     return html.escape(text)
 
 
-def render_block(block: dict) -> str:
+def render_block(block: LayoutBlock) -> str:
     """Renderiza um bloco de conteúdo"""
-    block_type = block.get("type")
-    
-    if block_type == "paragraph":
-        return f'<p>{escape_html(block.get("text", ""))}</p>'
+    if block.kind == "paragraph":
+        return f'<p>{escape_html(block.text)}</p>'
     
-    if block_type == "bullet_list":
-        items_html = "\n".join([f'  <li>{escape_html(item)}</li>' for item in block.get("items", [])])
+    if block.kind == "bullet_list":
+        items_html = "\n".join([f'  <li>{escape_html(item)}</li>' for item in block.items])
         return f'<ul>\n{items_html}\n</ul>'
     
-    if block_type == "callout":
-        style = block.get("style", "highlight")
-        return f'''<div class="callout callout-{style}">
-  <p style="margin: 0;">{escape_html(block.get("text", ""))}</p>
+    if block.kind == "callout":
+        return f'''<div class="callout callout-{escape_html(block.style)}">
+  <p style="margin: 0;">{escape_html(block.text)}</p>
 </div>'''
     
     return ""
 
 
-def render_section(section: dict) -> str:
-    """Renderiza uma seção"""
-    section_type = section.get("type")
-    
-    if section_type == "hero":
-        subtitle = f'<div class="hero-subtitle">{escape_html(section.get("subtitle", ""))}</div>' if section.get("subtitle") else ""
-        return f'''
+def render_hero(layout: EbookLayout) -> str:
+    """Renderiza a capa (hero)"""
+    subtitle = f'<div class="hero-subtitle">{escape_html(layout.subtitle)}</div>' if layout.subtitle else ""
+    return f'''
 <div class="hero">
-  <h1>{escape_html(section.get("title", ""))}</h1>
+  <h1>{escape_html(layout.title)}</h1>
   {subtitle}
 </div>'''
-    
-    if section_type == "section":
-        blocks_html = "\n".join([render_block(block) for block in section.get("blocks", [])])
+
+
+def render_section(section: LayoutSection) -> str:
+    """Renderiza uma seção"""
+    if section.kind == "chapter":
+        blocks_html = "\n".join([render_block(block) for block in section.blocks])
+        subtitle = f'<h3>{escape_html(section.subtitle)}</h3>' if section.subtitle else ""
+        note = f'<p class="source"><em>Referência: {escape_html(section.note)}</em></p>' if section.note else ""
         return f'''
 <section>
-  <h2>{escape_html(section.get("title", ""))}</h2>
+  <h2>{escape_html(section.title)}</h2>
+  {subtitle}
   {blocks_html}
+  {note}
 </section>'''
     
-    if section_type == "image":
-        style_class = "image-full" if section.get("style") == "full" else "image-inline"
-        if section.get("url"):
+    if section.kind == "image":
+        style_class = "image-full" if section.image_style == "full" else "image-inline"
+        if section.image_url:
             return f'''
 <div class="image-container">
-  <img src="{escape_html(section.get('url', ''))}" alt="{escape_html(section.get('prompt', ''))}" class="{style_class}" />
+  <img src="{escape_html(section.image_url)}" alt="{escape_html(section.image_prompt)}" class="{style_class}" />
 </div>'''
         else:
             return f'''
 <div class="image-container">
   <div style="padding: 20mm; background: #f1f5f9; border: 2px dashed #cbd5e1; text-align: center; color: #64748b;">
-    <p>Imagem: {escape_html(section.get("prompt", ""))}</p>
+    <p>Imagem: {escape_html(section.image_prompt)}</p>
     <p style="font-size: 9pt; margin-top: 5mm;">(Será gerada automaticamente)</p>
   </div>
 </div>'''
@@ -467,14 +470,17 @@ def render_section(section: dict) -> str:
 # RENDERER
 # ============================================================================
 
-def render_structured_ebook(ebook: dict, template: TemplateType) -> str:
-    """Converte documento estruturado em HTML estilizado"""
-    template_config = TEMPLATES.get(template, TEMPLATES["educational"])
+def resolve_template(template: str) -> str:
+    """Nome efetivo do template HTML (fallback: educational)"""
+    return template if template in TEMPLATES else "educational"
+
+
+def render_layout_html(layout: EbookLayout, template: TemplateType) -> str:
+    """Converte o layout do e-book em HTML estilizado"""
+    template_config = TEMPLATES[resolve_template(template)]
     
     html_parts = []
-    
-    meta = ebook.get("meta", {})
-    title = escape_html(meta.get("title", "E-book"))
+    title = escape_html(layout.title)
     
     # HTML Header
     html_parts.append(f'''<!DOCTYPE html>
@@ -492,8 +498,8 @@ def render_structured_ebook(ebook: dict, template: TemplateType) -> str:
 </head>
 <body>''')
     
-    # Render sections
-    for section in ebook.get("sections", []):
+    html_parts.append(render_hero(layout))
+    for section in layout.sections:
         html_parts.append(render_section(section))
     
     # HTML Footer
@@ -503,6 +509,11 @@ def render_structured_ebook(ebook: dict, template: TemplateType) -> str:
     return "\n".join(html_parts)
 
 
+def render_structured_ebook(ebook: dict, template: TemplateType) -> str:
+    """Converte documento estruturado em HTML estilizado"""
+    return render_layout_html(build_layout(ebook), template)
+
+
 def get_available_templates() -> list:
     """Retorna lista de templates disponíveis"""
     return [
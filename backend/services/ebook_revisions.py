@@ -0,0 +1,271 @@
+"""
+Histórico de Revisões de E-books (snapshots + deltas)
+
+Cada gravação de e-book gera uma revisão em `ebook_revisions`:
+
+- snapshot: conteúdo completo (versão 1, a cada SNAPSHOT_INTERVAL versões,
+  quando a cadeia anterior está incompleta ou quando o delta ficaria grande)
+- delta: operações JSON Patch (utils.json_patch) em relação à versão anterior
+
+Uma versão qualquer é reconstruída a partir do snapshot anterior mais próximo
+(ou de uma versão já materializada no LRU do worker) aplicando os deltas em
+ordem. A coleta de lixo converte a revisão mais antiga mantida em snapshot e
+apaga o que ficou antes dela (retenção por idade e por quantidade). Versões
+removidas saem do LRU de todos os workers (utils.shared_state).
+"""
+
+import copy
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+
+from utils.json_patch import apply_operations, diff
+from utils.shared_state import shared_state
+
+logger = logging.getLogger("elevare.ebook_revisions")
+
+SNAPSHOT_INTERVAL = int(os.environ.get("EBOOK_SNAPSHOT_INTERVAL", "20"))
+RETENTION_DAYS = int(os.environ.get("EBOOK_REVISION_RETENTION_DAYS", "90"))
+MAX_REVISIONS = int(os.environ.get("EBOOK_MAX_REVISIONS", "200"))
+# Delta maior que essa fração do conteúdo completo vira snapshot
+MAX_DELTA_RATIO = 0.5
+LIST_LIMIT = 100
+
+# Campos do e-book novo (ebooks_new) versionados
+NEW_EBOOK_FIELDS = ("title", "subtitle", "introduction", "chapters", "conclusion", "next_step")
+
+
+class RevisionNotFoundError(LookupError):
+    """Versão inexistente ou já removida pela retenção"""
+
+
+def new_ebook_content(ebook: dict) -> dict:
+    """Conteúdo versionado de um documento de ebooks_new"""
+    return {field: ebook.get(field) for field in NEW_EBOOK_FIELDS}
+
+
+# ============================================================================
+# CACHE DE VERSÕES MATERIALIZADAS
+# ============================================================================
+
+_CACHE_SIZE = 64
+_version_cache: "OrderedDict[Tuple[str, int], dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _cache_put(ebook_id: str, version: int, content: dict):
+    with _cache_lock:
+        _version_cache[(ebook_id, version)] = copy.deepcopy(content)
+        _version_cache.move_to_end((ebook_id, version))
+        while len(_version_cache) > _CACHE_SIZE:
+            _version_cache.popitem(last=False)
+
+
+def _cache_closest(ebook_id: str, version: int) -> Tuple[Optional[int], Optional[dict]]:
+    """Versão em cache mais próxima (<= version) do e-book"""
+    with _cache_lock:
+        cached = [v for (eid, v) in _version_cache if eid == ebook_id and v <= version]
+        if not cached:
+            return None, None
+        best = max(cached)
+        _version_cache.move_to_end((ebook_id, best))
+        return best, copy.deepcopy(_version_cache[(ebook_id, best)])
+
+
+def _cache_drop(ebook_id: str, below: Optional[int] = None):
+    with _cache_lock:
+        for key in [k for k in _version_cache if k[0] == ebook_id and (below is None or k[1] < below)]:
+            del _version_cache[key]
+
+
+# Versões removidas (retenção/exclusão) saem do cache de todos os workers
+shared_state.on_invalidation("ebook_revisions", lambda message: _cache_drop(message["ebook_id"], message.get("below")))
+
+
+# ============================================================================
+# GRAVAÇÃO
+# ============================================================================
+
+def _size(value: Any) -> int:
+    return len(json.dumps(value, ensure_ascii=False, default=str))
+
+
+async def record_revision(
+    db,
+    collection: str,
+    ebook_id: str,
+    user_id: str,
+    version: int,
+    content: dict,
+    *,
+    previous: Optional[dict] = None,
+    operations: Optional[List[dict]] = None,
+    source: str = "edit",
+):
+    """
+    Registra `content` como a versão `version` do e-book.
+
+    previous: conteúdo da versão anterior (para calcular o delta)
+    operations: delta já conhecido (ex.: operações do PATCH), dispensa o diff
+
+    Falhas são apenas logadas: a edição já foi gravada e a próxima revisão
+    vira snapshot se a cadeia ficar incompleta.
+    """
+    try:
+        latest = await db.ebook_revisions.find_one(
+            {"ebook_id": ebook_id}, {"_id": 0, "version": 1}, sort=[("version", DESCENDING)]
+        )
+        chain_ok = latest is not None and latest["version"] == version - 1
+
+        ops = None
+        if chain_ok and previous is not None and version % SNAPSHOT_INTERVAL != 0:
+            ops = operations if operations is not None else diff(previous, content)
+            if _size(ops) > MAX_DELTA_RATIO * _size(content):
+                ops = None
+
+        revision = {
+            "ebook_id": ebook_id,
+            "collection": collection,
+            "user_id": user_id,
+            "version": version,
+            "source": source,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        if ops is None:
+            revision.update({"kind": "snapshot", "content": content})
+        else:
+            revision.update({"kind": "delta", "ops": ops})
+
+        await db.ebook_revisions.insert_one(revision)
+        _cache_put(ebook_id, version, content)
+
+        if ops is None and version > 1:
+            await collect_garbage(db, ebook_id)
+    except DuplicateKeyError:
+        logger.warning(f"Revisão {version} do e-book {ebook_id} já registrada")
+    except Exception as e:
+        logger.warning(f"Falha ao registrar revisão {version} do e-book {ebook_id}: {e}")
+
+
+# ============================================================================
+# LEITURA
+# ============================================================================
+
+async def materialize(db, ebook_id: str, version: int) -> dict:
+    """
+    Conteúdo completo de uma versão.
+
+    Raises:
+        RevisionNotFoundError: versão inexistente ou fora da retenção
+    """
+    base_version, content = _cache_closest(ebook_id, version)
+    if base_version == version:
+        return content
+
+    snapshot = await db.ebook_revisions.find_one(
+        {"ebook_id": ebook_id, "kind": "snapshot", "version": {"$lte": version}},
+        {"_id": 0, "version": 1, "content": 1},
+        sort=[("version", DESCENDING)],
+    )
+    if snapshot and (base_version is None or snapshot["version"] > base_version):
+        base_version, content = snapshot["version"], snapshot["content"]
+    if base_version is None:
+        raise RevisionNotFoundError(f"Versão {version} não encontrada")
+
+    deltas = await db.ebook_revisions.find(
+        {"ebook_id": ebook_id, "version": {"$gt": base_version, "$lte": version}},
+        {"_id": 0, "version": 1, "kind": 1, "ops": 1, "content": 1},
+    ).sort("version", ASCENDING).to_list(None)
+    if len(deltas) != version - base_version:
+        raise RevisionNotFoundError(f"Versão {version} não encontrada")
+
+    for revision in deltas:
+        if revision["kind"] == "snapshot":
+            content = revision["content"]
+        else:
+            content = apply_operations(content, revision["ops"])
+
+    _cache_put(ebook_id, version, content)
+    return content
+
+
+async def list_revisions(db, ebook_id: str, limit: int = LIST_LIMIT) -> List[dict]:
+    """Revisões mais recentes primeiro (sem o conteúdo)"""
+    revisions = await db.ebook_revisions.find(
+        {"ebook_id": ebook_id},
+        {"_id": 0, "version": 1, "kind": 1, "source": 1, "created_at": 1, "ops": 1},
+    ).sort("version", DESCENDING).limit(limit).to_list(limit)
+    for revision in revisions:
+        revision["changes"] = len(revision.pop("ops", None) or [])
+    return revisions
+
+
+async def diff_versions(db, ebook_id: str, from_version: int, to_version: int) -> List[dict]:
+    """Operações que levam da versão `from_version` à `to_version`"""
+    old = await materialize(db, ebook_id, from_version)
+    new = await materialize(db, ebook_id, to_version)
+    return diff(old, new)
+
+
+# ============================================================================
+# RETENÇÃO
+# ============================================================================
+
+async def collect_garbage(db, ebook_id: str) -> int:
+    """
+    Aplica a retenção (RETENTION_DAYS / MAX_REVISIONS) ao histórico do e-book.
+    A última versão sempre é mantida. Retorna o número de revisões removidas.
+    """
+    latest = await db.ebook_revisions.find_one(
+        {"ebook_id": ebook_id}, {"_id": 0, "version": 1}, sort=[("version", DESCENDING)]
+    )
+    if not latest:
+        return 0
+
+    keep_from = latest["version"] - MAX_REVISIONS + 1
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=RETENTION_DAYS)).isoformat()
+    recent = await db.ebook_revisions.find_one(
+        {"ebook_id": ebook_id, "created_at": {"$gte": cutoff}},
+        {"_id": 0, "version": 1},
+        sort=[("version", ASCENDING)],
+    )
+    keep_from = max(keep_from, recent["version"] if recent else latest["version"])
+
+    oldest = await db.ebook_revisions.find_one(
+        {"ebook_id": ebook_id}, {"_id": 0, "version": 1}, sort=[("version", ASCENDING)]
+    )
+    if keep_from <= oldest["version"]:
+        return 0
+
+    # A primeira revisão mantida precisa ser autossuficiente
+    content = await materialize(db, ebook_id, keep_from)
+    await db.ebook_revisions.update_one(
+        {"ebook_id": ebook_id, "version": keep_from},
+        {"$set": {"kind": "snapshot", "content": content}, "$unset": {"ops": ""}},
+    )
+    result = await db.ebook_revisions.delete_many({"ebook_id": ebook_id, "version": {"$lt": keep_from}})
+    await shared_state.publish_invalidation("ebook_revisions", ebook_id=ebook_id, below=keep_from)
+    if result.deleted_count:
+        logger.info(f"Retenção do e-book {ebook_id}: {result.deleted_count} revisão(ões) removida(s)")
+    return result.deleted_count
+
+
+async def delete_revisions(db, ebook_id: str):
+    await db.ebook_revisions.delete_many({"ebook_id": ebook_id})
+    await shared_state.publish_invalidation("ebook_revisions", ebook_id=ebook_id)
+
+
+async def ensure_revision_indexes(db):
+    await db.ebook_revisions.create_index(
+        [("ebook_id", ASCENDING), ("version", ASCENDING)], unique=True, name="ebook_version_unique"
+    )
+    await db.ebook_revisions.create_index(
+        [("ebook_id", ASCENDING), ("kind", ASCENDING), ("version", DESCENDING)], name="ebook_kind_version"
+    )
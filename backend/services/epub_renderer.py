@@ -0,0 +1,146 @@
+"""
+Backend EPUB para E-books
+
+Gera EPUB 3 a partir do layout do e-book (services.ebook_layout).
+Usa apenas a stdlib (zipfile); o CSS vem dos templates HTML.
+"""
+
+import html
+import io
+import uuid
+import zipfile
+from typing import List
+
+from services.ebook_layout import EbookLayout, LayoutBlock, LayoutSection
+from services.ebook_renderer import TEMPLATES, resolve_template
+
+# Timestamp fixo nas entradas do zip: mesmo conteúdo → mesmos bytes (cache/ETag estáveis)
+_ZIP_DATE = (2024, 1, 1, 0, 0, 0)
+
+_CONTAINER_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/>
+  </rootfiles>
+</container>"""
+
+
+def _esc(text: str) -> str:
+    return html.escape(text or "", quote=True)
+
+
+def _xhtml(title: str, body: str) -> str:
+    return f"""<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE html>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" lang="pt-BR" xml:lang="pt-BR">
+<head>
+  <meta charset="UTF-8"/>
+  <title>{_esc(title)}</title>
+  <link rel="stylesheet" type="text/css" href="style.css"/>
+</head>
+<body>
+{body}
+</body>
+</html>"""
+
+
+def _render_block(block: LayoutBlock) -> str:
+    if block.kind == "paragraph":
+        return f"<p>{_esc(block.text)}</p>"
+    if block.kind == "bullet_list":
+        items = "\n".join(f"  <li>{_esc(item)}</li>" for item in block.items)
+        return f"<ul>\n{items}\n</ul>"
+    if block.kind == "callout":
+        return f'<div class="callout callout-{_esc(block.style)}"><p>{_esc(block.text)}</p></div>'
+    return ""
+
+
+def _render_chapter(section: LayoutSection) -> str:
+    parts = ['<section epub:type="chapter">', f"<h2>{_esc(section.title)}</h2>"]
+    if section.subtitle:
+        parts.append(f"<h3>{_esc(section.subtitle)}</h3>")
+    parts.extend(_render_block(block) for block in section.blocks)
+    if section.note:
+        parts.append(f'<p class="source"><em>Referência: {_esc(section.note)}</em></p>')
+    parts.append("</section>")
+    return "\n".join(parts)
+
+
+def _render_image(section: LayoutSection) -> str:
+    # Imagens não são embutidas no pacote; ficam como legenda
+    return f'<div class="image-container"><p><em>Imagem: {_esc(section.image_prompt)}</em></p></div>'
+
+
+def render_layout_epub(layout: EbookLayout, template: str) -> bytes:
+    """Renderiza o layout do e-book em EPUB 3"""
+    css = TEMPLATES[resolve_template(template)]["css"]
+    book_id = f"urn:uuid:{uuid.UUID(layout.content_hash[:32])}"
+
+    # Documentos: capa + um por capítulo (imagens acompanham o capítulo anterior)
+    documents: List[tuple] = []
+    cover_body = f'<div class="hero"><h1>{_esc(layout.title)}</h1>'
+    if layout.subtitle:
+        cover_body += f'<div class="hero-subtitle">{_esc(layout.subtitle)}</div>'
+    cover_body += f"<p>Por: {_esc(layout.author)}</p></div>"
+    documents.append(("cover.xhtml", layout.title, cover_body))
+
+    for section in layout.sections:
+        if section.kind == "chapter":
+            name = f"chapter_{len(documents):03d}.xhtml"
+            documents.append((name, section.title, _render_chapter(section)))
+        elif section.kind == "image" and len(documents) > 1:
+            name, title, body = documents[-1]
+            documents[-1] = (name, title, body + "\n" + _render_image(section))
+
+    nav_items = "\n".join(
+        f'      <li><a href="{name}">{_esc(title)}</a></li>' for name, title, _ in documents
+    )
+    nav = _xhtml("Sumário", f"""<nav epub:type="toc" id="toc">
+  <h1>Sumário</h1>
+  <ol>
+{nav_items}
+  </ol>
+</nav>""")
+
+    manifest = "\n".join(
+        f'    <item id="doc{i}" href="{name}" media-type="application/xhtml+xml"/>'
+        for i, (name, _, _) in enumerate(documents)
+    )
+    spine = "\n".join(f'    <itemref idref="doc{i}"/>' for i in range(len(documents)))
+    subtitle_meta = f"\n    <meta property=\"dcterms:alternative\">{_esc(layout.subtitle)}</meta>" if layout.subtitle else ""
+    opf = f"""<?xml version="1.0" encoding="UTF-8"?>
+<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="bookid" xml:lang="pt-BR">
+  <metadata xmlns:dc="http://purl.org/dc/elements/1.1/">
+    <dc:identifier id="bookid">{book_id}</dc:identifier>
+    <dc:title>{_esc(layout.title)}</dc:title>
+    <dc:creator>{_esc(layout.author)}</dc:creator>
+    <dc:language>pt-BR</dc:language>
+    <meta property="dcterms:modified">2024-01-01T00:00:00Z</meta>{subtitle_meta}
+  </metadata>
+  <manifest>
+    <item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>
+    <item id="css" href="style.css" media-type="text/css"/>
+{manifest}
+  </manifest>
+  <spine>
+{spine}
+  </spine>
+</package>"""
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as epub:
+        def write(name: str, data: str, compress: bool = True):
+            info = zipfile.ZipInfo(name, date_time=_ZIP_DATE)
+            info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+            epub.writestr(info, data)
+
+        # mimetype precisa ser o primeiro arquivo e sem compressão
+        write("mimetype", "application/epub+zip", compress=False)
+        write("META-INF/container.xml", _CONTAINER_XML)
+        write("OEBPS/content.opf", opf)
+        write("OEBPS/nav.xhtml", nav)
+        write("OEBPS/style.css", css)
+        for name, title, body in documents:
+            write(f"OEBPS/{name}", _xhtml(title, body))
+
+    return buffer.getvalue()
@@ -0,0 +1,301 @@
+"""
+Derivados de Imagem (miniatura e média em WebP/AVIF)
+
+Imagens geradas por IA e fotos da marca são gravadas uma vez na coleção
+`images` (original em binário, não em base64) e servidas como image/* por
+GET /api/images/{id}/{variante}:
+
+- variantes: thumb (lado maior IMAGE_THUMB_SIZE), medium (IMAGE_MEDIUM_SIZE)
+  e original
+- formato negociado pelo Accept: AVIF > WebP > JPEG/PNG (clientes antigos)
+- derivados gerados na gravação (IMAGE_EAGER_FORMATS) e, se faltarem, no
+  primeiro request; ficam em `image_variants`
+- o conteúdo de um id nunca muda: ETag estável, Cache-Control immutable e
+  If-None-Match respondido com 304 sem ler o binário
+
+Decodificação, redimensionamento e codificação rodam em um pool dedicado de
+IMAGE_WORKERS threads (o Pillow libera o GIL nessas etapas): não travam o
+event loop nem disputam o threadpool do Starlette.
+
+Os ids são aleatórios (128 bits) e funcionam como URL de capacidade: <img>
+não envia o token Bearer, então a rota de leitura não exige login.
+"""
+
+import asyncio
+import base64
+import binascii
+import hashlib
+import io
+import logging
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from uuid import uuid4
+
+from bson import Binary
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("elevare.images")
+
+THUMB_SIZE = int(os.environ.get("IMAGE_THUMB_SIZE", "320"))
+MEDIUM_SIZE = int(os.environ.get("IMAGE_MEDIUM_SIZE", "1080"))
+WEBP_QUALITY = int(os.environ.get("IMAGE_WEBP_QUALITY", "80"))
+AVIF_QUALITY = int(os.environ.get("IMAGE_AVIF_QUALITY", "60"))
+JPEG_QUALITY = int(os.environ.get("IMAGE_JPEG_QUALITY", "85"))
+WORKERS = int(os.environ.get("IMAGE_WORKERS", "2"))
+MAX_BYTES = int(os.environ.get("IMAGE_MAX_MB", "10")) * 1024 * 1024
+CACHE_MAX_AGE = 365 * 24 * 3600
+
+ORIGINAL = "original"
+VARIANTS: Dict[str, int] = {"thumb": THUMB_SIZE, "medium": MEDIUM_SIZE}
+
+# Formato → (media type, opções do save do Pillow)
+FORMATS: Dict[str, Tuple[str, dict]] = {
+    "avif": ("image/avif", {"quality": AVIF_QUALITY}),
+    "webp": ("image/webp", {"quality": WEBP_QUALITY, "method": 4}),
+    "jpeg": ("image/jpeg", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True}),
+    "png": ("image/png", {"optimize": True}),
+}
+# Em ordem de preferência; só os que o Pillow instalado sabe codificar
+MODERN_FORMATS = [fmt for fmt in ("avif", "webp") if features.check(fmt)]
+EAGER_FORMATS = [
+    fmt for fmt in (f.strip().lower() for f in os.environ.get("IMAGE_EAGER_FORMATS", "webp,avif").split(","))
+    if fmt in MODERN_FORMATS
+]
+
+URL_PATTERN = re.compile(r"^/api/images/([0-9a-f]{32})/")
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="image-derivatives")
+
+
+async def run_in_image_pool(fn, *args):
+    """Executa trabalho do Pillow no pool dedicado de imagens"""
+    return await asyncio.get_running_loop().run_in_executor(_executor, fn, *args)
+
+
+def image_urls(image_id: str) -> Dict[str, str]:
+    return {variant: f"/api/images/{image_id}/{variant}" for variant in (*VARIANTS, ORIGINAL)}
+
+
+def image_id_from_url(value: str) -> Optional[str]:
+    match = URL_PATTERN.match(value or "")
+    return match.group(1) if match else None
+
+
+def decode_base64_image(value: str) -> bytes:
+    """Base64 puro ou data URL (data:image/png;base64,...)"""
+    if value.startswith("data:"):
+        value = value.partition(",")[2]
+    try:
+        return base64.b64decode(value)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Imagem em base64 inválida: {e}")
+
+
+async def ensure_image_indexes(db):
+    await db.images.create_index("id", unique=True)
+    await db.images.create_index("user_id")
+    await db.image_variants.create_index("image_id")
+
+
+# ============================================================================
+# PILLOW (executado no pool)
+# ============================================================================
+
+class ImageInfo(NamedTuple):
+    media_type: str
+    width: int
+    height: int
+    has_alpha: bool
+
+
+def _has_alpha(img: Image.Image) -> bool:
+    return img.mode in ("RGBA", "LA", "PA") or "transparency" in img.info
+
+
+def _inspect(data: bytes) -> ImageInfo:
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+        # verify() invalida o objeto: reabrir para ler os metadados
+        with Image.open(io.BytesIO(data)) as img:
+            media_type = Image.MIME.get(img.format or "")
+            if not media_type:
+                raise ValueError(f"Formato de imagem não suportado: {img.format}")
+            return ImageInfo(media_type, img.width, img.height, _has_alpha(img))
+    except (UnidentifiedImageError, OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Imagem inválida: {e}")
+
+
+def _render(data: bytes, size: int, fmt: str) -> Tuple[bytes, int, int]:
+    with Image.open(io.BytesIO(data)) as source:
+        img = ImageOps.exif_transpose(source)
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)  # nunca amplia
+        if fmt == "jpeg":
+            img = img.convert("RGB")
+        elif img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if _has_alpha(img) else "RGB")
+        out = io.BytesIO()
+        img.save(out, format=fmt.upper(), **FORMATS[fmt][1])
+        return out.getvalue(), img.width, img.height
+
+
+def negotiate_format(accept: Optional[str], has_alpha: bool) -> str:
+    accept = (accept or "").lower()
+    for fmt in MODERN_FORMATS:
+        if FORMATS[fmt][0] in accept:
+            return fmt
+    return "png" if has_alpha else "jpeg"
+
+
+# ============================================================================
+# GRAVAÇÃO
+# ============================================================================
+
+async def _build_variant(db, image_id: str, data: bytes, variant: str, fmt: str) -> bytes:
+    body, width, height = await run_in_image_pool(_render, data, VARIANTS[variant], fmt)
+    try:
+        await db.image_variants.insert_one({
+            "_id": f"{image_id}:{variant}:{fmt}",
+            "image_id": image_id,
+            "variant": variant,
+            "format": fmt,
+            "width": width,
+            "height": height,
+            "bytes": len(body),
+            "data": Binary(body),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        })
+    except DuplicateKeyError:
+        pass  # outro request gerou o mesmo derivado
+    return body
+
+
+async def store_image(db, user_id: str, data: bytes, source: str) -> dict:
+    """
+    Grava o original e gera os derivados de IMAGE_EAGER_FORMATS.
+
+    Raises:
+        ValueError: conteúdo que não é imagem, formato desconhecido ou acima de IMAGE_MAX_MB
+    """
+    if len(data) > MAX_BYTES:
+        raise ValueError(f"Imagem maior que {MAX_BYTES // (1024 * 1024)} MB")
+    info = await run_in_image_pool(_inspect, data)
+    image_id = uuid4().hex
+    await db.images.insert_one({
+        "id": image_id,
+        "user_id": user_id,
+        "source": source,
+        "media_type": info.media_type,
+        "width": info.width,
+        "height": info.height,
+        "has_alpha": info.has_alpha,
+        "bytes": len(data),
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "data": Binary(data),
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
+
+    results = await asyncio.gather(
+        *(_build_variant(db, image_id, data, variant, fmt) for variant in VARIANTS for fmt in EAGER_FORMATS),
+        return_exceptions=True,
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            # O derivado que faltar é gerado no primeiro request
+            logger.warning(f"Falha ao gerar derivado da imagem {image_id}: {result}")
+
+    return {"id": image_id, "urls": image_urls(image_id), "width": info.width, "height": info.height}
+
+
+async def store_image_refs(db, user_id: str, values: List[str], source: str) -> List[str]:
+    """
+    Converte uma lista de imagens em base64/data URL em referências
+    (/api/images/{id}/original). Referências já existentes são mantidas.
+    """
+    refs = []
+    for value in values:
+        if image_id_from_url(value):
+            refs.append(value)
+            continue
+        stored = await store_image(db, user_id, decode_base64_image(value), source)
+        refs.append(stored["urls"][ORIGINAL])
+    return refs
+
+
+async def delete_images(db, user_id: str, image_ids: List[Optional[str]]):
+    """Remove originais e derivados (só os do próprio usuário)"""
+    image_ids = [image_id for image_id in image_ids if image_id]
+    if not image_ids:
+        return
+    owned = await db.images.find({"id": {"$in": image_ids}, "user_id": user_id}, {"_id": 0, "id": 1}).to_list(None)
+    owned_ids = [image["id"] for image in owned]
+    if not owned_ids:
+        return
+    await db.images.delete_many({"id": {"$in": owned_ids}})
+    await db.image_variants.delete_many({"image_id": {"$in": owned_ids}})
+
+
+# ============================================================================
+# LEITURA
+# ============================================================================
+
+class ImageResponse(NamedTuple):
+    content: Optional[bytes]  # None = If-None-Match confere (304)
+    media_type: str
+    etag: str
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+async def load_image(
+    db,
+    image_id: str,
+    variant: str,
+    accept: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> Optional[ImageResponse]:
+    """
+    Variante da imagem no melhor formato aceito pelo cliente, gerando-a se
+    ainda não existir. None se a imagem não existir.
+
+    Raises:
+        ValueError: variante desconhecida
+    """
+    if variant != ORIGINAL and variant not in VARIANTS:
+        raise ValueError(f"Variante inválida: {variant}. Use: {', '.join([*VARIANTS, ORIGINAL])}")
+
+    image = await db.images.find_one({"id": image_id}, {"_id": 0, "data": 0})
+    if not image:
+        return None
+
+    if variant == ORIGINAL:
+        media_type = image["media_type"]
+        etag = f'"{image["sha256"][:24]}"'
+    else:
+        fmt = negotiate_format(accept, image.get("has_alpha", False))
+        media_type = FORMATS[fmt][0]
+        etag = f'"{image["sha256"][:24]}-{variant}-{fmt}"'
+    if _etag_matches(if_none_match, etag):
+        return ImageResponse(None, media_type, etag)
+
+    if variant != ORIGINAL:
+        cached = await db.image_variants.find_one({"_id": f"{image_id}:{variant}:{fmt}"}, {"data": 1})
+        if cached:
+            return ImageResponse(bytes(cached["data"]), media_type, etag)
+
+    original = await db.images.find_one({"id": image_id}, {"_id": 0, "data": 1})
+    if not original:
+        return None  # removida entre as duas leituras
+    data = bytes(original["data"])
+    if variant == ORIGINAL:
+        return ImageResponse(data, media_type, etag)
+    return ImageResponse(await _build_variant(db, image_id, data, variant, fmt), media_type, etag)
@@ -3,10 +3,6 @@ Serviço de Geração de Imagens para NeuroVendas
 Usa OpenAI GPT-Image via Emergent Integrations
 """
 import os
-import base64
-from dotenv import load_dotenv
-
-load_dotenv()
 
 class ImageGenerator:
     def __init__(self):
@@ -29,7 +25,7 @@ class ImageGenerator:
             model: Modelo a usar (gpt-image-1.5, gpt-image-1, dall-e-3)
         
         Returns:
-            dict com image_base64 e metadata
+            dict com image_bytes (binário, gravado por services.image_derivatives) e metadata
         """
         from emergentintegrations.llm.openai.image_generation import OpenAIImageGeneration
         
@@ -46,10 +42,9 @@ class ImageGenerator:
             )
             
             if images and len(images) > 0:
-                image_base64 = base64.b64encode(images[0]).decode('utf-8')
                 return {
                     "success": True,
-                    "image_base64": image_base64,
+                    "image_bytes": images[0],
                     "prompt_used": enhanced_prompt,
                     "model": model
                 }
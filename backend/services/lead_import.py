@@ -0,0 +1,347 @@
+"""
+Importação e Exportação de Leads em Massa
+
+Importação (CSV/XLSX):
+- Lê a planilha em lotes (csv.reader / openpyxl read_only), sem carregar o arquivo inteiro
+- Valida cada linha com o mesmo modelo do POST /api/leads
+- Deduplica por telefone/e-mail normalizados (dentro do arquivo e contra a base)
+- Grava com insert_many(ordered=False) por lote e registra o progresso em lead_imports
+
+Exportação (CSV):
+- Percorre a coleção por cursor (mesmos filtros de /api/leads/query) e envia aos poucos
+"""
+
+import asyncio
+import codecs
+import csv
+import io
+import logging
+import os
+import re
+from datetime import datetime, timezone
+from itertools import islice
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+
+from services.lead_query import build_lead_filters, normalize_email, normalize_phone, search_fields
+from utils.pagination import increment_count, paginate
+from utils.shared_state import shared_state
+
+logger = logging.getLogger("elevare.lead_import")
+
+IMPORT_BATCH_SIZE = 500
+EXPORT_PAGE_SIZE = 500
+MAX_REPORTED_ERRORS = 50
+# Ponto seguido de exatamente 3 dígitos (milhar em pt-BR)
+THOUSANDS_DOT = re.compile(r"\.(?=\d{3}(?!\d))")
+
+# Cabeçalhos aceitos (normalizados) → campo do lead
+HEADER_ALIASES: Dict[str, str] = {
+    "nome": "nome", "name": "nome", "nome completo": "nome", "cliente": "nome",
+    "email": "email", "e-mail": "email", "e mail": "email",
+    "telefone": "telefone", "phone": "telefone", "celular": "telefone", "whatsapp": "telefone", "fone": "telefone",
+    "procedimento": "procedimento", "servico": "procedimento", "serviço": "procedimento", "interesse": "procedimento",
+    "origem": "origem", "source": "origem", "canal": "origem",
+    "temperatura": "temperatura",
+    "valor": "valor_estimado", "valor estimado": "valor_estimado", "valor_estimado": "valor_estimado",
+    "observacoes": "observacoes", "observações": "observacoes", "obs": "observacoes", "notas": "observacoes",
+}
+
+EXPORT_COLUMNS = [
+    "nome", "email", "telefone", "procedimento", "origem", "temperatura",
+    "status", "valor_estimado", "observacoes", "created_at",
+]
+
+
+# ============================================================================
+# LEITURA DA PLANILHA
+# ============================================================================
+
+def _map_header(header: List) -> List[Optional[str]]:
+    return [HEADER_ALIASES.get(str(cell or "").strip().lower()) for cell in header]
+
+
+def _iter_csv(file) -> Iterator[List]:
+    """Linhas do CSV, decodificadas sob demanda (UTF-8 com BOM ou Latin-1 do Excel)"""
+    head = file.read(4096)
+    file.seek(0)
+    try:
+        head.decode("utf-8-sig")
+        encoding = "utf-8-sig"
+    except UnicodeDecodeError:
+        encoding = "latin-1"
+
+    sample = codecs.decode(head, encoding, errors="ignore")
+    try:
+        dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+
+    text = io.TextIOWrapper(file, encoding=encoding, errors="replace", newline="")
+    try:
+        yield from csv.reader(text, dialect)
+    finally:
+        text.detach()
+
+
+def _iter_xlsx(file) -> Iterator[List]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError as e:
+        raise ValueError("Importação de XLSX indisponível (openpyxl não instalado); envie CSV") from e
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield list(row)
+    finally:
+        workbook.close()
+
+
+def iter_rows(file, filename: str) -> Iterator[dict]:
+    """Linhas da planilha como dicts {campo do lead: valor}"""
+    extension = os.path.splitext(filename or "")[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        rows = _iter_xlsx(file)
+    elif extension in (".csv", ".txt", ""):
+        rows = _iter_csv(file)
+    else:
+        raise ValueError(f"Formato não suportado: {extension}. Use CSV ou XLSX")
+
+    header = next(rows, None)
+    if not header:
+        return
+    fields = _map_header(header)
+    if "nome" not in fields:
+        raise ValueError("A planilha precisa de uma coluna 'nome'")
+
+    for row in rows:
+        record = {}
+        for field, value in zip(fields, row):
+            if field and value not in (None, ""):
+                if isinstance(value, float) and value.is_integer():
+                    value = int(value)  # telefone numérico no Excel vem como 11987654321.0
+                record[field] = str(value).strip() if field != "valor_estimado" else value
+        if record:
+            record.setdefault("origem", "importacao")
+            yield record
+
+
+def _parse_valor(value) -> int:
+    """Valor em reais no formato pt-BR: "R$ 1.500", "1.500,00", "150,5" """
+    if isinstance(value, (int, float)):
+        return int(value)
+    cleaned = str(value).replace("R$", "").replace(" ", "")
+    # Ponto é separador de milhar (1.500,00 → 1500,00; 2.000 → 2000); vírgula é decimal
+    if "," in cleaned:
+        cleaned = cleaned.replace(".", "")
+    else:
+        cleaned = THOUSANDS_DOT.sub("", cleaned)
+    return int(float(cleaned.replace(",", ".")))
+
+
+# ============================================================================
+# IMPORTAÇÃO
+# ============================================================================
+
+async def create_import_job(db, user_id: str, filename: str) -> dict:
+    job = {
+        "id": str(uuid4()),
+        "user_id": user_id,
+        "filename": filename,
+        "status": "processing",
+        "processed": 0,
+        "inserted": 0,
+        "duplicates": 0,
+        "invalid": 0,
+        "errors": [],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "finished_at": None,
+    }
+    await db.lead_imports.insert_one(job)
+    job.pop("_id", None)
+    return job
+
+
+async def _existing_keys(db, user_id: str, emails: set, phones: set) -> tuple:
+    """E-mails/telefones do lote que já existem na base do usuário"""
+    conditions = []
+    if emails:
+        conditions.append({"email_norm": {"$in": list(emails)}})
+    if phones:
+        conditions.append({"telefone_norm": {"$in": list(phones)}})
+    if not conditions:
+        return set(), set()
+
+    cursor = db.leads.find(
+        {"user_id": user_id, "$or": conditions},
+        {"_id": 0, "email_norm": 1, "telefone_norm": 1},
+    )
+    found_emails, found_phones = set(), set()
+    async for lead in cursor:
+        if lead.get("email_norm"):
+            found_emails.add(lead["email_norm"])
+        if lead.get("telefone_norm"):
+            found_phones.add(lead["telefone_norm"])
+    return found_emails & emails, found_phones & phones
+
+
+async def import_leads(db, user_id: str, job_id: str, path: str, filename: str, model: Callable):
+    """
+    Processa o arquivo salvo em `path` e atualiza o job em lead_imports a cada lote.
+
+    model: modelo pydantic de criação de lead (LeadCreate) usado na validação.
+    """
+    stats = {"processed": 0, "inserted": 0, "duplicates": 0, "invalid": 0}
+    errors: List[dict] = []
+    seen_emails, seen_phones = set(), set()
+    line = 1  # cabeçalho
+
+    def report_error(message: str):
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"linha": line, "erro": message})
+
+    try:
+        with open(path, "rb") as file:
+            rows = iter_rows(file, filename)
+            while True:
+                # Parsing é síncrono: roda fora do event loop, um lote por vez
+                batch = await asyncio.to_thread(lambda: list(islice(rows, IMPORT_BATCH_SIZE)))
+                if not batch:
+                    break
+
+                candidates = []
+                for record in batch:
+                    line += 1
+                    stats["processed"] += 1
+                    try:
+                        if "valor_estimado" in record:
+                            record["valor_estimado"] = _parse_valor(record["valor_estimado"])
+                        lead = model(**record).dict()
+                    except ValidationError as e:
+                        stats["invalid"] += 1
+                        first = e.errors()[0]
+                        report_error(f"{'.'.join(str(p) for p in first['loc'])}: {first['msg']}")
+                        continue
+                    except ValueError:
+                        stats["invalid"] += 1
+                        report_error(f"Valor inválido: {record.get('valor_estimado')}")
+                        continue
+
+                    email = normalize_email(lead.get("email"))
+                    phone = normalize_phone(lead.get("telefone"))
+                    if (email and email in seen_emails) or (phone and phone in seen_phones):
+                        stats["duplicates"] += 1
+                        continue
+                    if email:
+                        seen_emails.add(email)
+                    if phone:
+                        seen_phones.add(phone)
+                    candidates.append((lead, email, phone))
+
+                emails = {email for _, email, _ in candidates if email}
+                phones = {phone for _, _, phone in candidates if phone}
+                known_emails, known_phones = await _existing_keys(db, user_id, emails, phones)
+
+                now = datetime.now(timezone.utc).isoformat()
+                documents = []
+                for lead, email, phone in candidates:
+                    if (email and email in known_emails) or (phone and phone in known_phones):
+                        stats["duplicates"] += 1
+                        continue
+                    documents.append({
+                        "id": str(uuid4()),
+                        "user_id": user_id,
+                        **lead,
+                        "status": "novo",
+                        "created_at": now,
+                        "updated_at": now,
+                        **search_fields(lead.get("nome"), lead.get("email"), lead.get("telefone")),
+                    })
+
+                if documents:
+                    try:
+                        result = await db.leads.insert_many(documents, ordered=False)
+                        inserted = len(result.inserted_ids)
+                    except BulkWriteError as e:
+                        inserted = e.details.get("nInserted", 0)
+                        report_error(f"{len(documents) - inserted} lead(s) não gravado(s) no lote")
+                    stats["inserted"] += inserted
+                    await increment_count(db, user_id, "leads", inserted)
+
+                await db.lead_imports.update_one({"id": job_id}, {"$set": {**stats, "errors": errors}})
+
+        status = "completed"
+    except Exception as e:
+        logger.error(f"Importação {job_id} falhou: {e}")
+        report_error(str(e))
+        status = "failed"
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    await db.lead_imports.update_one(
+        {"id": job_id},
+        {"$set": {**stats, "errors": errors, "status": status, "finished_at": datetime.now(timezone.utc).isoformat()}},
+    )
+    logger.info(f"Importação {job_id}: {status} {stats}")
+
+
+async def run_import_job(db, user_id: str, job_id: str, path: str, filename: str, model: Callable):
+    """import_leads com lease: se o worker morrer no meio, outro marca o job como interrompido"""
+    await shared_state.run_leased(
+        "lead_import", job_id, import_leads(db, user_id, job_id, path, filename, model), {"user_id": user_id}
+    )
+
+
+async def mark_import_interrupted(db, job: dict):
+    """Handler de lease vencido: o arquivo temporário ficou no worker que parou"""
+    await db.lead_imports.update_one(
+        {"id": job["id"], "status": "processing"},
+        {
+            "$set": {"status": "failed", "finished_at": datetime.now(timezone.utc).isoformat()},
+            "$push": {"errors": {"linha": None, "erro": "Importação interrompida. Envie o arquivo novamente."}},
+        },
+    )
+
+
+# ============================================================================
+# EXPORTAÇÃO
+# ============================================================================
+
+def _csv_safe(value) -> str:
+    """Evita injeção de fórmula no Excel (=, @, e +/- que não sejam número/telefone)"""
+    if value is None:
+        return ""
+    text = str(value)
+    if text[:1] in ("=", "@") or (text[:1] in ("+", "-") and not text[1:].replace(" ", "").replace("(", "").replace(")", "").replace("-", "").isdigit()):
+        return "'" + text
+    return text
+
+
+def _csv_line(values: List) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer, delimiter=";").writerow([_csv_safe(v) for v in values])
+    return buffer.getvalue()
+
+
+async def export_leads_csv(db, user_id: str, **filters) -> AsyncIterator[str]:
+    """CSV (separador ';', compatível com Excel pt-BR) gerado página a página"""
+    common, dims = build_lead_filters(user_id, **filters)
+    query = {**common, **dims}
+    projection = {"_id": 0, "id": 1, **{column: 1 for column in EXPORT_COLUMNS}}
+
+    yield "\ufeff" + _csv_line(EXPORT_COLUMNS)
+    cursor = None
+    while True:
+        page = await paginate(db.leads, query, cursor=cursor, limit=EXPORT_PAGE_SIZE, projection=projection)
+        if page.items:
+            yield "".join(_csv_line([lead.get(column) for column in EXPORT_COLUMNS]) for lead in page.items)
+        if not page.has_more:
+            break
+        cursor = page.next_cursor
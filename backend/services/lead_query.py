@@ -0,0 +1,261 @@
+"""
+Motor de Consulta de Leads
+
+Filtros, ordenação, busca e contagens do funil em uma única ida ao servidor.
+
+- Busca por prefixo em campos normalizados gravados no próprio lead
+  (nome_tokens, email_norm, telefone_norm), todos indexados com user_id
+- Busca textual (text=) pelo índice de texto em português
+- Funil: contagem por status e por temperatura via $facet, cada dimensão
+  ignorando o próprio filtro (as abas mostram quantos leads teriam)
+"""
+
+import asyncio
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, TEXT, UpdateOne
+
+from utils.pagination import paginate, resolve_projection
+
+SORT_FIELDS = ("created_at", "valor_estimado")
+
+# Campos de filtro por igualdade (aceitam lista separada por vírgula)
+DIMENSIONS = ("status", "temperatura", "procedimento", "origem")
+FUNNEL_DIMENSIONS = ("status", "temperatura")
+
+MIN_PREFIX_LENGTH = 2
+
+
+# ============================================================================
+# NORMALIZAÇÃO
+# ============================================================================
+
+def normalize_text(value: Optional[str]) -> str:
+    """Minúsculas, sem acentos e sem espaços extras"""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", str(value))
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def normalize_email(value: Optional[str]) -> str:
+    return (value or "").strip().lower()
+
+
+def normalize_phone(value: Optional[str]) -> str:
+    """Só dígitos, sem o DDI 55 (11987654321 e +55 (11) 98765-4321 viram o mesmo valor)"""
+    digits = re.sub(r"\D", "", value or "")
+    if digits.startswith("55") and len(digits) in (12, 13):
+        digits = digits[2:]
+    return digits
+
+
+def search_fields(nome: Optional[str], email: Optional[str], telefone: Optional[str]) -> dict:
+    """Campos normalizados gravados no lead para busca e deduplicação"""
+    nome_norm = normalize_text(nome)
+    return {
+        "nome_norm": nome_norm,
+        "nome_tokens": nome_norm.split(),
+        "email_norm": normalize_email(email),
+        "telefone_norm": normalize_phone(telefone),
+    }
+
+
+def search_fields_update(lead: dict, changes: dict) -> dict:
+    """Campos normalizados a regravar quando nome/email/telefone mudam"""
+    if not any(key in changes for key in ("nome", "email", "telefone")):
+        return {}
+    merged = {**lead, **changes}
+    return search_fields(merged.get("nome"), merged.get("email"), merged.get("telefone"))
+
+
+# ============================================================================
+# CONSULTA
+# ============================================================================
+
+def _split(value: Optional[str]) -> List[str]:
+    return [v.strip() for v in (value or "").split(",") if v.strip()]
+
+
+def _prefix_condition(q: str) -> Optional[dict]:
+    """Condição de busca por prefixo (regex ancorada usa o índice)"""
+    if "@" in q:
+        email = normalize_email(q)
+        return {"email_norm": {"$regex": f"^{re.escape(email)}"}}
+
+    digits = normalize_phone(q)
+    if digits and len(digits) >= 3 and not re.search(r"[^\d\s()+\-.]", q):
+        return {"telefone_norm": {"$regex": f"^{re.escape(digits)}"}}
+
+    words = [w for w in normalize_text(q).split() if len(w) >= MIN_PREFIX_LENGTH]
+    if not words:
+        return None
+    # Cada palavra precisa ser prefixo de alguma palavra do nome ("sil" acha "Maria Silva")
+    name_match = [{"nome_tokens": {"$regex": f"^{re.escape(w)}"}} for w in words]
+    condition = name_match[0] if len(name_match) == 1 else {"$and": name_match}
+    return {"$or": [condition, {"email_norm": {"$regex": f"^{re.escape(normalize_email(q))}"}}]}
+
+
+def build_lead_filters(
+    user_id: str,
+    *,
+    q: Optional[str] = None,
+    text: Optional[str] = None,
+    valor_min: Optional[int] = None,
+    valor_max: Optional[int] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    **dimensions: Optional[str],
+) -> tuple:
+    """
+    Retorna (filtro comum, filtros por dimensão).
+
+    O filtro comum inclui user_id, busca e faixas; as dimensões (status,
+    temperatura, ...) ficam separadas para o $facet do funil.
+    """
+    common: Dict = {"user_id": user_id}
+    if text and text.strip():
+        common["$text"] = {"$search": text.strip(), "$language": "portuguese"}
+
+    if q and q.strip():
+        condition = _prefix_condition(q.strip())
+        if condition:
+            common.update(condition)
+
+    if valor_min is not None or valor_max is not None:
+        valor = {}
+        if valor_min is not None:
+            valor["$gte"] = valor_min
+        if valor_max is not None:
+            valor["$lte"] = valor_max
+        common["valor_estimado"] = valor
+
+    if created_from or created_to:
+        created = {}
+        if created_from:
+            created["$gte"] = created_from
+        if created_to:
+            created["$lte"] = created_to
+        common["created_at"] = created
+
+    dims = {}
+    for name in DIMENSIONS:
+        values = _split(dimensions.get(name))
+        if values:
+            dims[name] = values[0] if len(values) == 1 else {"$in": values}
+    return common, dims
+
+
+async def _funnel(collection, common: dict, dims: dict) -> dict:
+    """Contagens por status/temperatura + total filtrado, em um único aggregate"""
+    facets = {}
+    for name in FUNNEL_DIMENSIONS:
+        others = {k: v for k, v in dims.items() if k != name}
+        facets[name] = [{"$match": others}, {"$group": {"_id": f"${name}", "count": {"$sum": 1}}}]
+    facets["total"] = [{"$match": dims}, {"$count": "count"}]
+
+    # $text precisa estar no primeiro $match do pipeline
+    result = await collection.aggregate([{"$match": common}, {"$facet": facets}]).to_list(1)
+    result = result[0] if result else {}
+
+    funnel = {
+        name: {(row["_id"] or "sem_valor"): row["count"] for row in result.get(name, [])}
+        for name in FUNNEL_DIMENSIONS
+    }
+    total_rows = result.get("total") or []
+    funnel["total"] = total_rows[0]["count"] if total_rows else 0
+    return funnel
+
+
+async def query_leads(
+    db,
+    user_id: str,
+    *,
+    sort: str = "created_at",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    **filters,
+) -> dict:
+    """
+    Página de leads filtrada + contagens do funil.
+
+    Raises:
+        ValueError: campo de ordenação inválido
+        InvalidCursorError: cursor malformado
+    """
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"Ordenação inválida: {sort}. Use: {', '.join(SORT_FIELDS)}")
+    direction = ASCENDING if order == "asc" else DESCENDING
+
+    common, dims = build_lead_filters(user_id, **filters)
+    page, funnel = await asyncio.gather(
+        paginate(
+            db.leads,
+            {**common, **dims},
+            cursor=cursor,
+            limit=limit,
+            projection=resolve_projection("leads", fields),
+            sort_field=sort,
+            direction=direction,
+        ),
+        _funnel(db.leads, common, dims),
+    )
+
+    return {
+        "success": True,
+        "leads": page.items,
+        "next_cursor": page.next_cursor,
+        "has_more": page.has_more,
+        "total": funnel.pop("total"),
+        "funnel": funnel,
+    }
+
+
+# ============================================================================
+# ÍNDICES E MIGRAÇÃO
+# ============================================================================
+
+async def ensure_lead_indexes(db):
+    leads = db.leads
+    await leads.create_index(
+        [("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING)], name="user_status_created"
+    )
+    await leads.create_index(
+        [("user_id", ASCENDING), ("temperatura", ASCENDING), ("created_at", DESCENDING)], name="user_temp_created"
+    )
+    await leads.create_index(
+        [("user_id", ASCENDING), ("valor_estimado", DESCENDING), ("id", DESCENDING)], name="user_valor_id"
+    )
+    await leads.create_index([("user_id", ASCENDING), ("nome_tokens", ASCENDING)], name="user_nome_tokens")
+    await leads.create_index([("user_id", ASCENDING), ("email_norm", ASCENDING)], name="user_email_norm")
+    await leads.create_index([("user_id", ASCENDING), ("telefone_norm", ASCENDING)], name="user_telefone_norm")
+    await leads.create_index(
+        [("nome", TEXT), ("email", TEXT), ("procedimento", TEXT), ("observacoes", TEXT)],
+        name="leads_text",
+        default_language="portuguese",
+    )
+
+
+async def backfill_search_fields(db, batch_size: int = 500) -> int:
+    """Grava os campos normalizados em leads antigos (idempotente)"""
+    updated = 0
+    while True:
+        batch = await db.leads.find(
+            {"nome_norm": {"$exists": False}},
+            {"_id": 1, "nome": 1, "email": 1, "telefone": 1},
+        ).limit(batch_size).to_list(batch_size)
+        if not batch:
+            return updated
+        await db.leads.bulk_write(
+            [
+                UpdateOne({"_id": lead["_id"]}, {"$set": search_fields(lead.get("nome"), lead.get("email"), lead.get("telefone"))})
+                for lead in batch
+            ],
+            ordered=False,
+        )
+        updated += len(batch)
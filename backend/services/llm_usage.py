@@ -0,0 +1,299 @@
+"""
+Ledger de Uso de LLM
+
+Toda chamada feita por LlmChat (LucresIA, geradores de serviço, EbookGeneratorV2)
+e por OpenAIImageGeneration é registrada com usuário, rota, tarefa e modelo
+(services.model_router), tentativa, versão do prompt (services.prompt_registry),
+tokens estimados, latência e custo estimado.
+
+- observe() só enfileira em memória (nenhuma escrita no caminho do request)
+- Uma task grava em lote a cada FLUSH_INTERVAL segundos ou BATCH_SIZE registros:
+  llm_usage (registro bruto, TTL de RETENTION_DAYS) e llm_usage_daily
+  (rollup por dia/usuário/rota/tarefa/modelo com histograma de latência)
+- usage_report() agrega os rollups com p50/p95 calculados pelo histograma
+"""
+
+import asyncio
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+
+from utils.observability import (
+    ExternalCall, add_call_observer, attempt_var, current_llm_task, current_prompt_version, current_route,
+    current_trace_id, current_user_id
+)
+
+logger = logging.getLogger("elevare.llm_usage")
+
+BATCH_SIZE = 200
+FLUSH_INTERVAL = float(os.environ.get("LLM_USAGE_FLUSH_SECONDS", "5"))
+MAX_BUFFER = 10_000
+RETENTION_DAYS = int(os.environ.get("LLM_USAGE_RETENTION_DAYS", "30"))
+
+# USD por 1M tokens (entrada, saída)
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "openai/gpt-4o": (2.50, 10.00),
+    "openai/gpt-4o-mini": (0.15, 0.60),
+    "openai/gpt-4.1": (2.00, 8.00),
+    "openai/gpt-4.1-mini": (0.40, 1.60),
+}
+# USD por imagem (1024x1024, qualidade média)
+IMAGE_PRICES: Dict[str, float] = {
+    "gpt-image-1": 0.042,
+}
+
+# Limites superiores (ms) do histograma de latência dos rollups; o último balde é "acima de"
+LATENCY_BUCKETS_MS = (250, 500, 1000, 2000, 4000, 8000, 15000, 30000, 60000)
+
+GROUP_FIELDS = ("day", "user_id", "endpoint", "task", "model")
+ROLLUP_INDEX = "day_user_endpoint_task_model"
+# Índice único anterior (sem a tarefa): impediria rollups da mesma rota e modelo com tarefas diferentes
+LEGACY_ROLLUP_INDEXES = ("day_user_endpoint_model",)
+DUPLICATE_KEY = 11000
+
+
+def estimate_cost(call: ExternalCall) -> float:
+    if call.kind == "image":
+        return call.units * IMAGE_PRICES.get(call.model, 0.0)
+    price_in, price_out = MODEL_PRICES.get(call.model, (0.0, 0.0))
+    return (call.prompt_tokens * price_in + call.completion_tokens * price_out) / 1_000_000
+
+
+def _bucket(latency_ms: float) -> int:
+    for index, bound in enumerate(LATENCY_BUCKETS_MS):
+        if latency_ms <= bound:
+            return index
+    return len(LATENCY_BUCKETS_MS)
+
+
+def _percentile(buckets: List[int], q: float) -> Optional[float]:
+    """Limite superior do balde onde está o quantil (último balde: o maior limite)"""
+    total = sum(buckets)
+    if not total:
+        return None
+    cumulative = 0
+    for index, count in enumerate(buckets):
+        cumulative += count
+        if cumulative >= q * total:
+            return float(LATENCY_BUCKETS_MS[min(index, len(LATENCY_BUCKETS_MS) - 1)])
+    return float(LATENCY_BUCKETS_MS[-1])
+
+
+# ============================================================================
+# LEDGER
+# ============================================================================
+
+class UsageLedger:
+    def __init__(self):
+        self._buffer: List[dict] = []
+        self._db = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self.dropped = 0
+
+    def observe(self, call: ExternalCall):
+        """Observador das chamadas (utils.observability): só enfileira"""
+        now = datetime.now(timezone.utc)
+        self._buffer.append({
+            # _id fixo: numa nova tentativa, o que já foi gravado volta como chave duplicada
+            "_id": ObjectId(),
+            "created_at": now,
+            "day": now.strftime("%Y-%m-%d"),
+            "user_id": current_user_id() or "sistema",
+            "endpoint": current_route() or "background",
+            "kind": call.kind,
+            "task": current_llm_task(),
+            "model": call.model,
+            "outcome": call.outcome,
+            "attempt": attempt_var.get(),
+            "prompt_version": current_prompt_version(),
+            "prompt_tokens": call.prompt_tokens,
+            "completion_tokens": call.completion_tokens,
+            "images": call.units,
+            "latency_ms": round(call.seconds * 1000, 1),
+            "cost_usd": round(estimate_cost(call), 6),
+            "trace_id": current_trace_id(),
+        })
+        if len(self._buffer) > MAX_BUFFER:
+            # Banco indisponível por muito tempo: descarta os mais antigos
+            excess = len(self._buffer) - MAX_BUFFER
+            del self._buffer[:excess]
+            self.dropped += excess
+        if len(self._buffer) >= BATCH_SIZE and self._wakeup is not None:
+            self._wakeup.set()
+
+    def start(self, db):
+        if self._task is not None:
+            return
+        self._db = db
+        self._wakeup = asyncio.Event()
+        add_call_observer(self.observe)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer or self._db is None:
+            return
+        batch, self._buffer = self._buffer, []
+        written = batch
+        try:
+            await self._db.llm_usage.insert_many(batch, ordered=False)
+        except BulkWriteError as e:
+            # Chave duplicada = gravado numa tentativa anterior cujo rollup não foi aplicado
+            failed = {
+                err["index"] for err in e.details.get("writeErrors", []) if err.get("code") != DUPLICATE_KEY
+            }
+            if failed:
+                logger.warning(f"Falha ao gravar {len(failed)} registro(s) de uso de LLM: {e}")
+                self._buffer = [batch[i] for i in sorted(failed)] + self._buffer
+            written = [entry for i, entry in enumerate(batch) if i not in failed]
+        except Exception as e:
+            logger.warning(f"Falha ao gravar {len(batch)} registro(s) de uso de LLM: {e}")
+            # Volta para a fila (com o mesmo _id); o limite de MAX_BUFFER vale na próxima chamada
+            self._buffer = batch + self._buffer
+            return
+        if not written:
+            return
+        try:
+            await self._db.llm_usage_daily.bulk_write(_rollup_updates(written), ordered=False)
+        except Exception as e:
+            logger.warning(f"Falha ao atualizar rollups de uso de LLM: {e}")
+
+
+def _rollup_updates(batch: List[dict]) -> List[UpdateOne]:
+    totals: Dict[tuple, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+    for entry in batch:
+        key = tuple(entry[field] for field in GROUP_FIELDS)
+        inc = totals[key]
+        inc["calls"] += 1
+        inc["errors"] += entry["outcome"] != "ok"
+        inc["retries"] += entry["attempt"] > 1
+        inc["prompt_tokens"] += entry["prompt_tokens"]
+        inc["completion_tokens"] += entry["completion_tokens"]
+        inc["images"] += entry["images"]
+        inc["cost_usd"] += entry["cost_usd"]
+        inc["latency_ms_total"] += entry["latency_ms"]
+        inc[f"latency_buckets.b{_bucket(entry['latency_ms'])}"] += 1
+
+    fractional = ("cost_usd", "latency_ms_total")
+    return [
+        UpdateOne(
+            dict(zip(GROUP_FIELDS, key)),
+            {"$inc": {field: value if field in fractional else int(value) for field, value in inc.items()}},
+            upsert=True,
+        )
+        for key, inc in totals.items()
+    ]
+
+
+usage_ledger = UsageLedger()
+
+
+# ============================================================================
+# RELATÓRIO
+# ============================================================================
+
+async def usage_report(
+    db,
+    *,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    group_by: Optional[List[str]] = None,
+    user_id: Optional[str] = None,
+    limit: int = 100,
+) -> dict:
+    """
+    Uso agregado por `group_by` (subconjunto de day, user_id, endpoint, task, model),
+    ordenado por custo. Datas no formato YYYY-MM-DD (inclusivas).
+
+    Raises:
+        ValueError: campo de agrupamento inválido
+    """
+    group_by = group_by or ["endpoint"]
+    invalid = [field for field in group_by if field not in GROUP_FIELDS]
+    if invalid:
+        raise ValueError(f"Agrupamento inválido: {', '.join(invalid)}. Use: {', '.join(GROUP_FIELDS)}")
+
+    match: Dict = {}
+    if date_from or date_to:
+        match["day"] = {}
+        if date_from:
+            match["day"]["$gte"] = date_from
+        if date_to:
+            match["day"]["$lte"] = date_to
+    if user_id:
+        match["user_id"] = user_id
+
+    sums = ("calls", "errors", "retries", "prompt_tokens", "completion_tokens", "images", "cost_usd", "latency_ms_total")
+    group: Dict = {"_id": {field: f"${field}" for field in group_by}}
+    group.update({field: {"$sum": f"${field}"} for field in sums})
+    for index in range(len(LATENCY_BUCKETS_MS) + 1):
+        group[f"b{index}"] = {"$sum": f"$latency_buckets.b{index}"}
+
+    rows = await db.llm_usage_daily.aggregate([
+        {"$match": match},
+        {"$group": group},
+        {"$sort": {"cost_usd": -1}},
+        {"$limit": limit},
+    ]).to_list(limit)
+
+    report = []
+    totals = defaultdict(float)
+    for row in rows:
+        buckets = [int(row.pop(f"b{index}", 0)) for index in range(len(LATENCY_BUCKETS_MS) + 1)]
+        calls = row["calls"] or 1
+        item = {**row.pop("_id")}
+        item.update({field: row[field] for field in sums if field != "latency_ms_total"})
+        item["cost_usd"] = round(item["cost_usd"], 4)
+        item["avg_latency_ms"] = round(row["latency_ms_total"] / calls, 1)
+        item["p50_latency_ms"] = _percentile(buckets, 0.5)
+        item["p95_latency_ms"] = _percentile(buckets, 0.95)
+        report.append(item)
+        for field in ("calls", "errors", "prompt_tokens", "completion_tokens", "images", "cost_usd"):
+            totals[field] += row[field]
+
+    totals["cost_usd"] = round(totals["cost_usd"], 4)
+    return {
+        "group_by": group_by,
+        "rows": report,
+        "totals": dict(totals),
+        "tokens_estimated": True,
+    }
+
+
+async def ensure_usage_indexes(db):
+    await db.llm_usage.create_index(
+        "created_at", expireAfterSeconds=RETENTION_DAYS * 86400, name="created_at_ttl"
+    )
+    await db.llm_usage.create_index([("user_id", ASCENDING), ("created_at", ASCENDING)], name="user_created")
+    existing = await db.llm_usage_daily.index_information()
+    for name in LEGACY_ROLLUP_INDEXES:
+        if name in existing:
+            await db.llm_usage_daily.drop_index(name)
+    await db.llm_usage_daily.create_index(
+        [(field, ASCENDING) for field in GROUP_FIELDS], unique=True, name=ROLLUP_INDEX
+    )
@@ -5,10 +5,9 @@ Método OÁSIS DE CONVERSÃO integrado.
 """
 
 import os
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from dotenv import load_dotenv
 
-load_dotenv()
+from services.model_router import routed_chat
+
 
 LUCRESIA_SYSTEM_PROMPT = """
 🔮 PROMPT OFICIAL — LUCRESIA | ELEVARE NEUROVENDAS
@@ -81,7 +80,8 @@ Você existe para transformar atendimento em negócio.
 class LucresIA:
     """LucresIA - IA especializada em estética e neurovendas"""
     
-    def __init__(self, session_id: str, user_context: dict = None, brand_identity: dict = None):
+    def __init__(self, session_id: str, user_context: dict = None, brand_identity: dict = None,
+                 conversation_context: str = None, task: str = "lucresia_chat"):
         self.api_key = os.environ.get("EMERGENT_LLM_KEY")
         self.session_id = session_id
         self.user_context = user_context or {}
@@ -121,20 +121,26 @@ class LucresIA:
                 system_message += f"Frases-chave: {', '.join(brand_identity['key_phrases'])}\n"
             system_message += "\nUse essa identidade para personalizar todas as respostas e conteúdos gerados.\n"
         
-        self.chat = LlmChat(
-            api_key=self.api_key,
-            session_id=session_id,
-            system_message=system_message
-        ).with_model("openai", "gpt-4o")
+        # Memória da conversa (resumo + últimas mensagens, ver services.chat_memory)
+        if conversation_context:
+            system_message += f"\n\n💬 MEMÓRIA DA CONVERSA:\n{conversation_context}\n"
+            system_message += "\nContinue a conversa a partir daqui, sem repetir o que já foi dito.\n"
+        
+        # Modelo definido pela rota da tarefa (services.model_router); os métodos
+        # especializados usam a própria tarefa
+        self.chat = routed_chat(task, session_id, system_message, api_key=self.api_key)
     
     async def send_message(self, message: str) -> str:
         """Envia mensagem para LucresIA e retorna resposta"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         user_message = UserMessage(text=message)
         response = await self.chat.send_message(user_message)
         return response
     
     async def analyze_bio(self, instagram_handle: str, bio_text: str = None) -> dict:
         """Analisa bio do Instagram como DOCUMENTO DE IDENTIDADE ESTRATÉGICA DA MARCA"""
+        from emergentintegrations.llm.chat import UserMessage
         
         prompt = f"""🎯 TAREFA OBRIGATÓRIA:
 Trate a bio fornecida como DOCUMENTO DE IDENTIDADE ESTRATÉGICA DA MARCA, com prioridade máxima.
@@ -214,7 +220,7 @@ A IA que não toma posição é inútil.
 Responda APENAS com o JSON válido."""
         
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="bio_analysis")
         
         # Tentar parsear como JSON
         import json
@@ -233,6 +239,7 @@ Responda APENAS com o JSON válido."""
     
     async def generate_content_aisv(self, tema: str, tipo: str, tom: str = "profissional") -> dict:
         """Gera conteúdo usando framework NeuroVendas Elevare"""
+        from emergentintegrations.llm.chat import UserMessage
         
         # Contexto da marca
         brand_context = ""
@@ -348,7 +355,7 @@ Forneça em formato JSON:
 Responda APENAS com o JSON válido."""
         
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="content_aisv")
         
         import json
         import re
@@ -365,6 +372,8 @@ Responda APENAS com o JSON válido."""
     
     async def generate_persona(self, servico: str, nicho: str = "estética") -> dict:
         """Gera persona profunda usando método OÁSIS"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         prompt = f"""Você é um analista de marketing especialista em psicologia do consumidor e neuromarketing.
 
 Crie a persona ideal para: {servico}
@@ -401,7 +410,7 @@ Inclua em formato JSON:
 Use linguagem vívida e emotiva. Responda APENAS com o JSON válido."""
         
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="persona")
         
         import json
         try:
@@ -411,6 +420,8 @@ Use linguagem vívida e emotiva. Responda APENAS com o JSON válido."""
     
     async def generate_ebook(self, topic: str, target_audience: str, chapters: int = 5) -> dict:
         """Gera e-book completo"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         prompt = f"""Crie um e-book completo sobre: {topic}
 
 Público-alvo: {target_audience}
@@ -438,7 +449,7 @@ Forneça em formato JSON:
 Seja detalhado e prático. Responda APENAS com o JSON válido."""
         
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="ebook")
         
         import json
         try:
@@ -448,6 +459,8 @@ Seja detalhado e prático. Responda APENAS com o JSON válido."""
     
     async def generate_script_direct(self, tipo: str = "premium") -> dict:
         """Gera scripts para automação de Direct/WhatsApp"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         prompt = f"""Crie um fluxo completo de mensagens para Direct/WhatsApp usando método OÁSIS.
 
 Tipo: {tipo} (fast = baixo ticket/volume | premium = alto ticket/qualificação)
@@ -478,7 +491,7 @@ Forneça em formato JSON:
 Responda APENAS com o JSON válido."""
         
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="script")
         
         import json
         try:
@@ -0,0 +1,295 @@
+"""
+Roteamento de Modelos por Tarefa
+
+Os serviços não escolhem mais o modelo: pedem uma tarefa ("caption",
+"seo_ideas", "lucresia_chat"...) e a política central decide qual modelo
+atende.
+
+- Cada tarefa pertence a um nível (TASK_TIERS): premium, standard, fast,
+  long (gerações longas, como e-books) ou vision. O nível é uma lista
+  ordenada de modelos: o primeiro é o primário, os seguintes são as
+  alternativas
+- Fallback: se o primário passar de `slow_seconds` do nível ou falhar com um
+  erro que permite retry (utils.ai_retry.should_retry), a mesma mensagem vai
+  para o próximo modelo. O último da lista não tem limite próprio (só o prazo
+  do request e o timeout de quem chamou)
+- Circuit breaker por modelo ("model:openai/gpt-4o"): um primário lento ou
+  fora do ar várias vezes seguidas deixa de ser tentado até o cooldown e as
+  chamadas vão direto para a alternativa
+- Cada chamada marca a tarefa no contexto (utils.observability): o ledger de
+  uso (services.llm_usage) grava tarefa + modelo + latência + custo e o
+  relatório de uso agrupa por `task`
+- Métricas Prometheus: elevare_llm_route_seconds{task,model,outcome} e
+  elevare_llm_route_fallbacks_total{task,model,reason}
+
+Configuração por ambiente, sem mexer nos serviços:
+- MODEL_ROUTES="caption=standard,seo_ideas=fast": nível de cada tarefa
+- MODEL_TIER_FAST="openai/gpt-4o-mini,openai/gpt-4.1-mini": modelos do nível
+- MODEL_TIER_FAST_SLOW_SECONDS=20: espera pelo primário antes da alternativa
+
+Cada modelo de um RoutedChat tem sua própria sessão LlmChat (histórico
+separado): quem depende do histórico entre mensagens deve reenviar o contexto
+no prompt, como já fazem os geradores.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from prometheus_client import Counter, Histogram
+
+from utils.ai_retry import CircuitOpenError, get_breaker, should_retry
+from utils.deadline import DeadlineExceeded, bounded_timeout, remaining
+from utils.observability import llm_task
+
+logger = logging.getLogger("elevare.model_router")
+
+ROUTE_SECONDS = Histogram(
+    "elevare_llm_route_seconds", "Latência por tarefa e modelo (roteamento de modelos)",
+    ["task", "model", "outcome"], buckets=(0.5, 1, 2, 4, 8, 15, 30, 60, 120),
+)
+ROUTE_FALLBACKS = Counter(
+    "elevare_llm_route_fallbacks_total", "Chamadas desviadas do modelo para a alternativa seguinte",
+    ["task", "model", "reason"],
+)
+
+# Modelos de cada nível, na ordem de tentativa
+DEFAULT_TIERS: Dict[str, Tuple[str, ...]] = {
+    "premium": ("openai/gpt-4o", "openai/gpt-4.1"),
+    "standard": ("openai/gpt-4o", "openai/gpt-4.1-mini"),
+    "fast": ("openai/gpt-4o-mini", "openai/gpt-4.1-mini", "openai/gpt-4o"),
+    "long": ("openai/gpt-4o", "openai/gpt-4.1"),
+    "vision": ("openai/gpt-4o", "openai/gpt-4.1"),
+}
+# Segundos de espera pelo modelo antes de passar para o próximo. Só há
+# fallback se depois disso ainda sobrar prazo do request (padrão: 90s)
+DEFAULT_SLOW_SECONDS: Dict[str, float] = {
+    "premium": 40.0,
+    "standard": 35.0,
+    "fast": 12.0,
+    "long": 150.0,
+    "vision": 45.0,
+}
+DEFAULT_TIER = "premium"
+
+TASK_TIERS: Dict[str, str] = {
+    # LucresIA
+    "lucresia_chat": "premium",
+    "bio_analysis": "standard",
+    "bio_diagnosis": "standard",
+    "presence_diagnosis": "standard",
+    "content_aisv": "standard",
+    "persona": "standard",
+    "script": "standard",
+    "prompt_library": "standard",
+    "calendar_suggestions": "standard",
+    "campaign_sequence": "standard",
+    "post_captions": "fast",
+    "post_copy": "fast",
+    "brand_suggestions": "fast",
+    "chat_summary": "fast",
+    # E-books
+    "ebook": "long",
+    "ebook_structured": "long",
+    # MultiPlatformGenerator
+    "caption": "fast",
+    "whatsapp_script": "fast",
+    "story_sequence": "fast",
+    # SEOBlogGenerator
+    "seo_article": "standard",
+    "seo_ideas": "fast",
+    "seo_improve": "standard",
+    # CarouselGenerator
+    "carousel": "standard",
+    "carousel_sequence": "standard",
+    # ContentVerifier
+    "content_verify": "fast",
+    "content_improve": "fast",
+    # Análise de prints (precisa de modelo com visão)
+    "presence_visual": "vision",
+}
+
+
+def _parse_pairs(raw: str) -> Dict[str, str]:
+    pairs = {}
+    for item in raw.split(","):
+        key, _, value = item.strip().partition("=")
+        if key and value:
+            pairs[key.strip()] = value.strip()
+    return pairs
+
+
+class Route(NamedTuple):
+    task: str
+    tier: str
+    models: Tuple[str, ...]
+    slow_seconds: float
+
+
+class ModelRouter:
+    """Política de roteamento: tarefa → nível → modelos (com overrides do ambiente)"""
+
+    def __init__(self, env: Optional[Dict[str, str]] = None):
+        env = os.environ if env is None else env
+        self.tiers: Dict[str, Tuple[str, ...]] = {}
+        self.slow_seconds: Dict[str, float] = {}
+        for tier in set(DEFAULT_TIERS) | {
+            key[len("MODEL_TIER_"):].lower() for key in env
+            if key.startswith("MODEL_TIER_") and not key.endswith("_SLOW_SECONDS")
+        }:
+            prefix = f"MODEL_TIER_{tier.upper()}"
+            models = tuple(m.strip() for m in env.get(prefix, "").split(",") if m.strip())
+            models = models or DEFAULT_TIERS.get(tier, ())
+            invalid = [model for model in models if "/" not in model]
+            if not models or invalid:
+                raise ValueError(f"{prefix}: use provedor/modelo separados por vírgula (inválidos: {invalid})")
+            self.tiers[tier] = models
+            self.slow_seconds[tier] = float(env.get(f"{prefix}_SLOW_SECONDS", DEFAULT_SLOW_SECONDS.get(tier, 60.0)))
+
+        self.task_tiers = {**TASK_TIERS, **_parse_pairs(env.get("MODEL_ROUTES", ""))}
+        unknown = {tier for tier in self.task_tiers.values() if tier not in self.tiers}
+        if unknown:
+            raise ValueError(f"MODEL_ROUTES com nível inexistente: {', '.join(sorted(unknown))}")
+
+    def route(self, task: str) -> Route:
+        tier = self.task_tiers.get(task)
+        if tier is None:
+            logger.warning(f"Tarefa sem rota definida: {task} (usando {DEFAULT_TIER})")
+            tier = DEFAULT_TIER
+        return Route(task, tier, self.tiers[tier], self.slow_seconds[tier])
+
+    def status(self) -> dict:
+        """Política em vigor e estado dos breakers por modelo (para diagnóstico)"""
+        models = sorted({model for models in self.tiers.values() for model in models})
+        return {
+            "tiers": {
+                tier: {"models": list(models), "slow_seconds": self.slow_seconds[tier]}
+                for tier, models in sorted(self.tiers.items())
+            },
+            "tasks": dict(sorted(self.task_tiers.items())),
+            "models": [get_breaker(f"model:{model}").snapshot() for model in models],
+        }
+
+
+model_router = ModelRouter()
+
+
+# ============================================================================
+# CHAT ROTEADO
+# ============================================================================
+
+class RoutedChat:
+    """
+    Substitui LlmChat(...).with_model(...) nos serviços: mesma send_message,
+    mas o modelo vem da rota da tarefa, com fallback entre os modelos do nível.
+    """
+
+    def __init__(self, task: str, session_id: str, system_message: str, api_key: Optional[str] = None,
+                 router: Optional[ModelRouter] = None):
+        self.task = task
+        self.session_id = session_id
+        self.system_message = system_message
+        self.api_key = api_key or os.environ.get("EMERGENT_LLM_KEY")
+        self.router = router or model_router
+        self.last_model: Optional[str] = None
+        self._chats: Dict[str, object] = {}
+
+    def _chat_for(self, model: str):
+        chat = self._chats.get(model)
+        if chat is None:
+            from emergentintegrations.llm.chat import LlmChat
+
+            provider, _, name = model.partition("/")
+            chat = LlmChat(
+                api_key=self.api_key,
+                session_id=f"{self.session_id}:{model}" if self._chats else self.session_id,
+                system_message=self.system_message,
+            ).with_model(provider, name)
+            self._chats[model] = chat
+        return chat
+
+    async def send_message(self, message, task: Optional[str] = None):
+        """
+        Envia pelo primeiro modelo disponível da rota.
+
+        Raises:
+            CircuitOpenError: todos os modelos da rota com circuito aberto
+            DeadlineExceeded: prazo do request esgotado
+            Exception: erro do último modelo tentado (ou erro que não permite retry)
+        """
+        route = self.router.route(task or self.task)
+        with llm_task(route.task):
+            return await self._send(route, message)
+
+    async def _send(self, route: Route, message):
+        candidates: List[str] = list(route.models)
+        skipped: List[str] = []
+
+        while candidates:
+            model = candidates.pop(0)
+            breaker = get_breaker(f"model:{model}")
+            try:
+                breaker.before_call()
+            except CircuitOpenError:
+                skipped.append(model)
+                if candidates:
+                    ROUTE_FALLBACKS.labels(route.task, model, "circuit_open").inc()
+                continue
+
+            # Alternativa só compensa se ainda sobrar prazo depois de esperar pelo primário
+            left = remaining()
+            has_fallback = bool(candidates) and (left is None or left > route.slow_seconds)
+            timeout = bounded_timeout(route.slow_seconds if has_fallback else None, f"llm:{route.task}")
+
+            start = time.perf_counter()
+            outcome = "error"
+            try:
+                coro = self._chat_for(model).send_message(message)
+                response = await (coro if timeout is None else asyncio.wait_for(coro, timeout))
+                outcome = "ok"
+            except asyncio.CancelledError:
+                outcome = "cancelled"
+                breaker.release()
+                raise
+            except asyncio.TimeoutError:
+                outcome = "slow"
+                if not has_fallback:
+                    # Cortada pelo prazo do request, não por lentidão do modelo
+                    breaker.release()
+                    raise DeadlineExceeded(f"llm:{route.task}")
+                breaker.record_failure()
+                reason = "slow"
+            except Exception as e:
+                if not should_retry(e):
+                    # Chave, cota, conta: outro modelo da mesma conta não resolve
+                    breaker.record_success()
+                    raise
+                breaker.record_failure()
+                if not has_fallback:
+                    raise
+                reason = "error"
+                logger.warning(f"Rota {route.task}: {model} falhou ({e}); tentando {candidates[0]}")
+            else:
+                breaker.record_success()
+                self.last_model = model
+                return response
+            finally:
+                ROUTE_SECONDS.labels(route.task, model, outcome).observe(time.perf_counter() - start)
+
+            ROUTE_FALLBACKS.labels(route.task, model, reason).inc()
+            if reason == "slow":
+                logger.warning(
+                    f"Rota {route.task}: {model} sem resposta em {route.slow_seconds:g}s; tentando {candidates[0]}"
+                )
+
+        raise CircuitOpenError(f"Nenhum modelo disponível para {route.task} (circuito aberto: {', '.join(skipped)})")
+
+
+def routed_chat(task: str, session_id: str, system_message: str, api_key: Optional[str] = None) -> RoutedChat:
+    return RoutedChat(task, session_id, system_message, api_key=api_key)
+
+
+def routing_status() -> dict:
+    return model_router.status()
@@ -5,10 +5,9 @@ Gera legendas otimizadas para cada plataforma e scripts de WhatsApp para estéti
 
 import os
 import uuid
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from dotenv import load_dotenv
 
-load_dotenv()
+from services.model_router import routed_chat
+
 
 # Diretrizes por plataforma
 PLATFORM_GUIDELINES = {
@@ -103,14 +102,15 @@ Regras de ouro:
             system_message += f"- Posicionamento: {brand_identity.get('positioning', '')}\n"
             system_message += f"- Estilo: {brand_identity.get('visual_style', '')}\n"
         
-        self.chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"multi_platform_{uuid.uuid4().hex[:8]}",
-            system_message=system_message
-        ).with_model("openai", "gpt-4o")
+        # Tarefas curtas: modelo rápido pela rota de cada método (services.model_router)
+        self.chat = routed_chat(
+            "caption", f"multi_platform_{uuid.uuid4().hex[:8]}", system_message, api_key=self.api_key
+        )
     
     async def generate_caption(self, content: str, platform: str, tone: str = "profissional") -> dict:
         """Gera legenda otimizada para plataforma específica"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         guidelines = PLATFORM_GUIDELINES.get(platform, PLATFORM_GUIDELINES["instagram"])
         
         prompt = f"""Crie uma legenda otimizada para {platform.upper()} baseada neste conteúdo:
@@ -181,6 +181,8 @@ Responda APENAS com o JSON válido."""
         context: str = None
     ) -> dict:
         """Gera script de WhatsApp para cenário específico"""
+        from emergentintegrations.llm.chat import UserMessage
+        
         scenario_info = WHATSAPP_SCENARIOS.get(scenario, WHATSAPP_SCENARIOS["primeiro_contato"])
         
         brand_context = ""
@@ -242,7 +244,7 @@ Responda em JSON:
 Responda APENAS com o JSON válido."""
 
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="whatsapp_script")
         
         import json
         import re
@@ -265,6 +267,7 @@ Responda APENAS com o JSON válido."""
         number_of_stories: int = 5
     ) -> dict:
         """Gera sequência de stories com narrativa"""
+        from emergentintegrations.llm.chat import UserMessage
         
         story_types = {
             "dia_a_dia": "Mostre um dia típico na clínica, humanizando a profissional",
@@ -316,7 +319,7 @@ Responda em JSON:
 Responda APENAS com o JSON válido."""
 
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="story_sequence")
         
         import json
         import re
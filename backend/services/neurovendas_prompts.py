@@ -5,37 +5,12 @@ Sistema de geração de apresentações de alta conversão para estética
 
 from typing import Dict, Optional
 
-class NeurovendasPromptBuilder:
-    """Construtor de prompts otimizados para conversão em estética"""
-    
-    @staticmethod
-    def build_procedimento_prompt(
-        procedimento: str,
-        publico_alvo: str = "pacientes de alto ticket",
-        problema_principal: str = None,
-        diferencial_clinica: str = None,
-        preco_investimento: str = None
-    ) -> str:
-        """
-        Constrói prompt premium para apresentação de procedimento estético
-        
-        Args:
-            procedimento: Nome do procedimento (ex: "Harmonização Facial")
-            publico_alvo: Perfil do público (padrão: alto ticket)
-            problema_principal: Dor principal a ser abordada
-            diferencial_clinica: O que torna a clínica única
-            preco_investimento: Faixa de preço (opcional)
-        """
-        
-        # Problema padrão se não fornecido
-        if not problema_principal:
-            problema_principal = "perda de autoestima e sinais visíveis de envelhecimento"
-        
-        # Diferencial padrão
-        if not diferencial_clinica:
-            diferencial_clinica = "tecnologia de ponta, segurança comprovada e resultados naturais"
-        
-        prompt = f"""### ROLE
+from services.prompt_registry import prompt_registry
+
+# Templates compilados uma vez no carregamento (ver services.prompt_registry)
+PROCEDIMENTO_PROMPT = prompt_registry.register(
+    "neurovendas_procedimento", "1",
+    """### ROLE
 Você é um Especialista em Neurovendas e Designer de Luxo para Clínicas de Estética Avançada.
 
 ### OBJECTIVE
@@ -107,8 +82,7 @@ Título: "Investimento no Seu Bem-Estar"
 Conteúdo:
 - Apresentar valor como "Custo do Bem-estar" vs "Preço"
 - Comparação: "Quanto você investe mensalmente em [outros produtos]?"
-- Parcelamento acessível e facilidades{f'''
-- Investimento: {preco_investimento}''' if preco_investimento else ''}
+- Parcelamento acessível e facilidades{linha_investimento}
 Visual: Layout clean focado no benefício, não no preço
 
 **SLIDE 7 - CTA FINAL (Comando Direto)**
@@ -165,26 +139,14 @@ Cada slide deve ter:
 - Foque no benefício emocional final
 - Use storytelling sutil (jornada do paciente)
 - Evite jargões médicos sem explicação
-"""
-        
-        return prompt
-    
-    @staticmethod
-    def build_script_vendas_prompt(
-        procedimento: str,
-        etapa_funil: str = "consultoria inicial",
-        objecao_principal: str = "preço alto"
-    ) -> str:
-        """
-        Constrói prompt para script de vendas via WhatsApp/Presencial
-        
-        Args:
-            procedimento: Procedimento a ser vendido
-            etapa_funil: Etapa do funil (inicial, apresentação, fechamento)
-            objecao_principal: Principal objeção a ser trabalhada
-        """
-        
-        prompt = f"""### ROLE
+""",
+    variables={"procedimento": str, "publico_alvo": str, "problema_principal": str, "diferencial_clinica": str, "linha_investimento": str},
+    description="Apresentação de vendas de procedimento (8 slides, Gamma)",
+)
+
+SCRIPT_VENDAS_PROMPT = prompt_registry.register(
+    "neurovendas_script_vendas", "1",
+    """### ROLE
 Você é uma Consultora de Neurovendas especializada em Estética de Alto Ticket.
 
 ### OBJECTIVE
@@ -231,21 +193,14 @@ O script deve:
 
 ### OUTPUT
 Retorne o script completo linha a linha, com indicações de pausas e ênfases.
-"""
-        
-        return prompt
-    
-    @staticmethod
-    def build_ebook_premium_prompt(
-        titulo: str,
-        tema: str,
-        publico: str
-    ) -> str:
-        """
-        Constrói prompt para e-book educativo premium de estética
-        """
-        
-        prompt = f"""### ROLE
+""",
+    variables={"procedimento": str, "etapa_funil": str, "objecao_principal": str},
+    description="Script de vendas (WhatsApp/presencial)",
+)
+
+EBOOK_PREMIUM_PROMPT = prompt_registry.register(
+    "neurovendas_ebook_premium", "1",
+    """### ROLE
 Você é uma Estrategista de Conteúdo Premium para o mercado de Estética Avançada.
 
 ### OBJECTIVE
@@ -334,9 +289,84 @@ Retorne o e-book completo estruturado em JSON:
   "conclusao": "",
   "cta_final": ""
 }}
-"""
+""",
+    variables={"titulo": str, "tema": str, "publico": str},
+    description="E-book educativo premium",
+)
+
+
+class NeurovendasPromptBuilder:
+    """Construtor de prompts otimizados para conversão em estética"""
+    
+    @staticmethod
+    def build_procedimento_prompt(
+        procedimento: str,
+        publico_alvo: str = "pacientes de alto ticket",
+        problema_principal: str = None,
+        diferencial_clinica: str = None,
+        preco_investimento: str = None
+    ) -> str:
+        """
+        Constrói prompt premium para apresentação de procedimento estético
+        
+        Args:
+            procedimento: Nome do procedimento (ex: "Harmonização Facial")
+            publico_alvo: Perfil do público (padrão: alto ticket)
+            problema_principal: Dor principal a ser abordada
+            diferencial_clinica: O que torna a clínica única
+            preco_investimento: Faixa de preço (opcional)
+        """
+        
+        # Problema padrão se não fornecido
+        if not problema_principal:
+            problema_principal = "perda de autoestima e sinais visíveis de envelhecimento"
+        
+        # Diferencial padrão
+        if not diferencial_clinica:
+            diferencial_clinica = "tecnologia de ponta, segurança comprovada e resultados naturais"
+        
+        return prompt_registry.render(
+            "neurovendas_procedimento",
+            procedimento=procedimento,
+            publico_alvo=publico_alvo,
+            problema_principal=problema_principal,
+            diferencial_clinica=diferencial_clinica,
+            linha_investimento=f"\n- Investimento: {preco_investimento}" if preco_investimento else "",
+        ).text
+    
+    @staticmethod
+    def build_script_vendas_prompt(
+        procedimento: str,
+        etapa_funil: str = "consultoria inicial",
+        objecao_principal: str = "preço alto"
+    ) -> str:
+        """
+        Constrói prompt para script de vendas via WhatsApp/Presencial
+        
+        Args:
+            procedimento: Procedimento a ser vendido
+            etapa_funil: Etapa do funil (inicial, apresentação, fechamento)
+            objecao_principal: Principal objeção a ser trabalhada
+        """
+        
+        return prompt_registry.render(
+            "neurovendas_script_vendas",
+            procedimento=procedimento,
+            etapa_funil=etapa_funil,
+            objecao_principal=objecao_principal,
+        ).text
+    
+    @staticmethod
+    def build_ebook_premium_prompt(
+        titulo: str,
+        tema: str,
+        publico: str
+    ) -> str:
+        """
+        Constrói prompt para e-book educativo premium de estética
+        """
         
-        return prompt
+        return prompt_registry.render("neurovendas_ebook_premium", titulo=titulo, tema=tema, publico=publico).text
 
 
 # Funções helper para uso fácil
@@ -0,0 +1,329 @@
+"""
+Renderização de PDFs Elevare (fpdf2)
+
+- Fontes TTF (DejaVu) são lidas e parseadas UMA vez por worker; cada documento
+  recebe uma cópia leve da fonte já processada em vez de chamar add_font()
+- Paletas dos templates são convertidas para RGB no import
+- Backend PDF do pipeline de renderização (services.render_pipeline)
+"""
+
+import copy
+import logging
+import os
+import threading
+from io import BytesIO
+from typing import Dict, NamedTuple, Tuple
+
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.fonts import SubsetMap, TTFFont
+
+from services.ebook_layout import EbookLayout, LayoutBlock, LayoutSection
+
+logger = logging.getLogger("elevare.pdf")
+
+# ============================================================================
+# FONTES
+# ============================================================================
+
+FONT_DIR = os.environ.get("PDF_FONT_DIR", "/usr/share/fonts/truetype/dejavu")
+FONT_FAMILY = "DejaVu"
+FALLBACK_FONT_FAMILY = "Helvetica"
+
+FONT_FILES = {
+    "": "DejaVuSans.ttf",
+    "B": "DejaVuSans-Bold.ttf",
+    "I": "DejaVuSans-Oblique.ttf",
+}
+
+# style -> (fonte parseada usada como modelo, bytes do arquivo TTF)
+_font_cache: Dict[str, Tuple[TTFFont, bytes]] = {}
+_font_cache_lock = threading.Lock()
+_fonts_loaded = False
+
+
+def _load_fonts() -> Dict[str, Tuple[TTFFont, bytes]]:
+    """Lê e parseia as fontes uma única vez por processo"""
+    global _fonts_loaded
+    if _fonts_loaded:
+        return _font_cache
+
+    with _font_cache_lock:
+        if _fonts_loaded:
+            return _font_cache
+
+        loader = FPDF()
+        for style, filename in FONT_FILES.items():
+            path = os.path.join(FONT_DIR, filename)
+            try:
+                with open(path, "rb") as font_file:
+                    data = font_file.read()
+                fontkey = f"{FONT_FAMILY.lower()}{style}"
+                _font_cache[style] = (TTFFont(loader, path, fontkey, style), data)
+            except Exception as e:
+                logger.warning(f"Fonte {path} indisponível: {e}")
+
+        _fonts_loaded = True
+        logger.info(f"Fontes PDF carregadas: {sorted(_font_cache) or 'nenhuma'}")
+
+    return _font_cache
+
+
+def warm_font_cache() -> bool:
+    """Pré-carrega as fontes (chamar no startup do worker). Retorna True se DejaVu está disponível"""
+    fonts = _load_fonts()
+    return "" in fonts and "B" in fonts
+
+
+def _clone_font(template: TTFFont, data: bytes, pdf: FPDF) -> TTFFont:
+    """
+    Cria uma cópia da fonte para um novo documento.
+
+    Métricas (cmap, larguras, glyph ids, descriptor) são compartilhadas; o que
+    o fpdf2 altera durante a escrita (subset, glifos faltantes, TTFont que é
+    subsetado in-place no output) é recriado por documento.
+    """
+    font = copy.copy(template)
+    font.i = len(pdf.fonts) + 1
+    font.ttfont = ttLib.TTFont(BytesIO(data), recalcTimestamp=False, fontNumber=0, lazy=True)
+    font.cw = copy.copy(template.cw)
+    font.missing_glyphs = []
+    font.biggest_size_pt = 0
+    font._hbfont = None
+    font.subset = SubsetMap(font)
+    return font
+
+
+def register_cached_fonts(pdf: FPDF) -> Tuple[str, str]:
+    """
+    Registra as fontes em cache no documento.
+
+    Returns:
+        (família de fonte, estilo itálico) — cai para Helvetica se DejaVu não existir
+    """
+    fonts = _load_fonts()
+    if "" not in fonts or "B" not in fonts:
+        return FALLBACK_FONT_FAMILY, ""
+
+    for style, (template, data) in fonts.items():
+        fontkey = f"{FONT_FAMILY.lower()}{style}"
+        if fontkey not in pdf.fonts:
+            pdf.fonts[fontkey] = _clone_font(template, data, pdf)
+
+    return FONT_FAMILY, "I" if "I" in fonts else ""
+
+
+class ElevarePDF(FPDF):
+    """FPDF com fontes Unicode pré-carregadas"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.font_name, self.italic_style = register_cached_fonts(self)
+
+
+# ============================================================================
+# PALETAS (resolvidas no import)
+# ============================================================================
+
+class PDFPalette(NamedTuple):
+    primary: Tuple[int, int, int]
+    secondary: Tuple[int, int, int]
+    text: Tuple[int, int, int]
+    accent: Tuple[int, int, int]
+
+
+def hex_to_rgb(hex_color: str) -> Tuple[int, int, int]:
+    """Converte #RRGGBB para tupla RGB"""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+# Templates do e-book estruturado - paleta Elevare
+STRUCTURED_TEMPLATE_PALETTES: Dict[str, PDFPalette] = {
+    "educational": PDFPalette((139, 92, 246), (167, 139, 250), (30, 41, 59), (147, 51, 234)),
+    "marketing": PDFPalette((217, 70, 239), (236, 72, 153), (30, 41, 59), (212, 175, 55)),
+    "storytelling": PDFPalette((124, 58, 237), (139, 92, 246), (30, 41, 59), (212, 175, 55)),
+}
+
+# Esquemas de cores do novo sistema de e-books (Elevare E-books)
+COLOR_SCHEMES = {
+    "clean-profissional": {"primary": "#4F46E5", "secondary": "#7C3AED", "accent": "#D4A853"},
+    "acolhedor-feminino": {"primary": "#EC4899", "secondary": "#A855F7", "accent": "#D4A853"},
+    "moderno-impactante": {"primary": "#06B6D4", "secondary": "#F59E0B", "accent": "#EC4899"}
+}
+
+COLOR_SCHEME_PALETTES: Dict[str, PDFPalette] = {
+    name: PDFPalette(
+        hex_to_rgb(scheme["primary"]),
+        hex_to_rgb(scheme["secondary"]),
+        (30, 30, 30),
+        hex_to_rgb(scheme["accent"]),
+    )
+    for name, scheme in COLOR_SCHEMES.items()
+}
+
+# Paleta do motor V2 (Lavanda / Petróleo / Dourado Elevare)
+ELEVARE_V2_PALETTE = PDFPalette((138, 124, 168), (128, 122, 168), (52, 73, 94), (212, 175, 55))
+
+PDF_TEMPLATE_PALETTES: Dict[str, PDFPalette] = {
+    **STRUCTURED_TEMPLATE_PALETTES,
+    **COLOR_SCHEME_PALETTES,
+    "elevare-v2": ELEVARE_V2_PALETTE,
+}
+
+
+def resolve_template(template: str) -> str:
+    """Nome efetivo do template PDF (fallback: educational)"""
+    return template if template in PDF_TEMPLATE_PALETTES else "educational"
+
+
+# ============================================================================
+# RENDERER (layout → PDF)
+# ============================================================================
+
+class LayoutPDF(ElevarePDF):
+    """PDF de e-book com header/footer e paleta do template"""
+
+    def __init__(self, template: str, title: str):
+        super().__init__()
+        self.palette = PDF_TEMPLATE_PALETTES[resolve_template(template)]
+        self.ebook_title = title
+        self.bullet = "•" if self.font_name == FONT_FAMILY else chr(149)
+        self.set_auto_page_break(auto=True, margin=20)
+        self.set_title(title)
+
+    def header(self):
+        if self.page_no() > 2:  # Sem header na capa e no sumário
+            self.set_font(self.font_name, self.italic_style, 8)
+            self.set_text_color(*self.palette.secondary)
+            self.cell(0, 10, self.ebook_title, align='C')
+            self.ln(10)
+
+    def footer(self):
+        if self.page_no() > 1:
+            self.set_y(-15)
+            self.set_font(self.font_name, self.italic_style, 8)
+            self.set_text_color(128, 128, 128)
+            self.cell(0, 10, f'Página {self.page_no()}', align='C')
+
+    def cover(self, layout: EbookLayout):
+        self.add_page()
+        self.set_fill_color(*self.palette.primary)
+        self.rect(0, 0, 210, 297, 'F')
+
+        # Decoração
+        self.set_draw_color(*self.palette.accent)
+        self.set_line_width(1)
+        self.line(30, 70, 180, 70)
+
+        self.set_y(80)
+        self.set_font(self.font_name, 'B', 28)
+        self.set_text_color(255, 255, 255)
+        self.multi_cell(0, 12, layout.title, align='C', new_x="LMARGIN", new_y="NEXT")
+
+        if layout.subtitle:
+            self.ln(10)
+            self.set_font(self.font_name, self.italic_style, 14)
+            self.multi_cell(0, 8, layout.subtitle, align='C', new_x="LMARGIN", new_y="NEXT")
+
+        self.line(30, self.get_y() + 10, 180, self.get_y() + 10)
+
+        self.set_y(240)
+        self.set_font(self.font_name, '', 12)
+        self.cell(0, 10, f"Por: {layout.author}", align='C', new_x="LMARGIN", new_y="NEXT")
+        if layout.audience:
+            self.set_font(self.font_name, self.italic_style, 10)
+            self.cell(0, 8, f"Para: {layout.audience}", align='C', new_x="LMARGIN", new_y="NEXT")
+
+        self.set_y(270)
+        self.set_font(self.font_name, '', 9)
+        self.cell(0, 10, "Gerado pela Plataforma Elevare", align='C')
+
+    def table_of_contents(self, chapters):
+        self.add_page()
+        self.set_text_color(*self.palette.primary)
+        self.set_font(self.font_name, 'B', 24)
+        self.cell(0, 15, "Sumário", new_x="LMARGIN", new_y="NEXT")
+
+        self.set_draw_color(*self.palette.accent)
+        self.set_line_width(1)
+        self.line(10, self.get_y(), 60, self.get_y())
+        self.ln(10)
+
+        self.set_text_color(*self.palette.text)
+        self.set_font(self.font_name, '', 12)
+        for chapter in chapters:
+            label = f"Capítulo {chapter.number}: {chapter.title}" if chapter.number else chapter.title
+            self.multi_cell(0, 9, label, new_x="LMARGIN", new_y="NEXT")
+
+    def chapter(self, section: LayoutSection):
+        self.add_page()
+
+        if section.number:
+            self.set_text_color(*self.palette.accent)
+            self.set_font(self.font_name, 'B', 10)
+            self.cell(0, 10, f"CAPÍTULO {section.number}", new_x="LMARGIN", new_y="NEXT")
+
+        if section.title:
+            self.set_font(self.font_name, 'B', 20)
+            self.set_text_color(*self.palette.primary)
+            self.multi_cell(0, 10, section.title, align='L', new_x="LMARGIN", new_y="NEXT")
+            self.set_draw_color(*self.palette.secondary)
+            self.set_line_width(0.5)
+            self.line(10, self.get_y() + 3, 200, self.get_y() + 3)
+            self.ln(8)
+
+        if section.subtitle:
+            self.set_font(self.font_name, self.italic_style, 12)
+            self.set_text_color(*self.palette.secondary)
+            self.multi_cell(0, 7, section.subtitle, new_x="LMARGIN", new_y="NEXT")
+            self.ln(5)
+
+        for block in section.blocks:
+            self.block(block)
+
+        if section.note:
+            self.ln(4)
+            self.set_text_color(100, 100, 100)
+            self.set_font(self.font_name, '', 9)
+            self.multi_cell(0, 6, f"Referência: {section.note}", new_x="LMARGIN", new_y="NEXT")
+
+    def block(self, block: LayoutBlock):
+        self.set_text_color(*self.palette.text)
+
+        if block.kind == "paragraph":
+            self.set_font(self.font_name, '', 11)
+            self.multi_cell(0, 6, block.text, new_x="LMARGIN", new_y="NEXT")
+            self.ln(4)
+
+        elif block.kind == "bullet_list":
+            self.set_font(self.font_name, '', 11)
+            for item in block.items:
+                self.cell(8, 6, self.bullet)
+                self.multi_cell(0, 6, item, new_x="LMARGIN", new_y="NEXT")
+            self.ln(3)
+
+        elif block.kind == "callout":
+            self.set_fill_color(*_tint(self.palette.accent))
+            self.set_font(self.font_name, self.italic_style, 10)
+            self.multi_cell(0, 6, block.text, fill=True, new_x="LMARGIN", new_y="NEXT")
+            self.ln(5)
+
+
+def _tint(rgb: Tuple[int, int, int], amount: float = 0.8) -> Tuple[int, int, int]:
+    """Clareia a cor para fundo de callout"""
+    return tuple(int(c + (255 - c) * amount) for c in rgb)
+
+
+def render_layout_pdf(layout: EbookLayout, template: str) -> bytes:
+    """Renderiza o layout do e-book em PDF"""
+    pdf = LayoutPDF(template, layout.title)
+
+    pdf.cover(layout)
+    chapters = layout.chapters
+    if chapters:
+        pdf.table_of_contents(chapters)
+    for section in chapters:
+        pdf.chapter(section)
+
+    return bytes(pdf.output())
@@ -0,0 +1,279 @@
+"""
+Registro Versionado de Prompts
+
+Os prompts de geração deixam de ser montados com f-strings espalhadas pelo
+código: cada um é registrado uma vez (nome + versão + texto + variáveis
+tipadas) e compilado no carregamento em uma lista de trechos fixos e campos.
+
+- render(): valida as variáveis (faltando, desconhecidas ou de tipo errado →
+  PromptVariableError) e junta os trechos em uma passada, sem str.replace
+  repetido nem reprocessar o texto que veio da usuária
+- version_id ("nome@versão.hash"): muda sempre que o texto muda, mesmo sem
+  bump de versão. É gravado junto de cada geração e no ledger de uso de LLM
+  (chave de cache e comparação A/B entre versões)
+- tokens do prefixo fixo (texto antes da primeira variável) e do total fixo
+  calculados uma vez por template (tiktoken quando instalado; senão a
+  estimativa de ~4 caracteres por token)
+- várias versões do mesmo prompt podem coexistir; a ativa é a mais recente,
+  ou a fixada em PROMPT_VERSIONS ("nome=versão,outro=versão")
+
+Dois formatos de template:
+- "format": sintaxe do str.format ({variavel}, chaves literais como {{ }}),
+  o que permite mover uma f-string para cá sem reescrevê-la
+- "brackets": [VARIAVEL] da Biblioteca de Prompts; maiúsculas/minúsculas
+  indiferentes e placeholders sem valor ficam no texto como estão
+
+Relatório de tokens por template: python -m benchmarks.prompt_footprint
+"""
+
+import hashlib
+import logging
+import os
+import re
+import string
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple, Union
+
+from utils.observability import estimate_tokens, set_prompt_version
+
+logger = logging.getLogger("elevare.prompts")
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - dependência opcional
+    tiktoken = None
+
+TOKENIZER_ENCODING = os.environ.get("PROMPT_TOKENIZER_ENCODING", "o200k_base")
+
+BRACKET_PATTERN = re.compile(r"\[([A-Za-z_][A-Za-z0-9_]*)\]")
+
+# Tipo declarado → tipos aceitos em render()
+VariableType = Union[type, Tuple[type, ...]]
+
+
+class PromptVariableError(ValueError):
+    """Variáveis inválidas para o template (faltando, desconhecidas ou de tipo errado)"""
+
+
+# ============================================================================
+# TOKENS
+# ============================================================================
+
+_encoder = None
+_encoder_failed = False
+
+
+def count_tokens(text: str) -> int:
+    """Tokens do texto no tokenizer do modelo (fallback: estimativa por caracteres)"""
+    global _encoder, _encoder_failed
+    if not text:
+        return 0
+    if _encoder is None and not _encoder_failed and tiktoken is not None:
+        try:
+            _encoder = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception as e:  # arquivo do encoding indisponível (sem rede)
+            _encoder_failed = True
+            logger.warning(f"tiktoken indisponível ({e}); usando estimativa de tokens")
+    if _encoder is not None:
+        return len(_encoder.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+def tokenizer_name() -> str:
+    count_tokens("x")
+    return f"tiktoken/{TOKENIZER_ENCODING}" if _encoder is not None else "estimativa (~4 caracteres/token)"
+
+
+# ============================================================================
+# TEMPLATE
+# ============================================================================
+
+class RenderedPrompt(NamedTuple):
+    text: str
+    version_id: str
+
+
+def _format_value(value: Any) -> str:
+    if isinstance(value, (list, tuple)):
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+
+def _compile_format(text: str) -> List[Tuple[str, Optional[str]]]:
+    segments = []
+    for literal, field, spec, conversion in string.Formatter().parse(text):
+        if spec or conversion or (field is not None and not field.isidentifier()):
+            raise ValueError(f"Campo não suportado no template: {{{field}}}")
+        segments.append((literal, field))
+    return segments
+
+
+def _compile_brackets(text: str) -> List[Tuple[str, Optional[str]]]:
+    segments = []
+    position = 0
+    for match in BRACKET_PATTERN.finditer(text):
+        segments.append((text[position:match.start()], match.group(0)))
+        position = match.end()
+    segments.append((text[position:], None))
+    return segments
+
+
+class PromptTemplate:
+    """Template compilado: trechos fixos + campos, com variáveis tipadas"""
+
+    def __init__(
+        self,
+        name: str,
+        version: str,
+        text: str,
+        variables: Optional[Dict[str, VariableType]] = None,
+        defaults: Optional[Dict[str, Any]] = None,
+        syntax: str = "format",
+        description: str = "",
+    ):
+        self.name = name
+        self.version = str(version)
+        self.syntax = syntax
+        self.description = description
+        self.defaults = dict(defaults or {})
+        digest = hashlib.sha256(f"{syntax}\0{text}".encode("utf-8")).hexdigest()[:8]
+        self.version_id = f"{name}@{self.version}.{digest}"
+
+        if syntax == "format":
+            self._segments = _compile_format(text)
+            fields = {field for _, field in self._segments if field is not None}
+            self.variables: Dict[str, VariableType] = dict(variables or {})
+            undeclared = fields - set(self.variables)
+            if undeclared:
+                raise ValueError(f"Template {name}: variáveis sem tipo declarado: {sorted(undeclared)}")
+            unused = set(self.variables) - fields
+            if unused:
+                raise ValueError(f"Template {name}: variáveis declaradas e não usadas: {sorted(unused)}")
+        elif syntax == "brackets":
+            self._segments = _compile_brackets(text)
+            # Placeholders e variáveis declaradas, todos texto e opcionais
+            names = {field[1:-1].lower() for _, field in self._segments if field is not None}
+            names.update(name.lower() for name in (variables or {}))
+            self.variables = {name: str for name in names}
+        else:
+            raise ValueError(f"Sintaxe de template desconhecida: {syntax}")
+
+        self.static_text = "".join(literal for literal, _ in self._segments)
+        self._static_tokens: Optional[int] = None
+        self._prefix_tokens: Optional[int] = None
+
+    @property
+    def static_tokens(self) -> int:
+        """Tokens de todo o texto fixo (sem as variáveis)"""
+        if self._static_tokens is None:
+            self._static_tokens = count_tokens(self.static_text)
+        return self._static_tokens
+
+    @property
+    def prefix_tokens(self) -> int:
+        """Tokens do texto fixo antes da primeira variável (igual em todo request)"""
+        if self._prefix_tokens is None:
+            self._prefix_tokens = count_tokens(self._segments[0][0] if self._segments else "")
+        return self._prefix_tokens
+
+    def _validate(self, values: Dict[str, Any]) -> Dict[str, Any]:
+        if self.syntax == "brackets":
+            values = {name.lower(): value for name, value in values.items()}
+        unknown = set(values) - set(self.variables)
+        if unknown:
+            raise PromptVariableError(
+                f"Variáveis desconhecidas para {self.name}: {', '.join(sorted(unknown))}. "
+                f"Aceitas: {', '.join(sorted(self.variables)) or 'nenhuma'}"
+            )
+        values = {**self.defaults, **values}
+        if self.syntax == "format":
+            missing = set(self.variables) - set(values)
+            if missing:
+                raise PromptVariableError(f"Variáveis faltando para {self.name}: {', '.join(sorted(missing))}")
+        for name, value in values.items():
+            expected = self.variables[name]
+            if not isinstance(value, expected) or isinstance(value, bool) and bool not in _as_tuple(expected):
+                raise PromptVariableError(
+                    f"Variável {name} de {self.name} deve ser {_type_names(expected)}, recebido {type(value).__name__}"
+                )
+        return values
+
+    def render(self, **values) -> RenderedPrompt:
+        values = self._validate(values)
+        parts = []
+        for literal, field in self._segments:
+            parts.append(literal)
+            if field is None:
+                continue
+            if self.syntax == "brackets":
+                value = values.get(field[1:-1].lower())
+                parts.append(field if value is None else _format_value(value))
+            else:
+                parts.append(_format_value(values[field]))
+        return RenderedPrompt("".join(parts), self.version_id)
+
+
+def _as_tuple(expected: VariableType) -> Tuple[type, ...]:
+    return expected if isinstance(expected, tuple) else (expected,)
+
+
+def _type_names(expected: VariableType) -> str:
+    return " ou ".join(t.__name__ for t in _as_tuple(expected))
+
+
+# ============================================================================
+# REGISTRO
+# ============================================================================
+
+def _pinned_versions() -> Dict[str, str]:
+    pins = {}
+    for item in os.environ.get("PROMPT_VERSIONS", "").split(","):
+        name, _, version = item.strip().partition("=")
+        if name and version:
+            pins[name.strip()] = version.strip()
+    return pins
+
+
+class PromptRegistry:
+    def __init__(self):
+        self._templates: Dict[str, Dict[str, PromptTemplate]] = {}
+        self._pins = _pinned_versions()
+
+    def register(self, name: str, version: str, text: str, **options) -> PromptTemplate:
+        template = PromptTemplate(name, version, text, **options)
+        versions = self._templates.setdefault(name, {})
+        if template.version in versions:
+            raise ValueError(f"Prompt {name} versão {template.version} já registrado")
+        versions[template.version] = template
+        return template
+
+    def get(self, name: str, version: Optional[str] = None) -> PromptTemplate:
+        versions = self._templates.get(name)
+        if not versions:
+            raise KeyError(f"Prompt não registrado: {name}")
+        version = version or self._pins.get(name)
+        if version is not None:
+            if version not in versions:
+                raise KeyError(f"Prompt {name} sem versão {version}")
+            return versions[version]
+        return versions[list(versions)[-1]]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._templates
+
+    def render(self, name: str, version: Optional[str] = None, **values) -> RenderedPrompt:
+        """Renderiza a versão ativa e marca o request (ledger de uso) com o version_id"""
+        rendered = self.get(name, version).render(**values)
+        set_prompt_version(rendered.version_id)
+        return rendered
+
+    def templates(self) -> Iterable[PromptTemplate]:
+        """Todas as versões registradas"""
+        for versions in self._templates.values():
+            yield from versions.values()
+
+    def active(self) -> Iterable[PromptTemplate]:
+        for name in self._templates:
+            yield self.get(name)
+
+
+prompt_registry = PromptRegistry()
@@ -0,0 +1,334 @@
+"""
+Templates de Prompt Registrados (services.prompt_registry)
+
+Prompts de geração que antes eram f-strings nos endpoints do server.py e a
+Biblioteca de Prompts Estratégicos (placeholders [VARIAVEL]). Importar este
+módulo registra e compila todos uma única vez.
+
+Ao alterar um texto, suba a versão (ou registre uma nova ao lado da antiga
+para comparar): o version_id gravado nas gerações muda junto.
+"""
+
+from services.biblioteca_prompts import PROMPTS_ESTRATEGICOS
+from services.prompt_registry import prompt_registry
+
+# =============================================================================
+# CALENDÁRIO ELEVARE 360°
+# =============================================================================
+
+CALENDARIO_SUGESTOES = prompt_registry.register(
+    "calendario_sugestoes", "1",
+    """Gere um calendário de conteúdo para o mês de {mes} com o tema "{tema_principal}".
+
+Subtemas disponíveis: {subtemas}
+
+Configurações:
+- Posts por semana: {posts_por_semana}
+- Tipos de conteúdo: {tipos_conteudo}
+- Tom de comunicação: {tom_nome} ({tom_descricao})
+
+Gere em formato JSON uma lista com {total_posts} posts (4 semanas), cada um com:
+{{
+    "semana": 1-4,
+    "dia_semana": "segunda/terça/etc",
+    "tipo": "feed/reels/stories/etc",
+    "titulo": "título do post",
+    "subtema": "subtema relacionado",
+    "objetivo": "engajar/educar/vender/inspirar",
+    "legenda_sugerida": "legenda completa",
+    "hashtags": ["lista", "de", "hashtags"],
+    "horario_sugerido": "melhor horário"
+}}
+
+Distribua os tipos de conteúdo e objetivos de forma equilibrada.
+Responda APENAS com o JSON válido, sem texto adicional.""",
+    variables={
+        "mes": str,
+        "tema_principal": str,
+        "subtemas": list,
+        "posts_por_semana": int,
+        "tipos_conteudo": list,
+        "tom_nome": str,
+        "tom_descricao": str,
+        "total_posts": int,
+    },
+    description="Sugestões de posts do mês (POST /api/calendario/gerar-sugestoes)",
+)
+
+# =============================================================================
+# CAMPANHAS (CICLO NEUROVENDEDOR)
+# =============================================================================
+
+CAMPANHA_IDENTIDADE_MARCA = prompt_registry.register(
+    "campanha_identidade_marca", "1",
+    """
+IDENTIDADE DA MARCA:
+- Marca: {brand_name}
+- Segmento: {segment}
+- Especialidade: {main_specialty}
+- Posicionamento: {positioning}
+- Estilo Visual: {visual_style}
+- Frases-chave: {key_phrases}
+""",
+    variables={
+        "brand_name": str,
+        "segment": str,
+        "main_specialty": str,
+        "positioning": str,
+        "visual_style": str,
+        "key_phrases": list,
+    },
+    defaults={
+        "brand_name": "Não definido",
+        "segment": "estética",
+        "main_specialty": "",
+        "positioning": "",
+        "visual_style": "",
+        "key_phrases": [],
+    },
+    description="Bloco de identidade da marca inserido na sequência de campanha",
+)
+
+CAMPANHA_SEQUENCIA = prompt_registry.register(
+    "campanha_sequencia", "1",
+    """Você é a LucresIA, especialista em neurovendas para estética. 
+Gere uma sequência de 6 posts seguindo o CICLO NEUROVENDEDOR para a campanha:
+
+CAMPANHA: {nome}
+TEMA BASE: {tema_base}
+OBJETIVO: {objetivo}
+TOM: {tom_nome} - {tom_descricao}
+EMOÇÃO PRINCIPAL: {emocao_principal}
+{brand_context}
+CICLO A SEGUIR:
+1. IMPACTO (Reptiliano) - Reels/Frase instintiva - Captar atenção
+2. IDENTIFICAÇÃO (Límbico) - Storytelling/Bastidor - Criar conexão
+3. AUTORIDADE (Neocórtex) - Dica Técnica/Carrossel - Demonstrar expertise
+4. EDUCAÇÃO (Neocórtex) - Carrossel/Mini Aula - Entregar valor
+5. PROVA+OFERTA (Límbico/Reptiliano) - Depoimento+CTA - Converter
+6. ENCANTAMENTO (Límbico) - Bastidor/Agradecimento - Fidelizar
+
+Para CADA post, gere em JSON:
+{{
+    "dia": 1-6,
+    "titulo": "título curto",
+    "tipo_conteudo": "tipo sugerido",
+    "legenda": "legenda completa com gancho, corpo e CTA",
+    "cta": "call-to-action específico",
+    "gatilhos": ["lista", "de", "gatilhos"],
+    "dica_visual": "sugestão de visual/design"
+}}
+
+Responda APENAS com um array JSON válido dos 6 posts.""",
+    variables={
+        "nome": str,
+        "tema_base": str,
+        "objetivo": str,
+        "tom_nome": str,
+        "tom_descricao": str,
+        "emocao_principal": str,
+        "brand_context": str,
+    },
+    defaults={"brand_context": ""},
+    description="Sequência de 6 posts do ciclo neurovendedor (POST /api/campanhas/{id}/gerar-sequencia)",
+)
+
+# =============================================================================
+# DIAGNÓSTICO DE PRESENÇA VISUAL
+# =============================================================================
+
+PRESENCA_VISUAL_SYSTEM = prompt_registry.register(
+    "presenca_visual_system", "1",
+    "Você é um especialista premium em análise de presença digital e marketing para estética.",
+    description="System message do diagnóstico visual (GPT-4o com imagens)",
+)
+
+PRESENCA_VISUAL = prompt_registry.register(
+    "presenca_visual", "1",
+    """Você é um especialista premium em análise de presença digital, marketing para estética avançada e conversão de alto valor.
+
+═══════════════════════════════════════════════════════════════════════════════════
+DADOS DE ENTRADA
+═══════════════════════════════════════════════════════════════════════════════════
+
+PERFIL INSTAGRAM:
+- Handle: @{instagram_handle}
+- IMAGEM 1: Print do perfil Instagram (ANALISE VISUALMENTE TODOS OS ELEMENTOS)
+
+PÁGINA DE DESTINO:
+- Link: {link_bio}
+- IMAGEM 2: Print da página de destino (ANALISE VISUALMENTE TODOS OS ELEMENTOS)
+
+═══════════════════════════════════════════════════════════════════════════════════
+INSTRUÇÕES DE ANÁLISE VISUAL DETALHADA
+═══════════════════════════════════════════════════════════════════════════════════
+
+📱 ANÁLISE DO INSTAGRAM (baseado no print):
+1. Bio: Leia o texto da bio, identifique nome, especialidade, proposta de valor
+2. Foto de perfil: Avalie profissionalismo e coerência
+3. Destaques: Identifique os destaques fixados e seus títulos/ícones
+4. Feed: Analise estilo visual, cores dominantes, qualidade das fotos
+5. Números: Identifique seguidores, posts (se visíveis)
+6. Prova social: Busque menções a números, certificações, transformações
+7. CTA: Avalie se há chamada clara para ação
+
+🌐 ANÁLISE DA PÁGINA (baseado no print):
+1. Título principal: Leia e transcreva o título exato
+2. Subtítulo: Leia e transcreva se houver
+3. CTA principal: Identifique o botão/link de ação principal
+4. Layout: Avalie organização visual e hierarquia
+5. Prova social: Busque depoimentos, avaliações, números de clientes
+6. Cores: Identifique paleta de cores dominante
+7. Serviços/Preços: Identifique se estão visíveis
+
+🎨 ANÁLISE DE COERÊNCIA VISUAL:
+- Compare cores entre Instagram e página
+- Compare tom de comunicação
+- Compare qualidade visual e profissionalismo
+- Identifique quebras de expectativa entre canais
+
+🏆 ANÁLISE DE AUTORIDADE:
+- Especialização clara ou genérica?
+- Prova social visível e quantificável?
+- Elementos de credibilidade (certificações, anos de experiência)?
+- Percepção de preço (popular, médio ou premium)?
+
+═══════════════════════════════════════════════════════════════════════════════════
+FORMATO DE RESPOSTA (JSON OBRIGATÓRIO)
+═══════════════════════════════════════════════════════════════════════════════════
+
+Retorne EXATAMENTE este JSON (sem texto antes ou depois):
+
+{{
+  "resumoExecutivo": {{
+    "notaGeral": 70,
+    "pontuacoes": {{
+      "autoridadePercebida": 75,
+      "coerenciaVisual": 70,
+      "provaSocial": 65,
+      "conversaoCTAs": 60,
+      "presencaDigitalGlobal": 72
+    }},
+    "status": "BOM"
+  }},
+  "instagramAnalise": {{
+    "bioIdentificada": "Texto exato da bio lido na imagem",
+    "seguidores": "Número identificado ou 'Não visível'",
+    "posts": "Número identificado ou 'Não visível'",
+    "destaqueIdentificados": ["Destaque 1", "Destaque 2"],
+    "paletaCores": ["#cor1", "#cor2"],
+    "pontosFortes": [
+      {{"item": "Ponto forte específico", "impacto": "ALTO"}},
+      {{"item": "Outro ponto forte", "impacto": "MÉDIO"}}
+    ],
+    "pontosFracos": [
+      {{"item": "Ponto fraco específico", "impacto": "ALTO", "solucao": "Solução prática"}},
+      {{"item": "Outro ponto fraco", "impacto": "MÉDIO", "solucao": "Solução prática"}}
+    ],
+    "sugestoesCopy": {{
+      "bioSugerida": "Sugestão de bio otimizada com CTA",
+      "ctaSugerido": "Exemplo de CTA para link"
+    }}
+  }},
+  "paginaAnalise": {{
+    "tituloIdentificado": "Título exato lido na imagem",
+    "subtituloIdentificado": "Subtítulo ou 'Não identificado'",
+    "ctaIdentificado": "Texto do botão/CTA principal",
+    "servicosVisiveis": ["Serviço 1", "Serviço 2"],
+    "precosVisiveis": ["R$ X", "R$ Y"],
+    "provasSociaisVisiveis": ["Depoimento", "Avaliação", "Número"],
+    "pontosFortes": [
+      {{"item": "Ponto forte específico", "impacto": "ALTO"}},
+      {{"item": "Outro ponto forte", "impacto": "MÉDIO"}}
+    ],
+    "pontosFracos": [
+      {{"item": "Ponto fraco específico", "impacto": "ALTO", "solucao": "Solução prática"}},
+      {{"item": "Outro ponto fraco", "impacto": "MÉDIO", "solucao": "Solução prática"}}
+    ],
+    "sugestoesCopy": {{
+      "tituloSugerido": "Sugestão de título mais impactante",
+      "ctaSugerido": "Sugestão de CTA mais efetivo"
+    }}
+  }},
+  "coerencia": {{
+    "status": "alinhado",
+    "analise": "Análise detalhada da coerência entre canais baseada nos elementos visuais identificados",
+    "elementosAlinhados": ["Elemento 1", "Elemento 2"],
+    "quebraExpectativa": ["Quebra 1 se houver"]
+  }},
+  "autoridade": {{
+    "percepcao": "especialista",
+    "nivel": "premium",
+    "justificativa": "Justificativa baseada nos elementos visuais identificados",
+    "elementosAutoridade": ["Elemento 1", "Elemento 2"],
+    "elementosFaltando": ["Elemento que aumentaria autoridade"]
+  }},
+  "melhorias": [
+    {{
+      "acao": "Ação específica e prática",
+      "impacto": "ALTO",
+      "prazo": "7 dias",
+      "resultadoEsperado": "Resultado quantificável esperado"
+    }},
+    {{
+      "acao": "Segunda ação prioritária",
+      "impacto": "ALTO",
+      "prazo": "7 dias",
+      "resultadoEsperado": "Resultado esperado"
+    }},
+    {{
+      "acao": "Terceira ação",
+      "impacto": "MÉDIO",
+      "prazo": "30 dias",
+      "resultadoEsperado": "Resultado esperado"
+    }}
+  ],
+  "templateVisual": {{
+    "paletaSugerida": {{
+      "primaria": "#cor",
+      "secundaria": "#cor",
+      "contraste": "#cor"
+    }},
+    "tipografiaSugerida": {{
+      "titulos": "Nome da fonte",
+      "corpo": "Nome da fonte"
+    }}
+  }},
+  "insightPrincipal": "Um parágrafo estratégico com o insight mais importante para aumentar conversão"
+}}
+
+═══════════════════════════════════════════════════════════════════════════════════
+REGRAS CRÍTICAS
+═══════════════════════════════════════════════════════════════════════════════════
+
+1. ANALISE VISUALMENTE as imagens - NÃO invente informações
+2. Leia os textos que aparecem nas imagens (bio, títulos, CTAs)
+3. Identifique cores, elementos visuais, números visíveis
+4. Se algo não estiver visível, indique "Não identificado" ou "Não visível"
+5. Seja ESPECÍFICO - cite elementos que você viu nas imagens
+6. Priorize melhorias que aumentem CONVERSÃO real
+7. Responda APENAS com o JSON, sem texto adicional""",
+    variables={"instagram_handle": str, "link_bio": str},
+    description="Análise visual dos prints de Instagram e página (POST /api/ai/diagnostico-presenca-visual)",
+)
+
+# =============================================================================
+# BIBLIOTECA DE PROMPTS ESTRATÉGICOS
+# =============================================================================
+
+BIBLIOTECA_PREFIX = "biblioteca."
+
+
+def biblioteca_prompt_name(prompt_id: str) -> str:
+    return f"{BIBLIOTECA_PREFIX}{prompt_id}"
+
+
+# [VARIAVEL] preenchida pela usuária; o tom é sempre o último parágrafo
+for _prompt_id, _prompt in PROMPTS_ESTRATEGICOS.items():
+    prompt_registry.register(
+        biblioteca_prompt_name(_prompt_id), "1",
+        _prompt["prompt"] + "\n\nTom de comunicação: [TOM_NOME] - [TOM_DESCRICAO]",
+        variables=dict.fromkeys(_prompt.get("variaveis", []), str),
+        syntax="brackets",
+        description=_prompt["titulo"],
+    )
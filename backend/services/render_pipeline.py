@@ -0,0 +1,198 @@
+"""
+Pipeline Unificado de Renderização de E-books
+
+StructuredEbook → EbookLayout (uma vez por conteúdo) → backend (HTML, PDF, EPUB)
+
+Resultados ficam em um cache LRU por worker com chave
+(hash do conteúdo, template, backend): trocar de template ou baixar de novo
+um e-book que não mudou não renderiza outra vez.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, NamedTuple, Optional, Tuple
+
+from services.ebook_layout import EbookLayout, build_layout, content_hash
+from services import ebook_renderer, epub_renderer, pdf_renderer
+from utils.observability import RENDER_LATENCY, span
+
+logger = logging.getLogger("elevare.render")
+
+# ============================================================================
+# BACKENDS
+# ============================================================================
+
+class RenderBackend(NamedTuple):
+    name: str
+    media_type: str
+    extension: str
+    resolve_template: Callable[[str], str]
+    render: Callable[[EbookLayout, str], bytes]
+
+
+def _render_html(layout: EbookLayout, template: str) -> bytes:
+    return ebook_renderer.render_layout_html(layout, template).encode("utf-8")
+
+
+BACKENDS: Dict[str, RenderBackend] = {}
+
+
+def register_backend(backend: RenderBackend):
+    """Registra um backend de renderização (chave: backend.name)"""
+    BACKENDS[backend.name] = backend
+
+
+register_backend(RenderBackend(
+    "html", "text/html; charset=utf-8", "html",
+    ebook_renderer.resolve_template, _render_html,
+))
+register_backend(RenderBackend(
+    "pdf", "application/pdf", "pdf",
+    pdf_renderer.resolve_template, pdf_renderer.render_layout_pdf,
+))
+register_backend(RenderBackend(
+    "epub", "application/epub+zip", "epub",
+    ebook_renderer.resolve_template, epub_renderer.render_layout_epub,
+))
+
+# ============================================================================
+# CACHE
+# ============================================================================
+
+class RenderCache:
+    """LRU limitado por bytes totais dos artefatos renderizados"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[str, str, str]) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Tuple[str, str, str], data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def invalidate(self, digest: str):
+        """Remove todos os artefatos de um conteúdo"""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == digest]:
+                self._size -= len(self._entries.pop(key))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+RENDER_CACHE_MAX_MB = int(os.environ.get("EBOOK_RENDER_CACHE_MB", "64"))
+render_cache = RenderCache(RENDER_CACHE_MAX_MB * 1024 * 1024)
+
+# Layouts montados recentemente (trocar de backend não remonta o layout)
+_LAYOUT_CACHE_SIZE = 32
+_layout_cache: "OrderedDict[str, EbookLayout]" = OrderedDict()
+_layout_lock = threading.Lock()
+
+
+def get_layout(structured: dict, digest: Optional[str] = None) -> EbookLayout:
+    """Retorna o layout do conteúdo, montando apenas se ainda não estiver em cache"""
+    digest = digest or content_hash(structured)
+    with _layout_lock:
+        layout = _layout_cache.get(digest)
+        if layout is not None:
+            _layout_cache.move_to_end(digest)
+            return layout
+
+    layout = build_layout(structured, digest)
+    with _layout_lock:
+        _layout_cache[digest] = layout
+        while len(_layout_cache) > _LAYOUT_CACHE_SIZE:
+            _layout_cache.popitem(last=False)
+    return layout
+
+
+# ============================================================================
+# API
+# ============================================================================
+
+class RenderedEbook(NamedTuple):
+    content: bytes
+    media_type: str
+    extension: str
+    template: str
+    content_hash: str
+    cached: bool
+
+
+def _backend(backend: str) -> RenderBackend:
+    renderer = BACKENDS.get(backend)
+    if renderer is None:
+        raise ValueError(f"Formato não suportado: {backend}. Use: {', '.join(BACKENDS)}")
+    return renderer
+
+
+def render_key(structured: dict, template: str, backend: str = "html") -> Tuple[str, str, str]:
+    """
+    Chave do artefato (hash do conteúdo, template resolvido, backend) sem
+    renderizar. Serve para caches derivados (ex.: respostas pré-comprimidas).
+
+    Raises:
+        ValueError: backend desconhecido
+    """
+    renderer = _backend(backend)
+    return (content_hash(structured), renderer.resolve_template(template), renderer.name)
+
+
+def render_ebook(structured: dict, template: str, backend: str = "html") -> RenderedEbook:
+    """
+    Renderiza um StructuredEbook no backend pedido, usando o cache quando possível.
+
+    Raises:
+        ValueError: backend desconhecido ou conteúdo estruturado inválido
+    """
+    renderer = _backend(backend)
+    key = render_key(structured, template, backend)
+    digest, resolved_template, _ = key
+
+    data = render_cache.get(key)
+    if data is not None:
+        RENDER_LATENCY.labels(renderer.name, "true").observe(0)
+        return RenderedEbook(data, renderer.media_type, renderer.extension, resolved_template, digest, True)
+
+    start = time.perf_counter()
+    with span("render"):
+        layout = get_layout(structured, digest)
+        data = renderer.render(layout, resolved_template)
+    RENDER_LATENCY.labels(renderer.name, "false").observe(time.perf_counter() - start)
+    render_cache.put(key, data)
+    logger.info(f"E-book renderizado: backend={renderer.name} template={resolved_template} bytes={len(data)}")
+
+    return RenderedEbook(data, renderer.media_type, renderer.extension, resolved_template, digest, False)
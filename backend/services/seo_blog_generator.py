@@ -7,10 +7,9 @@ import os
 import uuid
 import re
 import json
-from emergentintegrations.llm.chat import LlmChat, UserMessage
-from dotenv import load_dotenv
 
-load_dotenv()
+from services.model_router import routed_chat
+
 
 # Tipos de artigo para estética
 ARTICLE_TYPES = {
@@ -110,11 +109,10 @@ IDENTIDADE DA MARCA:
 - Estilo: {brand_identity.get('visual_style', '')}
 - Frases-chave: {', '.join(brand_identity.get('key_phrases', []))}"""
         
-        self.chat = LlmChat(
-            api_key=self.api_key,
-            session_id=f"seo_blog_{uuid.uuid4().hex[:8]}",
-            system_message=system_message
-        ).with_model("openai", "gpt-4o")
+        # Artigo no modelo padrão; ideias e melhorias com a rota de cada método (services.model_router)
+        self.chat = routed_chat(
+            "seo_article", f"seo_blog_{uuid.uuid4().hex[:8]}", system_message, api_key=self.api_key
+        )
     
     def calculate_seo_score(self, article: dict, keyword: str) -> dict:
         """Calcula score de SEO interno baseado em boas práticas"""
@@ -245,6 +243,7 @@ IDENTIDADE DA MARCA:
         custom_instructions: str = None
     ) -> dict:
         """Gera artigo SEO completo com Método NeuroVendas Elevare"""
+        from emergentintegrations.llm.chat import UserMessage
         
         type_info = ARTICLE_TYPES.get(article_type, ARTICLE_TYPES["procedimento"])
         awareness_info = AWARENESS_LEVELS.get(awareness_level, AWARENESS_LEVELS["consciente_problema"])
@@ -373,6 +372,7 @@ Responda APENAS com JSON válido, sem texto adicional."""
         count: int = 10
     ) -> list:
         """Gera ideias de artigos baseadas na especialidade"""
+        from emergentintegrations.llm.chat import UserMessage
         
         location_context = f" em {location}" if location else ""
         
@@ -404,7 +404,7 @@ Responda em JSON:
 Responda APENAS com JSON válido."""
 
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="seo_ideas")
         
         try:
             data = json.loads(response)
@@ -421,6 +421,7 @@ Responda APENAS com JSON válido."""
     
     async def improve_article(self, content: str, keyword: str, feedback: str = None) -> dict:
         """Melhora um artigo existente para SEO"""
+        from emergentintegrations.llm.chat import UserMessage
         
         feedback_context = f"\nFEEDBACK DO USUÁRIO: {feedback}" if feedback else ""
         
@@ -463,7 +464,7 @@ Responda em JSON:
 Responda APENAS com JSON válido."""
 
         user_message = UserMessage(text=prompt)
-        response = await self.chat.send_message(user_message)
+        response = await self.chat.send_message(user_message, task="seo_improve")
         
         try:
             return json.loads(response)
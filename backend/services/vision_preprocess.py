@@ -0,0 +1,202 @@
+"""
+Pré-processamento de Prints para Análise com Visão (GPT-4o)
+
+Antes de ir para o modelo, cada print enviado:
+1. é lido em blocos com limite de VISION_MAX_UPLOAD_MB (upload maior é
+   recusado sem ser carregado inteiro na memória)
+2. é validado pelo conteúdo (PNG, JPEG, WebP ou GIF), não pelo Content-Type
+3. é reduzido ao orçamento de tiles do modelo: a API já encaixa a imagem em
+   2048×2048 e leva o menor lado a 768 px antes de cobrar 85 + 170 tokens por
+   tile de 512×512. Enviamos direto nesse tamanho (pixels a mais só aumentam
+   upload e latência) e, se preciso, reduzimos até VISION_MAX_TILES tiles,
+   encostando na borda do tile quando isso custa pouca resolução
+4. perde metadados (EXIF, GPS, perfil) e é recodificado em JPEG
+5. ganha um hash perceptual (dHash 16×16, 256 bits): o mesmo print enviado
+   de novo, mesmo recomprimido ou com o relógio da barra de status diferente,
+   reaproveita a análise salva em `presenca_analyses`
+
+Um print de celular 1170×2532 sai em 709×1536 (6 tiles, ~1.100 tokens) em vez
+de 8 tiles.
+"""
+
+import base64
+import io
+import logging
+import math
+import os
+from typing import List, NamedTuple, Optional
+
+from fastapi import UploadFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from services.image_derivatives import run_in_image_pool
+
+logger = logging.getLogger("elevare.vision")
+
+MAX_UPLOAD_BYTES = int(os.environ.get("VISION_MAX_UPLOAD_MB", "15")) * 1024 * 1024
+MAX_PIXELS = int(os.environ.get("VISION_MAX_PIXELS", str(40_000_000)))
+MAX_TILES = int(os.environ.get("VISION_MAX_TILES", "6"))
+JPEG_QUALITY = int(os.environ.get("VISION_JPEG_QUALITY", "85"))
+# Distância de Hamming máxima (em 256 bits) para considerar o mesmo print
+PHASH_MAX_DISTANCE = int(os.environ.get("VISION_PHASH_MAX_DISTANCE", "10"))
+
+ALLOWED_FORMATS = {"PNG", "JPEG", "WEBP", "GIF"}
+READ_CHUNK = 64 * 1024
+
+# Regras de dimensionamento do modelo (detail=high)
+MODEL_MAX_SIDE = 2048
+MODEL_SHORT_SIDE = 768
+TILE = 512
+TOKENS_BASE = 85
+TOKENS_PER_TILE = 170
+# Reduzir até 10% a mais para economizar uma linha/coluna de tiles
+TILE_SNAP_LOSS = 0.10
+
+PHASH_SIZE = 16
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    media_type: str
+    width: int
+    height: int
+    original_width: int
+    original_height: int
+    original_bytes: int
+    tiles: int
+    tokens: int
+    phash: str
+
+    def base64(self) -> str:
+        return base64.b64encode(self.data).decode("ascii")
+
+
+async def read_upload(upload: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytes:
+    """Lê o upload em blocos, recusando assim que passar de max_bytes"""
+    buffer = io.BytesIO()
+    while True:
+        chunk = await upload.read(READ_CHUNK)
+        if not chunk:
+            break
+        buffer.write(chunk)
+        if buffer.tell() > max_bytes:
+            raise ValueError(f"Imagem maior que {max_bytes // (1024 * 1024)} MB")
+    if buffer.tell() == 0:
+        raise ValueError("Imagem vazia")
+    return buffer.getvalue()
+
+
+# ============================================================================
+# DIMENSIONAMENTO POR TILES
+# ============================================================================
+
+def tile_count(width: int, height: int) -> int:
+    return math.ceil(width / TILE) * math.ceil(height / TILE)
+
+
+def vision_tokens(tiles: int) -> int:
+    return TOKENS_BASE + TOKENS_PER_TILE * tiles
+
+
+def vision_target_size(width: int, height: int, max_tiles: int = MAX_TILES) -> tuple:
+    """Maior tamanho (sem ampliar) dentro das regras do modelo e de max_tiles"""
+    # O que a API faria de qualquer forma
+    scale = min(1.0, MODEL_MAX_SIDE / max(width, height), MODEL_SHORT_SIDE / min(width, height))
+    base_w, base_h = width * scale, height * scale
+
+    def size(s: float) -> tuple:
+        return max(1, int(base_w * s)), max(1, int(base_h * s))
+
+    # Escalas em que um dos lados encosta na borda de um tile
+    candidates = {1.0}
+    for side in (base_w, base_h):
+        candidates.update(TILE * k / side for k in range(1, math.ceil(side / TILE) + 1) if TILE * k <= side)
+    candidates = sorted(candidates, reverse=True)
+
+    best = next((s for s in candidates if tile_count(*size(s)) <= max_tiles), candidates[-1])
+    for s in candidates:
+        if s < best and s >= best * (1 - TILE_SNAP_LOSS) and tile_count(*size(s)) < tile_count(*size(best)):
+            best = s
+    return size(best)
+
+
+# ============================================================================
+# PILLOW (executado no pool de imagens)
+# ============================================================================
+
+def _dhash(img: Image.Image) -> str:
+    gray = img.convert("L").resize((PHASH_SIZE + 1, PHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(PHASH_SIZE):
+        offset = row * (PHASH_SIZE + 1)
+        for col in range(PHASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{PHASH_SIZE * PHASH_SIZE // 4}x}"
+
+
+def _prepare(data: bytes, max_tiles: int) -> PreparedImage:
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            if source.format not in ALLOWED_FORMATS:
+                raise ValueError(f"Formato não suportado: {source.format}. Envie PNG, JPEG ou WebP")
+            if source.width * source.height > MAX_PIXELS:
+                raise ValueError("Imagem com resolução grande demais")
+            original_size = source.size
+            img = ImageOps.exif_transpose(source)
+            # Sem canal alfa e sem metadados: pixels copiados para uma imagem nova
+            if img.mode in ("RGBA", "LA", "PA") or (img.mode == "P" and "transparency" in img.info):
+                rgba = img.convert("RGBA")
+                img = Image.new("RGB", rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel("A"))
+            else:
+                img = img.convert("RGB")
+    except UnidentifiedImageError:
+        raise ValueError("Arquivo não é uma imagem válida. Envie PNG, JPEG ou WebP")
+    except (OSError, SyntaxError, Image.DecompressionBombError) as e:
+        raise ValueError(f"Imagem inválida: {e}")
+
+    phash = _dhash(img)
+    width, height = vision_target_size(*img.size, max_tiles=max_tiles)
+    if (width, height) != img.size:
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    # subsampling=0 (4:4:4) mantém textos pequenos legíveis
+    img.save(out, format="JPEG", quality=JPEG_QUALITY, optimize=True, subsampling=0)
+    tiles = tile_count(width, height)
+    return PreparedImage(
+        out.getvalue(), "image/jpeg", width, height, original_size[0], original_size[1],
+        len(data), tiles, vision_tokens(tiles), phash,
+    )
+
+
+async def prepare_screenshot(upload: UploadFile, max_tiles: int = MAX_TILES) -> PreparedImage:
+    """
+    Lê, valida, reduz e recodifica um print para o modelo de visão.
+
+    Raises:
+        ValueError: upload grande demais, vazio ou que não é uma imagem suportada
+    """
+    data = await read_upload(upload)
+    prepared = await run_in_image_pool(_prepare, data, max_tiles)
+    logger.info(
+        f"Print preparado: {prepared.original_width}x{prepared.original_height} {prepared.original_bytes} bytes → "
+        f"{prepared.width}x{prepared.height} {len(prepared.data)} bytes, {prepared.tiles} tiles (~{prepared.tokens} tokens)"
+    )
+    return prepared
+
+
+# ============================================================================
+# REAPROVEITAMENTO DE ANÁLISES
+# ============================================================================
+
+def hash_distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def same_screenshots(hashes: List[str], stored: List[Optional[str]], max_distance: int = PHASH_MAX_DISTANCE) -> bool:
+    """Todos os prints equivalentes (mesma ordem) aos de uma análise anterior"""
+    return len(hashes) == len(stored) and all(
+        other is not None and len(other) == len(current) and hash_distance(current, other) <= max_distance
+        for current, other in zip(hashes, stored)
+    )
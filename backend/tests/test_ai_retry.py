@@ -0,0 +1,69 @@
+"""
+Circuit breaker de utils.ai_retry: a chamada de teste do half-open é liberada
+quando é cancelada ou cortada pelo prazo do request.
+
+    cd backend && python -m pytest tests/test_ai_retry.py -q
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ai_retry import CircuitBreaker, _breakers, ai_call_with_retry  # noqa: E402
+from utils.deadline import DeadlineExceeded, request_deadline  # noqa: E402
+
+
+def _half_open_breaker(name: str) -> CircuitBreaker:
+    breaker = CircuitBreaker(name, failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    _breakers[name] = breaker
+    return breaker
+
+
+async def _ok():
+    return "ok"
+
+
+async def _slow():
+    await asyncio.sleep(10)
+
+
+async def _deadline():
+    raise DeadlineExceeded("teste")
+
+
+def test_cancelled_probe_releases_half_open():
+    breaker = _half_open_breaker("test-cancel")
+
+    async def scenario():
+        probe = asyncio.ensure_future(ai_call_with_retry(_slow, provider="test-cancel", max_retries=1))
+        await asyncio.sleep(0.05)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # A próxima chamada vira a nova chamada de teste e fecha o circuito
+        return await ai_call_with_retry(_ok, provider="test-cancel", max_retries=1)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_deadline_in_probe_releases_half_open():
+    breaker = _half_open_breaker("test-deadline")
+
+    async def scenario():
+        with pytest.raises(DeadlineExceeded):
+            await ai_call_with_retry(_deadline, provider="test-deadline", max_retries=1)
+        with request_deadline(0.05):
+            with pytest.raises(DeadlineExceeded):
+                await ai_call_with_retry(_slow, provider="test-deadline", max_retries=1, timeout=5)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        return await ai_call_with_retry(_ok, provider="test-deadline", max_retries=1)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
@@ -0,0 +1,63 @@
+"""
+CompressionMiddleware (utils.compression): Vary: Accept-Encoding em toda
+resposta de tipo comprimível, inclusive as que passam sem compressão.
+
+    cd backend && python -m pytest tests/test_compression.py -q
+"""
+
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.compression import CompressionMiddleware, encoded_response  # noqa: E402
+
+BIG = {"items": ["texto repetido para comprimir"] * 200}
+
+
+def _app():
+    app = Starlette(routes=[
+        Route("/big", lambda request: JSONResponse(BIG)),
+        Route("/small", lambda request: JSONResponse({"ok": True})),
+        Route("/png", lambda request: Response(b"\x89PNG" * 1000, media_type="image/png")),
+        Route("/encoded", lambda request: encoded_response(b"{}", None, "application/json")),
+    ])
+    app.add_middleware(CompressionMiddleware)
+    return app
+
+
+def _get(path: str, accept: str) -> httpx.Response:
+    async def run():
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.get(path, headers={"Accept-Encoding": accept})
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("path, accept, encoded", [
+    ("/big", "gzip", True),
+    ("/big", "identity", False),
+    ("/small", "gzip", False),
+    ("/small", "identity", False),
+])
+def test_vary_on_compressible_responses(path, accept, encoded):
+    response = _get(path, accept)
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert ("content-encoding" in response.headers) == encoded
+
+
+def test_no_vary_on_incompressible_type():
+    response = _get("/png", "gzip")
+    assert "vary" not in response.headers
+
+
+def test_vary_not_duplicated():
+    response = _get("/encoded", "gzip")
+    assert response.headers["vary"] == "Accept-Encoding"
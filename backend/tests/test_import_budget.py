@@ -0,0 +1,60 @@
+"""
+Orçamento de cold start: `import server` num processo limpo deve caber em
+IMPORT_BUDGET_SECONDS e não pode carregar os SDKs pesados (importados no
+primeiro uso).
+
+    cd backend && python -m pytest tests/test_import_budget.py -q
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_BUDGET_SECONDS = float(os.environ.get("IMPORT_BUDGET_SECONDS", "3.0"))
+
+HEAVY_MODULES = (
+    "emergentintegrations.llm.chat",
+    "emergentintegrations.payments.stripe.checkout",
+    "litellm",
+    "openai",
+    "resend",
+)
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import server
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": [m for m in %r if m in sys.modules],
+    "report": server.startup_timer.report(),
+}))
+""" % (HEAVY_MODULES,)
+
+
+@pytest.fixture(scope="module")
+def cold_import():
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        if "ModuleNotFoundError" in result.stderr or "ImportError" in result.stderr:
+            pytest.skip(f"Dependências do backend ausentes: {result.stderr.strip().splitlines()[-1]}")
+        pytest.fail(result.stderr)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_import_within_budget(cold_import):
+    phases = ", ".join(f"{p['phase']}={p['ms']:.0f}ms" for p in cold_import["report"]["phases"])
+    assert cold_import["seconds"] <= IMPORT_BUDGET_SECONDS, (
+        f"import server levou {cold_import['seconds']:.2f}s (orçamento {IMPORT_BUDGET_SECONDS}s): {phases}"
+    )
+
+
+def test_heavy_sdks_not_imported(cold_import):
+    assert cold_import["heavy"] == []
@@ -0,0 +1,34 @@
+"""
+Conversão de valores em reais da importação de leads (formato pt-BR).
+
+    cd backend && python -m pytest tests/test_lead_import.py -q
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.lead_import import _parse_valor  # noqa: E402
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("1.500", 1500),
+    ("R$ 1.500", 1500),
+    ("1.500,00", 1500),
+    ("R$ 2.000", 2000),
+    ("1.250.000", 1250000),
+    ("150,5", 150),
+    ("150", 150),
+    ("1.5", 1),
+    (1500.0, 1500),
+])
+def test_parse_valor_pt_br(raw, expected):
+    assert _parse_valor(raw) == expected
+
+
+def test_parse_valor_invalido():
+    with pytest.raises(ValueError):
+        _parse_valor("a combinar")
@@ -0,0 +1,94 @@
+"""
+Ledger de uso de LLM (services.llm_usage): falha parcial do insert_many não
+conta o mesmo registro duas vezes nos rollups.
+
+    cd backend && python -m pytest tests/test_llm_usage.py -q
+"""
+
+import asyncio
+import os
+import sys
+
+from pymongo.errors import BulkWriteError
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.llm_usage import DUPLICATE_KEY, UsageLedger  # noqa: E402
+from utils.observability import ExternalCall  # noqa: E402
+
+
+class _Usage:
+    """llm_usage com _id único; `fail_once` = índices que falham na primeira gravação"""
+
+    def __init__(self, fail_once=(), lose_ack=False):
+        self.docs = {}
+        self.fail_once = set(fail_once)
+        self.lose_ack = lose_ack
+
+    async def insert_many(self, docs, ordered=True):
+        errors = []
+        for i, doc in enumerate(docs):
+            if i in self.fail_once:
+                errors.append({"index": i, "code": 91, "errmsg": "shutdown"})
+            elif doc["_id"] in self.docs:
+                errors.append({"index": i, "code": DUPLICATE_KEY, "errmsg": "duplicate key"})
+            else:
+                self.docs[doc["_id"]] = dict(doc)
+        self.fail_once = set()
+        if self.lose_ack:
+            # Gravou, mas a resposta não chegou
+            self.lose_ack = False
+            raise ConnectionError("conexão perdida")
+        if errors:
+            raise BulkWriteError({"writeErrors": errors, "nInserted": len(docs) - len(errors)})
+
+
+class _Daily:
+    def __init__(self):
+        self.calls = 0
+
+    async def bulk_write(self, updates, ordered=True):
+        self.calls += sum(update._doc["$inc"]["calls"] for update in updates)
+
+
+class _DB:
+    def __init__(self, usage):
+        self.llm_usage = usage
+        self.llm_usage_daily = _Daily()
+
+
+def _ledger(db, calls):
+    ledger = UsageLedger()
+    ledger._db = db
+    for _ in range(calls):
+        ledger.observe(ExternalCall("llm", "openai/gpt-4o-mini", 0.5, "ok", 100, 50))
+    return ledger
+
+
+def test_partial_failure_requeues_only_failed_records():
+    db = _DB(_Usage(fail_once={1, 3}))
+    ledger = _ledger(db, 5)
+
+    asyncio.run(ledger.flush())
+    assert len(db.llm_usage.docs) == 3
+    assert db.llm_usage_daily.calls == 3
+    assert len(ledger._buffer) == 2
+
+    asyncio.run(ledger.flush())
+    assert len(db.llm_usage.docs) == 5
+    assert db.llm_usage_daily.calls == 5
+    assert ledger._buffer == []
+
+
+def test_retry_after_lost_ack_counts_once():
+    db = _DB(_Usage(lose_ack=True))
+    ledger = _ledger(db, 4)
+
+    asyncio.run(ledger.flush())
+    assert db.llm_usage_daily.calls == 0
+    assert len(ledger._buffer) == 4
+
+    asyncio.run(ledger.flush())
+    assert len(db.llm_usage.docs) == 4
+    assert db.llm_usage_daily.calls == 4
+    assert ledger._buffer == []
@@ -0,0 +1,184 @@
+"""
+Soak multi-worker: vários processos contra um MongoDB local provando que o
+estado compartilhado (utils.shared_state) é consistente entre workers.
+
+    SOAK_MONGO_URL=mongodb://localhost:27017 python -m pytest tests/test_multiworker_soak.py -q
+
+- test_shared_state_across_processes: SOAK_WORKERS processos disputando
+  reservas, contadores, jobs com lease vencido e eventos de invalidação
+- test_login_rate_limit_across_uvicorn_workers: sobe `uvicorn server:app
+  --workers SOAK_WORKERS` e verifica que o limite de login vale para a soma
+  dos workers (só com as dependências do backend instaladas)
+
+Sem MongoDB acessível, os testes são pulados.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MONGO_URL = os.environ.get("SOAK_MONGO_URL", "mongodb://localhost:27017")
+WORKERS = int(os.environ.get("SOAK_WORKERS", "4"))
+ROUNDS = int(os.environ.get("SOAK_ROUNDS", "200"))
+KEYS = 50
+JOBS = 20
+WINDOW = 10 ** 9  # uma única janela durante o teste
+
+
+def _mongo_available() -> bool:
+    try:
+        from pymongo import MongoClient
+        MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).admin.command("ping")
+        return True
+    except Exception:
+        return False
+
+
+pytestmark = pytest.mark.skipif(not _mongo_available(), reason=f"MongoDB indisponível em {MONGO_URL}")
+
+
+@pytest.fixture
+def db_name():
+    from pymongo import MongoClient
+    name = f"elevare_soak_{uuid4().hex[:8]}"
+    yield name
+    MongoClient(MONGO_URL).drop_database(name)
+
+
+# ============================================================================
+# PROCESSOS COM O BACKEND MONGODB
+# ============================================================================
+
+async def _worker(index: int, db_name: str, barrier, results):
+    sys.path.insert(0, BACKEND_DIR)
+    from motor.motor_asyncio import AsyncIOMotorClient
+    from utils.shared_state import MongoStateBackend
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    backend = MongoStateBackend(client[db_name])
+    origin = f"worker-{index}"
+    wait = lambda: barrier.wait(timeout=60)  # noqa: E731
+
+    await asyncio.get_running_loop().run_in_executor(None, wait)
+    won = [key for key in range(KEYS) if await backend.add("soak", f"key-{key}", {"owner": origin}, 60)]
+    counts = [await backend.incr("soak", "counter", WINDOW) for _ in range(ROUNDS)]
+
+    # O worker 0 registra jobs e "morre" (não renova o lease)
+    if index == 0:
+        for job in range(JOBS):
+            await backend.register_job("soak", f"job-{job}", origin, 1, {})
+    await asyncio.get_running_loop().run_in_executor(None, wait)
+    await asyncio.sleep(1.5)
+    claimed = []
+    while True:
+        job = await backend.claim_expired_job(origin)
+        if job is None:
+            break
+        claimed.append(job["id"])
+
+    since = datetime.now(timezone.utc) - timedelta(seconds=60)
+    await backend.publish("soak", {"from": origin}, origin)
+    await asyncio.get_running_loop().run_in_executor(None, wait)
+    events = [e["message"]["from"] for e in await backend.poll(since) if e["channel"] == "soak"]
+
+    results.put({"index": index, "won": won, "counts": counts, "claimed": claimed, "events": sorted(events)})
+    client.close()
+
+
+def _run_worker(index, db_name, barrier, results):
+    asyncio.run(_worker(index, db_name, barrier, results))
+
+
+def test_shared_state_across_processes(db_name):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(WORKERS)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=_run_worker, args=(i, db_name, barrier, results)) for i in range(WORKERS)]
+    for process in processes:
+        process.start()
+    collected = [results.get(timeout=120) for _ in processes]
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    # Cada reserva tem exatamente um dono
+    won = sorted(key for result in collected for key in result["won"])
+    assert won == list(range(KEYS))
+
+    # Nenhum incremento perdido ou repetido
+    counts = sorted(count for result in collected for count in result["counts"])
+    assert counts == list(range(1, WORKERS * ROUNDS + 1))
+
+    # Cada job com lease vencido é assumido por um único worker
+    claimed = sorted(job for result in collected for job in result["claimed"])
+    assert claimed == sorted(f"job-{job}" for job in range(JOBS))
+
+    # Todos os workers enxergam todas as invalidações
+    expected = sorted(f"worker-{i}" for i in range(WORKERS))
+    for result in collected:
+        assert result["events"] == expected
+
+
+# ============================================================================
+# APLICAÇÃO COM VÁRIOS WORKERS UVICORN
+# ============================================================================
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_login_rate_limit_across_uvicorn_workers(db_name):
+    httpx = pytest.importorskip("httpx")
+    limit = 20
+    port = _free_port()
+    env = {
+        **os.environ, "MONGO_URL": MONGO_URL, "DB_NAME": db_name,
+        "LOGIN_RATE_LIMIT": str(limit), "SHARED_STATE_BACKEND": "mongo",
+    }
+    log = tempfile.TemporaryFile(mode="w+")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--workers", str(WORKERS)],
+        cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, text=True,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 60
+        while True:
+            if server.poll() is not None:
+                log.seek(0)
+                pytest.skip(f"Servidor não subiu: {log.read()[-500:]}")
+            try:
+                if httpx.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            assert time.time() < deadline, "Servidor não respondeu em 60s"
+            time.sleep(0.5)
+
+        async def attempt(client):
+            response = await client.post("/api/auth/login", json={"email": "soak@example.com", "password": "x"})
+            return response.status_code
+
+        async def hammer():
+            async with httpx.AsyncClient(base_url=base_url, timeout=30) as client:
+                return await asyncio.gather(*[attempt(client) for _ in range(limit * 3)])
+
+        statuses = asyncio.run(hammer())
+        assert statuses.count(401) == limit
+        assert statuses.count(429) == limit * 2
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+        log.close()
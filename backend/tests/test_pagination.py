@@ -0,0 +1,149 @@
+"""
+Paginação por cursor (utils.pagination) com created_at misto: strings ISO e
+datetime (documentos gravados pelos routers) na mesma listagem.
+
+    cd backend && python -m pytest tests/test_pagination.py -q
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pagination import (  # noqa: E402
+    InvalidCursorError, decode_cursor, encode_cursor, paginate,
+)
+from pymongo import ASCENDING, DESCENDING  # noqa: E402
+
+
+# ============================================================================
+# COLEÇÃO EM MEMÓRIA (só os operadores usados pela paginação)
+# ============================================================================
+
+def _type_rank(value):
+    # Ordem de comparação do BSON: null < string < date
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, datetime):
+        return 9
+    raise TypeError(value)
+
+
+def _sort_key(value):
+    return (_type_rank(value), value if value is not None else 0)
+
+
+def _matches_value(value, condition) -> bool:
+    if not isinstance(condition, dict):
+        return value == condition
+    for op, arg in condition.items():
+        if op == "$type":
+            ok = {"string": str, "date": datetime}[arg]
+            if not isinstance(value, ok):
+                return False
+        elif op == "$ne":
+            if value == arg:
+                return False
+        elif op in ("$lt", "$gt"):
+            # Comparação só entre valores do mesmo tipo
+            if value is None or _type_rank(value) != _type_rank(arg):
+                return False
+            if not (value < arg if op == "$lt" else value > arg):
+                return False
+        else:
+            raise NotImplementedError(op)
+    return True
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, condition in query.items():
+        if key == "$and":
+            if not all(_matches(doc, q) for q in condition):
+                return False
+        elif key == "$or":
+            if not any(_matches(doc, q) for q in condition):
+                return False
+        elif not _matches_value(doc.get(key), condition):
+            return False
+    return True
+
+
+class _Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, keys):
+        for field, direction in reversed(keys):
+            self.docs.sort(key=lambda d: _sort_key(d.get(field)), reverse=direction == DESCENDING)
+        return self
+
+    def limit(self, n):
+        self.docs = self.docs[:n]
+        return self
+
+    async def to_list(self, n):
+        return self.docs[:n]
+
+
+class _Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, projection=None):
+        return _Cursor([dict(d) for d in self.docs if _matches(d, query)])
+
+
+# ============================================================================
+# TESTES
+# ============================================================================
+
+BASE = datetime(2026, 3, 1, 12, 0, 0)
+
+
+def _docs():
+    return [
+        {"id": "a", "created_at": (BASE + timedelta(days=1)).isoformat()},
+        {"id": "b", "created_at": BASE + timedelta(days=2)},
+        {"id": "c", "created_at": BASE.isoformat()},
+        {"id": "d", "created_at": BASE + timedelta(days=3)},
+        {"id": "e", "created_at": None},
+    ]
+
+
+def _all_pages(collection, direction):
+    async def run():
+        ids, cursor = [], None
+        while True:
+            page = await paginate(collection, {}, cursor=cursor, limit=1, direction=direction)
+            ids.extend(doc["id"] for doc in page.items)
+            if not page.has_more:
+                return ids
+            cursor = page.next_cursor
+    return asyncio.run(run())
+
+
+def test_cursor_roundtrip_keeps_datetime():
+    created = BASE + timedelta(hours=5)
+    cursor = encode_cursor({"id": "x", "created_at": created}, "created_at")
+    assert decode_cursor(cursor, "created_at") == (created, "x")
+
+
+def test_cursor_rejects_unknown_tagged_value():
+    import base64
+    raw = base64.urlsafe_b64encode(b'["created_at",{"$where":"1"},"x"]').decode()
+    with pytest.raises(InvalidCursorError):
+        decode_cursor(raw, "created_at")
+
+
+@pytest.mark.parametrize("direction, expected", [
+    (DESCENDING, ["d", "b", "a", "c", "e"]),
+    (ASCENDING, ["e", "c", "a", "b", "d"]),
+])
+def test_pages_across_datetime_rows(direction, expected):
+    assert _all_pages(_Collection(_docs()), direction) == expected
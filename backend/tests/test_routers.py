@@ -0,0 +1,61 @@
+"""
+Routers modulares (routers/): só as rotas de MOUNTED_ROUTES são montadas, todas
+existem no módulo e nenhuma repete uma rota do server.py.
+
+    cd backend && python -m pytest tests/test_routers.py -q
+"""
+
+import importlib
+import os
+import re
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from routers import MOUNTED_ROUTES, ROUTE_MODULES, mounted_routes  # noqa: E402
+
+SERVER_ROUTE = re.compile(r'^@app\.(get|post|put|patch|delete)\("([^"]+)"', re.MULTILINE)
+
+
+def _server_routes() -> set:
+    with open(os.path.join(BACKEND_DIR, "server.py"), encoding="utf-8") as f:
+        return {f"{method.upper()} {path}" for method, path in SERVER_ROUTE.findall(f.read())}
+
+
+def _module_routes(module_name: str) -> set:
+    try:
+        module = importlib.import_module(module_name)
+    except ImportError as e:
+        pytest.skip(f"Dependências do backend ausentes: {e}")
+    return {
+        f"{method} {route.path}"
+        for route in mounted_routes(module_name, module.router.routes)
+        for method in route.methods
+    }
+
+
+@pytest.mark.parametrize("module_name", sorted(MOUNTED_ROUTES))
+def test_mounted_routes_exist(module_name):
+    assert _module_routes(module_name) == MOUNTED_ROUTES[module_name]
+
+
+@pytest.mark.parametrize("module_name", sorted(MOUNTED_ROUTES))
+def test_mounted_routes_under_module_prefix(module_name):
+    prefixes = [prefix for prefix, name in ROUTE_MODULES.items() if name == module_name]
+    for key in MOUNTED_ROUTES[module_name]:
+        path = key.split(" ", 1)[1]
+        assert any(path == p or path.startswith(p + "/") for p in prefixes), key
+
+
+def test_mounted_routes_not_served_by_server():
+    mounted = set().union(*MOUNTED_ROUTES.values())
+    assert mounted & _server_routes() == set()
+
+
+def test_no_self_service_xp_or_duplicate_webhook():
+    mounted = set().union(*MOUNTED_ROUTES.values())
+    assert "POST /api/gamification/add-xp" not in mounted
+    assert "POST /api/payments/webhook" not in mounted
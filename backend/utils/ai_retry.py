@@ -1,16 +1,40 @@
 """
 Utilitário para chamadas de IA com Timeout e Retry
 Implementa resiliência nas chamadas para OpenAI/LLM
+
+- Backoff exponencial com full jitter (espera aleatória entre 0 e o teto)
+- Classificação de erros com should_retry (chave inválida, cota etc. não repetem)
+- Circuit breaker por provedor com half-open (uma chamada de teste após o cooldown)
+- Orçamento de retries compartilhado: novas tentativas e hedges limitados a uma
+  fração do tráfego recente
+- Hedge opcional: para chamadas curtas, dispara uma segunda requisição se a
+  primeira passar do p95 observado e fica com a que responder primeiro
+- Prazo do request (utils.deadline): cada tentativa usa no máximo o tempo que
+  resta e não há nova tentativa se o backoff não couber no prazo
 """
 
 import asyncio
 import logging
-from typing import Callable, Any, Optional
+import os
+import random
+import threading
+from collections import deque
+from typing import Callable, Any, Dict, Optional
 from functools import wraps
 import time
 
+from prometheus_client import Counter, Gauge
+
+from utils.deadline import DeadlineExceeded, bounded_timeout, has_time_for
+from utils.observability import AI_RETRIES, attempt_var
+
 logger = logging.getLogger("elevare.ai_utils")
 
+BREAKER_STATE = Gauge("elevare_ai_circuit_state", "Estado do circuit breaker (0 fechado, 1 half-open, 2 aberto)", ["provider"])
+BREAKER_REJECTED = Counter("elevare_ai_circuit_rejected_total", "Chamadas recusadas com o circuito aberto", ["provider"])
+HEDGES = Counter("elevare_ai_hedged_requests_total", "Requisições de hedge disparadas", ["outcome"])
+BUDGET_EXHAUSTED = Counter("elevare_ai_retry_budget_exhausted_total", "Retries/hedges negados pelo orçamento")
+
 class AICallError(Exception):
     """Erro em chamada de IA"""
     def __init__(self, message: str, retry_count: int = 0, original_error: Optional[Exception] = None):
@@ -19,12 +43,214 @@ class AICallError(Exception):
         self.original_error = original_error
         super().__init__(self.message)
 
+class CircuitOpenError(AICallError):
+    """Provedor com circuito aberto: a chamada nem é feita"""
+
 class AICallConfig:
     """Configuração para chamadas de IA"""
     DEFAULT_TIMEOUT = 60  # segundos
     DEFAULT_MAX_RETRIES = 3
     DEFAULT_RETRY_DELAY = 2  # segundos
     DEFAULT_BACKOFF_MULTIPLIER = 2  # exponential backoff
+    MAX_RETRY_DELAY = 30  # teto do backoff (segundos)
+    
+    # Circuit breaker
+    BREAKER_FAILURE_THRESHOLD = int(os.environ.get("AI_BREAKER_FAILURES", "5"))  # falhas seguidas para abrir
+    BREAKER_RESET_TIMEOUT = float(os.environ.get("AI_BREAKER_RESET_SECONDS", "30"))  # cooldown até o half-open
+    
+    # Orçamento de retries: até RATIO × chamadas da janela + MIN_PER_SECOND × janela
+    RETRY_BUDGET_RATIO = float(os.environ.get("AI_RETRY_BUDGET_RATIO", "0.2"))
+    RETRY_BUDGET_MIN_PER_SECOND = 0.5
+    RETRY_BUDGET_WINDOW = 10.0  # segundos
+    
+    # Hedge
+    HEDGE_MIN_SAMPLES = 20  # antes disso usa DEFAULT_HEDGE_DELAY
+    DEFAULT_HEDGE_DELAY = 3.0  # segundos
+    LATENCY_SAMPLES = 200
+
+# =============================================================================
+# CIRCUIT BREAKER
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    closed → (N falhas seguidas) → open → (cooldown) → half_open → sucesso: closed
+                                                                 → falha: open
+    No half-open só uma chamada de teste passa por vez.
+    """
+    CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+    
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = AICallConfig.BREAKER_FAILURE_THRESHOLD,
+        reset_timeout: float = AICallConfig.BREAKER_RESET_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+    
+    def _set_state(self, state: str):
+        self.state = state
+        BREAKER_STATE.labels(self.name).set({self.CLOSED: 0, self.HALF_OPEN: 1, self.OPEN: 2}[state])
+    
+    def before_call(self):
+        """Raises CircuitOpenError se a chamada não deve ser feita agora"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"Circuito aberto para {self.name}")
+                self._set_state(self.HALF_OPEN)
+                logger.info(f"Circuit breaker {self.name}: half-open (chamada de teste)")
+            if self.state == self.HALF_OPEN:
+                if self._probe_in_flight:
+                    BREAKER_REJECTED.labels(self.name).inc()
+                    raise CircuitOpenError(f"Circuito em teste para {self.name}")
+                self._probe_in_flight = True
+    
+    def record_success(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.failures = 0
+            if self.state != self.CLOSED:
+                logger.info(f"Circuit breaker {self.name}: fechado")
+                self._set_state(self.CLOSED)
+    
+    def release(self):
+        """Chamada cancelada ou cortada pelo prazo: libera o teste do half-open sem contar sucesso nem falha"""
+        with self._lock:
+            self._probe_in_flight = False
+    
+    def record_failure(self):
+        with self._lock:
+            self._probe_in_flight = False
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Circuit breaker {self.name}: aberto após {self.failures} falha(s)")
+                self._set_state(self.OPEN)
+                self.opened_at = time.monotonic()
+    
+    def snapshot(self) -> dict:
+        return {"provider": self.name, "state": self.state, "failures": self.failures}
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+def get_breaker(provider: str) -> CircuitBreaker:
+    breaker = _breakers.get(provider)
+    if breaker is None:
+        breaker = _breakers.setdefault(provider, CircuitBreaker(provider))
+    return breaker
+
+# =============================================================================
+# ORÇAMENTO DE RETRIES E LATÊNCIA
+# =============================================================================
+
+class RetryBudget:
+    """Limita retries + hedges a uma fração das chamadas na janela recente"""
+    
+    def __init__(
+        self,
+        ratio: float = AICallConfig.RETRY_BUDGET_RATIO,
+        min_per_second: float = AICallConfig.RETRY_BUDGET_MIN_PER_SECOND,
+        window: float = AICallConfig.RETRY_BUDGET_WINDOW
+    ):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.window = window
+        self._calls: deque = deque()
+        self._retries: deque = deque()
+        self._lock = threading.Lock()
+    
+    def _prune(self, now: float):
+        for events in (self._calls, self._retries):
+            while events and now - events[0] > self.window:
+                events.popleft()
+    
+    def record_call(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            self._calls.append(now)
+    
+    def try_spend(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            allowed = self.ratio * len(self._calls) + self.min_per_second * self.window
+            if len(self._retries) >= allowed:
+                BUDGET_EXHAUSTED.inc()
+                return False
+            self._retries.append(now)
+            return True
+
+retry_budget = RetryBudget()
+
+class LatencyTracker:
+    """Últimas latências com sucesso por tipo de chamada (para o atraso do hedge)"""
+    
+    def __init__(self, size: int = AICallConfig.LATENCY_SAMPLES):
+        self._samples: Dict[str, deque] = {}
+        self._size = size
+    
+    def add(self, key: str, seconds: float):
+        self._samples.setdefault(key, deque(maxlen=self._size)).append(seconds)
+    
+    def p95(self, key: str) -> Optional[float]:
+        samples = self._samples.get(key)
+        if not samples or len(samples) < AICallConfig.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+latency_tracker = LatencyTracker()
+
+def _backoff(attempt: int, retry_delay: float, backoff_multiplier: float) -> float:
+    """Full jitter: uniforme entre 0 e o teto exponencial"""
+    ceiling = min(AICallConfig.MAX_RETRY_DELAY, retry_delay * (backoff_multiplier ** attempt))
+    return random.uniform(0, ceiling)
+
+async def _hedged(func: Callable, args: tuple, kwargs: dict, timeout: float, delay: float) -> Any:
+    """Primeira requisição; se passar de `delay`, dispara outra e usa a primeira resposta bem-sucedida"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    tasks = {asyncio.ensure_future(func(*args, **kwargs))}
+    hedged = False
+    last_error: Optional[BaseException] = None
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=min(delay, timeout))
+        if not done and retry_budget.try_spend():
+            hedged = True
+            tasks.add(asyncio.ensure_future(func(*args, **kwargs)))
+        
+        while tasks:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            done, _ = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                raise asyncio.TimeoutError()
+            for task in done:
+                tasks.discard(task)
+                if task.exception() is None:
+                    if hedged:
+                        HEDGES.labels("won" if tasks else "lost").inc()
+                    return task.result()
+                last_error = task.exception()
+        raise last_error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+# =============================================================================
+# CHAMADA COM RETRY
+# =============================================================================
 
 async def ai_call_with_retry(
     func: Callable,
@@ -33,6 +259,9 @@ async def ai_call_with_retry(
     max_retries: int = AICallConfig.DEFAULT_MAX_RETRIES,
     retry_delay: float = AICallConfig.DEFAULT_RETRY_DELAY,
     backoff_multiplier: float = AICallConfig.DEFAULT_BACKOFF_MULTIPLIER,
+    provider: str = "openai",
+    hedge: bool = False,
+    hedge_delay: Optional[float] = None,
     **kwargs
 ) -> Any:
     """
@@ -44,62 +273,121 @@ async def ai_call_with_retry(
         max_retries: Número máximo de tentativas
         retry_delay: Delay inicial entre tentativas
         backoff_multiplier: Multiplicador para exponential backoff
-        
+        provider: Nome do circuit breaker (um por provedor)
+        hedge: Dispara uma segunda requisição se a primeira passar do p95
+               (só para chamadas curtas e sem estado, ex.: legendas, ideias)
+        hedge_delay: Atraso fixo do hedge (padrão: p95 observado da função)
+    
+    O timeout de cada tentativa é limitado ao restante do prazo do request.
+    
     Returns:
         Resultado da função
-        
+    
     Raises:
-        AICallError: Se todas as tentativas falharem
+        CircuitOpenError: Provedor com circuito aberto
+        DeadlineExceeded: Prazo do request esgotado
+        AICallError: Se todas as tentativas falharem ou o erro não permitir retry
     """
+    breaker = get_breaker(provider)
+    latency_key = f"{provider}:{getattr(func, '__qualname__', 'call')}"
     last_error = None
-    current_delay = retry_delay
+    retry_budget.record_call()
     
     for attempt in range(max_retries):
+        reason = "error"
+        admitted = False
         try:
+            attempt_timeout = bounded_timeout(timeout, "ai_retry")
+            breaker.before_call()
+            admitted = True
             logger.info(f"Chamada IA - Tentativa {attempt + 1}/{max_retries}")
             start_time = time.time()
             
-            # Executar com timeout
-            result = await asyncio.wait_for(
-                func(*args, **kwargs),
-                timeout=timeout
-            )
+            # Executar com timeout (a tentativa vai para o ledger de uso de LLM)
+            attempt_token = attempt_var.set(attempt + 1)
+            try:
+                if hedge:
+                    delay = hedge_delay or latency_tracker.p95(latency_key) or AICallConfig.DEFAULT_HEDGE_DELAY
+                    result = await _hedged(func, args, kwargs, attempt_timeout, delay)
+                else:
+                    result = await asyncio.wait_for(
+                        func(*args, **kwargs),
+                        timeout=attempt_timeout
+                    )
+            finally:
+                attempt_var.reset(attempt_token)
             
             elapsed = time.time() - start_time
+            breaker.record_success()
+            latency_tracker.add(latency_key, elapsed)
             logger.info(f"Chamada IA concluída em {elapsed:.2f}s")
             
             return result
-            
+        
+        except CircuitOpenError as e:
+            logger.warning(f"Chamada IA não enviada: {e.message}")
+            raise
+        
+        except (asyncio.CancelledError, DeadlineExceeded) as e:
+            # Cancelada (cliente desconectou) ou sem prazo: não conta como falha do provedor,
+            # mas libera a chamada de teste do half-open
+            if admitted:
+                breaker.release()
+            if isinstance(e, DeadlineExceeded):
+                logger.warning(f"Prazo do request esgotado na chamada IA (tentativa {attempt + 1}/{max_retries})")
+            raise
+        
         except asyncio.TimeoutError:
+            if attempt_timeout < timeout:
+                # Cortada pelo prazo do request, não por lentidão acima do normal do provedor
+                breaker.release()
+                raise DeadlineExceeded("ai_retry")
+            breaker.record_failure()
             last_error = AICallError(
                 f"Timeout após {timeout}s na tentativa {attempt + 1}",
                 retry_count=attempt + 1
             )
             logger.warning(f"Timeout na chamada IA (tentativa {attempt + 1}/{max_retries})")
-            
+            reason = "timeout"
+        
         except Exception as e:
             last_error = AICallError(
                 f"Erro na chamada IA: {str(e)}",
                 retry_count=attempt + 1,
                 original_error=e
             )
+            if not should_retry(e):
+                # Erro de configuração/conta: o provedor respondeu, repetir não adianta
+                breaker.record_success()
+                logger.error(f"Erro sem retry na chamada IA: {str(e)}")
+                raise last_error
+            breaker.record_failure()
             logger.warning(f"Erro na chamada IA (tentativa {attempt + 1}/{max_retries}): {str(e)}")
         
         # Se não for a última tentativa, aguardar antes de tentar novamente
         if attempt < max_retries - 1:
-            logger.info(f"Aguardando {current_delay}s antes da próxima tentativa...")
-            await asyncio.sleep(current_delay)
-            current_delay *= backoff_multiplier  # Exponential backoff
+            delay = _backoff(attempt, retry_delay, backoff_multiplier)
+            if not has_time_for(delay):
+                logger.warning("Prazo do request insuficiente: sem nova tentativa")
+                break
+            if not retry_budget.try_spend():
+                logger.warning("Orçamento de retries esgotado: sem nova tentativa")
+                break
+            AI_RETRIES.labels(reason).inc()
+            logger.info(f"Aguardando {delay:.2f}s antes da próxima tentativa...")
+            await asyncio.sleep(delay)
     
     # Todas as tentativas falharam
-    error_msg = f"Falha após {max_retries} tentativas. Último erro: {last_error.message if last_error else 'Desconhecido'}"
+    error_msg = f"Falha após {attempt + 1} tentativa(s). Último erro: {last_error.message if last_error else 'Desconhecido'}"
     logger.error(error_msg)
-    raise AICallError(error_msg, retry_count=max_retries, original_error=last_error)
+    raise AICallError(error_msg, retry_count=attempt + 1, original_error=last_error)
 
 def with_ai_retry(
     timeout: int = AICallConfig.DEFAULT_TIMEOUT,
     max_retries: int = AICallConfig.DEFAULT_MAX_RETRIES,
-    retry_delay: float = AICallConfig.DEFAULT_RETRY_DELAY
+    retry_delay: float = AICallConfig.DEFAULT_RETRY_DELAY,
+    provider: str = "openai",
+    hedge: bool = False
 ):
     """
     Decorator para adicionar timeout e retry a funções de IA.
@@ -117,14 +405,22 @@ def with_ai_retry(
                 timeout=timeout,
                 max_retries=max_retries,
                 retry_delay=retry_delay,
+                provider=provider,
+                hedge=hedge,
                 **kwargs
             )
         return wrapper
     return decorator
 
+def resilience_status() -> dict:
+    """Estado dos circuit breakers (para diagnóstico)"""
+    return {"breakers": [breaker.snapshot() for breaker in _breakers.values()]}
+
 # Funções auxiliares para tratamento de erros
 def get_user_friendly_error(error: AICallError) -> str:
     """Retorna mensagem amigável para o usuário"""
+    if isinstance(error, CircuitOpenError):
+        return "O serviço de IA está instável no momento. Por favor, tente novamente em alguns instantes."
     if "timeout" in error.message.lower():
         return "A geração de conteúdo está demorando mais que o esperado. Por favor, tente novamente em alguns instantes."
     elif "rate limit" in error.message.lower():
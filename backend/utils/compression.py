@@ -0,0 +1,264 @@
+"""
+Compressão de Respostas (gzip/brotli)
+
+- CompressionMiddleware: comprime respostas de corpo único com Content-Type
+  textual (JSON, HTML, CSS, CSV...) a partir de COMPRESSION_MIN_BYTES, na
+  codificação negociada pelo Accept-Encoding (br > gzip). Respostas pequenas,
+  streams (exportação CSV) e respostas que já têm Content-Encoding passam
+  intactas.
+- Artefatos pré-comprimidos: precompressed_response() guarda o corpo e suas
+  versões comprimidas em um LRU por worker (chave do artefato + codificação).
+  O request repetido não renderiza nem comprime de novo. Como o corpo é
+  comprimido uma vez só, usa níveis altos (COMPRESSION_STATIC_*).
+
+Corpos grandes são comprimidos no threadpool para não travar o event loop.
+brotli é opcional: sem o módulo, só gzip é oferecido.
+"""
+
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from prometheus_client import Counter
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+MIN_BYTES = int(os.environ.get("COMPRESSION_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.environ.get("COMPRESSION_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.environ.get("COMPRESSION_BROTLI_QUALITY", "4"))
+STATIC_GZIP_LEVEL = int(os.environ.get("COMPRESSION_STATIC_GZIP_LEVEL", "9"))
+STATIC_BROTLI_QUALITY = int(os.environ.get("COMPRESSION_STATIC_BROTLI_QUALITY", "11"))
+THREAD_BYTES = int(os.environ.get("COMPRESSION_THREAD_BYTES", str(64 * 1024)))
+ARTIFACT_CACHE_MB = int(os.environ.get("COMPRESSION_ARTIFACT_CACHE_MB", "32"))
+
+IDENTITY = "identity"
+# Ordem de preferência do servidor quando o cliente aceita mais de uma
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli is not None else ("gzip",)
+
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "application/xhtml+xml", "image/svg+xml",
+)
+
+COMPRESSION_BYTES = Counter(
+    "elevare_response_compression_bytes_total",
+    "Bytes antes (in) e depois (out) da compressão de respostas",
+    ["encoding", "mode", "stage"],
+)
+
+
+def is_compressible(media_type: Optional[str]) -> bool:
+    return bool(media_type) and media_type.lower().startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Melhor codificação suportada pelo Accept-Encoding (None = sem compressão)"""
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[coding] = q
+
+    wildcard = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for encoding in SUPPORTED_ENCODINGS:
+        q = weights.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, static: bool = False) -> bytes:
+    if encoding == "br":
+        return brotli.compress(data, quality=STATIC_BROTLI_QUALITY if static else BROTLI_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL if static else GZIP_LEVEL, mtime=0)
+    raise ValueError(f"Codificação não suportada: {encoding}")
+
+
+async def compress_async(data: bytes, encoding: str, static: bool = False) -> bytes:
+    """compress() no threadpool para corpos grandes (zlib/brotli liberam o GIL)"""
+    if len(data) >= THREAD_BYTES:
+        result = await run_in_threadpool(compress, data, encoding, static)
+    else:
+        result = compress(data, encoding, static)
+    mode = "artifact" if static else "dynamic"
+    COMPRESSION_BYTES.labels(encoding, mode, "in").inc(len(data))
+    COMPRESSION_BYTES.labels(encoding, mode, "out").inc(len(result))
+    return result
+
+
+def encoded_response(
+    body: bytes,
+    encoding: Optional[str],
+    media_type: str,
+    headers: Optional[dict] = None,
+) -> Response:
+    """Response com o corpo já na codificação indicada (None = identity)"""
+    response = Response(content=body, media_type=media_type, headers=headers)
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers.add_vary_header("Accept-Encoding")
+    return response
+
+
+# ============================================================================
+# ARTEFATOS PRÉ-COMPRIMIDOS
+# ============================================================================
+
+class ArtifactCache:
+    """LRU de corpos por (chave do artefato, codificação), limitado por bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[Hashable, str], bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple[Hashable, str]) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: Tuple[Hashable, str], data: bytes):
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+
+artifact_cache = ArtifactCache(ARTIFACT_CACHE_MB * 1024 * 1024)
+
+
+async def precompressed_response(
+    request: Request,
+    key: Hashable,
+    build: Callable[[], bytes],
+    media_type: str,
+    headers: Optional[dict] = None,
+) -> Response:
+    """
+    Resposta de um artefato identificado por `key` (deve mudar sempre que o
+    conteúdo mudar, ex.: hash do conteúdo + template). `build` só é chamado
+    quando o corpo não está em cache, sempre no threadpool (renderização é
+    síncrona). Tipos não compressíveis (PDF, EPUB) não entram no cache:
+    `build` é chamado sempre.
+    """
+    if not is_compressible(media_type):
+        return Response(content=await run_in_threadpool(build), media_type=media_type, headers=headers)
+
+    body = artifact_cache.get((key, IDENTITY))
+    if body is None:
+        body = await run_in_threadpool(build)
+        artifact_cache.put((key, IDENTITY), body)
+
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    if encoding is None or len(body) < MIN_BYTES:
+        return encoded_response(body, None, media_type, headers)
+
+    data = artifact_cache.get((key, encoding))
+    if data is None:
+        data = await compress_async(body, encoding, static=True)
+        artifact_cache.put((key, encoding), data)
+    return encoded_response(data, encoding, media_type, headers)
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+def _varies_on_encoding(headers: MutableHeaders) -> bool:
+    vary = headers.get("vary", "")
+    return any(token.strip().lower() in ("accept-encoding", "*") for token in vary.split(","))
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        start_message = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Vary em toda resposta comprimível, comprimida ou não: um cache
+                # não pode entregar a versão identity a quem aceita gzip e vice-versa
+                headers = MutableHeaders(raw=list(message.get("headers") or []))
+                if is_compressible(headers.get("content-type")) and not _varies_on_encoding(headers):
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "headers": headers.raw}
+                if encoding is None:
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            # Primeiro (e talvez único) pedaço do corpo: decide se comprime
+            start, start_message = start_message, None
+            body = message.get("body", b"")
+            headers = MutableHeaders(raw=list(start.get("headers") or []))
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or start["status"] in (204, 206, 304)
+                or "content-encoding" in headers
+                or not is_compressible(headers.get("content-type"))
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            compressed = await compress_async(body, encoding)
+            if len(compressed) >= len(body):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(compressed))
+            await send({**start, "headers": headers.raw})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
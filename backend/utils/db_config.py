@@ -0,0 +1,273 @@
+"""
+Configuração do MongoDB (Motor)
+
+Opções do AsyncIOMotorClient vindas do ambiente (têm precedência sobre as da
+MONGO_URL):
+- pool: MONGO_MAX_POOL_SIZE, MONGO_MIN_POOL_SIZE, MONGO_MAX_IDLE_TIME_MS,
+  MONGO_WAIT_QUEUE_TIMEOUT_MS (espera máxima por uma conexão livre)
+- timeouts: MONGO_SERVER_SELECTION_TIMEOUT_MS, MONGO_CONNECT_TIMEOUT_MS
+- compressão: MONGO_COMPRESSORS (ordem de preferência; zstd/snappy só entram se
+  o módulo estiver instalado), MONGO_ZLIB_LEVEL
+- leitura: MONGO_READ_PREFERENCE (padrão do client) e, por carga de trabalho,
+  WORKLOAD_READ_PREFERENCES (analytics/leaderboards em secundários, com
+  MONGO_MAX_STALENESS_SECONDS)
+
+O pool é por processo: com N workers e R réplicas o servidor recebe até
+N × R × MONGO_MAX_POOL_SIZE conexões.
+
+MongoPoolListener publica a utilização do pool (abertas, em uso, aguardando,
+tempo de checkout, falhas) no Prometheus e em GET /api/admin/db-pool.
+"""
+
+import importlib.util
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from prometheus_client import Counter, Gauge, Histogram
+from pymongo import monitoring
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+logger = logging.getLogger("elevare.db")
+
+MAX_POOL_SIZE = int(os.environ.get("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_TIME_MS = int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000"))
+WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "10000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+CONNECT_TIMEOUT_MS = int(os.environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+COMPRESSORS = os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib")
+ZLIB_LEVEL = int(os.environ.get("MONGO_ZLIB_LEVEL", "6"))
+READ_PREFERENCE = os.environ.get("MONGO_READ_PREFERENCE", "primary")
+MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", "120"))  # -1 = sem limite
+
+# Carga de trabalho → read preference (leituras agregadas que toleram atraso de replicação)
+WORKLOAD_READ_PREFERENCES: Dict[str, str] = {
+    "analytics": os.environ.get("MONGO_ANALYTICS_READ_PREFERENCE", "secondaryPreferred"),
+}
+
+# Compressor → módulo Python necessário
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": None}
+
+_READ_PREFERENCE_CLASSES = {
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+
+def available_compressors() -> List[str]:
+    """Compressores de MONGO_COMPRESSORS disponíveis neste ambiente (na ordem pedida)"""
+    available = []
+    for name in (c.strip().lower() for c in COMPRESSORS.split(",")):
+        if name not in _COMPRESSOR_MODULES:
+            if name:
+                logger.warning(f"Compressor MongoDB desconhecido ignorado: {name}")
+            continue
+        module = _COMPRESSOR_MODULES[name]
+        if module is None or importlib.util.find_spec(module) is not None:
+            available.append(name)
+    return available
+
+
+def read_preference(name: str):
+    """Read preference pelo nome do modo (primary, secondaryPreferred, ...)"""
+    if name.lower() == "primary":
+        return Primary()
+    cls = _READ_PREFERENCE_CLASSES.get(name.lower())
+    if cls is None:
+        raise ValueError(f"Read preference inválida: {name}")
+    return cls(max_staleness=MAX_STALENESS_SECONDS)
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": WAIT_QUEUE_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        "read_preference": read_preference(READ_PREFERENCE),
+    }
+    compressors = available_compressors()
+    if compressors:
+        options["compressors"] = ",".join(compressors)
+        if "zlib" in compressors:
+            options["zlibCompressionLevel"] = ZLIB_LEVEL
+    return options
+
+
+def create_client(url: str, event_listeners: Optional[list] = None):
+    """AsyncIOMotorClient com as opções de client_options() e a métrica de pool"""
+    options = client_options()
+    listeners = list(event_listeners or []) + [pool_listener]
+    logger.info(
+        f"MongoDB: pool {MIN_POOL_SIZE}-{MAX_POOL_SIZE}, compressão {options.get('compressors') or 'nenhuma'}, "
+        f"leitura {READ_PREFERENCE}"
+    )
+    return AsyncIOMotorClient(url, event_listeners=listeners, **options)
+
+
+def workload_database(db, workload: str):
+    """O mesmo banco com a read preference da carga de trabalho (ex.: analytics)"""
+    return db.with_options(read_preference=read_preference(WORKLOAD_READ_PREFERENCES[workload]))
+
+
+def config_report() -> dict:
+    report = {key: value for key, value in client_options().items() if key != "read_preference"}
+    report["read_preference"] = READ_PREFERENCE
+    report["workload_read_preferences"] = dict(WORKLOAD_READ_PREFERENCES)
+    report["max_staleness_seconds"] = MAX_STALENESS_SECONDS
+    return report
+
+
+# ============================================================================
+# MÉTRICAS DO POOL
+# ============================================================================
+
+POOL_CONNECTIONS = Gauge("elevare_mongo_pool_connections", "Conexões abertas no pool", ["address"])
+POOL_IN_USE = Gauge("elevare_mongo_pool_in_use", "Conexões em uso (checked out)", ["address"])
+POOL_WAITING = Gauge("elevare_mongo_pool_waiting", "Operações aguardando uma conexão do pool", ["address"])
+POOL_CHECKOUT_SECONDS = Histogram(
+    "elevare_mongo_pool_checkout_seconds", "Espera para obter uma conexão do pool", ["address"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+POOL_CHECKOUT_FAILED = Counter(
+    "elevare_mongo_pool_checkout_failed_total", "Checkouts que falharam (timeout, pool fechado, erro)", ["address", "reason"]
+)
+POOL_CLEARED = Counter("elevare_mongo_pool_cleared_total", "Pools limpos (servidor indisponível/failover)", ["address"])
+
+
+class _PoolStats:
+    __slots__ = ("max_size", "open", "in_use", "waiting", "peak_in_use", "checkouts", "failed", "wait_total", "wait_max")
+
+    def __init__(self, max_size: Optional[int]):
+        self.max_size = max_size
+        self.open = self.in_use = self.waiting = self.peak_in_use = self.checkouts = self.failed = 0
+        self.wait_total = self.wait_max = 0.0
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Utilização do pool por servidor (registrado em event_listeners do client)"""
+
+    def __init__(self):
+        self._pools: Dict[str, _PoolStats] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()  # início do checkout (mesma thread do evento de fim)
+
+    @staticmethod
+    def _address(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def _stats(self, address: str) -> _PoolStats:
+        stats = self._pools.get(address)
+        if stats is None:
+            stats = self._pools[address] = _PoolStats(None)
+        return stats
+
+    def pool_created(self, event):
+        address = self._address(event)
+        with self._lock:
+            # Só vem nas opções quando difere do padrão do driver
+            self._pools[address] = _PoolStats(event.options.get("maxPoolSize", MAX_POOL_SIZE))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        POOL_CLEARED.labels(self._address(event)).inc()
+
+    def pool_closed(self, event):
+        address = self._address(event)
+        with self._lock:
+            self._pools.pop(address, None)
+        for gauge in (POOL_CONNECTIONS, POOL_IN_USE, POOL_WAITING):
+            gauge.labels(address).set(0)
+
+    def connection_created(self, event):
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            stats.open += 1
+            POOL_CONNECTIONS.labels(address).set(stats.open)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            stats.open = max(stats.open - 1, 0)
+            POOL_CONNECTIONS.labels(address).set(stats.open)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            stats.waiting += 1
+            POOL_WAITING.labels(address).set(stats.waiting)
+
+    def _check_out_finished(self, address: str, stats: _PoolStats) -> float:
+        started = getattr(self._local, "started", None)
+        self._local.started = None
+        stats.waiting = max(stats.waiting - 1, 0)
+        POOL_WAITING.labels(address).set(stats.waiting)
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def connection_checked_out(self, event):
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            waited = self._check_out_finished(address, stats)
+            stats.in_use += 1
+            stats.peak_in_use = max(stats.peak_in_use, stats.in_use)
+            stats.checkouts += 1
+            stats.wait_total += waited
+            stats.wait_max = max(stats.wait_max, waited)
+            POOL_IN_USE.labels(address).set(stats.in_use)
+        POOL_CHECKOUT_SECONDS.labels(address).observe(waited)
+
+    def connection_check_out_failed(self, event):
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            self._check_out_finished(address, stats)
+            stats.failed += 1
+        POOL_CHECKOUT_FAILED.labels(address, str(event.reason)).inc()
+
+    def connection_checked_in(self, event):
+        address = self._address(event)
+        with self._lock:
+            stats = self._stats(address)
+            stats.in_use = max(stats.in_use - 1, 0)
+            POOL_IN_USE.labels(address).set(stats.in_use)
+
+    def report(self) -> List[dict]:
+        with self._lock:
+            return [
+                {
+                    "address": address,
+                    "max_size": stats.max_size,
+                    "open": stats.open,
+                    "in_use": stats.in_use,
+                    "waiting": stats.waiting,
+                    "peak_in_use": stats.peak_in_use,
+                    "utilization": round(stats.in_use / stats.max_size, 3) if stats.max_size else None,
+                    "checkouts": stats.checkouts,
+                    "checkout_failures": stats.failed,
+                    "avg_checkout_ms": round(stats.wait_total / stats.checkouts * 1000, 3) if stats.checkouts else 0,
+                    "max_checkout_ms": round(stats.wait_max * 1000, 3),
+                }
+                for address, stats in sorted(self._pools.items())
+            ]
+
+
+pool_listener = MongoPoolListener()
@@ -0,0 +1,259 @@
+"""
+Prazo (deadline) por Request
+
+Cada request recebe um orçamento de tempo total, em vez de cada etapa ter o seu
+timeout fixo e independente:
+- por rota (ROUTE_DEADLINES, primeiro padrão que casar) ou REQUEST_DEADLINE_SECONDS
+- o cliente pode encurtar com o cabeçalho X-Request-Timeout (segundos), nunca alongar
+- rotas com None (importação/exportação de leads) não têm prazo
+
+Quem consulta o prazo:
+- LlmChat.send_message e OpenAIImageGeneration.generate_images (enforce_on_ai_clients)
+- ai_call_with_retry: timeout de cada tentativa limitado ao restante, sem nova
+  tentativa se o backoff não couber
+- MongoDB: pymongo.timeout() com o restante (CSOT; o Motor copia o contexto
+  para as threads do executor)
+- fluxos encadeados (reescritas do e-book, sequência de campanha) param antes
+  e devolvem o resultado parcial
+
+Prazo esgotado fora de um tratamento específico vira 504.
+"""
+
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from typing import List, Optional, Tuple
+
+import pymongo
+from prometheus_client import Counter
+from pymongo.errors import PyMongoError
+
+from utils.lazy_imports import when_imported
+
+logger = logging.getLogger("elevare.deadline")
+
+DEFAULT_DEADLINE = float(os.environ.get("REQUEST_DEADLINE_SECONDS", "90"))  # 0 desliga o padrão
+DEADLINE_HEADER = b"x-request-timeout"
+
+# (padrão do path, segundos); None = sem prazo (jobs em background, streaming)
+ROUTE_DEADLINES: List[Tuple[str, Optional[float]]] = [
+    (r"^/api/leads/(import|export)", None),
+    (r"^/api/ebook(-new)?/generate", 300),
+    (r"^/api/ebook-new/refine-chapter", 180),
+    (r"^/api/campanhas/[^/]+/gerar-sequencia", 180),
+    (r"^/api/seo/", 180),
+    (r"^/api/images/|/gerar-(copy|imagem)$", 120),
+]
+_ROUTE_PATTERNS = [(re.compile(pattern), seconds) for pattern, seconds in ROUTE_DEADLINES]
+
+DEADLINE_EXCEEDED = Counter("elevare_deadline_exceeded_total", "Requests abortados por prazo esgotado", ["stage"])
+DEADLINE_PARTIAL = Counter("elevare_deadline_partial_results_total", "Fluxos encerrados antes com resultado parcial", ["stage"])
+
+
+class DeadlineExceeded(TimeoutError):
+    """O prazo do request acabou antes (ou durante) a etapa `stage`"""
+    def __init__(self, stage: str = "request"):
+        self.stage = stage
+        super().__init__(f"Prazo do request esgotado em {stage}")
+
+
+class Deadline:
+    __slots__ = ("budget", "expires_at")
+
+    def __init__(self, budget: float):
+        self.budget = budget
+        self.expires_at = time.monotonic() + budget
+
+    def remaining(self) -> float:
+        return self.expires_at - time.monotonic()
+
+
+_deadline_var: contextvars.ContextVar[Optional[Deadline]] = contextvars.ContextVar("request_deadline", default=None)
+
+
+def remaining() -> Optional[float]:
+    """Segundos restantes do prazo do request (None se não houver prazo)"""
+    deadline = _deadline_var.get()
+    return None if deadline is None else deadline.remaining()
+
+
+def has_time_for(seconds: float) -> bool:
+    """Cabe uma etapa de `seconds` no que resta do prazo?"""
+    left = remaining()
+    return left is None or left > seconds
+
+
+def check_deadline(stage: str):
+    """Raises DeadlineExceeded se o prazo já acabou"""
+    left = remaining()
+    if left is not None and left <= 0:
+        DEADLINE_EXCEEDED.labels(stage).inc()
+        raise DeadlineExceeded(stage)
+
+
+def bounded_timeout(timeout: Optional[float], stage: str = "call") -> Optional[float]:
+    """
+    Timeout da etapa limitado ao restante do prazo.
+
+    Raises:
+        DeadlineExceeded: prazo já esgotado
+    """
+    check_deadline(stage)
+    left = remaining()
+    if left is None:
+        return timeout
+    return left if timeout is None else min(timeout, left)
+
+
+def record_partial(stage: str):
+    DEADLINE_PARTIAL.labels(stage).inc()
+    logger.warning(f"Prazo do request insuficiente: {stage} encerrado com resultado parcial")
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]):
+    """Define o prazo no contexto atual (também para as operações do MongoDB)"""
+    if seconds is None:
+        yield None
+        return
+    deadline = Deadline(seconds)
+    token = _deadline_var.set(deadline)
+    try:
+        with pymongo.timeout(seconds):
+            yield deadline
+    finally:
+        _deadline_var.reset(token)
+
+
+async def await_within(coro, stage: str):
+    """Aguarda a corrotina no máximo até o fim do prazo (DeadlineExceeded se estourar)"""
+    try:
+        timeout = bounded_timeout(None, stage)
+    except DeadlineExceeded:
+        coro.close()
+        raise
+    if timeout is None:
+        return await coro
+    try:
+        return await asyncio.wait_for(coro, timeout=timeout)
+    except asyncio.TimeoutError:
+        if remaining() > 0:
+            # Timeout do próprio cliente, não do prazo
+            raise
+        DEADLINE_EXCEEDED.labels(stage).inc()
+        raise DeadlineExceeded(stage)
+
+
+def is_deadline_error(exc: BaseException) -> bool:
+    """Prazo esgotado, inclusive quando detectado pelo driver do MongoDB (CSOT)"""
+    if isinstance(exc, DeadlineExceeded):
+        return True
+    return isinstance(exc, PyMongoError) and getattr(exc, "timeout", False) and remaining() is not None
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+def deadline_for(scope) -> Optional[float]:
+    path = scope.get("path", "")
+    budget: Optional[float] = DEFAULT_DEADLINE or None
+    for pattern, seconds in _ROUTE_PATTERNS:
+        if pattern.search(path):
+            if seconds is None:
+                return None
+            budget = seconds
+            break
+
+    header = dict(scope.get("headers") or []).get(DEADLINE_HEADER)
+    if header:
+        try:
+            requested = float(header.decode("latin-1"))
+        except ValueError:
+            requested = 0
+        if requested > 0:
+            budget = requested if budget is None else min(budget, requested)
+    return budget
+
+
+class DeadlineMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        budget = deadline_for(scope)
+        if budget is None:
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_wrapper(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        with request_deadline(budget):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception as exc:
+                if response_started or not is_deadline_error(exc):
+                    raise
+                stage = getattr(exc, "stage", "db")
+                if not isinstance(exc, DeadlineExceeded):
+                    DEADLINE_EXCEEDED.labels(stage).inc()
+                logger.warning(f"Prazo de {budget:.0f}s esgotado em {stage}: {scope.get('method')} {scope.get('path')}")
+                body = json.dumps({
+                    "detail": "A operação excedeu o tempo limite. Tente novamente em instantes.",
+                    "stage": stage,
+                }).encode()
+                await send({
+                    "type": "http.response.start",
+                    "status": 504,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+                })
+                await send({"type": "http.response.body", "body": body})
+
+
+# ============================================================================
+# CLIENTES DE IA
+# ============================================================================
+
+_enforced = False
+
+
+def enforce_on_ai_clients():
+    """Limita LlmChat.send_message e generate_images ao prazo do request (idempotente)"""
+    global _enforced
+    if _enforced:
+        return
+    _enforced = True
+    when_imported("emergentintegrations.llm.chat", _enforce_on_llm_chat)
+    when_imported("emergentintegrations.llm.openai.image_generation", _enforce_on_image_generation)
+
+
+def _enforce_on_llm_chat(module):
+    original_send = module.LlmChat.send_message
+
+    async def send_message(self, *args, **kwargs):
+        return await await_within(original_send(self, *args, **kwargs), "llm")
+
+    module.LlmChat.send_message = send_message
+
+
+def _enforce_on_image_generation(module):
+    original_generate = module.OpenAIImageGeneration.generate_images
+
+    async def generate_images(self, *args, **kwargs):
+        return await await_within(original_generate(self, *args, **kwargs), "image")
+
+    module.OpenAIImageGeneration.generate_images = generate_images
@@ -0,0 +1,211 @@
+"""
+Execução Sensível à Desconexão do Cliente
+
+Handlers longos de IA rodam a geração numa task e consultam
+request.is_disconnected() a cada DISCONNECT_POLL_SECONDS. Se o cliente fechar a aba:
+- padrão: a task é cancelada (a chamada ao LLM em andamento e as próximas,
+  como reescritas, não acontecem) e o request termina com 499
+- keep_running=True: a geração continua em segundo plano e a resposta que o
+  handler devolveria fica em background_results (GET /api/background-results)
+
+Chamadas de LLM canceladas por desconexão alimentam as métricas de tokens
+economizados (estimativa: média recente de tokens de saída do modelo).
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+from uuid import uuid4
+
+from fastapi import HTTPException
+from prometheus_client import Counter
+from pymongo import ASCENDING, DESCENDING
+
+from utils.observability import ExternalCall, add_call_observer
+from utils.shared_state import shared_state
+
+logger = logging.getLogger("elevare.disconnect")
+
+POLL_INTERVAL = float(os.environ.get("DISCONNECT_POLL_SECONDS", "1"))
+DEFAULT_COMPLETION_TOKENS = 1000  # antes de haver chamadas concluídas do modelo
+RESULT_RETENTION_DAYS = int(os.environ.get("BACKGROUND_RESULT_RETENTION_DAYS", "7"))
+
+DISCONNECTS = Counter("elevare_client_disconnects_total", "Gerações abandonadas pelo cliente", ["stage", "action"])
+CANCELLED_CALLS = Counter("elevare_llm_cancelled_calls_total", "Chamadas de LLM/imagem canceladas por desconexão", ["kind", "model"])
+TOKENS_SAVED = Counter("elevare_llm_tokens_saved_total", "Tokens de saída estimados não gerados por desconexão", ["model"])
+
+
+class ClientDisconnected(Exception):
+    """O cliente desconectou durante `stage` (o handler não tem a quem responder)"""
+    def __init__(self, stage: str, background_id: Optional[str] = None):
+        self.stage = stage
+        self.background_id = background_id
+        super().__init__(f"Cliente desconectou durante {stage}")
+
+
+class _Watch:
+    __slots__ = ("stage", "disconnected")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.disconnected = False
+
+
+_watch_var: contextvars.ContextVar[Optional[_Watch]] = contextvars.ContextVar("disconnect_watch", default=None)
+
+# Média móvel de tokens de saída por modelo (base da estimativa de economia)
+_completion_avg: Dict[str, float] = {}
+
+# Referências das tasks que continuam após a desconexão (evita coleta pelo GC)
+_background: Set[asyncio.Task] = set()
+
+
+def _observe(call: ExternalCall):
+    if call.outcome == "ok":
+        if call.kind == "llm" and call.completion_tokens:
+            previous = _completion_avg.get(call.model)
+            _completion_avg[call.model] = (
+                call.completion_tokens if previous is None else 0.9 * previous + 0.1 * call.completion_tokens
+            )
+        return
+    watch = _watch_var.get()
+    if call.outcome != "cancelled" or watch is None or not watch.disconnected:
+        return
+    CANCELLED_CALLS.labels(call.kind, call.model).inc()
+    if call.kind == "llm":
+        TOKENS_SAVED.labels(call.model).inc(int(_completion_avg.get(call.model, DEFAULT_COMPLETION_TOKENS)))
+
+
+add_call_observer(_observe)
+
+
+async def run_disconnect_aware(
+    request,
+    coro,
+    *,
+    stage: str,
+    keep_running: bool = False,
+    db=None,
+    user_id: Optional[str] = None,
+    poll_interval: float = POLL_INTERVAL,
+):
+    """
+    Aguarda `coro` enquanto o cliente estiver conectado.
+
+    Com keep_running=True (exige db e user_id), a desconexão não cancela: o
+    resultado é gravado em background_results ao terminar.
+
+    Raises:
+        ClientDisconnected: o cliente foi embora antes do fim
+    """
+    watch = _Watch(stage)
+    token = _watch_var.set(watch)
+    try:
+        # A task herda o contexto atual (trace ID, prazo do request, _Watch)
+        task = asyncio.ensure_future(coro)
+    finally:
+        _watch_var.reset(token)
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                break
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+
+    watch.disconnected = True
+    if keep_running:
+        DISCONNECTS.labels(stage, "background").inc()
+        background_id = await _keep_in_background(db, user_id, stage, task)
+        logger.info(f"Cliente desconectou durante {stage}: geração continua em segundo plano ({background_id})")
+        raise ClientDisconnected(stage, background_id)
+
+    DISCONNECTS.labels(stage, "cancelled").inc()
+    task.cancel()
+    # Espera o cancelamento chegar até a chamada do LLM (métricas de economia)
+    await asyncio.wait({task})
+    if not task.cancelled():
+        task.exception()
+    logger.info(f"Cliente desconectou durante {stage}: geração cancelada")
+    raise ClientDisconnected(stage)
+
+
+# ============================================================================
+# RESULTADOS EM SEGUNDO PLANO
+# ============================================================================
+
+async def _keep_in_background(db, user_id: str, stage: str, task: asyncio.Task) -> str:
+    record = {
+        "id": str(uuid4()),
+        "user_id": user_id,
+        "kind": stage,
+        "status": "processing",
+        "result": None,
+        "error": None,
+        "created_at": datetime.now(timezone.utc),
+        "finished_at": None,
+    }
+    await db.background_results.insert_one(record)
+    runner = asyncio.ensure_future(
+        shared_state.run_leased("background_result", record["id"], _store_result(db, record["id"], task))
+    )
+    _background.add(runner)
+    runner.add_done_callback(_background.discard)
+    return record["id"]
+
+
+async def _store_result(db, record_id: str, task: asyncio.Task):
+    update = {}
+    try:
+        update.update(status="done", result=await task)
+    except HTTPException as e:
+        update.update(status="failed", error=e.detail)
+    except Exception as e:
+        logger.warning(f"Geração em segundo plano {record_id} falhou: {e}")
+        update.update(status="failed", error=str(e))
+    update["finished_at"] = datetime.now(timezone.utc)
+    try:
+        await db.background_results.update_one({"id": record_id}, {"$set": update})
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar o resultado em segundo plano {record_id}: {e}")
+
+
+async def mark_background_result_interrupted(db, job: dict):
+    """Handler de lease vencido: o worker que rodava a geração parou"""
+    await db.background_results.update_one(
+        {"id": job["id"], "status": "processing"},
+        {"$set": {"status": "failed", "error": "Geração interrompida", "finished_at": datetime.now(timezone.utc)}},
+    )
+
+
+def _public(record: dict) -> dict:
+    for field in ("created_at", "finished_at"):
+        if isinstance(record.get(field), datetime):
+            record[field] = record[field].isoformat()
+    return record
+
+
+async def list_background_results(db, user_id: str, limit: int = 20) -> list:
+    records = await db.background_results.find(
+        {"user_id": user_id}, {"_id": 0, "result": 0}
+    ).sort("created_at", DESCENDING).to_list(limit)
+    return [_public(record) for record in records]
+
+
+async def get_background_result(db, user_id: str, record_id: str) -> Optional[dict]:
+    record = await db.background_results.find_one({"id": record_id, "user_id": user_id}, {"_id": 0})
+    return _public(record) if record else None
+
+
+async def ensure_background_result_indexes(db):
+    await db.background_results.create_index(
+        "created_at", expireAfterSeconds=RESULT_RETENTION_DAYS * 86400, name="created_at_ttl"
+    )
+    await db.background_results.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_created")
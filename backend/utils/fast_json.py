@@ -0,0 +1,97 @@
+"""
+Serialização JSON Rápida para Respostas Grandes
+
+O caminho padrão do FastAPI para um dict retornado pelo endpoint é
+jsonable_encoder (percorre e copia a estrutura inteira) + json.dumps. Para
+listagens e documentos grandes isso é boa parte da CPU do request.
+
+Opt-in por endpoint:
+- FastJSONResponse(conteúdo): o endpoint devolve a Response pronta, sem passar
+  pelo jsonable_encoder; serializa com orjson (datetime, UUID e dicts do Motor
+  direto; ObjectId/Decimal/modelos pydantic pelo fallback)
+- StaticJSON(builder): payload estático (catálogos de prompts, templates)
+  serializado e comprimido (gzip/brotli, ver utils.compression) uma única vez
+  por worker
+
+Sem orjson instalado, cai para json da stdlib com a mesma interface.
+"""
+
+import base64
+import json
+from decimal import Decimal
+from typing import Any, Callable, Dict, Optional
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+
+from utils.compression import MIN_BYTES, compress_async, encoded_response, negotiate_encoding
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+MEDIA_TYPE = "application/json"
+
+
+def _default(value: Any):
+    """Tipos que o orjson não serializa nativamente"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if isinstance(value, bytes):
+        return base64.b64encode(value).decode("ascii")
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return jsonable_encoder(value)
+
+
+if orjson is not None:
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=_OPTIONS)
+else:
+    def dumps(content: Any) -> bytes:
+        return json.dumps(
+            content, default=_default, ensure_ascii=False, allow_nan=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse serializada com orjson, sem jsonable_encoder no caminho"""
+
+    media_type = MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class StaticJSON:
+    """Payload estático serializado (e comprimido) no primeiro uso e reaproveitado em todo request"""
+
+    def __init__(self, builder: Callable[[], Any]):
+        self._builder = builder
+        self._body: Optional[bytes] = None
+        self._encoded: Dict[str, bytes] = {}
+
+    @property
+    def body(self) -> bytes:
+        if self._body is None:
+            self._body = dumps(self._builder())
+        return self._body
+
+    async def response(self, request: Request) -> Response:
+        body = self.body
+        encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if encoding is None or len(body) < MIN_BYTES:
+            return encoded_response(body, None, MEDIA_TYPE)
+        data = self._encoded.get(encoding)
+        if data is None:
+            data = self._encoded[encoding] = await compress_async(body, encoding, static=True)
+        return encoded_response(data, encoding, MEDIA_TYPE)
@@ -0,0 +1,228 @@
+"""
+Idempotência e Single-Flight para Endpoints de Geração
+
+Um duplo clique em "gerar" não deve disparar duas gerações, dois inserts e dois
+débitos de créditos. Endpoints decorados com @idempotent(scope):
+
+- Com cabeçalho Idempotency-Key: a chave (por usuário e endpoint) é reservada em
+  idempotency_keys. Requests concorrentes com a mesma chave aguardam a mesma
+  execução (no mesmo worker, pela task em andamento; entre workers e réplicas,
+  pela reserva no estado compartilhado). A resposta concluída é reaproduzida por IDEMPOTENCY_TTL_SECONDS
+  (cabeçalho Idempotent-Replayed: true). Mesma chave com outro corpo: 422.
+- Sem a chave: requests idênticos (mesmo usuário, endpoint e parâmetros) em
+  andamento no mesmo worker compartilham a execução, sem replay posterior.
+
+Erros não ficam gravados: a chave é liberada e o cliente pode tentar de novo.
+Exceção: se o cliente desconectou e a geração continuou em segundo plano
+(utils.disconnect, keep_running=True), a chave fica com uma resposta 202 que
+aponta para /api/background-results/{id}; o retry não dispara uma segunda
+geração nem um segundo débito de créditos.
+
+O endpoint precisa declarar `request: Request` e `current_user`.
+"""
+
+import asyncio
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from prometheus_client import Counter
+
+from utils.disconnect import ClientDisconnected
+from utils.shared_state import shared_state
+
+logger = logging.getLogger("elevare.idempotency")
+
+IDEMPOTENCY_HEADER = "idempotency-key"
+NAMESPACE = "idempotency"
+TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "3600"))
+WAIT_SECONDS = float(os.environ.get("IDEMPOTENCY_WAIT_SECONDS", "120"))  # espera por outro worker
+POLL_INTERVAL = 0.5
+MAX_KEY_LENGTH = 255
+MAX_STORED_BYTES = 4 * 1024 * 1024  # respostas maiores (ex.: imagem em base64) não são reaproduzidas
+
+IDEMPOTENT_REQUESTS = Counter(
+    "elevare_idempotent_requests_total", "Requests em endpoints idempotentes por desfecho", ["scope", "outcome"]
+)
+
+_IGNORED_PARAMS = ("request", "current_user", "background_tasks")
+
+# Execuções em andamento neste worker: chave → (fingerprint, future com a resposta)
+_inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+
+def _fingerprint(kwargs: dict) -> str:
+    params = {name: value for name, value in kwargs.items() if name not in _IGNORED_PARAMS}
+    payload = json.dumps(jsonable_encoder(params), sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\x1f".join(parts).encode()).hexdigest()
+
+
+def _replay(record: dict) -> JSONResponse:
+    return JSONResponse(
+        record["response"], status_code=record.get("status_code", 200), headers={"Idempotent-Replayed": "true"}
+    )
+
+
+def _background_response(background_id: str) -> dict:
+    return {
+        "success": True,
+        "background": True,
+        "background_result_id": background_id,
+        "result_url": f"/api/background-results/{background_id}",
+        "message": "A geração continua em segundo plano. Consulte o resultado em result_url.",
+    }
+
+
+async def _acquire(scope: str, key: str, user_id: str, fingerprint: str) -> Optional[JSONResponse]:
+    """
+    Reserva a chave no estado compartilhado. Retorna a resposta gravada se outra execução já
+    terminou; None se este request deve executar.
+    """
+    record = {
+        "scope": scope,
+        "user_id": user_id,
+        "fingerprint": fingerprint,
+        "status": "processing",
+        "response": None,
+        "created_at": datetime.now(timezone.utc),
+    }
+    started = time.monotonic()
+    while True:
+        if await shared_state.backend.add(NAMESPACE, key, record, TTL_SECONDS):
+            return None
+        existing = await shared_state.backend.get(NAMESPACE, key)
+        if existing is None:
+            continue  # a outra execução falhou e liberou a chave
+        if existing["fingerprint"] != fingerprint:
+            IDEMPOTENT_REQUESTS.labels(scope, "mismatch").inc()
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key já utilizada com outros parâmetros"
+            )
+        if existing["status"] == "done":
+            IDEMPOTENT_REQUESTS.labels(scope, "replayed").inc()
+            return _replay(existing)
+        if time.monotonic() - started > WAIT_SECONDS:
+            IDEMPOTENT_REQUESTS.labels(scope, "conflict").inc()
+            raise HTTPException(
+                status_code=409,
+                detail="Uma requisição idêntica ainda está em processamento. Tente novamente em instantes."
+            )
+        await asyncio.sleep(POLL_INTERVAL)
+
+
+async def _store(scope: str, key: str, response, status_code: int = 200) -> None:
+    try:
+        encoded = jsonable_encoder(response)
+        if len(json.dumps(encoded, default=str)) > MAX_STORED_BYTES:
+            await shared_state.backend.delete(NAMESPACE, key)
+            return
+        await shared_state.backend.update(
+            NAMESPACE, key, {"status": "done", "response": encoded, "status_code": status_code}
+        )
+    except Exception as e:
+        logger.warning(f"Não foi possível gravar a resposta idempotente de {scope}: {e}")
+
+
+async def _release(key: str):
+    try:
+        await shared_state.backend.delete(NAMESPACE, key, only_if={"status": "processing"})
+    except Exception as e:
+        logger.warning(f"Não foi possível liberar a chave idempotente: {e}")
+
+
+def idempotent(scope: str):
+    """
+    Decorator de endpoint: single-flight por usuário/parâmetros e replay por
+    Idempotency-Key (ver docstring do módulo).
+
+    Uso:
+        @app.post("/api/seo/generate-article")
+        @idempotent("seo_article")
+        async def generate_seo_article(request: Request, data: ..., current_user: dict = Depends(...)):
+    """
+    def decorator(func: Callable):
+        parameters = inspect.signature(func).parameters
+        if "request" not in parameters or "current_user" not in parameters:
+            raise TypeError(f"@idempotent({scope!r}) exige os parâmetros request e current_user")
+
+        @wraps(func)
+        async def wrapper(**kwargs):
+            request: Request = kwargs["request"]
+            user_id = kwargs["current_user"]["id"]
+            fingerprint = _fingerprint(kwargs)
+            client_key = (request.headers.get(IDEMPOTENCY_HEADER) or "").strip()
+            if len(client_key) > MAX_KEY_LENGTH:
+                raise HTTPException(status_code=400, detail="Idempotency-Key muito longa")
+            persistent = bool(client_key)
+            key = _digest(scope, user_id, client_key) if client_key else _digest(scope, user_id, fingerprint)
+
+            inflight = _inflight.get(key)
+            if inflight is not None:
+                if inflight[0] != fingerprint:
+                    IDEMPOTENT_REQUESTS.labels(scope, "mismatch").inc()
+                    raise HTTPException(status_code=422, detail="Idempotency-Key já utilizada com outros parâmetros")
+                IDEMPOTENT_REQUESTS.labels(scope, "coalesced").inc()
+                result = await asyncio.shield(inflight[1])
+                if persistent and not isinstance(result, JSONResponse):
+                    return JSONResponse(jsonable_encoder(result), headers={"Idempotent-Replayed": "true"})
+                return result
+
+            future = asyncio.get_running_loop().create_future()
+            _inflight[key] = (fingerprint, future)
+            try:
+                if persistent:
+                    replayed = await _acquire(scope, key, user_id, fingerprint)
+                    if replayed is not None:
+                        future.set_result(replayed)
+                        return replayed
+                IDEMPOTENT_REQUESTS.labels(scope, "executed").inc()
+                try:
+                    result = await func(**kwargs)
+                except ClientDisconnected as e:
+                    if e.background_id is None:
+                        if persistent:
+                            await _release(key)
+                        raise
+                    # A geração segue em segundo plano (e debita os créditos): retries e
+                    # requests aguardando recebem onde buscar o resultado
+                    body = _background_response(e.background_id)
+                    if persistent:
+                        await _store(scope, key, body, status_code=202)
+                    future.set_result(JSONResponse(body, status_code=202, headers={"Idempotent-Replayed": "true"}))
+                    raise
+                except BaseException:
+                    if persistent:
+                        await _release(key)
+                    raise
+                if persistent:
+                    await _store(scope, key, result)
+                future.set_result(result)
+                return result
+            except BaseException as e:
+                if not future.done():
+                    if isinstance(e, Exception):
+                        future.set_exception(e)
+                    else:
+                        future.cancel()
+                raise
+            finally:
+                _inflight.pop(key, None)
+                if future.done() and not future.cancelled():
+                    future.exception()  # evita "exception was never retrieved" sem seguidores
+
+        return wrapper
+    return decorator
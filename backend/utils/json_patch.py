@@ -0,0 +1,138 @@
+"""
+JSON Patch (subconjunto do RFC 6902: add, remove, replace)
+
+- apply_operation/apply_operations: aplica operações com caminhos JSON Pointer
+- diff: gera as operações que transformam um documento em outro, descendo
+  até o nível de campo (listas de tamanhos diferentes viram remove/add só
+  no trecho que mudou, preservando prefixo e sufixo comuns)
+"""
+
+import copy
+from typing import Any, List
+
+OPERATIONS = ("add", "remove", "replace")
+
+
+class JsonPatchError(ValueError):
+    """Operação inválida ou caminho inexistente"""
+
+
+def _escape(token) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def parse_path(path: str) -> List[str]:
+    if not path or not path.startswith("/"):
+        raise JsonPatchError(f"Caminho inválido: {path!r}")
+    # Escapes de JSON Pointer: ~1 → /, ~0 → ~
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _index(container: list, token: str, allow_end: bool = False) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit():
+        raise JsonPatchError(f"Índice inválido: {token!r}")
+    index = int(token)
+    limit = len(container) + (1 if allow_end else 0)
+    if index >= limit:
+        raise JsonPatchError(f"Índice fora do intervalo: {index}")
+    return index
+
+
+def apply_operation(document: Any, operation: dict):
+    """Aplica uma operação no documento (in place)"""
+    op = operation.get("op")
+    path = operation.get("path", "")
+    if op not in OPERATIONS:
+        raise JsonPatchError(f"Operação não suportada: {op!r}. Use: {', '.join(OPERATIONS)}")
+    if op != "remove" and "value" not in operation:
+        raise JsonPatchError(f"Operação {op} sem 'value'")
+    tokens = parse_path(path)
+
+    parent: Any = document
+    for token in tokens[:-1]:
+        if isinstance(parent, list):
+            parent = parent[_index(parent, token)]
+        elif isinstance(parent, dict) and token in parent:
+            parent = parent[token]
+        else:
+            raise JsonPatchError(f"Caminho inexistente: {path}")
+
+    last = tokens[-1]
+    value = copy.deepcopy(operation.get("value"))
+    if isinstance(parent, list):
+        if op == "add":
+            parent.insert(_index(parent, last, allow_end=True), value)
+        elif op == "remove":
+            parent.pop(_index(parent, last))
+        else:
+            parent[_index(parent, last)] = value
+    elif isinstance(parent, dict):
+        if op != "add" and last not in parent:
+            raise JsonPatchError(f"Caminho inexistente: {path}")
+        if op == "remove":
+            del parent[last]
+        else:
+            parent[last] = value
+    else:
+        raise JsonPatchError(f"Caminho inexistente: {path}")
+
+
+def apply_operations(document: Any, operations: List[dict]) -> Any:
+    """Retorna uma cópia do documento com as operações aplicadas"""
+    patched = copy.deepcopy(document)
+    for operation in operations:
+        apply_operation(patched, operation)
+    return patched
+
+
+def diff(old: Any, new: Any, path: str = "") -> List[dict]:
+    """Operações que transformam `old` em `new`"""
+    if old == new:
+        return []
+
+    if isinstance(old, dict) and isinstance(new, dict):
+        ops = []
+        for key in old:
+            if key not in new:
+                ops.append({"op": "remove", "path": f"{path}/{_escape(key)}"})
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key not in old:
+                ops.append({"op": "add", "path": child, "value": value})
+            else:
+                ops.extend(diff(old[key], value, child))
+        return ops
+
+    if isinstance(old, list) and isinstance(new, list):
+        if len(old) == len(new):
+            ops = []
+            for i, (a, b) in enumerate(zip(old, new)):
+                ops.extend(diff(a, b, f"{path}/{i}"))
+            return ops
+
+        # Trecho do meio diferente: prefixo e sufixo comuns ficam intactos
+        prefix = 0
+        while prefix < min(len(old), len(new)) and old[prefix] == new[prefix]:
+            prefix += 1
+        suffix = 0
+        while (suffix < min(len(old), len(new)) - prefix
+               and old[len(old) - 1 - suffix] == new[len(new) - 1 - suffix]):
+            suffix += 1
+
+        old_middle = old[prefix:len(old) - suffix]
+        new_middle = new[prefix:len(new) - suffix]
+        ops = []
+        common = min(len(old_middle), len(new_middle))
+        for i in range(common):
+            ops.extend(diff(old_middle[i], new_middle[i], f"{path}/{prefix + i}"))
+        for i in reversed(range(common, len(old_middle))):
+            ops.append({"op": "remove", "path": f"{path}/{prefix + i}"})
+        for i in range(common, len(new_middle)):
+            ops.append({"op": "add", "path": f"{path}/{prefix + i}", "value": new_middle[i]})
+        return ops
+
+    if not path:
+        raise JsonPatchError("A raiz do documento precisa ser um objeto")
+    return [{"op": "replace", "path": path, "value": new}]
@@ -0,0 +1,143 @@
+"""
+Imports Preguiçosos e Relatório de Inicialização
+
+Os SDKs pesados (emergentintegrations → litellm/openai/google, resend, Stripe)
+não são importados no cold start: cada serviço importa no primeiro uso.
+
+- when_imported(módulo, callback): roda callback(módulo) logo após o primeiro
+  import (ou na hora, se já importado). Usado para instrumentar os clientes de
+  IA sem forçar o import do SDK.
+- startup_timer: duração das fases do cold start (imports do server.py, evento
+  de startup), dos imports tardios dos SDKs e da carga dos routers preguiçosos.
+  O resumo vai para o log ao fim do startup e para GET /api/admin/startup-timing.
+"""
+
+import importlib.abc
+import logging
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List
+
+logger = logging.getLogger("elevare.startup")
+
+# Imports tardios que entram no relatório mesmo sem callback
+TRACKED_MODULES = (
+    "emergentintegrations.llm.chat",
+    "emergentintegrations.llm.openai",
+    "emergentintegrations.llm.openai.image_generation",
+    "emergentintegrations.payments.stripe.checkout",
+    "resend",
+)
+
+
+class StartupTimer:
+    def __init__(self):
+        self._last = time.perf_counter()
+        self._lock = threading.Lock()
+        self.phases: List[dict] = []
+        self.lazy_imports: List[dict] = []
+        self.ready_at = None
+        self._ready_perf = None
+
+    def mark(self, phase: str):
+        """Fecha a fase `phase` (tempo desde a marca anterior)"""
+        now = time.perf_counter()
+        with self._lock:
+            self.phases.append({"phase": phase, "ms": round((now - self._last) * 1000, 1)})
+            self._last = now
+
+    def ready(self):
+        self.mark("startup")
+        self._ready_perf = time.perf_counter()
+        self.ready_at = datetime.now(timezone.utc).isoformat()
+        slowest = sorted(self.phases, key=lambda p: p["ms"], reverse=True)[:3]
+        summary = ", ".join(f"{p['phase']} {p['ms']:.0f}ms" for p in slowest)
+        logger.info(f"Aplicação pronta em {self.total_ms():.0f}ms (mais lentas: {summary})")
+
+    def record_lazy(self, kind: str, name: str, seconds: float):
+        after_ready = None
+        if self._ready_perf is not None:
+            after_ready = round(time.perf_counter() - self._ready_perf, 1)
+        with self._lock:
+            self.lazy_imports.append({
+                "kind": kind, "name": name, "ms": round(seconds * 1000, 1), "after_ready_s": after_ready,
+            })
+        logger.info(f"Import tardio ({kind}) {name}: {seconds * 1000:.0f}ms")
+
+    def total_ms(self) -> float:
+        return round(sum(p["ms"] for p in self.phases), 1)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "total_ms": self.total_ms(),
+                "ready_at": self.ready_at,
+                "phases": list(self.phases),
+                "lazy_imports": list(self.lazy_imports),
+                "heavy_modules_loaded": sorted(m for m in TRACKED_MODULES if m in sys.modules),
+            }
+
+
+startup_timer = StartupTimer()
+
+
+# ============================================================================
+# HOOKS PÓS-IMPORT
+# ============================================================================
+
+_hooks: Dict[str, List[Callable]] = {}
+
+
+class _TimedLoader(importlib.abc.Loader):
+    def __init__(self, loader, name: str):
+        self._loader = loader
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(self._loader, attr)
+
+    def create_module(self, spec):
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        start = time.perf_counter()
+        self._loader.exec_module(module)
+        startup_timer.record_lazy("sdk", self._name, time.perf_counter() - start)
+        for callback in _hooks.pop(self._name, []):
+            _run_hook(callback, module)
+
+
+class _PostImportFinder(importlib.abc.MetaPathFinder):
+    def find_spec(self, fullname, path, target=None):
+        if fullname not in _hooks and fullname not in TRACKED_MODULES:
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None:
+                    spec.loader = _TimedLoader(spec.loader, fullname)
+                return spec
+        return None
+
+
+def _run_hook(callback: Callable, module):
+    try:
+        callback(module)
+    except Exception as e:
+        logger.warning(f"Hook pós-import de {module.__name__} falhou: {e}")
+
+
+def when_imported(module_name: str, callback: Callable):
+    """Chama callback(módulo) no primeiro import de `module_name` (ou já, se importado)"""
+    module = sys.modules.get(module_name)
+    if module is not None:
+        _run_hook(callback, module)
+        return
+    _hooks.setdefault(module_name, []).append(callback)
+
+
+sys.meta_path.insert(0, _PostImportFinder())
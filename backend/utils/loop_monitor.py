@@ -0,0 +1,171 @@
+"""
+Monitor de Travamentos do Event Loop
+
+- Heartbeat no loop: mede o atraso de um asyncio.sleep curto (lag do loop)
+- Watchdog em thread: se o heartbeat não roda há mais que o limite, captura a
+  pilha da thread do loop (o código que está bloqueando naquele momento)
+- Agrega os travamentos por local no código da aplicação (arquivo:linha função)
+  com contagem, tempo total/máximo e a última pilha capturada
+
+Configuração: LOOP_MONITOR_ENABLED, LOOP_STALL_THRESHOLD_MS, LOOP_MONITOR_INTERVAL_MS.
+"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger("elevare.loop_monitor")
+
+ENABLED = os.environ.get("LOOP_MONITOR_ENABLED", "true").lower() in ("1", "true", "yes")
+STALL_THRESHOLD_MS = int(os.environ.get("LOOP_STALL_THRESHOLD_MS", "100"))
+INTERVAL_MS = int(os.environ.get("LOOP_MONITOR_INTERVAL_MS", "50"))
+MAX_OFFENDERS = 200
+STACK_DEPTH = 20
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOOP_LAG = Histogram(
+    "elevare_event_loop_lag_seconds", "Atraso do event loop medido pelo heartbeat",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+LOOP_STALLS = Counter("elevare_event_loop_stalls_total", "Travamentos do event loop acima do limite")
+LOOP_MAX_LAG = Gauge("elevare_event_loop_max_lag_seconds", "Maior atraso do event loop desde o último reset")
+
+
+def _is_app_frame(filename: str) -> bool:
+    return filename.startswith(APP_ROOT) and "site-packages" not in filename and filename != __file__
+
+
+def _location(frame: traceback.FrameSummary) -> str:
+    path = os.path.relpath(frame.filename, APP_ROOT) if frame.filename.startswith(APP_ROOT) else frame.filename
+    return f"{path}:{frame.lineno} {frame.name}"
+
+
+class LoopMonitor:
+    def __init__(self, threshold_ms: int = STALL_THRESHOLD_MS, interval_ms: int = INTERVAL_MS):
+        self.threshold = threshold_ms / 1000
+        self.interval = interval_ms / 1000
+        self._offenders: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pending: Optional[tuple] = None  # (local na app, local do bloqueio, pilha)
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    # ------------------------------------------------------------------ ciclo de vida
+
+    def start(self):
+        """Inicia heartbeat e watchdog (chamar de dentro do event loop)"""
+        if self._running:
+            return
+        self._running = True
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._thread.start()
+        logger.info(f"Monitor do event loop ativo (limite {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    # ------------------------------------------------------------------ medição
+
+    async def _heartbeat(self):
+        while self._running:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(now - start - self.interval, 0.0)
+            self._last_beat = now
+            LOOP_LAG.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+                LOOP_MAX_LAG.set(lag)
+            if lag >= self.threshold:
+                self._finish_stall(lag)
+
+    def _watch(self):
+        """Thread: captura a pilha do loop enquanto ele está bloqueado"""
+        step = max(self.threshold / 4, 0.005)
+        while self._running:
+            time.sleep(step)
+            blocked = time.monotonic() - self._last_beat - self.interval
+            if blocked < self.threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            stack = traceback.extract_stack(frame)
+            app_frames = [f for f in stack if _is_app_frame(f.filename)]
+            app_location = _location(app_frames[-1]) if app_frames else _location(stack[-1])
+            self._pending = (app_location, _location(stack[-1]), traceback.format_list(stack[-STACK_DEPTH:]))
+
+    def _finish_stall(self, lag: float):
+        pending, self._pending = self._pending, None
+        # Travamento mais curto que o passo do watchdog pode não ter pilha
+        location, blocking_in, stack = pending or ("desconhecido", "desconhecido", [])
+        lag_ms = lag * 1000
+        self.stalls += 1
+        LOOP_STALLS.inc()
+        logger.warning(f"Event loop travado por {lag_ms:.0f}ms em {location} (bloqueio em {blocking_in})")
+
+        with self._lock:
+            offender = self._offenders.get(location)
+            if offender is None:
+                if len(self._offenders) >= MAX_OFFENDERS:
+                    smallest = min(self._offenders, key=lambda k: self._offenders[k]["total_ms"])
+                    del self._offenders[smallest]
+                offender = self._offenders[location] = {
+                    "location": location, "count": 0, "total_ms": 0.0, "max_ms": 0.0,
+                }
+            offender["count"] += 1
+            offender["total_ms"] += lag_ms
+            offender["max_ms"] = max(offender["max_ms"], lag_ms)
+            offender["blocking_in"] = blocking_in
+            offender["last_seen"] = datetime.now(timezone.utc).isoformat()
+            if stack:
+                offender["last_stack"] = stack
+
+    # ------------------------------------------------------------------ relatório
+
+    def report(self, limit: int = 50) -> dict:
+        with self._lock:
+            offenders = sorted(self._offenders.values(), key=lambda o: o["total_ms"], reverse=True)[:limit]
+            offenders = [{**o, "total_ms": round(o["total_ms"], 1), "max_ms": round(o["max_ms"], 1)} for o in offenders]
+        return {
+            "enabled": self._running,
+            "threshold_ms": self.threshold * 1000,
+            "interval_ms": self.interval * 1000,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "offenders": offenders,
+        }
+
+    def reset(self):
+        with self._lock:
+            self._offenders.clear()
+        self.stalls = 0
+        self.max_lag = 0.0
+        LOOP_MAX_LAG.set(0)
+
+
+loop_monitor = LoopMonitor()
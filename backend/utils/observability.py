@@ -0,0 +1,443 @@
+"""
+Observabilidade: métricas Prometheus, trace IDs e tempo por dependência
+
+- ObservabilityMiddleware (ASGI): latência/status por rota (template da rota,
+  não a URL), trace ID por request (X-Request-ID de entrada ou gerado) e
+  cabeçalhos X-Trace-Id / Server-Timing com o tempo gasto em db, llm,
+  image, http e render
+- MongoCommandListener: latência por coleção/comando (monitoring do pymongo)
+- instrument_ai_clients(): envolve LlmChat.send_message,
+  OpenAIImageGeneration.generate_images (no primeiro import do SDK) e
+  httpx.AsyncClient.send
+- configure_logging(): formato de log com o trace ID do request
+
+Requests acima de SLOW_REQUEST_MS geram um log com o detalhamento por dependência.
+"""
+
+import asyncio
+import contextvars
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+
+from utils.lazy_imports import when_imported
+
+logger = logging.getLogger("elevare.observability")
+
+SLOW_REQUEST_MS = int(os.environ.get("SLOW_REQUEST_MS", "2000"))
+TRACE_HEADER = "x-request-id"
+
+# Dependências com tempo acumulado por request
+SPAN_KINDS = ("db", "llm", "image", "http", "render")
+
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+HTTP_REQUESTS = Counter(
+    "elevare_http_requests_total", "Requests HTTP", ["method", "route", "status"]
+)
+HTTP_LATENCY = Histogram(
+    "elevare_http_request_duration_seconds", "Latência dos requests HTTP", ["method", "route"],
+    buckets=_LATENCY_BUCKETS,
+)
+HTTP_IN_PROGRESS = Gauge("elevare_http_requests_in_progress", "Requests HTTP em andamento")
+DB_LATENCY = Histogram(
+    "elevare_mongo_command_duration_seconds", "Latência dos comandos MongoDB", ["collection", "command"],
+    buckets=_LATENCY_BUCKETS,
+)
+DB_FAILURES = Counter(
+    "elevare_mongo_command_failures_total", "Comandos MongoDB com erro", ["collection", "command"]
+)
+EXTERNAL_LATENCY = Histogram(
+    "elevare_external_call_duration_seconds", "Latência de chamadas externas (LLM, imagem, HTTP)",
+    ["kind", "target", "outcome"], buckets=_LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "elevare_llm_tokens_total", "Tokens estimados por modelo", ["model", "direction"]
+)
+AI_RETRIES = Counter("elevare_ai_retries_total", "Novas tentativas em chamadas de IA", ["reason"])
+RENDER_LATENCY = Histogram(
+    "elevare_render_duration_seconds", "Renderização de e-books", ["backend", "cached"],
+    buckets=_LATENCY_BUCKETS,
+)
+
+
+# ============================================================================
+# CONTEXTO DO REQUEST
+# ============================================================================
+
+class RequestTiming:
+    """Tempo acumulado por dependência no request (somado também de threads do Motor)"""
+
+    def __init__(self):
+        self._totals: Dict[str, float] = {}
+        self._counts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, kind: str, seconds: float):
+        with self._lock:
+            self._totals[kind] = self._totals.get(kind, 0.0) + seconds
+            self._counts[kind] = self._counts.get(kind, 0) + 1
+
+    def breakdown(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                kind: {"ms": round(total * 1000, 1), "calls": self._counts[kind]}
+                for kind, total in self._totals.items()
+            }
+
+
+trace_id_var: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+_timing_var: contextvars.ContextVar[Optional[RequestTiming]] = contextvars.ContextVar("request_timing", default=None)
+_scope_var: contextvars.ContextVar[Optional[dict]] = contextvars.ContextVar("request_scope", default=None)
+_user_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_user", default=None)
+# Tentativa atual dentro de ai_call_with_retry (1 = primeira)
+attempt_var: contextvars.ContextVar[int] = contextvars.ContextVar("ai_attempt", default=1)
+# version_id do último prompt renderizado pelo registro (services.prompt_registry)
+_prompt_version_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("prompt_version", default=None)
+# Tarefa da chamada de LLM em andamento (services.model_router)
+_llm_task_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_task", default=None)
+
+
+def current_trace_id() -> str:
+    return trace_id_var.get()
+
+
+def current_route() -> Optional[str]:
+    """Template da rota do request atual (None fora de request)"""
+    scope = _scope_var.get()
+    if scope is None:
+        return None
+    return _route_label(scope)
+
+
+def set_request_user(user_id: Optional[str]):
+    """Chamado na autenticação: atribui as chamadas externas do request ao usuário"""
+    _user_var.set(user_id)
+
+
+def current_user_id() -> Optional[str]:
+    return _user_var.get()
+
+
+def set_prompt_version(version_id: Optional[str]):
+    _prompt_version_var.set(version_id)
+
+
+def current_prompt_version() -> Optional[str]:
+    return _prompt_version_var.get()
+
+
+@contextmanager
+def llm_task(task: str):
+    token = _llm_task_var.set(task)
+    try:
+        yield
+    finally:
+        _llm_task_var.reset(token)
+
+
+def current_llm_task() -> Optional[str]:
+    return _llm_task_var.get()
+
+
+def record_span(kind: str, seconds: float):
+    """Soma `seconds` ao tempo da dependência no request atual (sem request: ignora)"""
+    timing = _timing_var.get()
+    if timing is not None:
+        timing.add(kind, seconds)
+
+
+@contextmanager
+def span(kind: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(kind, time.perf_counter() - start)
+
+
+# ============================================================================
+# LOGS
+# ============================================================================
+
+LOG_FORMAT = "%(asctime)s %(levelname)s [%(trace_id)s] %(name)s: %(message)s"
+
+
+class TraceIdFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.trace_id = trace_id_var.get()
+        return True
+
+
+def configure_logging(level: int = logging.INFO):
+    """Inclui o trace ID em todas as linhas de log da aplicação"""
+    root = logging.getLogger()
+    if not root.handlers:
+        logging.basicConfig(level=level, format=LOG_FORMAT)
+    for handler in root.handlers:
+        if not any(isinstance(f, TraceIdFilter) for f in handler.filters):
+            handler.addFilter(TraceIdFilter())
+            handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    # Template da rota (/api/ebook/{ebook_id}) mantém a cardinalidade baixa
+    return getattr(route, "path", None) or "unmatched"
+
+
+def _server_timing(breakdown: Dict[str, dict], total_ms: float) -> str:
+    parts = [f"{kind};dur={values['ms']}" for kind, values in breakdown.items()]
+    parts.append(f"total;dur={round(total_ms, 1)}")
+    return ", ".join(parts)
+
+
+class ObservabilityMiddleware:
+    """Middleware ASGI de métricas e trace ID (não bufferiza o corpo da resposta)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope.get("headers") or []).get(TRACE_HEADER.encode())
+        trace_id = incoming.decode("latin-1")[:64] if incoming else uuid.uuid4().hex
+        timing = RequestTiming()
+        trace_token = trace_id_var.set(trace_id)
+        timing_token = _timing_var.set(timing)
+        scope_token = _scope_var.set(scope)
+
+        start = time.perf_counter()
+        status_code = 500
+        HTTP_IN_PROGRESS.inc()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                headers = list(message.get("headers") or [])
+                headers.append((b"x-trace-id", trace_id.encode("latin-1")))
+                headers.append((b"server-timing", _server_timing(timing.breakdown(), elapsed_ms).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.dec()
+            method = scope.get("method", "")
+            route = _route_label(scope)
+            HTTP_REQUESTS.labels(method, route, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route).observe(elapsed)
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                logger.warning(
+                    f"Request lento: {method} {route} status={status_code} "
+                    f"total={elapsed * 1000:.0f}ms detalhamento={timing.breakdown()}"
+                )
+            trace_id_var.reset(trace_token)
+            _timing_var.reset(timing_token)
+            _scope_var.reset(scope_token)
+
+
+def metrics_payload() -> tuple:
+    """(corpo, content-type) da exposição Prometheus"""
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+# ============================================================================
+# MONGODB
+# ============================================================================
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    Latência por coleção/comando. Registrado no AsyncIOMotorClient
+    (event_listeners=[...]); o Motor executa em threads com o contexto do
+    request copiado, então o tempo entra no detalhamento do request.
+    """
+
+    def __init__(self):
+        self._pending: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = "-"
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (collection, _timing_var.get())
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            collection, timing = self._pending.pop((event.connection_id, event.request_id), ("-", None))
+        seconds = event.duration_micros / 1_000_000
+        DB_LATENCY.labels(collection, event.command_name).observe(seconds)
+        if failed:
+            DB_FAILURES.labels(collection, event.command_name).inc()
+        if timing is not None:
+            timing.add("db", seconds)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+# ============================================================================
+# LLM, IMAGEM E HTTP
+# ============================================================================
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Estimativa de tokens (~4 caracteres por token em português)"""
+    return (len(text) + 3) // 4 if text else 0
+
+
+class ExternalCall(NamedTuple):
+    kind: str               # llm, image
+    model: str
+    seconds: float
+    outcome: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    units: int = 0          # imagens geradas
+
+
+_call_observers: List[Callable[[ExternalCall], None]] = []
+
+
+def add_call_observer(observer: Callable[[ExternalCall], None]):
+    """Registra um callback síncrono chamado ao fim de cada chamada de LLM/imagem"""
+    _call_observers.append(observer)
+
+
+def _notify(call: ExternalCall):
+    for observer in _call_observers:
+        try:
+            observer(call)
+        except Exception as e:
+            logger.warning(f"Observador de chamadas falhou: {e}")
+
+
+def observe_external(kind: str, target: str, seconds: float, outcome: str = "ok"):
+    EXTERNAL_LATENCY.labels(kind, target, outcome).observe(seconds)
+    record_span(kind, seconds)
+
+
+_instrumented = False
+
+
+def instrument_ai_clients():
+    """Instrumenta os clientes de LLM, imagem e HTTP (idempotente)"""
+    global _instrumented
+    if _instrumented:
+        return
+    _instrumented = True
+    # O SDK só é importado no primeiro uso (cold start); a instrumentação vai junto
+    when_imported("emergentintegrations.llm.chat", _instrument_llm_chat)
+    when_imported("emergentintegrations.llm.openai.image_generation", _instrument_image_generation)
+    _instrument_httpx()
+
+
+def _instrument_llm_chat(module):
+    LlmChat = module.LlmChat
+    original_init = LlmChat.__init__
+    original_with_model = LlmChat.with_model
+    original_send = LlmChat.send_message
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        system_message = kwargs.get("system_message", args[2] if len(args) > 2 else None)
+        # A sessão reenvia system + histórico a cada mensagem: entra na estimativa do prompt
+        self._elevare_context_chars = len(system_message or "")
+
+    def with_model(self, provider, model, *args, **kwargs):
+        self._elevare_model = f"{provider}/{model}"
+        return original_with_model(self, provider, model, *args, **kwargs)
+
+    async def send_message(self, message, *args, **kwargs):
+        model = getattr(self, "_elevare_model", "default")
+        text = getattr(message, "text", None) or ""
+        context_chars = getattr(self, "_elevare_context_chars", 0) + len(text)
+        prompt_tokens = (context_chars + 3) // 4
+        completion_tokens = 0
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await original_send(self, message, *args, **kwargs)
+            outcome = "ok"
+            if isinstance(response, str):
+                completion_tokens = estimate_tokens(response)
+                self._elevare_context_chars = context_chars + len(response)
+            return response
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            observe_external("llm", model, seconds, outcome)
+            LLM_TOKENS.labels(model, "prompt").inc(prompt_tokens)
+            LLM_TOKENS.labels(model, "completion").inc(completion_tokens)
+            _notify(ExternalCall("llm", model, seconds, outcome, prompt_tokens, completion_tokens))
+
+    LlmChat.__init__ = __init__
+    LlmChat.with_model = with_model
+    LlmChat.send_message = send_message
+
+
+def _instrument_image_generation(module):
+    OpenAIImageGeneration = module.OpenAIImageGeneration
+    original = OpenAIImageGeneration.generate_images
+
+    async def generate_images(self, *args, **kwargs):
+        model = kwargs.get("model") or "default"
+        start = time.perf_counter()
+        outcome = "error"
+        images = None
+        try:
+            images = await original(self, *args, **kwargs)
+            outcome = "ok"
+            return images
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        finally:
+            seconds = time.perf_counter() - start
+            observe_external("image", model, seconds, outcome)
+            prompt_tokens = estimate_tokens(kwargs.get("prompt"))
+            _notify(ExternalCall("image", model, seconds, outcome, prompt_tokens, 0, len(images or [])))
+
+    OpenAIImageGeneration.generate_images = generate_images
+
+
+def _instrument_httpx():
+    import httpx
+
+    original = httpx.AsyncClient.send
+
+    async def send(self, request, *args, **kwargs):
+        start = time.perf_counter()
+        outcome = "error"
+        try:
+            response = await original(self, request, *args, **kwargs)
+            outcome = str(response.status_code)
+            return response
+        finally:
+            observe_external("http", request.url.host or "-", time.perf_counter() - start, outcome)
+
+    httpx.AsyncClient.send = send
@@ -0,0 +1,276 @@
+"""
+Paginação por Cursor (keyset) para Listagens
+
+- Cursor opaco sobre (campo de ordenação, id): a próxima página continua
+  exatamente após o último item, sem skip() e sem limite fixo de 1000 docs
+- Projeções de resumo por coleção (listas não trazem corpo de artigo, base64 etc.)
+- Total via contadores por usuário em `user_counters` (sem count_documents a cada request)
+- created_at pode ser string ISO ou datetime (documentos antigos dos routers):
+  o cursor guarda o tipo, e a continuação considera a ordem entre tipos do Mongo
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Optional
+
+from pymongo import ASCENDING, DESCENDING
+
+logger = logging.getLogger("elevare.pagination")
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# Campos retornados por padrão nas listagens (fields=full devolve o documento inteiro)
+LIST_PROJECTIONS: Dict[str, List[str]] = {
+    "leads": [
+        "id", "nome", "email", "telefone", "procedimento", "origem", "temperatura",
+        "status", "valor_estimado", "observacoes", "created_at", "updated_at",
+    ],
+    "calendar_posts": [
+        "id", "titulo", "tipo", "data_agendada", "horario", "legenda", "hashtags",
+        "tema_mensal", "subtema", "objetivo", "tom", "plataforma", "status",
+        "publicado_em", "created_at", "updated_at",
+    ],
+    "agendamentos": [
+        "id", "cliente_nome", "procedimento", "valor", "data", "horario",
+        "status", "observacoes", "created_at",
+    ],
+    "generated_content": [
+        "id", "tipo", "tema", "titulo", "prompt_id", "prompt_titulo", "tom", "created_at",
+    ],
+    "ebooks": [
+        "id", "title", "topic", "audience", "tone", "author", "num_chapters",
+        "pages", "pdf_filename", "status", "type", "created_at",
+    ],
+    "content_templates": [
+        "id", "name", "description", "template_type", "platform", "variables",
+        "usage_count", "created_at", "updated_at",
+    ],
+    "seo_articles": [
+        "id", "keyword", "topic", "article_type", "objetivo", "publico",
+        "status", "created_at", "updated_at",
+    ],
+}
+
+# Coleções com total mantido em user_counters
+COUNTED_COLLECTIONS = tuple(LIST_PROJECTIONS)
+
+
+class Page(NamedTuple):
+    items: List[dict]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+class InvalidCursorError(ValueError):
+    """Cursor malformado ou de outra ordenação"""
+
+
+# ============================================================================
+# CURSOR
+# ============================================================================
+
+def _encode_value(value: Any) -> Any:
+    # datetime vira {"$date": iso} para voltar como datetime (e não como string) no filtro
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict):
+        if set(value) != {"$date"}:
+            raise ValueError("valor de cursor desconhecido")
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+
+def encode_cursor(doc: dict, sort_field: str) -> str:
+    payload = json.dumps(
+        [sort_field, _encode_value(doc.get(sort_field)), doc.get("id")], separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str) -> tuple:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        field, value, last_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        value = _decode_value(value)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Cursor inválido") from e
+    if field != sort_field:
+        raise InvalidCursorError("Cursor inválido")
+    return value, last_id
+
+
+def _after_cursor(sort_field: str, value: Any, last_id: str, direction: int) -> dict:
+    """Filtro dos documentos que vêm depois de (value, last_id) na ordenação"""
+    op = "$lt" if direction == DESCENDING else "$gt"
+    if value is None:
+        # null é o menor valor no Mongo: fica no fim da ordem decrescente, no início da crescente
+        same_value = {sort_field: None, "id": {op: last_id}}
+        if direction == DESCENDING:
+            return same_value
+        return {"$or": [same_value, {sort_field: {"$ne": None}}]}
+    after = [
+        {sort_field: {op: value}},
+        {sort_field: value, "id": {op: last_id}},
+    ]
+    # $lt/$gt só comparam valores do mesmo tipo. Na ordem do Mongo,
+    # null < string < date: o que é de outro tipo entra inteiro de um lado
+    if direction == DESCENDING:
+        if isinstance(value, datetime):
+            after.append({sort_field: {"$type": "string"}})
+        after.append({sort_field: None})
+    elif isinstance(value, str):
+        after.append({sort_field: {"$type": "date"}})
+    return {"$or": after}
+
+
+# ============================================================================
+# PAGINAÇÃO
+# ============================================================================
+
+def resolve_projection(collection_name: str, fields: Optional[str] = None) -> dict:
+    """
+    Projeção da listagem.
+
+    fields: None/"summary" → resumo da coleção; "full" → documento inteiro;
+            "a,b,c" → apenas esses campos (sempre com id e o campo de ordenação)
+    """
+    if fields == "full":
+        return {"_id": 0}
+    if fields and fields != "summary":
+        selected = [f.strip() for f in fields.split(",") if f.strip() and not f.strip().startswith("$")]
+    else:
+        selected = LIST_PROJECTIONS.get(collection_name)
+        if not selected:
+            return {"_id": 0}
+    projection = {field: 1 for field in selected}
+    projection.update({"_id": 0, "id": 1})
+    return projection
+
+
+def clamp_limit(limit: Optional[int]) -> int:
+    if not limit or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+async def paginate(
+    collection,
+    query: dict,
+    *,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    projection: Optional[dict] = None,
+    sort_field: str = "created_at",
+    direction: int = DESCENDING,
+) -> Page:
+    """
+    Busca uma página ordenada por (sort_field, id).
+
+    Raises:
+        InvalidCursorError: cursor malformado
+    """
+    limit = clamp_limit(limit)
+    projection = dict(projection or {"_id": 0})
+    if any(v == 1 for v in projection.values()):
+        # O cursor é montado a partir desses campos
+        projection.update({sort_field: 1, "id": 1})
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort_field)
+        query = {"$and": [query, _after_cursor(sort_field, value, last_id, direction)]}
+
+    # Busca um item a mais para saber se existe próxima página
+    docs = await collection.find(query, projection).sort(
+        [(sort_field, direction), ("id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    has_more = len(docs) > limit
+    items = docs[:limit]
+    next_cursor = encode_cursor(items[-1], sort_field) if has_more else None
+    return Page(items, next_cursor, has_more)
+
+
+# ============================================================================
+# CONTADORES
+# ============================================================================
+
+async def get_cached_count(db, user_id: str, collection_name: str) -> int:
+    """
+    Total de documentos do usuário na coleção, lido de user_counters.
+    Na primeira leitura o contador é semeado com count_documents.
+    """
+    counters = await db.user_counters.find_one({"user_id": user_id}, {"_id": 0, collection_name: 1})
+    if counters and collection_name in counters:
+        return max(int(counters[collection_name]), 0)
+
+    total = await db[collection_name].count_documents({"user_id": user_id})
+    # $ifNull: se outro request semeou antes, mantém o valor dele
+    await db.user_counters.update_one(
+        {"user_id": user_id},
+        [{"$set": {collection_name: {"$ifNull": [f"${collection_name}", total]}}}],
+        upsert=True,
+    )
+    return total
+
+
+async def increment_count(db, user_id: str, collection_name: str, delta: int = 1):
+    """Atualiza o contador (só se já foi semeado; senão a próxima leitura conta do zero)"""
+    try:
+        await db.user_counters.update_one(
+            {"user_id": user_id, collection_name: {"$exists": True}},
+            {"$inc": {collection_name: delta}},
+        )
+    except Exception as e:
+        logger.warning(f"Falha ao atualizar contador {collection_name} de {user_id}: {e}")
+
+
+async def ensure_pagination_indexes(db):
+    """Índices (user_id, created_at, id) das listagens + índice único de user_counters"""
+    for name in COUNTED_COLLECTIONS:
+        await db[name].create_index(
+            [("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)],
+            name="user_created_id",
+        )
+    await db.calendar_posts.create_index(
+        [("user_id", ASCENDING), ("data_agendada", ASCENDING), ("id", ASCENDING)],
+        name="user_data_agendada_id",
+    )
+    await db.user_counters.create_index("user_id", unique=True, name="user_id_unique")
+
+
+async def page_response(
+    db,
+    collection_name: str,
+    user_id: str,
+    key: str,
+    *,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = None,
+    fields: Optional[str] = None,
+    sort_field: str = "created_at",
+    direction: int = DESCENDING,
+) -> dict:
+    """Resposta padrão das listagens: {success, <key>: [...], next_cursor, has_more, total}"""
+    page = await paginate(
+        db[collection_name],
+        {"user_id": user_id},
+        cursor=cursor,
+        limit=limit,
+        projection=resolve_projection(collection_name, fields),
+        sort_field=sort_field,
+        direction=direction,
+    )
+    return {
+        "success": True,
+        key: page.items,
+        "next_cursor": page.next_cursor,
+        "has_more": page.has_more,
+        "total": await get_cached_count(db, user_id, collection_name),
+    }
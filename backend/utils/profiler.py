@@ -0,0 +1,204 @@
+"""
+Profiler por Amostragem sob Demanda
+
+Ativado por request:
+- cabeçalho X-Profile com o valor de PROFILER_TOKEN (segredo de administração), ou
+- amostragem aleatória de PROFILE_SAMPLE_RATE dos requests (opcionalmente só
+  nas rotas com os prefixos de PROFILE_ROUTES)
+
+Enquanto o handler roda, uma thread lê a pilha da thread do event loop a cada
+PROFILE_INTERVAL_MS. Só contam as amostras cuja pilha passa pelo frame do
+request (outros requests intercalados no loop viram "[aguardando]"). A saída é
+o formato "folded" (frame;frame;frame N), aceito por flamegraph.pl e
+speedscope, em PROFILE_DIR com no máximo PROFILE_MAX_FILES arquivos.
+
+Sem cabeçalho e com taxa 0, o custo é uma comparação por request.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from utils.observability import current_trace_id
+
+logger = logging.getLogger("elevare.profiler")
+
+PROFILER_TOKEN = os.environ.get("PROFILER_TOKEN", "")
+SAMPLE_RATE = float(os.environ.get("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_ROUTES = [p.strip() for p in os.environ.get("PROFILE_ROUTES", "").split(",") if p.strip()]
+INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", "5"))
+PROFILE_DIR = os.environ.get("PROFILE_DIR", "/tmp/elevare-profiles")
+MAX_FILES = int(os.environ.get("PROFILE_MAX_FILES", "50"))
+
+APP_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WAITING = "[aguardando]"
+PROFILE_NAME = re.compile(r"^[\w.-]+\.folded$")
+
+
+def _frame_label(frame) -> str:
+    filename = frame.f_code.co_filename
+    if filename.startswith(APP_ROOT):
+        filename = os.path.relpath(filename, APP_ROOT)
+    elif "site-packages/" in filename:
+        filename = filename.rsplit("site-packages/", 1)[-1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{frame.f_code.co_name} ({filename}:{frame.f_lineno})"
+
+
+class SamplingProfiler:
+    """Amostra a pilha de `thread_id` abaixo de `root_frame` até stop()"""
+
+    def __init__(self, root_frame, thread_id: int, interval_ms: float = INTERVAL_MS):
+        self.root_frame = root_frame
+        self.thread_id = thread_id
+        self.interval = interval_ms / 1000
+        self.samples: Counter = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        self._thread.join()
+        return self.samples
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if self._stop.is_set():
+                break
+            stack: List[str] = []
+            while frame is not None and frame is not self.root_frame:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if frame is None:
+                # O loop está executando outro request (ou ocioso): handler aguardando I/O
+                self.samples[WAITING] += 1
+            elif stack:
+                self.samples[";".join(reversed(stack))] += 1
+
+
+# ============================================================================
+# ARQUIVOS
+# ============================================================================
+
+def _rotate():
+    files = sorted(
+        (os.path.join(PROFILE_DIR, f) for f in os.listdir(PROFILE_DIR) if f.endswith(".folded")),
+        key=os.path.getmtime,
+    )
+    for path in files[:max(len(files) - MAX_FILES, 0)]:
+        for target in (path, path[: -len(".folded")] + ".json"):
+            try:
+                os.remove(target)
+            except OSError:
+                pass
+
+
+def _write_profile(name: str, samples: Counter, meta: dict):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    base = os.path.join(PROFILE_DIR, name)
+    with open(base + ".folded", "w", encoding="utf-8") as f:
+        for stack, count in samples.most_common():
+            f.write(f"{stack} {count}\n")
+    with open(base + ".json", "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    _rotate()
+
+
+def list_profiles() -> List[dict]:
+    """Perfis capturados, mais recentes primeiro"""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for filename in os.listdir(PROFILE_DIR):
+        if not filename.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(PROFILE_DIR, filename), encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(profiles, key=lambda p: p.get("created_at", ""), reverse=True)
+
+
+def profile_path(name: str) -> Optional[str]:
+    """Caminho do arquivo .folded (None se o nome for inválido ou não existir)"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(PROFILE_DIR, name)
+    return path if os.path.isfile(path) else None
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+def _should_profile(scope) -> bool:
+    if PROFILER_TOKEN:
+        header = dict(scope.get("headers") or []).get(b"x-profile")
+        if header and header.decode("latin-1") == PROFILER_TOKEN:
+            return True
+    if SAMPLE_RATE <= 0:
+        return False
+    if PROFILE_ROUTES and not any(scope.get("path", "").startswith(p) for p in PROFILE_ROUTES):
+        return False
+    return random.random() < SAMPLE_RATE
+
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        started_at = datetime.now(timezone.utc)
+        slug = re.sub(r"[^\w-]+", "-", scope.get("path", "")).strip("-")[:60] or "root"
+        name = f"{started_at.strftime('%Y%m%dT%H%M%S%f')}_{scope.get('method', '')}_{slug}"
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message = {**message, "headers": [*(message.get("headers") or []), (b"x-profile-id", f"{name}.folded".encode())]}
+            await send(message)
+
+        # Amostras só contam quando a pilha passa por este frame
+        profiler = SamplingProfiler(sys._getframe(), threading.get_ident())
+        start = time.perf_counter()
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            samples = profiler.stop()
+            route = getattr(scope.get("route"), "path", None) or scope.get("path", "")
+            meta = {
+                "name": f"{name}.folded",
+                "method": scope.get("method", ""),
+                "route": route,
+                "path": scope.get("path", ""),
+                "trace_id": current_trace_id(),
+                "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                "samples": sum(samples.values()),
+                "waiting_samples": samples.get(WAITING, 0),
+                "interval_ms": profiler.interval * 1000,
+                "created_at": started_at.isoformat(),
+            }
+            try:
+                await asyncio.to_thread(_write_profile, name, samples, meta)
+                logger.info(f"Perfil capturado: {meta['name']} ({meta['duration_ms']}ms, {meta['samples']} amostras)")
+            except OSError as e:
+                logger.warning(f"Não foi possível gravar o perfil {name}: {e}")
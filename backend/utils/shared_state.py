@@ -0,0 +1,487 @@
+"""
+Estado Compartilhado entre Workers e Réplicas
+
+Com N workers (uvicorn --workers / gunicorn) e várias réplicas, o que fica em
+memória vale só para o processo. O que precisa ser consistente entre processos
+passa por um backend plugável (SHARED_STATE_BACKEND):
+
+- mongo (padrão): coleções shared_kv, shared_counters, shared_events e shared_jobs
+- memory: um único processo (desenvolvimento, testes)
+
+Primitivas:
+- chave/valor com expiração e inserção atômica (idempotência, reservas)
+- contadores por janela de tempo (rate limits)
+- eventos de invalidação: caches locais registram on_invalidation(canal,
+  handler); publish_invalidation aplica na hora neste worker e os demais
+  aplicam no próximo ciclo (INVALIDATION_POLL_SECONDS)
+- jobs com lease: run_leased renova o lease enquanto o job roda; se o worker
+  morrer, outro worker detecta o lease vencido e chama o handler de
+  on_job_expired (ex.: marcar a importação como interrompida)
+
+shared_state.start(db) roda por worker no lifespan da aplicação (depois do
+fork), e o worker_id só é definido ali.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from pymongo import ASCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger("elevare.shared_state")
+
+BACKEND_NAME = os.environ.get("SHARED_STATE_BACKEND", "mongo")
+INVALIDATION_POLL_SECONDS = float(os.environ.get("INVALIDATION_POLL_SECONDS", "2"))
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+EVENT_RETENTION_SECONDS = 3600
+# Eventos gravados por outro processo podem chegar com horário um pouco anterior
+EVENT_OVERLAP_SECONDS = 5
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+# ============================================================================
+# INTERFACE
+# ============================================================================
+
+class SharedStateBackend(ABC):
+    """Armazenamento compartilhado; valores são dicts serializáveis em BSON/JSON"""
+
+    # Chave/valor com expiração
+    @abstractmethod
+    async def add(self, namespace: str, key: str, value: dict, ttl: float) -> bool:
+        """Grava se a chave não existir (ou estiver expirada). True se gravou"""
+
+    @abstractmethod
+    async def get(self, namespace: str, key: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def update(self, namespace: str, key: str, fields: dict, only_if: Optional[dict] = None) -> bool:
+        """Atualiza campos do valor; only_if restringe a valores com esses campos"""
+
+    @abstractmethod
+    async def delete(self, namespace: str, key: str, only_if: Optional[dict] = None) -> bool:
+        ...
+
+    # Contadores
+    @abstractmethod
+    async def incr(self, namespace: str, key: str, window_seconds: float) -> int:
+        """Incrementa o contador da janela atual e retorna o novo valor"""
+
+    # Eventos
+    @abstractmethod
+    async def publish(self, channel: str, message: dict, origin: str):
+        ...
+
+    @abstractmethod
+    async def poll(self, since: datetime) -> List[dict]:
+        """Eventos publicados a partir de `since` ({id, channel, message, origin, at})"""
+
+    # Jobs com lease
+    @abstractmethod
+    async def register_job(self, queue: str, job_id: str, owner: str, lease_seconds: float, payload: dict):
+        ...
+
+    @abstractmethod
+    async def renew_job(self, job_id: str, owner: str, lease_seconds: float) -> bool:
+        ...
+
+    @abstractmethod
+    async def finish_job(self, job_id: str, owner: str, status: str):
+        ...
+
+    @abstractmethod
+    async def claim_expired_job(self, owner: str) -> Optional[dict]:
+        """Assume um job cujo lease venceu (no máximo um worker recebe cada job)"""
+
+
+# ============================================================================
+# BACKEND EM MEMÓRIA (um processo)
+# ============================================================================
+
+class MemoryStateBackend(SharedStateBackend):
+    def __init__(self):
+        self._kv: Dict[Tuple[str, str], Tuple[dict, float]] = {}
+        self._counters: Dict[Tuple[str, str, int], int] = {}
+        self._events: List[dict] = []
+        self._jobs: Dict[str, dict] = {}
+
+    def _live(self, namespace: str, key: str) -> Optional[dict]:
+        entry = self._kv.get((namespace, key))
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._kv[(namespace, key)]
+            return None
+        return entry[0]
+
+    @staticmethod
+    def _matches(value: dict, only_if: Optional[dict]) -> bool:
+        return not only_if or all(value.get(field) == expected for field, expected in only_if.items())
+
+    async def add(self, namespace, key, value, ttl):
+        if self._live(namespace, key) is not None:
+            return False
+        self._kv[(namespace, key)] = (dict(value), time.monotonic() + ttl)
+        return True
+
+    async def get(self, namespace, key):
+        value = self._live(namespace, key)
+        return dict(value) if value is not None else None
+
+    async def update(self, namespace, key, fields, only_if=None):
+        value = self._live(namespace, key)
+        if value is None or not self._matches(value, only_if):
+            return False
+        value.update(fields)
+        return True
+
+    async def delete(self, namespace, key, only_if=None):
+        value = self._live(namespace, key)
+        if value is None or not self._matches(value, only_if):
+            return False
+        del self._kv[(namespace, key)]
+        return True
+
+    async def incr(self, namespace, key, window_seconds):
+        bucket = int(time.time() // window_seconds)
+        counter = (namespace, key, bucket)
+        self._counters[counter] = self._counters.get(counter, 0) + 1
+        for stale in [c for c in self._counters if c[:2] == (namespace, key) and c[2] < bucket]:
+            del self._counters[stale]
+        return self._counters[counter]
+
+    async def publish(self, channel, message, origin):
+        now = _now()
+        self._events = [e for e in self._events if e["at"] > now - timedelta(seconds=EVENT_RETENTION_SECONDS)]
+        self._events.append({"id": str(uuid4()), "channel": channel, "message": message, "origin": origin, "at": now})
+
+    async def poll(self, since):
+        return [e for e in self._events if e["at"] >= since]
+
+    async def register_job(self, queue, job_id, owner, lease_seconds, payload):
+        self._jobs[job_id] = {
+            "id": job_id, "queue": queue, "owner": owner, "status": "running", "payload": payload,
+            "lease_expires_at": _now() + timedelta(seconds=lease_seconds),
+        }
+
+    async def renew_job(self, job_id, owner, lease_seconds):
+        job = self._jobs.get(job_id)
+        if job is None or job["owner"] != owner or job["status"] != "running":
+            return False
+        job["lease_expires_at"] = _now() + timedelta(seconds=lease_seconds)
+        return True
+
+    async def finish_job(self, job_id, owner, status):
+        job = self._jobs.get(job_id)
+        if job is not None and job["owner"] == owner:
+            del self._jobs[job_id]
+
+    async def claim_expired_job(self, owner):
+        now = _now()
+        for job in self._jobs.values():
+            if job["status"] == "running" and job["lease_expires_at"] < now:
+                job.update(status="expired", owner=owner)
+                return dict(job)
+        return None
+
+
+# ============================================================================
+# BACKEND MONGODB
+# ============================================================================
+
+class MongoStateBackend(SharedStateBackend):
+    def __init__(self, db):
+        self._db = db
+
+    @staticmethod
+    def _id(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    @staticmethod
+    def _value_filter(only_if: Optional[dict]) -> dict:
+        return {f"value.{field}": expected for field, expected in (only_if or {}).items()}
+
+    async def add(self, namespace, key, value, ttl):
+        now = _now()
+        document = {
+            "_id": self._id(namespace, key),
+            "namespace": namespace,
+            "value": value,
+            "expires_at": now + timedelta(seconds=ttl),
+        }
+        try:
+            await self._db.shared_kv.insert_one(document)
+            return True
+        except DuplicateKeyError:
+            pass
+        # O TTL do MongoDB remove com atraso: chave vencida conta como livre
+        removed = await self._db.shared_kv.delete_one({"_id": document["_id"], "expires_at": {"$lte": now}})
+        if not removed.deleted_count:
+            return False
+        try:
+            await self._db.shared_kv.insert_one(document)
+            return True
+        except DuplicateKeyError:
+            return False
+
+    async def get(self, namespace, key):
+        document = await self._db.shared_kv.find_one(
+            {"_id": self._id(namespace, key), "expires_at": {"$gt": _now()}}, {"value": 1}
+        )
+        return document["value"] if document else None
+
+    async def update(self, namespace, key, fields, only_if=None):
+        result = await self._db.shared_kv.update_one(
+            {"_id": self._id(namespace, key), "expires_at": {"$gt": _now()}, **self._value_filter(only_if)},
+            {"$set": {f"value.{field}": value for field, value in fields.items()}},
+        )
+        return result.matched_count > 0
+
+    async def delete(self, namespace, key, only_if=None):
+        result = await self._db.shared_kv.delete_one({"_id": self._id(namespace, key), **self._value_filter(only_if)})
+        return result.deleted_count > 0
+
+    async def incr(self, namespace, key, window_seconds):
+        bucket = int(time.time() // window_seconds)
+        expires_at = datetime.fromtimestamp((bucket + 2) * window_seconds, timezone.utc)
+        for _ in range(2):
+            try:
+                document = await self._db.shared_counters.find_one_and_update(
+                    {"_id": f"{self._id(namespace, key)}:{bucket}"},
+                    {"$inc": {"count": 1}, "$setOnInsert": {"expires_at": expires_at}},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER,
+                )
+                return document["count"]
+            except DuplicateKeyError:
+                continue  # upsert concorrente: o documento já existe, tenta de novo
+        raise RuntimeError(f"Não foi possível incrementar {namespace}:{key}")
+
+    async def publish(self, channel, message, origin):
+        await self._db.shared_events.insert_one({
+            "id": str(uuid4()), "channel": channel, "message": message, "origin": origin, "at": _now(),
+        })
+
+    async def poll(self, since):
+        return await self._db.shared_events.find({"at": {"$gte": since}}, {"_id": 0}).sort("at", ASCENDING).to_list(1000)
+
+    async def register_job(self, queue, job_id, owner, lease_seconds, payload):
+        await self._db.shared_jobs.update_one(
+            {"id": job_id},
+            {"$set": {
+                "queue": queue, "owner": owner, "status": "running", "payload": payload,
+                "lease_expires_at": _now() + timedelta(seconds=lease_seconds),
+            }},
+            upsert=True,
+        )
+
+    async def renew_job(self, job_id, owner, lease_seconds):
+        result = await self._db.shared_jobs.update_one(
+            {"id": job_id, "owner": owner, "status": "running"},
+            {"$set": {"lease_expires_at": _now() + timedelta(seconds=lease_seconds)}},
+        )
+        return result.matched_count > 0
+
+    async def finish_job(self, job_id, owner, status):
+        await self._db.shared_jobs.delete_one({"id": job_id, "owner": owner})
+
+    async def claim_expired_job(self, owner):
+        return await self._db.shared_jobs.find_one_and_update(
+            {"status": "running", "lease_expires_at": {"$lt": _now()}},
+            {"$set": {"status": "expired", "owner": owner}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER,
+        )
+
+
+async def ensure_shared_state_indexes(db):
+    await db.shared_kv.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+    await db.shared_counters.create_index("expires_at", expireAfterSeconds=0, name="expires_at_ttl")
+    await db.shared_events.create_index("at", expireAfterSeconds=EVENT_RETENTION_SECONDS, name="at_ttl")
+    await db.shared_jobs.create_index("id", unique=True, name="id_unique")
+    await db.shared_jobs.create_index([("status", ASCENDING), ("lease_expires_at", ASCENDING)], name="status_lease")
+
+
+BACKENDS: Dict[str, Callable] = {
+    "mongo": MongoStateBackend,
+    "memory": lambda db: MemoryStateBackend(),
+}
+
+
+# ============================================================================
+# COORDENAÇÃO POR WORKER
+# ============================================================================
+
+InvalidationHandler = Callable[[dict], None]
+ExpiredJobHandler = Callable[[dict], Awaitable[None]]
+
+
+class RateLimitExceeded(Exception):
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"Limite de requisições excedido (tente em {retry_after:.0f}s)")
+
+
+class SharedState:
+    def __init__(self):
+        self.backend: SharedStateBackend = MemoryStateBackend()
+        self.worker_id: Optional[str] = None
+        self._invalidation_handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._expired_handlers: Dict[str, ExpiredJobHandler] = {}
+        self._seen_events: Dict[str, datetime] = {}
+        self._since = _now()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, db, backend: Optional[SharedStateBackend] = None):
+        """Inicializa o estado compartilhado neste worker (chamar no lifespan)"""
+        if self._task is not None:
+            return
+        if backend is None:
+            factory = BACKENDS.get(BACKEND_NAME)
+            if factory is None:
+                raise ValueError(f"SHARED_STATE_BACKEND desconhecido: {BACKEND_NAME}")
+            backend = factory(db)
+        self.backend = backend
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:6]}"
+        self._since = _now()
+        self._task = asyncio.get_running_loop().create_task(self._run())
+        logger.info(f"Estado compartilhado: backend {type(backend).__name__}, worker {self.worker_id}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(INVALIDATION_POLL_SECONDS)
+            try:
+                await self.apply_remote_invalidations()
+                await self.reap_expired_jobs()
+            except Exception as e:
+                logger.warning(f"Sincronização do estado compartilhado falhou: {e}")
+
+    # ------------------------------------------------------------------
+    # Invalidação de caches
+    # ------------------------------------------------------------------
+
+    def on_invalidation(self, channel: str, handler: InvalidationHandler):
+        """Registra o handler local (síncrono) das invalidações de `channel`"""
+        self._invalidation_handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, message: dict):
+        for handler in self._invalidation_handlers.get(channel, []):
+            try:
+                handler(message)
+            except Exception as e:
+                logger.warning(f"Invalidação de {channel} falhou: {e}")
+
+    async def publish_invalidation(self, channel: str, **message):
+        """Aplica a invalidação neste worker e publica para os demais"""
+        self._dispatch(channel, message)
+        try:
+            await self.backend.publish(channel, message, self.worker_id or "local")
+        except Exception as e:
+            logger.warning(f"Não foi possível publicar a invalidação de {channel}: {e}")
+
+    async def apply_remote_invalidations(self) -> int:
+        now = _now()
+        events = await self.backend.poll(self._since - timedelta(seconds=EVENT_OVERLAP_SECONDS))
+        self._since = now
+        applied = 0
+        for event in events:
+            if event["id"] in self._seen_events:
+                continue
+            self._seen_events[event["id"]] = event["at"]
+            if event["origin"] != self.worker_id:
+                self._dispatch(event["channel"], event["message"])
+                applied += 1
+        cutoff = now - timedelta(seconds=EVENT_OVERLAP_SECONDS * 4)
+        for event_id in [i for i, at in self._seen_events.items() if at < cutoff]:
+            del self._seen_events[event_id]
+        return applied
+
+    # ------------------------------------------------------------------
+    # Rate limit
+    # ------------------------------------------------------------------
+
+    async def rate_limit(self, name: str, key: str, limit: int, window_seconds: float):
+        """
+        Conta uma ocorrência de `key` na janela atual (somando todos os workers).
+
+        Raises:
+            RateLimitExceeded: mais de `limit` ocorrências na janela
+        """
+        if limit <= 0:
+            return
+        count = await self.backend.incr(f"rate:{name}", key, window_seconds)
+        if count > limit:
+            raise RateLimitExceeded(window_seconds - time.time() % window_seconds)
+
+    # ------------------------------------------------------------------
+    # Jobs com lease
+    # ------------------------------------------------------------------
+
+    def on_job_expired(self, queue: str, handler: ExpiredJobHandler):
+        """Handler para jobs de `queue` cujo worker parou de renovar o lease"""
+        self._expired_handlers[queue] = handler
+
+    async def run_leased(self, queue: str, job_id: str, coro, payload: Optional[dict] = None):
+        """Executa `coro` renovando o lease do job enquanto ele roda"""
+        owner = self.worker_id or "local"
+        await self.backend.register_job(queue, job_id, owner, JOB_LEASE_SECONDS, payload or {})
+        task = asyncio.ensure_future(coro)
+        status = "failed"
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=JOB_LEASE_SECONDS / 3)
+                if done:
+                    result = task.result()
+                    status = "done"
+                    return result
+                try:
+                    await self.backend.renew_job(job_id, owner, JOB_LEASE_SECONDS)
+                except Exception as e:
+                    logger.warning(f"Não foi possível renovar o lease do job {job_id}: {e}")
+        except asyncio.CancelledError:
+            task.cancel()
+            raise
+        finally:
+            try:
+                await self.backend.finish_job(job_id, owner, status)
+            except Exception as e:
+                logger.warning(f"Não foi possível encerrar o job {job_id}: {e}")
+
+    async def reap_expired_jobs(self) -> int:
+        reaped = 0
+        while True:
+            job = await self.backend.claim_expired_job(self.worker_id or "local")
+            if job is None:
+                return reaped
+            handler = self._expired_handlers.get(job["queue"])
+            logger.warning(f"Job {job['id']} ({job['queue']}) perdeu o worker; lease vencido")
+            if handler is not None:
+                try:
+                    await handler(job)
+                except Exception as e:
+                    logger.warning(f"Handler de job expirado {job['queue']} falhou: {e}")
+            await self.backend.finish_job(job["id"], self.worker_id or "local", "expired")
+            reaped += 1
+
+
+shared_state = SharedState()
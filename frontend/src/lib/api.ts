@@ -82,6 +82,9 @@ export { api };
 // Also export as default for backward compatibility
 export default api;
 
+// Imagens servidas pelo backend (/api/images/{id}/{variante}) para usar em <img src>
+export const backendUrl = (path: string) => `${API_URL}${path}`;
+
 // Legacy API functions for backward compatibility
 interface ApiOptions {
   method?: string;
@@ -148,8 +151,9 @@ export const leadsApi = {
 };
 
 export const agendamentosApi = {
-  getAll: (token: string) =>
-    apiFetch('/api/agendamentos', { token }),
+  // Paginado por cursor (next_cursor na resposta)
+  getAll: (token: string, cursor?: string) =>
+    apiFetch(`/api/agendamentos${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`, { token }),
   
   create: (token: string, data: any) =>
     apiFetch('/api/agendamentos', { method: 'POST', body: data, token }),
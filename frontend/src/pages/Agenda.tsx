@@ -48,8 +48,15 @@ export default function Agenda() {
   const loadAgendamentos = async () => {
     if (token) {
       try {
-        const response = await agendamentosApi.getAll(token)
-        setAgendamentos(response.agendamentos)
+        // Todas as páginas: os totais de faturamento somam a agenda inteira
+        const all: Agendamento[] = []
+        let cursor: string | undefined
+        do {
+          const response = await agendamentosApi.getAll(token, cursor)
+          all.push(...response.agendamentos)
+          cursor = response.next_cursor ?? undefined
+        } while (cursor)
+        setAgendamentos(all)
       } catch (error) {
         console.error('Error loading agendamentos:', error)
       }
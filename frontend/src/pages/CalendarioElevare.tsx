@@ -25,7 +25,7 @@ import {
   DialogTitle,
 } from "@/components/ui/dialog";
 import NeuroVendasLayout from "@/components/dashboard/NeuroVendasLayout";
-import { api } from "@/lib/api";
+import { api, backendUrl } from "@/lib/api";
 import { BackButton, HomeButton } from "@/components/ui/page-header";
 import {
   Calendar,
@@ -86,7 +86,14 @@ interface PostCampanha {
   dica_visual?: string;
   data_programada: string;
   status: string;
-  imagem_base64?: string;
+  imagem_id?: string;
+  imagem_urls?: ImageUrls;
+}
+
+interface ImageUrls {
+  thumb: string;
+  medium: string;
+  original: string;
 }
 
 interface CicloNeuro {
@@ -127,7 +134,7 @@ export default function CalendarioElevare() {
   const [generating, setGenerating] = useState(false);
   const [regeneratingPost, setRegeneratingPost] = useState<string | null>(null);
   const [generatingImage, setGeneratingImage] = useState<string | null>(null);
-  const [selectedImage, setSelectedImage] = useState<string | null>(null);
+  const [selectedImage, setSelectedImage] = useState<ImageUrls | null>(null);
   const [verifyingPost, setVerifyingPost] = useState<string | null>(null);
   const [verifyingCampaign, setVerifyingCampaign] = useState(false);
   const [verificationResult, setVerificationResult] = useState<any>(null);
@@ -278,7 +285,7 @@ export default function CalendarioElevare() {
         // Atualizar o post com a imagem
         setPosts(posts.map(p => 
           p.id === postId 
-            ? { ...p, imagem_base64: response.data.image_base64 } 
+            ? { ...p, imagem_id: response.data.image_id, imagem_urls: response.data.image_urls } 
             : p
         ));
       }
@@ -329,14 +336,14 @@ export default function CalendarioElevare() {
     }
   };
 
-  const handleViewImage = (imageBase64: string) => {
-    setSelectedImage(imageBase64);
+  const handleViewImage = (urls: ImageUrls) => {
+    setSelectedImage(urls);
     setShowImageDialog(true);
   };
 
-  const handleDownloadImage = (imageBase64: string, postTitle: string) => {
+  const handleDownloadImage = (urls: ImageUrls, postTitle: string) => {
     const link = document.createElement('a');
-    link.href = `data:image/png;base64,${imageBase64}`;
+    link.href = backendUrl(urls.original);
     link.download = `${postTitle.replace(/\s+/g, '_')}_neurovendas.png`;
     link.click();
   };
@@ -702,19 +709,22 @@ export default function CalendarioElevare() {
                                 </div>
                                 
                                 {/* Imagem Gerada */}
-                                {post.imagem_base64 && (
+                                {post.imagem_urls && (
                                   <div className="mb-3 relative group">
                                     <img
-                                      src={`data:image/png;base64,${post.imagem_base64}`}
+                                      src={backendUrl(post.imagem_urls.thumb)}
+                                      srcSet={`${backendUrl(post.imagem_urls.thumb)} 320w, ${backendUrl(post.imagem_urls.medium)} 1080w`}
+                                      sizes="(max-width: 768px) 100vw, 33vw"
+                                      loading="lazy"
                                       alt={post.titulo || "Imagem do post"}
                                       className="w-full h-48 object-cover rounded-lg cursor-pointer"
-                                      onClick={() => handleViewImage(post.imagem_base64!)}
+                                      onClick={() => handleViewImage(post.imagem_urls!)}
                                     />
                                     <div className="absolute inset-0 bg-black/40 opacity-0 group-hover:opacity-100 transition-opacity rounded-lg flex items-center justify-center gap-2">
                                       <Button
                                         size="sm"
                                         variant="secondary"
-                                        onClick={() => handleViewImage(post.imagem_base64!)}
+                                        onClick={() => handleViewImage(post.imagem_urls!)}
                                       >
                                         <Image className="w-4 h-4 mr-1" />
                                         Ver
@@ -722,7 +732,7 @@ export default function CalendarioElevare() {
                                       <Button
                                         size="sm"
                                         variant="secondary"
-                                        onClick={() => handleDownloadImage(post.imagem_base64!, post.titulo || `post_${post.dia_do_ciclo}`)}
+                                        onClick={() => handleDownloadImage(post.imagem_urls!, post.titulo || `post_${post.dia_do_ciclo}`)}
                                       >
                                         <Download className="w-4 h-4 mr-1" />
                                         Baixar
@@ -966,7 +976,7 @@ export default function CalendarioElevare() {
             {selectedImage && (
               <div className="mt-4">
                 <img
-                  src={`data:image/png;base64,${selectedImage}`}
+                  src={backendUrl(selectedImage.medium)}
                   alt="Imagem gerada"
                   className="w-full rounded-lg"
                 />
@@ -980,7 +990,7 @@ export default function CalendarioElevare() {
                   <Button
                     onClick={() => {
                       const link = document.createElement('a');
-                      link.href = `data:image/png;base64,${selectedImage}`;
+                      link.href = backendUrl(selectedImage.original);
                       link.download = `neurovendas_post_${Date.now()}.png`;
                       link.click();
                     }}
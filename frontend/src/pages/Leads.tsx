@@ -60,8 +60,15 @@ interface Lead {
   created_at: string;
 }
 
+interface LeadFunnel {
+  status: Record<string, number>;
+  temperatura: Record<string, number>;
+}
+
 export default function Leads() {
   const [leads, setLeads] = useState<Lead[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [funnel, setFunnel] = useState<LeadFunnel>({ status: {}, temperatura: {} });
   const [loading, setLoading] = useState(true);
   const [search, setSearch] = useState("");
   const [filterTemp, setFilterTemp] = useState("all");
@@ -82,14 +89,24 @@ export default function Leads() {
     observacoes: "",
   });
 
+  // Filtros e busca rodam no servidor (/api/leads/query); debounce na digitação
   useEffect(() => {
-    fetchLeads();
-  }, []);
+    const timer = setTimeout(() => fetchLeads(), 300);
+    return () => clearTimeout(timer);
+  }, [search, filterTemp]);
 
-  const fetchLeads = async () => {
+  const fetchLeads = async (cursor?: string) => {
     try {
-      const response = await api.get("/api/leads");
-      setLeads(response.data.leads);
+      const response = await api.get("/api/leads/query", {
+        params: {
+          ...(search.trim() ? { q: search.trim() } : {}),
+          ...(filterTemp !== "all" ? { temperatura: filterTemp } : {}),
+          ...(cursor ? { cursor } : {}),
+        },
+      });
+      setLeads((prev) => (cursor ? [...prev, ...response.data.leads] : response.data.leads));
+      setNextCursor(response.data.next_cursor ?? null);
+      setFunnel(response.data.funnel);
     } catch (error) {
       console.error("Error fetching leads:", error);
       toast({
@@ -194,11 +211,7 @@ export default function Leads() {
     }
   };
 
-  const filteredLeads = leads.filter((lead) => {
-    const matchesSearch = lead.nome.toLowerCase().includes(search.toLowerCase());
-    const matchesTemp = filterTemp === "all" || lead.temperatura === filterTemp;
-    return matchesSearch && matchesTemp;
-  });
+  const totalLeads = Object.values(funnel.temperatura).reduce((sum, count) => sum + count, 0);
 
   const temperatureIcons: Record<string, any> = {
     quente: { icon: Flame, color: "text-red-500", bg: "bg-red-50" },
@@ -344,7 +357,7 @@ export default function Leads() {
               <Input
                 value={search}
                 onChange={(e) => setSearch(e.target.value)}
-                placeholder="Buscar por nome..."
+                placeholder="Buscar por nome, e-mail ou telefone..."
                 className="pl-10"
               />
             </div>
@@ -365,24 +378,24 @@ export default function Leads() {
         {/* Stats */}
         <div className="grid grid-cols-2 md:grid-cols-4 gap-4 mb-6">
           <Card className="p-4 bg-white border-slate-200">
-            <p className="text-2xl font-bold text-slate-800">{leads.length}</p>
+            <p className="text-2xl font-bold text-slate-800">{totalLeads}</p>
             <p className="text-sm text-slate-500">Total de leads</p>
           </Card>
           <Card className="p-4 bg-red-50 border-red-200">
             <p className="text-2xl font-bold text-red-600">
-              {leads.filter((l) => l.temperatura === "quente").length}
+              {funnel.temperatura.quente ?? 0}
             </p>
             <p className="text-sm text-red-600">Leads quentes</p>
           </Card>
           <Card className="p-4 bg-amber-50 border-amber-200">
             <p className="text-2xl font-bold text-amber-600">
-              {leads.filter((l) => l.temperatura === "morno").length}
+              {funnel.temperatura.morno ?? 0}
             </p>
             <p className="text-sm text-amber-600">Leads mornos</p>
           </Card>
           <Card className="p-4 bg-green-50 border-green-200">
             <p className="text-2xl font-bold text-green-600">
-              {leads.filter((l) => l.status === "convertido").length}
+              {funnel.status.convertido ?? 0}
             </p>
             <p className="text-sm text-green-600">Convertidos</p>
           </Card>
@@ -395,7 +408,7 @@ export default function Leads() {
               <CardSkeleton key={i} />
             ))}
           </div>
-        ) : filteredLeads.length === 0 ? (
+        ) : leads.length === 0 ? (
           <Card className="p-12 bg-white border-slate-200 text-center">
             <Target className="w-12 h-12 text-slate-300 mx-auto mb-4" />
             <h3 className="text-lg font-semibold text-slate-800 mb-2">Nenhum lead encontrado</h3>
@@ -403,7 +416,7 @@ export default function Leads() {
           </Card>
         ) : (
           <div className="space-y-3">
-            {filteredLeads.map((lead) => {
+            {leads.map((lead) => {
               const temp = temperatureIcons[lead.temperatura] || temperatureIcons.frio;
               const TempIcon = temp.icon;
               return (
@@ -464,6 +477,11 @@ export default function Leads() {
                 </Card>
               );
             })}
+            {nextCursor && (
+              <Button variant="outline" className="w-full" onClick={() => fetchLeads(nextCursor)}>
+                Carregar mais
+              </Button>
+            )}
           </div>
         )}
 